@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline da ingestão RAG (enviar_chunks_embeddings.py)
+================================================================
+
+Mede o efeito de CHUNK_SIZE, estratégia de chunking e chunks por request no
+pipeline de embeddings sem chamar a API da OpenAI nem o Supabase.
+
+- Sobe um stub local da edge function gerar-embeddings-documentacao com
+  latência e respostas 429 configuráveis
+- Gera embeddings com um embedder local determinístico (hashing de tokens)
+- Para cada configuração reporta chunks, tokens estimados, requests, 429s,
+  tempo total e recall@k sobre um conjunto fixo de perguntas
+
+Uso:
+    python benchmark_embeddings.py --tamanhos 1000 2000 4000 --modos paragrafo cdc --lotes 1 5
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import enviar_chunks_embeddings as ingestao
+
+DIMENSAO_EMBEDDING = 256
+
+# Perguntas fixas com o tipo de documento que deve ser recuperado
+PERGUNTAS = [
+    ("Como adicionar uma nova despesa na obra?", "despesas"),
+    ("Como usar a busca SINAPI no formulário de despesa?", "despesas"),
+    ("Como é calculado o indicador de variação em relação ao SINAPI?", "despesas"),
+    ("Quais são os campos obrigatórios dos dados básicos do orçamento paramétrico?", "orcamento"),
+    ("Como funciona a busca por CEP na localização do orçamento?", "orcamento"),
+    ("Como informar áreas e metragens no orçamento?", "orcamento"),
+    ("Como criar um novo contrato com o assistente IA?", "contratoIA"),
+    ("Quantos contratos estão aguardando assinatura?", "contratoIA"),
+    ("Como filtrar contratos por obra?", "contratoIA"),
+    ("Como excluir uma obra da listagem?", "obras"),
+    ("Como é calculado o status da obra?", "obras"),
+    ("O que mostra a tabela de obras?", "obras"),
+    ("Qual é o saldo disponível no controle orçamentário?", "controle_orcamentario"),
+    ("Quais obras estão em risco de estourar o orçamento?", "controle_orcamentario"),
+    ("Como interpretar a precisão das estimativas?", "controle_orcamentario"),
+]
+
+
+def _tokens(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]{3,}", texto)
+
+
+def estimar_tokens(texto):
+    """Estimativa de tokens da API (~4 caracteres por token)"""
+    return max(1, len(texto) // 4)
+
+
+def embedding_local(texto, dimensao=DIMENSAO_EMBEDDING):
+    """
+    Embedder determinístico: hashing de tokens em um vetor L2-normalizado
+
+    Args:
+        texto: Texto a ser representado
+        dimensao: Tamanho do vetor
+
+    Returns:
+        list[float] com norma 1 (ou zeros para texto sem tokens)
+    """
+    vetor = [0.0] * dimensao
+    for token in _tokens(texto):
+        h = int.from_bytes(hashlib.blake2b(
+            token.encode("utf-8"), digest_size=8).digest(), "big")
+        vetor[h % dimensao] += 1.0 if (h >> 63) else -1.0
+    norma = math.sqrt(sum(v * v for v in vetor))
+    return [v / norma for v in vetor] if norma else vetor
+
+
+class ServidorEmbeddingsStub:
+    """Stub local da edge function gerar-embeddings-documentacao"""
+
+    def __init__(self, latencia=0.0, taxa_429=0.0, retry_after=0.05, semente=42):
+        self.latencia = latencia
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.registros = {}
+        self.requests = 0
+        self.respostas_429 = 0
+        self.bytes_recebidos = 0
+        self._servidor = ThreadingHTTPServer(
+            ("127.0.0.1", 0), self._criar_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, porta = self._servidor.server_address
+        return f"http://{host}:{porta}{ingestao.EDGE_FUNCTION}"
+
+    def _criar_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status, corpo, extra=None):
+                dados = json.dumps(corpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                for chave, valor in (extra or {}).items():
+                    self.send_header(chave, valor)
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_POST(self):
+                corpo = self.rfile.read(
+                    int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.bytes_recebidos += len(corpo)
+                    limitar = stub._aleatorio.random() < stub.taxa_429
+                    if limitar:
+                        stub.respostas_429 += 1
+                if stub.latencia:
+                    time.sleep(stub.latencia)
+                if limitar:
+                    self._responder(429, {"error": "Too Many Requests"},
+                                    {"Retry-After": str(stub.retry_after)})
+                    return
+                payload = json.loads(corpo)
+                documento, chunks = payload.get(
+                    "documento"), payload.get("chunks")
+                if not documento or not isinstance(chunks, list):
+                    self._responder(
+                        400, {"error": "Documento e chunks são obrigatórios"})
+                    return
+                # Upsert pelo chunk_id e limpeza por manter_ids, como a edge function
+                novos = {c.get("chunk_id") or len(stub.registros) + i:
+                         (documento, c["conteudo"], embedding_local(c["conteudo"]))
+                         for i, c in enumerate(chunks)}
+                manter = payload.get("manter_ids")
+                removidos = 0
+                with stub._lock:
+                    stub.registros.update(novos)
+                    if isinstance(manter, list):
+                        antigos = [i for i, r in stub.registros.items()
+                                   if r[0] == documento and i not in set(manter)]
+                        for i in antigos:
+                            del stub.registros[i]
+                        removidos = len(antigos)
+                self._responder(200, {"success": True, "documento": documento,
+                                      "chunks_processados": len(novos),
+                                      "removidos": removidos})
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def recall_em_k(registros, perguntas=PERGUNTAS, k=3):
+    """Fração das perguntas cujo top-k contém um chunk do documento esperado"""
+    if not registros:
+        return 0.0
+    acertos = 0
+    for pergunta, esperado in perguntas:
+        q = embedding_local(pergunta)
+        pontuados = sorted(
+            registros, key=lambda r: -sum(a * b for a, b in zip(q, r[2])))
+        if any(doc == esperado for doc, _, _ in pontuados[:k]):
+            acertos += 1
+    return acertos / len(perguntas)
+
+
+def executar_configuracao(tamanho, modo, chunks_por_request, latencia=0.0,
+                          taxa_429=0.0, k=3):
+    """
+    Executa a ingestão completa contra o stub para uma configuração
+
+    Returns:
+        Dict com métricas da configuração
+    """
+    with ServidorEmbeddingsStub(latencia=latencia, taxa_429=taxa_429) as stub:
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for documento in ingestao.documentos:
+                ingestao.enviar_chunks(
+                    documento, modo=modo, url=stub.url, tamanho=tamanho,
+                    chunks_por_request=chunks_por_request, pausa=0)
+        tempo = time.perf_counter() - inicio
+        registros = list(stub.registros.values())
+
+    return {
+        "chunk_size": tamanho,
+        "modo": modo,
+        "chunks_por_request": chunks_por_request,
+        "chunks": len(registros),
+        "tokens": sum(estimar_tokens(r[1]) for r in registros),
+        "requests": stub.requests,
+        "respostas_429": stub.respostas_429,
+        "bytes": stub.bytes_recebidos,
+        "tempo_s": round(tempo, 3),
+        f"recall@{k}": round(recall_em_k(registros, k=k), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark offline da ingestão de embeddings")
+    parser.add_argument("--tamanhos", type=int, nargs="+",
+                        default=[1000, ingestao.CHUNK_SIZE, 4000])
+    parser.add_argument("--modos", nargs="+", default=["paragrafo", "cdc"],
+                        choices=["paragrafo", "cdc"])
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 5],
+                        help="Chunks por request")
+    parser.add_argument("--latencia", type=float, default=0.02,
+                        help="Latência simulada por request (s)")
+    parser.add_argument("--taxa-429", type=float, default=0.0,
+                        help="Probabilidade de resposta 429 por request")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    for tamanho in args.tamanhos:
+        for modo in args.modos:
+            for lote in args.lotes:
+                resultado = executar_configuracao(
+                    tamanho, modo, lote, latencia=args.latencia,
+                    taxa_429=args.taxa_429, k=args.k)
+                resultados.append(resultado)
+                print(" | ".join(f"{c}={v}" for c, v in resultado.items()))
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
+import contextlib
+import email.utils
 import requests
 import os
+import sys
 import time
+from datetime import datetime, timezone
+import json
+import hashlib
+import uuid
 
 documentos = [
     {
@@ -36,6 +43,24 @@ API_KEY = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZSIsInJlZiI6
 
 CHUNK_SIZE = 2000  # caracteres
 
+# Chunking por conteúdo: um parágrafo vira âncora de corte quando o hash do
+# seu texto cai no divisor, ou quando o próximo parágrafo é um título markdown.
+# Como a decisão depende só do parágrafo, uma edição local mexe apenas nos
+# chunks vizinhos e o restante do documento mantém os mesmos cortes.
+CDC_DIVISOR = 4
+CDC_MIN_SIZE = CHUNK_SIZE // 4
+
+MANIFEST_PATH = ".embeddings_manifest.json"
+MAX_TENTATIVAS_429 = 5
+
+# Sessão única (keep-alive); com --metricas passa a registrar cada chamada
+sessao = requests.Session()
+
+
+def _etapa(nome):
+    # Sem --profile as etapas não custam nada (ver sinapi_perfil.py)
+    return contextlib.nullcontext()
+
 
 def split_chunks(text, size=CHUNK_SIZE):
     # Quebra por parágrafo, mas garante que não ultrapasse o tamanho
@@ -54,42 +79,189 @@ def split_chunks(text, size=CHUNK_SIZE):
     return chunks
 
 
-def enviar_chunks(documento):
+def _hash_paragrafo(p):
+    # Normaliza espaços para que reformatações triviais não movam âncoras
+    normalizado = " ".join(p.split())
+    return int.from_bytes(
+        hashlib.blake2b(normalizado.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _eh_titulo(p):
+    return p.lstrip().startswith("#")
+
+
+def split_chunks_cdc(text, size=CHUNK_SIZE, min_size=CDC_MIN_SIZE, divisor=CDC_DIVISOR):
+    # Quebra por parágrafo com cortes definidos pelo conteúdo (e não pela posição)
+    paragraphs = [p for p in text.split('\n\n') if p.strip()]
+    chunks = []
+    current = ""
+    for idx, p in enumerate(paragraphs):
+        if current and len(current) + len(p) + 2 > size:
+            # Limite de tamanho: corte forçado
+            chunks.append(current)
+            current = ""
+        current += ("\n\n" if current else "") + p
+        proximo = paragraphs[idx + 1] if idx + 1 < len(paragraphs) else None
+        ancora = _hash_paragrafo(p) % divisor == 0 or (
+            proximo is not None and _eh_titulo(proximo))
+        if ancora and len(current) >= min_size:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_id(documento, chunk):
+    # ID estável: mesmo tipo de documento + mesmo conteúdo => mesmo ID
+    base = f"{documento['tipo']}\x00{chunk}".encode("utf-8")
+    return hashlib.sha256(base).hexdigest()[:32]
+
+
+def id_registro(cid):
+    # O chunk_id (128 bits) vira o id uuid da linha em embeddings_conhecimento
+    return str(uuid.UUID(hex=cid))
+
+
+def carregar_manifesto(caminho=MANIFEST_PATH):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_manifesto(manifesto, caminho=MANIFEST_PATH):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+
+def _segundos_retry_after(valor, padrao):
+    # Retry-After vem em segundos ("120") ou como data HTTP ("Wed, 21 Oct 2026 07:28:00 GMT")
+    if not valor:
+        return padrao
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        quando = email.utils.parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return padrao
+    if quando.tzinfo is None:
+        quando = quando.replace(tzinfo=timezone.utc)
+    return max(0.0, (quando - datetime.now(timezone.utc)).total_seconds())
+
+
+def _post_com_retry(url, payload, headers, max_tentativas=MAX_TENTATIVAS_429):
+    # Em 429 respeita o Retry-After (ou backoff exponencial) antes de tentar de novo
+    for tentativa in range(max_tentativas):
+        resp = sessao.post(url, json=payload, headers=headers, timeout=60)
+        if resp.status_code != 429 or tentativa == max_tentativas - 1:
+            return resp
+        metricas = getattr(sessao, "_metricas", None)
+        if metricas is not None:
+            metricas.registrar_retentativa("POST", url)
+        time.sleep(_segundos_retry_after(resp.headers.get("Retry-After"), 2 ** tentativa))
+    return resp
+
+
+def enviar_chunks(documento, modo="paragrafo", manifesto=None, url=None,
+                  tamanho=CHUNK_SIZE, chunks_por_request=1, pausa=1.0):
     with open(documento["path"], "r", encoding="utf-8") as f:
         texto = f.read()
-    chunks = split_chunks(texto)
+    with _etapa("chunking"):
+        if modo == "cdc":
+            chunks = split_chunks_cdc(texto, size=tamanho, min_size=tamanho // 4)
+        else:
+            chunks = split_chunks(texto, size=tamanho)
+        ids = [chunk_id(documento, c) for c in chunks]
+    # Chunks idênticos têm o mesmo ID (uma linha no banco): cada ID vai uma
+    # vez só, senão o upsert de um lote recebe o mesmo id duas vezes
+    unicos = list(dict.fromkeys(ids))
+    # Com manifesto, chunks já enviados (mesmo ID) são pulados
+    ja_enviados = set(manifesto.get(documento["nome"], [])
+                      ) if manifesto is not None else set()
+    enviados = [cid for cid in unicos if cid in ja_enviados]
+    pendentes, vistos = [], set(ja_enviados)
+    for i, (c, cid) in enumerate(zip(chunks, ids)):
+        if cid not in vistos:
+            vistos.add(cid)
+            pendentes.append((i, c, cid))
     print(
-        f"Enviando {len(chunks)} chunks para {documento['nome']} ({documento['tipo']})...")
-    for i, chunk in enumerate(chunks):
+        f"Enviando {len(pendentes)}/{len(chunks)} chunks para {documento['nome']} ({documento['tipo']})...")
+    headers = {
+        "Content-Type": "application/json",
+        "apikey": API_KEY,
+        "Authorization": f"Bearer {API_KEY}"
+    }
+    # A edge function aceita vários chunks por request; como cada chunk é
+    # gravado por upsert no seu chunk_id, reenviar um lote que falhou no meio
+    # (parte já gravada) não duplica linhas
+    for inicio in range(0, len(pendentes), chunks_por_request):
+        lote = pendentes[inicio:inicio + chunks_por_request]
         payload = {
             "documento": documento["tipo"],
             "chunks": [
                 {
                     "conteudo": chunk,
-                    "nome_documento": documento["nome"]
+                    "nome_documento": documento["nome"],
+                    "chunk_id": id_registro(cid)
                 }
+                for _, chunk, cid in lote
             ]
         }
-        headers = {
-            "Content-Type": "application/json",
-            "apikey": API_KEY,
-            "Authorization": f"Bearer {API_KEY}"
-        }
-        resp = requests.post(
-            SUPABASE_URL + EDGE_FUNCTION,
-            json=payload,
-            headers=headers,
-            timeout=60
-        )
+        faixa = f"{lote[0][0]+1}-{lote[-1][0]+1}" if len(lote) > 1 else f"{lote[0][0]+1}"
+        with _etapa("upload"):
+            resp = _post_com_retry(
+                url or SUPABASE_URL + EDGE_FUNCTION, payload, headers)
         if resp.status_code == 200:
-            print(f"Chunk {i+1}/{len(chunks)} enviado com sucesso.")
+            print(f"Chunk {faixa}/{len(chunks)} enviado com sucesso.")
+            enviados.extend(cid for _, _, cid in lote)
         else:
             print(
-                f"ERRO no chunk {i+1}/{len(chunks)}: {resp.status_code} - {resp.text}")
-        time.sleep(1)  # Evita sobrecarga na API
+                f"ERRO no chunk {faixa}/{len(chunks)}: {resp.status_code} - {resp.text}")
+        if pausa:
+            time.sleep(pausa)  # Evita sobrecarga na API
+    if len(enviados) == len(unicos):
+        # Versão atual completa no banco: linhas de chunks que saíram do documento são removidas
+        payload = {
+            "documento": documento["tipo"],
+            "nome_documento": documento["nome"],
+            "manter_ids": [id_registro(cid) for cid in unicos],
+            "chunks": []
+        }
+        resp = _post_com_retry(url or SUPABASE_URL + EDGE_FUNCTION, payload, headers)
+        if resp.status_code == 200:
+            removidos = resp.json().get("removidos", 0)
+            if removidos:
+                print(f"{removidos} chunk(s) antigo(s) de {documento['nome']} removido(s).")
+        else:
+            print(f"ERRO ao remover chunks antigos: {resp.status_code} - {resp.text}")
+    if manifesto is not None:
+        # Só ficam no manifesto os IDs presentes na versão atual do documento
+        manifesto[documento["nome"]] = [cid for cid in unicos if cid in set(enviados)]
+    return enviados
 
 
 if __name__ == "__main__":
+    # --cdc: cortes por conteúdo + manifesto para reenviar só chunks alterados
+    modo = "cdc" if "--cdc" in sys.argv else "paragrafo"
+    # --metricas: latência/bytes/status por chamada, exportados ao final
+    # (logs/metricas_enviar_chunks_embeddings_*.json ou METRICAS_ARQUIVO)
+    # --profile: perfis de CPU e alocações de chunking/upload em perfil/
+    if "--metricas" in sys.argv or "--profile" in sys.argv:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+    if "--metricas" in sys.argv:
+        from sinapi_metricas import exportar_ao_sair, instrumentar_sessao
+        instrumentar_sessao(sessao)
+        exportar_ao_sair("enviar_chunks_embeddings")
+    if "--profile" in sys.argv:
+        from sinapi_perfil import PERFIL, ativar_se_pedido
+        ativar_se_pedido("enviar_chunks_embeddings")
+        _etapa = PERFIL.etapa
+    manifesto = carregar_manifesto() if modo == "cdc" else None
     for doc in documentos:
-        enviar_chunks(doc)
+        enviar_chunks(doc, modo=modo, manifesto=manifesto)
+    if manifesto is not None:
+        salvar_manifesto(manifesto)
     print("\nProcesso finalizado!")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Benchmark de Throughput da Importação SINAPI contra o PostgREST Local
+=====================================================================
+
+Mede ponta a ponta os três caminhos de upload com condições de rede
+controladas, sem projeto Supabase (postgrest_local.py em thread de fundo):
+
+- insumos: importar_sinapi.importar_em_lotes
+- mão de obra: import_sinapi_composicoes_mao_obra.insert_data_batch
+- manutenções: ImportadorSinapiManutencoes.importar_em_lotes
+
+Para cada combinação de latência e tamanho de lote (linhas fixas ou
+'auto', o controlador adaptativo) sobe um servidor novo e reporta tempo,
+registros/s, requests, bytes, erros e o relatório do controlador de cada
+tabela. Os dados são sintéticos (tamanhos configuráveis) ou lidos dos
+arquivos com os próprios importadores.
+
+Uso:
+    python scripts/benchmark_importacao.py --latencias 0 0.05 --lotes auto 100 1000
+    python scripts/benchmark_importacao.py --insumos SINAPI_2025_04.zip --taxa-erro 0.01 \\
+        --limite-corpo 1048576 --saida benchmark_importacao.json
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from postgrest_local import CHAVE_LOCAL, ServidorPostgrestLocal
+from sinapi_dtypes import ESTADOS
+from sinapi_lotes import ControladorLotes
+
+MES_SINTETICO = '2025-04-01'
+
+
+def insumos_sinteticos(linhas: int, semente: int = 42) -> pd.DataFrame:
+    """Registros no formato de processar_dados_sinapi (um preço por UF)"""
+    aleatorio = np.random.default_rng(semente)
+    dados = pd.DataFrame({
+        'codigo_do_insumo': np.arange(1, linhas + 1).astype(str),
+        'descricao_do_insumo': [f'INSUMO SINTETICO {i}' for i in range(1, linhas + 1)],
+        'unidade': aleatorio.choice(['UN', 'M', 'M2', 'M3', 'KG', 'H'], linhas),
+    })
+    for estado in ESTADOS:
+        dados[f'preco_{estado.lower()}'] = aleatorio.uniform(1, 5000, linhas).round(2)
+    dados['mes_referencia'] = MES_SINTETICO
+    dados['ativo'] = True
+    return dados
+
+
+def mao_obra_sintetica(linhas: int, semente: int = 43) -> pd.DataFrame:
+    """Registros no formato de transform_data (preços SEM e COM desoneração)"""
+    aleatorio = np.random.default_rng(semente)
+    dados = pd.DataFrame({
+        'codigo_composicao': np.arange(80000, 80000 + linhas).astype(str),
+        'grupo': aleatorio.choice(['ALVENARIA', 'PINTURA', 'ESTRUTURA'], linhas),
+        'descricao': [f'COMPOSICAO SINTETICA {i}' for i in range(linhas)],
+        'unidade': aleatorio.choice(['H', 'M2', 'M3'], linhas),
+        'mes_referencia': MES_SINTETICO,
+        'fonte_dados': 'SINAPI_OFICIAL',
+        'ativo': True,
+    })
+    for prefixo in ('preco_sem', 'preco_com'):
+        for estado in ESTADOS:
+            dados[f'{prefixo}_{estado.lower()}'] = aleatorio.uniform(10, 500, linhas).round(2)
+    return dados
+
+
+def manutencoes_sinteticas(linhas: int, semente: int = 44) -> pd.DataFrame:
+    """Registros no formato de ImportadorSinapiManutencoes.processar_dados"""
+    aleatorio = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'data_referencia': MES_SINTETICO,
+        'tipo': aleatorio.choice(['INSUMO', 'COMPOSIÇÃO'], linhas),
+        'codigo_sinapi': pd.array(aleatorio.integers(1, 100000, linhas), dtype='Int64'),
+        'descricao': [f'MANUTENCAO SINTETICA {i}' for i in range(linhas)],
+        'tipo_manutencao': aleatorio.choice(['ALTERAÇÃO DE PREÇO', 'DESATIVAÇÃO'], linhas),
+    })
+
+
+def carregar_conjuntos(args) -> Dict[str, pd.DataFrame]:
+    """Dados de cada tabela: arquivo pelo importador ou sintéticos"""
+    if args.insumos:
+        from importar_sinapi import carregar_dados_sinapi
+        insumos = carregar_dados_sinapi(args.insumos)
+    else:
+        insumos = insumos_sinteticos(args.linhas_insumos)
+    if args.mao_obra:
+        from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra
+        mao_obra = carregar_mao_de_obra(args.mao_obra)
+    else:
+        mao_obra = mao_obra_sintetica(args.linhas_mao_obra)
+    if args.manutencoes:
+        from importar_sinapi_manutencoes import ImportadorSinapiManutencoes
+        importador = ImportadorSinapiManutencoes(args.manutencoes)
+        manutencoes = importador.processar_dados(importador.ler_planilha())
+    else:
+        manutencoes = manutencoes_sinteticas(args.linhas_manutencoes)
+    return {'sinapi_insumos': insumos, 'sinapi_composicoes_mao_obra': mao_obra,
+            'sinapi_manutencoes': manutencoes}
+
+
+def _caminhos_upload(supabase) -> Dict[str, Callable[[pd.DataFrame, ControladorLotes], Any]]:
+    from import_sinapi_composicoes_mao_obra import insert_data_batch
+    from importar_sinapi import importar_em_lotes
+    from importar_sinapi_manutencoes import ImportadorSinapiManutencoes
+
+    manutencoes = ImportadorSinapiManutencoes(supabase=supabase)
+    return {
+        'sinapi_insumos': lambda dados, c: importar_em_lotes(dados, supabase, controlador=c),
+        'sinapi_composicoes_mao_obra': lambda dados, c: insert_data_batch(
+            supabase, dados, controlador=c),
+        'sinapi_manutencoes': lambda dados, c: manutencoes.importar_em_lotes(dados, controlador=c),
+    }
+
+
+def executar_configuracao(conjuntos: Dict[str, pd.DataFrame], latencia: float,
+                          linhas_fixas: Optional[int], condicoes: Dict[str, Any]) -> List[Dict]:
+    """
+    Sobe um servidor com as condições dadas e importa as três tabelas
+
+    Returns:
+        Um dict de métricas por tabela
+    """
+    from supabase import create_client
+
+    resultados = []
+    with ServidorPostgrestLocal(latencia=latencia, **condicoes) as servidor:
+        supabase = create_client(servidor.url, CHAVE_LOCAL)
+        caminhos = _caminhos_upload(supabase)
+        for tabela, dados in conjuntos.items():
+            # Sem arquivo de estado: cada medição começa do tamanho inicial
+            controlador = ControladorLotes(tabela, linhas_fixas=linhas_fixas, arquivo_estado=None)
+            inicio = time.perf_counter()
+            caminhos[tabela](dados, controlador)
+            tempo = time.perf_counter() - inicio
+
+            estatisticas = servidor.resumo().get(f'POST {tabela}', {})
+            gravadas = len(servidor.armazenamento.tabelas.get(tabela, []))
+            resultados.append({
+                'tabela': tabela,
+                'latencia_s': latencia,
+                'lotes': linhas_fixas or 'auto',
+                'registros': len(dados),
+                'gravados': gravadas,
+                'tempo_s': round(tempo, 3),
+                'registros_por_s': round(gravadas / tempo, 1) if tempo else None,
+                'requests': estatisticas.get('requests', 0),
+                'erros_http': estatisticas.get('erros', 0),
+                'mib_enviados': round(estatisticas.get('bytes', 0) / 1024 ** 2, 2),
+                'controlador': controlador.relatorio(),
+            })
+    return resultados
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark de throughput da importação SINAPI (PostgREST local)")
+    parser.add_argument('--insumos', help="CSV/ZIP de insumos (padrão: sintéticos)")
+    parser.add_argument('--mao-obra', help="Planilha/ZIP de mão de obra (padrão: sintéticos)")
+    parser.add_argument('--manutencoes', help="Planilha/ZIP de manutenções (padrão: sintéticos)")
+    parser.add_argument('--linhas-insumos', type=int, default=20000)
+    parser.add_argument('--linhas-mao-obra', type=int, default=5000)
+    parser.add_argument('--linhas-manutencoes', type=int, default=20000)
+    parser.add_argument('--latencias', type=float, nargs='+', default=[0.0, 0.05],
+                        help="Latência fixa por request (s)")
+    parser.add_argument('--lotes', nargs='+', default=['auto'],
+                        help="'auto' (adaptativo) ou linhas fixas por lote")
+    parser.add_argument('--latencia-por-kb', type=float, default=0.0)
+    parser.add_argument('--throughput', type=float, default=None, help="Teto em bytes/s")
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help="Probabilidade de 503")
+    parser.add_argument('--limite-corpo', type=int, default=None, help="413 acima de N bytes")
+    parser.add_argument('--saida', help="Arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    try:
+        lotes = [None if l == 'auto' else int(l) for l in args.lotes]
+    except ValueError:
+        parser.error("--lotes aceita 'auto' ou números inteiros")
+
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    # importar_sinapi_manutencoes grava em logs/ ao ser importado
+    os.makedirs('logs', exist_ok=True)
+
+    conjuntos = carregar_conjuntos(args)
+    condicoes = {'latencia_por_kb': args.latencia_por_kb, 'bytes_por_segundo': args.throughput,
+                 'taxa_erro': args.taxa_erro, 'limite_corpo': args.limite_corpo}
+
+    resultados = []
+    for latencia in args.latencias:
+        for linhas_fixas in lotes:
+            for resultado in executar_configuracao(conjuntos, latencia, linhas_fixas, condicoes):
+                resultados.append(resultado)
+                print(" | ".join(f"{c}={v}" for c, v in resultado.items() if c != 'controlador'))
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False, default=str)
+        print(f"\nResultados salvos em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
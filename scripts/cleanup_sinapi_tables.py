@@ -24,11 +24,14 @@ Data: 2024-12-26
 import os
 import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from sinapi_metricas import exportar_ao_sair, instrumentar_cliente
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -58,23 +61,25 @@ def configurar_logging():
 class LimpadorTabelasSinapi:
     """Classe para limpeza de tabelas SINAPI desnecessárias"""
 
-    def __init__(self):
-        """Inicializar o limpador"""
-        self.supabase_url = os.getenv('VITE_SUPABASE_URL')
-        self.supabase_key = os.getenv('VITE_SUPABASE_ROLE_KEY')
+    def __init__(self, supabase: Client = None):
+        """Inicializar o limpador (reaproveita o cliente informado, se houver)"""
+        if supabase is None:
+            self.supabase_url = os.getenv('VITE_SUPABASE_URL')
+            self.supabase_key = os.getenv('VITE_SUPABASE_ROLE_KEY')
 
-        if not self.supabase_url or not self.supabase_key:
-            # Fallback para as chaves do arquivo env
-            self.supabase_url = os.getenv('SUPABASE_URL')
-            self.supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
+            if not self.supabase_url or not self.supabase_key:
+                # Fallback para as chaves do arquivo env
+                self.supabase_url = os.getenv('SUPABASE_URL')
+                self.supabase_key = os.getenv('SUPABASE_SERVICE_KEY')
 
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError("Variáveis de ambiente SUPABASE não encontradas")
+            if not self.supabase_url or not self.supabase_key:
+                raise ValueError("Variáveis de ambiente SUPABASE não encontradas")
 
-        logging.info(
-            "🔌 Conectando ao Supabase com privilégios administrativos...")
-        self.supabase: Client = create_client(
-            self.supabase_url, self.supabase_key)
+            logging.info(
+                "🔌 Conectando ao Supabase com privilégios administrativos...")
+            supabase = instrumentar_cliente(create_client(
+                self.supabase_url, self.supabase_key))
+        self.supabase: Client = supabase
 
         # Tabelas a serem removidas
         self.tabelas_para_remover = [
@@ -114,16 +119,77 @@ class LimpadorTabelasSinapi:
             return []
 
     def contar_registros_tabela(self, nome_tabela):
-        """Conta registros em uma tabela"""
+        """Conta registros em uma tabela (HEAD: só a contagem, sem linhas)"""
         try:
             result = self.supabase.table(nome_tabela).select(
-                '*', count='exact').execute()
+                '*', count='exact', head=True).execute()
             return result.count if result.count is not None else 0
         except Exception as e:
             logging.warning(
                 f"⚠️ Erro ao contar registros da tabela {nome_tabela}: {e}")
             return 0
 
+    def inventario_tabelas(self, contagem_exata=False, max_workers=8):
+        """
+        Coleta em uma única consulta ao catálogo, para cada tabela sinapi_*,
+        linhas estimadas, tamanho em disco e tamanho dos índices
+
+        Args:
+            contagem_exata: Se True, substitui a estimativa por COUNT exato,
+                executado em paralelo para todas as tabelas
+            max_workers: Máximo de contagens exatas simultâneas
+
+        Returns:
+            Lista de dicts (tablename, registros, estimado, tamanho_tabela,
+            tamanho_indices, tamanho_total), ordenada por nome
+        """
+        # reltuples é -1 em tabelas nunca analisadas; nesse caso usa n_live_tup
+        query = """
+        SELECT c.relname AS tablename,
+               CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint
+                    ELSE COALESCE(s.n_live_tup, 0) END AS registros,
+               pg_relation_size(c.oid) AS tamanho_tabela,
+               pg_indexes_size(c.oid) AS tamanho_indices,
+               pg_total_relation_size(c.oid) AS tamanho_total
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = 'public'
+        AND c.relkind IN ('r', 'p')
+        AND c.relname LIKE 'sinapi\\_%'
+        ORDER BY c.relname;
+        """
+
+        try:
+            result = self.supabase.rpc(
+                'execute_sql', {'query': query}).execute()
+        except Exception as e:
+            logging.error(f"❌ Erro ao consultar inventário de tabelas: {e}")
+            return []
+
+        inventario = [
+            {
+                'tablename': row['tablename'],
+                'registros': int(row['registros'] or 0),
+                'estimado': True,
+                'tamanho_tabela': int(row['tamanho_tabela'] or 0),
+                'tamanho_indices': int(row['tamanho_indices'] or 0),
+                'tamanho_total': int(row['tamanho_total'] or 0),
+            }
+            for row in (result.data or [])
+        ]
+
+        if contagem_exata and inventario:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(inventario))) as executor:
+                contagens = executor.map(
+                    self.contar_registros_tabela,
+                    [item['tablename'] for item in inventario])
+                for item, count in zip(inventario, contagens):
+                    item['registros'] = count
+                    item['estimado'] = False
+
+        return inventario
+
     def remover_tabela(self, nome_tabela):
         """Remove uma tabela específica"""
         try:
@@ -145,8 +211,14 @@ class LimpadorTabelasSinapi:
             logging.error(f"❌ Erro ao remover tabela {nome_tabela}: {e}")
             return False
 
-    def executar_limpeza(self):
-        """Executa a limpeza das tabelas desnecessárias"""
+    def executar_limpeza(self, contagem_exata=False):
+        """
+        Executa a limpeza das tabelas desnecessárias
+
+        Args:
+            contagem_exata: Se True, o relatório final das tabelas restantes
+                usa COUNT exato em vez da estimativa do catálogo
+        """
         logging.info("🚀 Iniciando limpeza de tabelas SINAPI desnecessárias...")
 
         # Verificar tabelas existentes
@@ -183,24 +255,29 @@ class LimpadorTabelasSinapi:
         logging.info(f"   - Erros: {erros}")
 
         # Verificar tabelas restantes
-        self.verificar_tabelas_restantes()
+        self.verificar_tabelas_restantes(contagem_exata=contagem_exata)
 
         return erros == 0
 
-    def verificar_tabelas_restantes(self):
+    def verificar_tabelas_restantes(self, contagem_exata=False):
         """Verifica e lista tabelas SINAPI restantes após limpeza"""
         logging.info("📋 Verificando tabelas SINAPI restantes...")
 
-        tabelas_restantes = self.verificar_tabelas_existentes()
+        inventario = self.inventario_tabelas(contagem_exata=contagem_exata)
 
-        if tabelas_restantes:
+        if inventario:
             logging.info("✅ Tabelas SINAPI mantidas:")
-            for tabela in tabelas_restantes:
-                count = self.contar_registros_tabela(tabela)
-                logging.info(f"   - {tabela}: {count:,} registros")
+            for item in inventario:
+                prefixo = "~" if item['estimado'] else ""
+                logging.info(
+                    f"   - {item['tablename']}: {prefixo}{item['registros']:,} registros, "
+                    f"{item['tamanho_tabela'] / 1024**2:.1f} MB dados, "
+                    f"{item['tamanho_indices'] / 1024**2:.1f} MB índices")
         else:
             logging.warning("⚠️ Nenhuma tabela SINAPI restante encontrada")
 
+        return inventario
+
 
 def main():
     """Função principal"""
@@ -210,6 +287,7 @@ def main():
     # Configurar logging
     log_file = configurar_logging()
     logging.info(f"📝 Log salvo em: {log_file}")
+    exportar_ao_sair('cleanup_sinapi_tables')
 
     try:
         # Criar instância do limpador
@@ -220,15 +298,20 @@ def main():
         for tabela in limpador.tabelas_para_remover:
             print(f"   - {tabela}")
 
-        confirmacao = input("\n❓ Deseja continuar? (s/N): ").strip().lower()
+        # --sim confirma sem perguntar (execução agendada / orquestrador)
+        if '--sim' in sys.argv:
+            confirmacao = 's'
+        else:
+            confirmacao = input("\n❓ Deseja continuar? (s/N): ").strip().lower()
 
         if confirmacao not in ['s', 'sim', 'y', 'yes']:
             logging.info("❌ Operação cancelada pelo usuário")
             print("❌ Operação cancelada")
             return
 
-        # Executar limpeza
-        sucesso = limpador.executar_limpeza()
+        # Executar limpeza (--contagem-exata: COUNT exato no relatório final)
+        sucesso = limpador.executar_limpeza(
+            contagem_exata='--contagem-exata' in sys.argv)
 
         if sucesso:
             print("✅ Limpeza concluída com sucesso!")
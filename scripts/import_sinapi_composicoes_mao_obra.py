@@ -1,23 +1,42 @@
 #!/usr/bin/env python3
 """
 Script para importar composições SINAPI de mão de obra
-Arquivo: SINAPI_mao_de_obra_2025_04.xlsx
+Arquivo: SINAPI_mao_de_obra_2025_04.xlsx (ou pacote .zip oficial do SINAPI)
 
 Este script processa as duas páginas da planilha:
 - SEM Desoneração
 - COM Desoneração
 
 E importa os dados para a tabela sinapi_composicoes_mao_obra
+
+O mês de referência vem de --mes=AAAA-MM ou do nome da planilha (ou dos
+membros do ZIP), como SINAPI_mao_de_obra_2025_04.xlsx
 """
 
 import pandas as pd
+import numpy as np
 import os
 import sys
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import logging
 
+from sinapi_dtypes import ESTADOS, compactar_com_medicao, uso_memoria
+from sinapi_indices import CargaSemIndices
+from sinapi_metricas import exportar_ao_sair, instrumentar_cliente
+from sinapi_perfil import ativar_se_pedido, perfilar
+from sinapi_qualidade import verificar_qualidade
+from sinapi_lotes import ControladorLotes, enviar_em_lotes
+from sinapi_particoes import detectar_mes_referencia, normalizar_mes
+from sinapi_zip import eh_zip, ler_membro, listar_membros, processar_membros
+
+ARQUIVO_PADRAO = 'docs/sinapi/SINAPI_mao_de_obra_2025_04.xlsx'
+
+# Membro selecionado quando a entrada é um pacote ZIP do SINAPI
+PADRAO_ZIP = '*mao*de*obra*.xlsx'
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -37,25 +56,24 @@ def setup_supabase() -> Client:
         raise ValueError(
             "Variáveis VITE_SUPABASE_URL e VITE_SUPABASE_ANON_KEY devem estar definidas no .env")
 
-    return create_client(url, key)
+    return instrumentar_cliente(create_client(url, key))
 
 
-def clean_numeric_value(value):
-    """Limpa e converte valores numéricos"""
-    if pd.isna(value) or value == '' or value == '-':
+def clean_numeric_series(serie) -> pd.Series:
+    """Limpa e converte uma coluna de valores numéricos ('' e '-' viram NaN)"""
+    if serie is None:
         return None
+    # Preços já numéricos (float32 compactado inclusive) passam direto
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
 
-    try:
-        # Remove espaços e converte para float
-        if isinstance(value, str):
-            value = value.strip().replace(',', '.')
-        return float(value)
-    except (ValueError, TypeError):
-        return None
+    # Remove espaços e troca vírgula decimal por ponto
+    texto = serie.astype(str).str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(texto.where(serie.notna()), errors='coerce')
 
 
-def process_excel_sheet(file_path: str, sheet_name: str) -> pd.DataFrame:
-    """Processa uma página específica da planilha Excel"""
+def process_excel_sheet(file_path, sheet_name: str) -> pd.DataFrame:
+    """Processa uma página específica da planilha Excel (caminho ou arquivo em memória)"""
     logger.info(f"Processando página: {sheet_name}")
 
     # Carrega a planilha
@@ -66,115 +84,186 @@ def process_excel_sheet(file_path: str, sheet_name: str) -> pd.DataFrame:
 
     logger.info(f"Encontrados {len(df)} registros na página {sheet_name}")
 
+    # Grupo/Unidade como categóricas e preços por UF em float32
+    df, _ = compactar_com_medicao(
+        df, sheet_name, categoricas=['Grupo', 'Unidade'], codigos=[],
+        precos=[e for e in ESTADOS if e in df.columns])
+
     return df
 
 
-def transform_data(df_sem: pd.DataFrame, df_com: pd.DataFrame) -> list:
-    """Transforma os dados das duas planilhas em formato para inserção"""
+def _process_zip_member(zip_path: str, member: str) -> dict:
+    """Lê as duas páginas de um membro do ZIP (executado em paralelo)"""
+    conteudo = ler_membro(zip_path, member)
+    sheets = {}
+    for sheet_name in ('SEM Desoneração', 'COM Desoneração'):
+        conteudo.seek(0)
+        sheets[sheet_name] = process_excel_sheet(conteudo, sheet_name)
+    return sheets
+
+
+@perfilar('leitura')
+def load_sheets(file_path: str) -> tuple:
+    """
+    Carrega as páginas SEM e COM desoneração de uma planilha ou pacote ZIP
+
+    Com ZIP, a planilha é lida direto do arquivo compactado, sem extração
+    em disco; vários membros são processados em paralelo e concatenados.
+    """
+    if not eh_zip(file_path):
+        return (process_excel_sheet(file_path, 'SEM Desoneração'),
+                process_excel_sheet(file_path, 'COM Desoneração'))
+
+    members = listar_membros(file_path, PADRAO_ZIP)
+    if not members:
+        raise ValueError(
+            f"Nenhuma planilha '{PADRAO_ZIP}' encontrada em {file_path}")
+
+    results = list(processar_membros(
+        file_path, members, _process_zip_member).values())
+    return (pd.concat([r['SEM Desoneração'] for r in results], ignore_index=True),
+            pd.concat([r['COM Desoneração'] for r in results], ignore_index=True))
+
+
+def detectar_mes(file_path: str) -> Optional[str]:
+    """Mês de referência ('AAAA-MM-01') pelo nome dos membros do ZIP ou da planilha"""
+    membros = listar_membros(file_path, PADRAO_ZIP) if eh_zip(file_path) else []
+    return detectar_mes_referencia(None, *membros, os.path.basename(file_path))
+
+
+@perfilar('processamento')
+def transform_data(df_sem: pd.DataFrame, df_com: pd.DataFrame,
+                   mes_referencia: Optional[str] = None) -> pd.DataFrame:
+    """
+    Transforma os dados das duas planilhas em formato para inserção (uma linha por composição)
+
+    Args:
+        mes_referencia: Mês das planilhas (padrão: mês corrente, com aviso;
+            carregar_mao_de_obra detecta pelo nome do arquivo)
+    """
     logger.info("Transformando dados para inserção...")
 
-    # Mapear colunas dos estados
-    estados = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
-               'MG', 'MS', 'MT', 'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN',
-               'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
-
-    registros = []
-
-    # Processa cada linha da planilha SEM desoneração
-    for idx, row_sem in df_sem.iterrows():
-        codigo = str(row_sem['Código da\nComposição']).strip()
-
-        # Busca a linha correspondente na planilha COM desoneração
-        row_com = df_com[df_com['Código da\nComposição']
-                         == row_sem['Código da\nComposição']]
-
-        if row_com.empty:
-            logger.warning(
-                f"Código {codigo} não encontrado na planilha COM desoneração")
-            continue
-
-        row_com = row_com.iloc[0]  # Pega a primeira ocorrência
-
-        # Monta o registro
-        registro = {
-            'codigo_composicao': codigo,
-            'grupo': str(row_sem['Grupo']).strip() if pd.notna(row_sem['Grupo']) else '',
-            'descricao': str(row_sem['Descrição']).strip() if pd.notna(row_sem['Descrição']) else '',
-            'unidade': str(row_sem['Unidade']).strip() if pd.notna(row_sem['Unidade']) else '',
-            'mes_referencia': '2025-04-01',  # Abril 2025
-            'fonte_dados': 'SINAPI_OFICIAL',
-            'ativo': True
-        }
-
-        # Adiciona preços SEM desoneração por estado
-        for estado in estados:
-            coluna_sem = estado  # Nome da coluna na planilha
-            valor_sem = clean_numeric_value(row_sem.get(coluna_sem))
-            registro[f'preco_sem_{estado.lower()}'] = valor_sem
-
-        # Adiciona preços COM desoneração por estado
-        for estado in estados:
-            coluna_com = estado  # Nome da coluna na planilha
-            valor_com = clean_numeric_value(row_com.get(coluna_com))
-            registro[f'preco_com_{estado.lower()}'] = valor_com
-
-        registros.append(registro)
-
-    logger.info(f"Transformados {len(registros)} registros para inserção")
+    if mes_referencia:
+        mes_referencia = normalizar_mes(mes_referencia)
+    else:
+        mes_referencia = date.today().replace(day=1).isoformat()
+        logger.warning(
+            f"Mês de referência não informado; usando o mês corrente ({mes_referencia[:7]})")
+
+    chave = 'Código da\nComposição'
+
+    # Linha correspondente na planilha COM desoneração (primeira ocorrência)
+    df_com = df_com.drop_duplicates(chave, keep='first')
+    faltantes = ~df_sem[chave].isin(df_com[chave])
+    if faltantes.any():
+        codigos = df_sem.loc[faltantes, chave].astype(str).str.strip().tolist()
+        logger.warning(
+            f"{len(codigos)} código(s) não encontrado(s) na planilha COM desoneração: "
+            f"{codigos[:10]}{'...' if len(codigos) > 10 else ''}")
+    df_sem = df_sem[~faltantes].reset_index(drop=True)
+    df_com = df_com.set_index(chave).reindex(df_sem[chave]).reset_index(drop=True)
+
+    def texto(coluna: str) -> pd.Series:
+        serie = df_sem[coluna]
+        return serie.astype(str).str.strip().where(serie.notna(), '')
+
+    registros = pd.DataFrame({
+        'codigo_composicao': df_sem[chave].astype(str).str.strip(),
+        # Grupo e unidade se repetem: categóricas guardam cada valor uma vez
+        'grupo': texto('Grupo').astype('category'),
+        'descricao': texto('Descrição'),
+        'unidade': texto('Unidade').astype('category'),
+        'mes_referencia': mes_referencia,
+        'fonte_dados': 'SINAPI_OFICIAL',
+        'ativo': True
+    })
+
+    # Preços SEM e COM desoneração por estado (coluna ausente vira null)
+    for prefixo, origem in (('preco_sem', df_sem), ('preco_com', df_com)):
+        for estado in ESTADOS:
+            valores = clean_numeric_series(origem.get(estado))
+            registros[f'{prefixo}_{estado.lower()}'] = (
+                valores.to_numpy() if valores is not None else np.nan)
+
+    logger.info(f"Transformados {len(registros)} registros para inserção "
+                f"(~{uso_memoria(registros) / 1024**2:.2f} MB)")
     return registros
 
 
-def insert_data_batch(supabase: Client, registros: list, batch_size: int = 100):
-    """Insere dados em lotes no Supabase"""
-    logger.info(
-        f"Inserindo {len(registros)} registros em lotes de {batch_size}")
-
-    total_inseridos = 0
-    total_erros = 0
-
-    for i in range(0, len(registros), batch_size):
-        batch = registros[i:i + batch_size]
-
-        try:
-            # Insere o lote
-            result = supabase.table(
-                'sinapi_composicoes_mao_obra').insert(batch).execute()
-
-            if result.data:
-                inseridos = len(result.data)
-                total_inseridos += inseridos
-                logger.info(
-                    f"Lote {i//batch_size + 1}: {inseridos} registros inseridos")
-            else:
-                logger.error(
-                    f"Lote {i//batch_size + 1}: Nenhum registro inserido")
-                total_erros += len(batch)
-
-        except Exception as e:
-            logger.error(f"Erro no lote {i//batch_size + 1}: {str(e)}")
-            total_erros += len(batch)
-
-            # Tenta inserir registro por registro para identificar problemas
-            for j, registro in enumerate(batch):
-                try:
-                    supabase.table('sinapi_composicoes_mao_obra').insert(
-                        registro).execute()
-                    total_inseridos += 1
-                except Exception as e2:
-                    logger.error(
-                        f"Erro no registro {registro.get('codigo_composicao', 'N/A')}: {str(e2)}")
-                    total_erros += 1
-
-    logger.info(
-        f"Importação concluída: {total_inseridos} inseridos, {total_erros} erros")
-    return total_inseridos, total_erros
+def carregar_mao_de_obra(file_path: str, mes_referencia: Optional[str] = None) -> pd.DataFrame:
+    """
+    load_sheets + transform_data de uma planilha ou ZIP, com o mês informado
+    ou detectado pelo nome do arquivo
+    """
+    mes_referencia = mes_referencia or detectar_mes(file_path)
+    return transform_data(*load_sheets(file_path), mes_referencia=mes_referencia)
+
+
+def insert_data_batch(supabase: Client, registros: pd.DataFrame, batch_size: Optional[int] = None,
+                      controlador: Optional[ControladorLotes] = None):
+    """
+    Insere dados em lotes no Supabase, dimensionados pelo corpo JSON e
+    ajustados pela latência (batch_size fixa o lote em linhas); lotes
+    recusados são reenviados registro por registro para identificar problemas
+    """
+    controlador = controlador or ControladorLotes('sinapi_composicoes_mao_obra',
+                                                  linhas_fixas=batch_size)
+    logger.info(f"Inserindo {len(registros)} registros (lotes {controlador.relatorio()['modo']})")
+    return enviar_em_lotes(supabase, 'sinapi_composicoes_mao_obra', registros, controlador,
+                           individual_em_erro=True, coluna_id='codigo_composicao')
+
+
+def importar_composicoes(supabase: Client, file_path: str, carga_sem_indices: bool = False,
+                         registros: Optional[pd.DataFrame] = None,
+                         mes_referencia: Optional[str] = None) -> dict:
+    """
+    Substitui o conteúdo de sinapi_composicoes_mao_obra pelos dados da
+    planilha (ou ZIP) com um cliente já conectado; usada pelo main e pelo
+    orquestrador (sinapi_orquestrador.py), que pode passar os registros de
+    transform_data já calculados
+
+    Returns:
+        Dict com total, inseridos, erros, qualidade e carga
+    """
+    # Limpa dados existentes
+    logger.info("Limpando dados existentes...")
+    supabase.table('sinapi_composicoes_mao_obra').delete().neq(
+        'id', 0).execute()
+
+    if registros is None:
+        # Processa as duas páginas da planilha e transforma os dados
+        registros = carregar_mao_de_obra(file_path, mes_referencia)
+
+    if registros.empty:
+        raise ValueError("Nenhum registro para inserir")
+
+    # Regras de qualidade (outliers entre UFs, COM x SEM desoneração...)
+    qualidade, _ = verificar_qualidade(registros)
+
+    # Insere os dados
+    lotes = ControladorLotes('sinapi_composicoes_mao_obra')
+    with CargaSemIndices(supabase, 'sinapi_composicoes_mao_obra',
+                         ativo=carga_sem_indices) as carga:
+        inseridos, erros = insert_data_batch(supabase, registros, controlador=lotes)
+
+    return {'total': len(registros), 'inseridos': inseridos, 'erros': erros,
+            'qualidade': qualidade, 'carga': carga.relatorio, 'lotes': lotes.relatorio()}
 
 
 def main():
     """Função principal"""
+    exportar_ao_sair('import_sinapi_composicoes_mao_obra')
+    ativar_se_pedido('import_sinapi_composicoes_mao_obra')
     try:
-        # Configuração
-        file_path = 'docs/sinapi/SINAPI_mao_de_obra_2025_04.xlsx'
+        # Configuração (planilha .xlsx ou pacote .zip via argumento;
+        # --carga-sem-indices remove os índices secundários durante a carga;
+        # --profile grava perfis de CPU e alocações por etapa em perfil/;
+        # --mes=AAAA-MM informa o mês quando o nome do arquivo não o traz)
+        argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+        file_path = argumentos[0] if argumentos else ARQUIVO_PADRAO
+        carga_sem_indices = '--carga-sem-indices' in sys.argv
+        mes_referencia = next((a.split('=', 1)[1] for a in sys.argv[1:]
+                               if a.startswith('--mes=')), None)
 
         if not os.path.exists(file_path):
             logger.error(f"Arquivo não encontrado: {file_path}")
@@ -184,33 +273,22 @@ def main():
         logger.info("Conectando ao Supabase...")
         supabase = setup_supabase()
 
-        # Limpa dados existentes (opcional)
-        logger.info("Limpando dados existentes...")
-        supabase.table('sinapi_composicoes_mao_obra').delete().neq(
-            'id', 0).execute()
-
-        # Processa as duas páginas da planilha
-        df_sem = process_excel_sheet(file_path, 'SEM Desoneração')
-        df_com = process_excel_sheet(file_path, 'COM Desoneração')
-
-        # Transforma os dados
-        registros = transform_data(df_sem, df_com)
-
-        if not registros:
-            logger.error("Nenhum registro para inserir")
-            sys.exit(1)
-
-        # Insere os dados
-        inseridos, erros = insert_data_batch(supabase, registros)
+        resultado = importar_composicoes(supabase, file_path, carga_sem_indices,
+                                         mes_referencia=mes_referencia)
+        total, inseridos, erros = resultado['total'], resultado['inseridos'], resultado['erros']
+        qualidade = resultado['qualidade']
 
         # Relatório final
         logger.info("="*60)
         logger.info("RELATÓRIO FINAL DA IMPORTAÇÃO")
         logger.info("="*60)
-        logger.info(f"Total de registros processados: {len(registros)}")
+        logger.info(f"Total de registros processados: {total}")
         logger.info(f"Registros inseridos com sucesso: {inseridos}")
         logger.info(f"Registros com erro: {erros}")
-        logger.info(f"Taxa de sucesso: {(inseridos/len(registros)*100):.1f}%")
+        logger.info(f"Taxa de sucesso: {(inseridos/total*100):.1f}%")
+        logger.info(f"Violações de qualidade: {qualidade['total_violacoes']} "
+                    f"{qualidade['violacoes_por_regra']}")
+        logger.info(f"Carga: {resultado['carga']}")
 
         if erros == 0:
             logger.info("🎉 Importação concluída com SUCESSO!")
@@ -7,9 +7,10 @@ Este script importa dados oficiais do SINAPI (Sistema Nacional de Pesquisa de Cu
 para a tabela sinapi_insumos no banco de dados Supabase.
 
 Funcionalidades:
-- Leitura e limpeza de dados CSV do SINAPI
+- Leitura e limpeza de dados CSV do SINAPI (encoding e delimitador
+  detectados automaticamente, parser multi-thread do Arrow)
 - Validação e conversão de tipos de dados
-- Importação em lotes para otimização de performance
+- Importação em lotes dimensionados pelo corpo JSON e ajustados pela latência
 - Logs detalhados de progresso e erros
 - Tratamento robusto de erros com rollback
 - Auditoria completa do processo de importação
@@ -21,14 +22,26 @@ Data: 2024-12-27
 import pandas as pd
 import os
 import sys
+import csv
+import codecs
 import logging
 import json
 from datetime import datetime, date
+from functools import partial
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import re
 from dotenv import load_dotenv
 
+from sinapi_dtypes import compactar_com_medicao
+from sinapi_indices import CargaSemIndices
+from sinapi_metricas import exportar_ao_sair, instrumentar_cliente
+from sinapi_perfil import ativar_se_pedido, perfilar
+from sinapi_qualidade import verificar_qualidade
+from sinapi_lotes import ControladorLotes, enviar_em_lotes
+from sinapi_particoes import ParticoesIndisponiveis, carregar_particoes, detectar_mes_referencia, normalizar_mes
+from sinapi_zip import eh_zip, ler_membro, listar_membros, processar_membros
+
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
 
@@ -55,6 +68,213 @@ def configurar_logging():
     return str(log_file)
 
 
+DELIMITADORES_CSV = ';,\t|'
+
+# Membros CSV selecionados quando a entrada é um pacote ZIP do SINAPI
+PADRAO_CSV_ZIP = '*.csv'
+
+# Regime de desoneração no nome do membro (..._NaoDesonerado.csv, ..._Desonerado.csv);
+# "não desonerado" é testado primeiro por conter "desonerado"
+REGIMES_ZIP = {
+    'nao_desonerado': re.compile(r'n[aã]o[-_ ]?desonerad|sem[-_ ]?desonera', re.IGNORECASE),
+    'desonerado': re.compile(r'desonerad|com[-_ ]?desonera', re.IGNORECASE),
+}
+REGIME_PADRAO_ZIP = 'nao_desonerado'
+
+# Um registro de sinapi_insumos por código e mês (uk_sinapi_codigo_insumo_mes)
+CHAVE_INSUMOS = ['codigo_do_insumo', 'mes_referencia']
+
+
+def detectar_formato_csv(caminho_arquivo, tamanho_amostra: int = 64 * 1024) -> Tuple[str, str]:
+    """
+    Detecta encoding e delimitador a partir de uma amostra do início do arquivo
+
+    Exportações oficiais do SINAPI costumam vir em Latin-1 separadas por ';'.
+
+    Args:
+        caminho_arquivo: Caminho para o arquivo CSV ou arquivo binário em memória
+        tamanho_amostra: Bytes lidos para a detecção
+
+    Returns:
+        Tuple com (encoding, delimitador)
+    """
+    if hasattr(caminho_arquivo, 'read'):
+        amostra = caminho_arquivo.read(tamanho_amostra)
+        caminho_arquivo.seek(0)
+    else:
+        with open(caminho_arquivo, 'rb') as f:
+            amostra = f.read(tamanho_amostra)
+
+    if amostra.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        # Decodificador incremental: a amostra pode cortar um caractere no meio
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'latin-1'
+
+    texto = amostra.decode(encoding, errors='ignore')
+    try:
+        delimitador = csv.Sniffer().sniff(texto, delimiters=DELIMITADORES_CSV).delimiter
+    except csv.Error:
+        # Cabeçalhos com quebra de linha confundem o Sniffer: usa o mais frequente
+        delimitador = max(DELIMITADORES_CSV, key=texto.count)
+
+    logging.info(
+        f"Formato detectado: encoding={encoding}, delimitador={delimitador!r}")
+    return encoding, delimitador
+
+
+@perfilar('leitura')
+def ler_csv_sinapi(caminho_arquivo, encoding: Optional[str] = None,
+                   delimitador: Optional[str] = None) -> pd.DataFrame:
+    """
+    Lê o CSV completo do SINAPI com o parser multi-thread do Arrow
+
+    Mantém as quebras de linha dentro dos nomes de colunas (tratadas depois em
+    limpar_nomes_colunas). Sem pyarrow instalado, usa o parser C do pandas.
+
+    Args:
+        caminho_arquivo: Caminho para o arquivo CSV ou arquivo binário em memória
+        encoding: Encoding (detectado se omitido)
+        delimitador: Delimitador (detectado se omitido)
+
+    Returns:
+        DataFrame com os dados brutos
+    """
+    if encoding is None or delimitador is None:
+        encoding_detectado, delimitador_detectado = detectar_formato_csv(
+            caminho_arquivo)
+        encoding = encoding or encoding_detectado
+        delimitador = delimitador or delimitador_detectado
+
+    try:
+        from pyarrow import csv as pa_csv
+
+        tabela = pa_csv.read_csv(
+            caminho_arquivo,
+            read_options=pa_csv.ReadOptions(
+                encoding=encoding.replace('-sig', ''), use_threads=True),
+            parse_options=pa_csv.ParseOptions(
+                delimiter=delimitador, newlines_in_values=True),
+        )
+        df = tabela.to_pandas()
+        if encoding == 'utf-8-sig' and len(df.columns):
+            df = df.rename(columns={df.columns[0]: str(df.columns[0]).lstrip('\ufeff')})
+        return df
+    except ImportError:
+        logging.info("pyarrow não instalado; usando parser do pandas")
+    except Exception as e:
+        logging.warning(f"Falha no parser Arrow ({e}); usando parser do pandas")
+
+    if hasattr(caminho_arquivo, 'seek'):
+        caminho_arquivo.seek(0)
+    return pd.read_csv(caminho_arquivo, encoding=encoding, sep=delimitador)
+
+
+def _processar_membro_csv(caminho_zip: str, nome_membro: str,
+                          mes_referencia: Optional[str] = None) -> pd.DataFrame:
+    """Lê, limpa, mapeia e processa um CSV de dentro do ZIP (executado em paralelo)"""
+    df = ler_csv_sinapi(ler_membro(caminho_zip, nome_membro))
+    df = limpar_nomes_colunas(df)
+    mes_referencia = mes_referencia or detectar_mes_referencia(df, nome_membro, caminho_zip)
+    return processar_dados_sinapi(df, mapear_colunas_sinapi(df), mes_referencia)
+
+
+def regime_do_membro(nome_membro: str) -> Optional[str]:
+    """Regime de desoneração indicado no nome do membro ('nao_desonerado', 'desonerado' ou None)"""
+    nome = Path(nome_membro).name
+    for regime, padrao in REGIMES_ZIP.items():
+        if padrao.search(nome):
+            return regime
+    return None
+
+
+def selecionar_regime(membros: List[str], regime: str = REGIME_PADRAO_ZIP) -> List[str]:
+    """
+    Mantém um único regime quando os membros selecionados misturam os dois
+
+    Os dois regimes trazem os mesmos códigos no mesmo mês com preços
+    diferentes; importados juntos, cada (código, mês) apareceria duas vezes.
+
+    Raises:
+        ValueError: Se o regime pedido não existir entre os membros
+    """
+    if regime not in REGIMES_ZIP:
+        raise ValueError(f"Regime inválido: {regime!r} (use {' ou '.join(REGIMES_ZIP)})")
+    regimes = {membro: regime_do_membro(membro) for membro in membros}
+    if len(set(regimes.values()) - {None}) <= 1:
+        return membros
+    selecionados = [m for m in membros if regimes[m] in (regime, None)]
+    if not any(regimes[m] == regime for m in selecionados):
+        raise ValueError(f"Nenhum membro do regime {regime} entre {membros}")
+    logging.info(f"Pacote com os dois regimes de desoneração: importando {regime} "
+                 f"({len(selecionados)} de {len(membros)} membros; use --regime ou um padrão)")
+    return selecionados
+
+
+def consolidar_chaves(dados: pd.DataFrame) -> pd.DataFrame:
+    """
+    Uma linha por (codigo_do_insumo, mes_referencia) antes do upload
+
+    Linhas repetidas que se completam (ex.: um CSV por UF, cada um com a
+    coluna de preço da sua UF) viram uma linha com o primeiro valor não nulo
+    de cada coluna; linhas idênticas colapsam.
+
+    Raises:
+        ValueError: Se a mesma chave tiver valores divergentes (ex.: regimes
+            ou releases diferentes no mesmo mês)
+    """
+    repetidas = dados.duplicated(CHAVE_INSUMOS, keep=False)
+    if not repetidas.any():
+        return dados
+
+    grupos = dados[repetidas].groupby(CHAVE_INSUMOS, sort=False, observed=True)
+    divergentes = (grupos.nunique(dropna=True) > 1).any(axis=1)
+    if divergentes.any():
+        exemplos = [codigo for codigo, _ in divergentes[divergentes].index[:10]]
+        raise ValueError(
+            f"{int(divergentes.sum())} código(s) com valores divergentes no mesmo mês "
+            f"(ex.: {exemplos}); selecione um regime/padrão de membros ou um único arquivo")
+
+    unidas = grupos.first().reset_index()
+    logging.warning(f"{int(repetidas.sum())} linhas com código e mês repetidos "
+                    f"consolidadas em {len(unidas)}")
+    return pd.concat([dados[~repetidas], unidas], ignore_index=True)[dados.columns]
+
+
+@perfilar('leitura')
+def carregar_zip_sinapi(caminho_zip: str, padrao: str = PADRAO_CSV_ZIP,
+                        mes_referencia: Optional[str] = None,
+                        regime: str = REGIME_PADRAO_ZIP) -> pd.DataFrame:
+    """
+    Processa os CSVs de um pacote ZIP do SINAPI sem extraí-los para disco
+
+    Args:
+        caminho_zip: Caminho do pacote ZIP
+        padrao: Padrão glob dos membros CSV a importar
+        mes_referencia: Mês de todos os membros (padrão: detectado por membro)
+        regime: Regime importado quando os membros trazem os dois
+
+    Returns:
+        DataFrame processado com os registros de todos os membros, um por
+        código e mês (consolidar_chaves)
+    """
+    membros = listar_membros(caminho_zip, padrao)
+    if not membros:
+        raise ValueError(
+            f"Nenhum arquivo '{padrao}' encontrado em {caminho_zip}")
+    membros = selecionar_regime(membros, regime)
+
+    resultados = processar_membros(caminho_zip, membros,
+                                   partial(_processar_membro_csv, mes_referencia=mes_referencia))
+    for nome, dados in resultados.items():
+        logging.info(f"Membro {nome}: {len(dados)} registros processados")
+    return consolidar_chaves(pd.concat(list(resultados.values()), ignore_index=True))
+
+
 def validar_arquivo_csv(caminho_arquivo: str) -> bool:
     """
     Valida se o arquivo CSV existe e tem estrutura esperada
@@ -76,7 +296,9 @@ def validar_arquivo_csv(caminho_arquivo: str) -> bool:
 
     # Tentar ler primeiras linhas para validar estrutura
     try:
-        df_sample = pd.read_csv(caminho_arquivo, nrows=5, encoding='utf-8')
+        encoding, delimitador = detectar_formato_csv(caminho_arquivo)
+        df_sample = pd.read_csv(caminho_arquivo, nrows=5,
+                                encoding=encoding, sep=delimitador)
 
         # Verificar se tem pelo menos as colunas básicas esperadas (com quebras de linha possíveis)
         colunas_esperadas = ['Código da', 'Código do', 'Descrição do Insumo']
@@ -98,6 +320,7 @@ def validar_arquivo_csv(caminho_arquivo: str) -> bool:
         return False
 
 
+@perfilar('cabecalhos')
 def limpar_nomes_colunas(df: pd.DataFrame) -> pd.DataFrame:
     """
     Limpa nomes de colunas removendo quebras de linha e caracteres especiais
@@ -127,6 +350,7 @@ def limpar_nomes_colunas(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+@perfilar('mapeamento')
 def mapear_colunas_sinapi(df: pd.DataFrame) -> Dict[str, str]:
     """
     Mapeia colunas do CSV para campos da tabela sinapi_insumos
@@ -203,6 +427,10 @@ def limpar_dados_precos(valor) -> Optional[float]:
     # Remover símbolos de moeda e espaços
     valor_str = valor_str.replace('R$', '').replace('$', '').replace(' ', '')
 
+    # Formato brasileiro (1.234,56): ponto é separador de milhar
+    if ',' in valor_str and '.' in valor_str:
+        valor_str = valor_str.replace('.', '')
+
     # Trocar vírgula por ponto para decimais
     valor_str = valor_str.replace(',', '.')
 
@@ -212,13 +440,17 @@ def limpar_dados_precos(valor) -> Optional[float]:
         return None
 
 
-def processar_dados_sinapi(df: pd.DataFrame, mapeamento: Dict[str, str]) -> pd.DataFrame:
+@perfilar('processamento')
+def processar_dados_sinapi(df: pd.DataFrame, mapeamento: Dict[str, str],
+                           mes_referencia: Optional[str] = None) -> pd.DataFrame:
     """
     Processa e limpa dados do SINAPI para importação
 
     Args:
         df: DataFrame original do SINAPI
         mapeamento: Mapeamento de colunas
+        mes_referencia: Mês do SINAPI (AAAA-MM; padrão: coluna de mês/data do
+            arquivo, senão o mês corrente)
 
     Returns:
         DataFrame processado e limpo
@@ -240,8 +472,16 @@ def processar_dados_sinapi(df: pd.DataFrame, mapeamento: Dict[str, str]) -> pd.D
                 dados_processados[campo_db] = df[coluna_csv].astype(
                     str).str.strip()
 
-    # Adicionar campos de controle - convertendo date para string ISO
-    dados_processados['mes_referencia'] = date.today().isoformat()
+    # Adicionar campos de controle - mês de referência como 'AAAA-MM-01' (chave da partição)
+    if mes_referencia:
+        mes_referencia = normalizar_mes(mes_referencia)
+    else:
+        mes_referencia = detectar_mes_referencia(df)
+        if not mes_referencia:
+            mes_referencia = date.today().replace(day=1).isoformat()
+            logging.warning(
+                f"Mês de referência não encontrado no arquivo; usando o mês corrente ({mes_referencia[:7]})")
+    dados_processados['mes_referencia'] = mes_referencia
     dados_processados['ativo'] = True
 
     # Validar dados obrigatórios
@@ -259,6 +499,20 @@ def processar_dados_sinapi(df: pd.DataFrame, mapeamento: Dict[str, str]) -> pd.D
     return dados_processados
 
 
+def compactar_dados_sinapi(dados: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Aplica o plano de tipos compactos (categóricas e float32 para preços)
+    aos dados processados
+
+    Args:
+        dados: DataFrame retornado por processar_dados_sinapi
+
+    Returns:
+        Tuple com (DataFrame compactado, medição de memória)
+    """
+    return compactar_com_medicao(dados, 'sinapi_insumos')
+
+
 def conectar_supabase():
     """
     Conecta ao Supabase usando credenciais do ambiente
@@ -283,8 +537,8 @@ def conectar_supabase():
                 "Configure SUPABASE_URL e SUPABASE_SERVICE_KEY (ou SUPABASE_ANON_KEY)")
             return None
 
-        # Criar cliente
-        supabase: Client = create_client(url, key)
+        # Criar cliente (chamadas HTTP medidas por tabela e operação)
+        supabase: Client = instrumentar_cliente(create_client(url, key))
 
         if os.getenv('SUPABASE_SERVICE_KEY'):
             logging.info(
@@ -299,68 +553,31 @@ def conectar_supabase():
 
     except ImportError:
         logging.error(
-            "Biblioteca supabase-py não instalada. Execute: pip install supabase")
+            "Biblioteca supabase-py não instalada. Execute: pip install -r scripts/requirements.txt")
         return None
     except Exception as e:
         logging.error(f"Erro ao conectar com Supabase: {str(e)}")
         return None
 
 
-def importar_em_lotes(dados: pd.DataFrame, supabase, tamanho_lote: int = 100) -> Tuple[int, int]:
+def importar_em_lotes(dados: pd.DataFrame, supabase, tamanho_lote: Optional[int] = None,
+                      controlador: Optional[ControladorLotes] = None) -> Tuple[int, int]:
     """
-    Importa dados em lotes para otimizar performance
+    Importa dados em lotes dimensionados pelo corpo JSON (sinapi_lotes.py)
 
     Args:
         dados: DataFrame com dados processados
         supabase: Cliente Supabase
-        tamanho_lote: Tamanho do lote para importação
+        tamanho_lote: Lote fixo em linhas (padrão: adaptativo por bytes e latência)
+        controlador: Controlador de lotes da tabela (para o relatório)
 
     Returns:
         Tuple com (registros_importados, registros_erro)
     """
-    logging.info(
-        f"Iniciando importação em lotes de {tamanho_lote} registros...")
-
-    total_registros = len(dados)
-    registros_importados = 0
-    registros_erro = 0
-
-    # Dividir dados em lotes
-    for i in range(0, total_registros, tamanho_lote):
-        lote = dados.iloc[i:i+tamanho_lote]
-        numero_lote = (i // tamanho_lote) + 1
-
-        try:
-            # Converter lote para lista de dicionários
-            registros_lote = lote.to_dict('records')
-
-            # Limpar valores NaN para None (JSON-friendly)
-            for registro in registros_lote:
-                for chave, valor in registro.items():
-                    if pd.isna(valor):
-                        registro[chave] = None
-
-            # Executar inserção
-            resultado = supabase.table('sinapi_insumos').insert(
-                registros_lote).execute()
-
-            registros_importados += len(registros_lote)
-            logging.info(
-                f"Lote {numero_lote}: {len(registros_lote)} registros importados com sucesso")
-
-        except Exception as e:
-            registros_erro += len(lote)
-            logging.error(f"Erro no lote {numero_lote}: {str(e)}")
-
-            # Log detalhado dos primeiros registros do lote com erro
-            if len(lote) > 0:
-                primeiro_registro = lote.iloc[0]
-                logging.debug(
-                    f"Primeiro registro do lote com erro: {primeiro_registro.to_dict()}")
-
-    logging.info(
-        f"Importação concluída - Sucesso: {registros_importados}, Erros: {registros_erro}")
-    return registros_importados, registros_erro
+    controlador = controlador or ControladorLotes('sinapi_insumos', linhas_fixas=tamanho_lote)
+    logging.info(f"Iniciando importação de {len(dados)} registros "
+                 f"(lotes {controlador.relatorio()['modo']})...")
+    return enviar_em_lotes(supabase, 'sinapi_insumos', dados, controlador)
 
 
 def gerar_relatorio_importacao(
@@ -368,7 +585,12 @@ def gerar_relatorio_importacao(
     total_registros: int,
     registros_importados: int,
     registros_erro: int,
-    log_file: str
+    log_file: str,
+    memoria: Optional[Dict] = None,
+    qualidade: Optional[Dict] = None,
+    carga: Optional[Dict] = None,
+    lotes: Optional[Dict] = None,
+    historico: Optional[List[Dict]] = None
 ) -> Dict:
     """
     Gera relatório completo da importação
@@ -379,6 +601,11 @@ def gerar_relatorio_importacao(
         registros_importados: Registros importados com sucesso
         registros_erro: Registros com erro
         log_file: Arquivo de log gerado
+        memoria: Medição de memória dos dados compactados (opcional)
+        qualidade: Relatório compacto das regras de qualidade (opcional)
+        carga: Modo e tempos da carga (remoção/recriação de índices, ANALYZE)
+        lotes: Tamanho de lote aprendido, vazão e falhas do envio
+        historico: Meses registrados no histórico local de preços
 
     Returns:
         Dict com relatório da importação
@@ -393,6 +620,16 @@ def gerar_relatorio_importacao(
         'log_file': log_file,
         'status': 'SUCESSO' if registros_erro == 0 else 'PARCIAL' if registros_importados > 0 else 'ERRO'
     }
+    if memoria:
+        relatorio['memoria'] = memoria
+    if qualidade:
+        relatorio['qualidade'] = qualidade
+    if carga:
+        relatorio['carga'] = carga
+    if lotes:
+        relatorio['lotes'] = lotes
+    if historico:
+        relatorio['historico'] = historico
 
     # Salvar relatório em JSON
     relatorio_file = f"relatorio_importacao_sinapi_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -403,26 +640,159 @@ def gerar_relatorio_importacao(
     return relatorio
 
 
+def carregar_dados_sinapi(arquivo_csv: str, padrao: Optional[str] = None,
+                          mes_referencia: Optional[str] = None,
+                          regime: Optional[str] = None) -> pd.DataFrame:
+    """
+    Etapas 3-6 (leitura, limpeza de cabeçalhos, mapeamento e processamento)
+    de um CSV ou pacote ZIP, sem conexão com o banco
+
+    Args:
+        arquivo_csv: CSV ou pacote ZIP do SINAPI
+        padrao: Padrão dos membros CSV quando a entrada é ZIP
+        mes_referencia: Mês do SINAPI (padrão: conteúdo, depois nome do arquivo)
+        regime: Regime de desoneração quando o ZIP traz os dois (padrão: não desonerado)
+
+    Returns:
+        DataFrame com os nomes de coluna de sinapi_insumos, um registro por
+        código e mês
+
+    Raises:
+        ValueError: Se houver códigos repetidos no mesmo mês com valores divergentes
+    """
+    if eh_zip(arquivo_csv):
+        # 3-6. Ler, limpar, mapear e processar os CSVs direto do ZIP
+        return carregar_zip_sinapi(arquivo_csv, padrao or PADRAO_CSV_ZIP, mes_referencia,
+                                   regime or REGIME_PADRAO_ZIP)
+    else:
+        # 3. Carregar dados CSV
+        logging.info("Carregando dados do arquivo CSV...")
+        df = ler_csv_sinapi(arquivo_csv)
+        logging.info(
+            f"Dados carregados: {len(df)} registros, {len(df.columns)} colunas")
+
+        # 4. Limpar nomes das colunas
+        df = limpar_nomes_colunas(df)
+
+        # 5. Mapear colunas
+        mapeamento = mapear_colunas_sinapi(df)
+
+        # 6. Processar dados
+        mes_referencia = mes_referencia or detectar_mes_referencia(df, arquivo_csv)
+        return consolidar_chaves(processar_dados_sinapi(df, mapeamento, mes_referencia))
+
+
+def executar_importacao(arquivo_csv: str, supabase, log_file: Optional[str] = None,
+                        padrao: Optional[str] = None, carga_sem_indices: bool = False,
+                        dados: Optional[pd.DataFrame] = None,
+                        mes_referencia: Optional[str] = None,
+                        historico: Optional[str] = None,
+                        regime: Optional[str] = None) -> Dict:
+    """
+    Etapas 3-8 da importação (leitura, processamento, qualidade, carga e
+    relatório) com um cliente já conectado; usada pelo main e pelo
+    orquestrador (sinapi_orquestrador.py)
+
+    Args:
+        arquivo_csv: CSV ou pacote ZIP do SINAPI
+        supabase: Cliente Supabase
+        log_file: Arquivo de log registrado no relatório
+        padrao: Padrão dos membros CSV quando a entrada é ZIP
+        carga_sem_indices: Remove os índices secundários durante a carga direta
+            (a carga por partição já usa uma tabela sem índices)
+        dados: Saída de carregar_dados_sinapi já calculada (pula as etapas 3-6)
+        mes_referencia: Mês do SINAPI (padrão: detectado no arquivo)
+        historico: Diretório do histórico local de preços (sinapi_historico.py)
+            que recebe os meses carregados sem erro
+        regime: Regime de desoneração quando o ZIP traz os dois
+
+    Returns:
+        Dict com relatório da importação
+    """
+    # 3-6. Ler, limpar, mapear e processar
+    if dados is None:
+        dados_processados = carregar_dados_sinapi(arquivo_csv, padrao, mes_referencia, regime)
+    else:
+        # Códigos repetidos no mesmo mês não chegam ao upload
+        dados_processados = consolidar_chaves(dados)
+
+    dados_processados, memoria = compactar_dados_sinapi(dados_processados)
+
+    # Regras de qualidade sobre a matriz código × UF (não bloqueiam a carga)
+    qualidade, _ = verificar_qualidade(dados_processados)
+
+    # 7. Importar dados: cada mês de referência vira uma partição nova de
+    # sinapi_insumos; sem a migração de particionamento, carga direta na tabela
+    # (opcionalmente sem índices secundários, recriados no fim)
+    lotes = ControladorLotes('sinapi_insumos')
+    try:
+        registros_importados, registros_erro, carga = carregar_particoes(
+            supabase, dados_processados, lotes)
+    except ParticoesIndisponiveis as e:
+        logging.warning(f"{e}; carga direta em sinapi_insumos")
+        with CargaSemIndices(supabase, 'sinapi_insumos', ativo=carga_sem_indices) as carga_direta:
+            registros_importados, registros_erro = importar_em_lotes(
+                dados_processados, supabase, controlador=lotes)
+        carga = carga_direta.relatorio
+
+    registrados = None
+    if historico and registros_erro == 0:
+        from sinapi_historico import registrar_importacao
+        try:
+            registrados = registrar_importacao(historico, dados_processados)
+        except Exception as e:
+            logging.error(f"Erro ao registrar o histórico de preços em {historico}: {e}")
+
+    # 8. Gerar relatório
+    relatorio = gerar_relatorio_importacao(
+        arquivo_csv,
+        len(dados_processados),
+        registros_importados,
+        registros_erro,
+        log_file,
+        memoria,
+        qualidade,
+        carga,
+        lotes.relatorio(),
+        registrados
+    )
+    return relatorio
+
+
 def main():
     """Função principal do script de importação"""
 
     # Configurar logging
     log_file = configurar_logging()
     logging.info("=== INICIANDO IMPORTAÇÃO DE DADOS SINAPI ===")
-
-    # Verificar argumentos
-    if len(sys.argv) < 2:
-        logging.error("Uso: python importar_sinapi.py <caminho_arquivo_csv>")
+    exportar_ao_sair('importar_sinapi')
+    ativar_se_pedido('importar_sinapi')
+
+    # Verificar argumentos (--carga-sem-indices: remove índices secundários durante a carga;
+    # --profile: perfis de CPU e alocações por etapa em perfil/;
+    # --mes=AAAA-MM: mês de referência quando o arquivo não o traz;
+    # --historico=DIR: registra o mês no histórico local de preços;
+    # --regime=desonerado|nao_desonerado: regime importado de pacotes com os dois)
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    carga_sem_indices = '--carga-sem-indices' in sys.argv
+    opcoes = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    mes_referencia = opcoes.get('mes')
+    if not argumentos:
+        logging.error(
+            "Uso: python importar_sinapi.py <caminho_arquivo_csv | pacote.zip> [padrao_membros] "
+            "[--carga-sem-indices] [--mes=AAAA-MM] [--historico=DIR] "
+            "[--regime=desonerado|nao_desonerado] [--profile]")
         logging.info(
             "Exemplo: python importar_sinapi.py docs/sinapi/sinapi_familias_coeficientes.csv")
         sys.exit(1)
 
-    arquivo_csv = sys.argv[1]
+    arquivo_csv = argumentos[0]
     logging.info(f"Arquivo de entrada: {arquivo_csv}")
+    entrada_zip = eh_zip(arquivo_csv)
 
     try:
-        # 1. Validar arquivo
-        if not validar_arquivo_csv(arquivo_csv):
+        # 1. Validar arquivo (pacotes ZIP são validados membro a membro no parsing)
+        if not entrada_zip and not validar_arquivo_csv(arquivo_csv):
             sys.exit(1)
 
         # 2. Conectar ao Supabase
@@ -430,33 +800,13 @@ def main():
         if not supabase:
             sys.exit(1)
 
-        # 3. Carregar dados CSV
-        logging.info("Carregando dados do arquivo CSV...")
-        df = pd.read_csv(arquivo_csv, encoding='utf-8')
-        logging.info(
-            f"Dados carregados: {len(df)} registros, {len(df.columns)} colunas")
-
-        # 4. Limpar nomes das colunas
-        df = limpar_nomes_colunas(df)
-
-        # 5. Mapear colunas
-        mapeamento = mapear_colunas_sinapi(df)
-
-        # 6. Processar dados
-        dados_processados = processar_dados_sinapi(df, mapeamento)
-
-        # 7. Importar dados
-        registros_importados, registros_erro = importar_em_lotes(
-            dados_processados, supabase)
-
-        # 8. Gerar relatório
-        relatorio = gerar_relatorio_importacao(
-            arquivo_csv,
-            len(dados_processados),
-            registros_importados,
-            registros_erro,
-            log_file
-        )
+        # 3-8. Processar, verificar qualidade, carregar e gerar relatório
+        padrao = argumentos[1] if len(argumentos) > 1 else None
+        relatorio = executar_importacao(
+            arquivo_csv, supabase, log_file, padrao, carga_sem_indices,
+            mes_referencia=mes_referencia, historico=opcoes.get('historico'),
+            regime=opcoes.get('regime'))
+        qualidade = relatorio['qualidade']
 
         # 9. Exibir resumo final
         logging.info("=== RESUMO DA IMPORTAÇÃO ===")
@@ -466,12 +816,15 @@ def main():
             f"Importados com sucesso: {relatorio['registros_importados']}")
         logging.info(f"Registros com erro: {relatorio['registros_erro']}")
         logging.info(f"Taxa de sucesso: {relatorio['taxa_sucesso']:.2f}%")
+        logging.info(
+            f"Violações de qualidade: {qualidade['total_violacoes']} "
+            f"{qualidade['violacoes_por_regra']}")
         logging.info("=== FIM DA IMPORTAÇÃO ===")
 
         # Código de saída baseado no resultado
-        if registros_erro == 0:
+        if relatorio['registros_erro'] == 0:
             sys.exit(0)  # Sucesso total
-        elif registros_importados > 0:
+        elif relatorio['registros_importados'] > 0:
             sys.exit(2)  # Sucesso parcial
         else:
             sys.exit(1)  # Erro total
@@ -8,16 +8,27 @@ Autor: ObrasAI Team
 Data: 2024-12-26
 """
 
+import numpy as np
 import pandas as pd
 import os
 import sys
 from pathlib import Path
 import json
-from datetime import datetime
 from supabase import create_client, Client
-from typing import List, Dict, Any
+from typing import Dict, Any, Optional
 import logging
 
+from sinapi_dtypes import compactar_com_medicao, uso_memoria
+from sinapi_indices import CargaSemIndices
+from sinapi_integridade import verificar_integridade
+from sinapi_metricas import exportar_ao_sair, instrumentar_cliente
+from sinapi_perfil import ativar_se_pedido, perfilar
+from sinapi_lotes import ControladorLotes, enviar_em_lotes
+from sinapi_zip import eh_zip, ler_membro, listar_membros
+
+# Planilha selecionada quando a entrada é um pacote ZIP do SINAPI
+PADRAO_ZIP = '*manutenc*.xlsx'
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -33,8 +44,35 @@ logger = logging.getLogger(__name__)
 class ImportadorSinapiManutencoes:
     """Classe para importar dados SINAPI de Manutenções"""
 
-    def __init__(self):
-        """Inicializar o importador"""
+    def __init__(self, caminho_planilha: str = None, carga_sem_indices: bool = False,
+                 supabase: Client = None, integridade_estrita: bool = False):
+        """
+        Inicializar o importador (planilha .xlsx ou pacote .zip do SINAPI)
+
+        Com carga_sem_indices, os índices secundários de sinapi_manutencoes são
+        removidos durante a carga e recriados (com ANALYZE) ao final. Um
+        cliente já conectado (ex.: o do orquestrador) dispensa a conexão própria;
+        sem ele, a conexão só é aberta no primeiro acesso ao banco. Com
+        integridade_estrita, códigos de insumo desconhecidos cancelam a carga.
+        """
+        self._supabase: Client = supabase
+        self.caminho_planilha = Path(
+            caminho_planilha or "docs/sinapi/Cópia de SINAPI_Manutenções_2025_04.xlsx")
+        self.memoria = None
+        self.carga_sem_indices = carga_sem_indices
+        self.relatorio_carga = None
+        self.lotes = None
+        self.integridade_estrita = integridade_estrita
+        self.relatorio_integridade = None
+
+    @property
+    def supabase(self) -> Client:
+        if self._supabase is None:
+            self._supabase = self._conectar()
+        return self._supabase
+
+    def _conectar(self) -> Client:
+        """Cria o cliente com a service key do ambiente"""
         self.supabase_url = os.getenv('VITE_SUPABASE_URL')
         # Usar SERVICE_KEY para importação com privilégios administrativos
         self.supabase_key = os.getenv('VITE_SUPABASE_ROLE_KEY')  # SERVICE_KEY
@@ -48,10 +86,8 @@ class ImportadorSinapiManutencoes:
             raise ValueError("Variáveis de ambiente SUPABASE não encontradas")
 
         logger.info("Conectando ao Supabase com privilégios administrativos...")
-        self.supabase: Client = create_client(
-            self.supabase_url, self.supabase_key)
-        self.caminho_planilha = Path(
-            "docs/sinapi/Cópia de SINAPI_Manutenções_2025_04.xlsx")
+        return instrumentar_cliente(create_client(
+            self.supabase_url, self.supabase_key))
 
     def validar_arquivo(self) -> bool:
         """Validar se o arquivo existe e é acessível"""
@@ -59,16 +95,28 @@ class ImportadorSinapiManutencoes:
             logger.error(f"Arquivo não encontrado: {self.caminho_planilha}")
             return False
 
+        if eh_zip(self.caminho_planilha) and not listar_membros(self.caminho_planilha, PADRAO_ZIP):
+            logger.error(
+                f"Nenhuma planilha '{PADRAO_ZIP}' encontrada em {self.caminho_planilha}")
+            return False
+
         logger.info(f"Arquivo encontrado: {self.caminho_planilha}")
         return True
 
+    @perfilar('leitura')
     def ler_planilha(self) -> pd.DataFrame:
         """Ler dados da planilha Excel"""
         logger.info("Lendo planilha SINAPI de Manutenções...")
 
         try:
+            # Em pacotes ZIP a planilha é lida direto do arquivo compactado
+            origem = self.caminho_planilha
+            if eh_zip(origem):
+                membro = listar_membros(origem, PADRAO_ZIP)[0]
+                origem = ler_membro(origem, membro)
+
             # Ler a aba 'Manutenções'
-            df = pd.read_excel(self.caminho_planilha, sheet_name='Manutenções')
+            df = pd.read_excel(origem, sheet_name='Manutenções')
             logger.info(
                 f"Planilha lida com sucesso: {len(df)} registros encontrados")
 
@@ -79,133 +127,74 @@ class ImportadorSinapiManutencoes:
                 raise ValueError(
                     f"Colunas esperadas não encontradas: {colunas_esperadas}")
 
+            # Tipo/Manutenção como categóricas e Código como Int32
+            df, self.memoria = compactar_com_medicao(
+                df, 'planilha de manutenções', categoricas=['Tipo', 'Manutenção'],
+                codigos=['Código'], precos=[])
+
             return df
 
         except Exception as e:
             logger.error(f"Erro ao ler planilha: {e}")
             raise
 
-    def processar_dados(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        """Processar e validar dados da planilha"""
+    @perfilar('processamento')
+    def processar_dados(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Processar e validar dados da planilha (colunas vetorizadas, sem dict por linha)"""
         logger.info("Processando dados da planilha...")
 
-        registros_processados = []
-        registros_com_erro = 0
-
-        for index, row in df.iterrows():
-            try:
-                # Validar dados obrigatórios
-                if pd.isna(row['Código']) or pd.isna(row['Descrição']):
-                    registros_com_erro += 1
-                    continue
-
-                # Processar data de referência
-                data_referencia = row['Referência']
-                if pd.isna(data_referencia):
-                    data_referencia = datetime(2025, 4, 1).date()
-                elif isinstance(data_referencia, str):
-                    data_referencia = datetime.strptime(
-                        data_referencia, '%Y-%m-%d').date()
-                elif hasattr(data_referencia, 'date'):
-                    data_referencia = data_referencia.date()
-
-                # Validar e limpar tipo
-                tipo = str(row['Tipo']).strip().upper()
-                if tipo not in ['INSUMO', 'COMPOSIÇÃO']:
-                    # Tentar mapear valores similares
-                    if 'INSUMO' in tipo:
-                        tipo = 'INSUMO'
-                    elif 'COMP' in tipo:
-                        tipo = 'COMPOSIÇÃO'
-                    else:
-                        tipo = 'INSUMO'  # Default
-
-                # Processar código SINAPI
-                codigo_sinapi = int(row['Código'])
-
-                # Limpar descrição
-                descricao = str(row['Descrição']).strip()
-                if len(descricao) > 1000:  # Limitar tamanho
-                    descricao = descricao[:997] + "..."
-
-                # Processar tipo de manutenção
-                tipo_manutencao = str(row['Manutenção']).strip()
-                if len(tipo_manutencao) > 100:
-                    tipo_manutencao = tipo_manutencao[:97] + "..."
-
-                # IMPORTANTE: Não incluir tenant_id para dados públicos do SINAPI
-                # Isso permite que a política RLS "Permitir inserção de dados SINAPI públicos" funcione
-                registro = {
-                    'data_referencia': data_referencia.isoformat(),
-                    'tipo': tipo,
-                    'codigo_sinapi': codigo_sinapi,
-                    'descricao': descricao,
-                    'tipo_manutencao': tipo_manutencao
-                    # tenant_id será NULL (dados públicos)
-                }
-
-                registros_processados.append(registro)
-
-            except Exception as e:
-                logger.warning(f"Erro ao processar linha {index}: {e}")
-                registros_com_erro += 1
-                continue
+        # Validar dados obrigatórios
+        codigo_sinapi = pd.to_numeric(df['Código'], errors='coerce')
+        validos = codigo_sinapi.notna() & df['Descrição'].notna()
+
+        # Processar data de referência (ausente = abril/2025; inválida = erro)
+        referencia = df['Referência']
+        datas = pd.to_datetime(referencia, errors='coerce', format='mixed')
+        validos &= datas.notna() | referencia.isna()
+        data_referencia = datas.fillna(pd.Timestamp(2025, 4, 1)).dt.strftime('%Y-%m-%d')
+
+        # Validar e limpar tipo (mapeia valores similares, padrão INSUMO)
+        tipo = df['Tipo'].astype(str).str.strip().str.upper()
+        tipo = pd.Series(np.select(
+            [tipo.isin(['INSUMO', 'COMPOSIÇÃO']), tipo.str.contains('INSUMO'),
+             tipo.str.contains('COMP')],
+            [tipo, 'INSUMO', 'COMPOSIÇÃO'], default='INSUMO'), index=df.index)
+
+        # Limpar descrição e tipo de manutenção (limitar tamanho)
+        def limitar(serie: pd.Series, tamanho: int) -> pd.Series:
+            texto = serie.astype(str).str.strip()
+            longo = texto.str.len() > tamanho
+            return texto.where(~longo, texto.str.slice(0, tamanho - 3) + "...")
+
+        # IMPORTANTE: Não incluir tenant_id para dados públicos do SINAPI
+        # Isso permite que a política RLS "Permitir inserção de dados SINAPI públicos" funcione
+        # Data e tipo de manutenção se repetem em milhares de linhas: categóricas
+        registros_processados = pd.DataFrame({
+            'data_referencia': data_referencia.astype('category'),
+            'tipo': tipo.astype('category'),
+            'codigo_sinapi': codigo_sinapi.astype('Int64'),
+            'descricao': limitar(df['Descrição'], 1000),
+            'tipo_manutencao': limitar(df['Manutenção'], 100).astype('category'),
+            # tenant_id será NULL (dados públicos)
+        })[validos.to_numpy()].reset_index(drop=True)
+        registros_com_erro = int((~validos).sum())
 
         logger.info(
-            f"Processamento concluído: {len(registros_processados)} registros válidos, {registros_com_erro} com erro")
+            f"Processamento concluído: {len(registros_processados)} registros válidos, {registros_com_erro} com erro "
+            f"(~{uso_memoria(registros_processados) / 1024**2:.2f} MB)")
         return registros_processados
 
-    def importar_em_lotes(self, registros: List[Dict[str, Any]], tamanho_lote: int = 1000) -> bool:
-        """Importar dados em lotes para o Supabase"""
-        logger.info(
-            f"Iniciando importação de {len(registros)} registros em lotes de {tamanho_lote}")
-
-        total_importados = 0
-        total_erros = 0
-
-        # Dividir em lotes
-        for i in range(0, len(registros), tamanho_lote):
-            lote = registros[i:i + tamanho_lote]
-            lote_numero = (i // tamanho_lote) + 1
-            total_lotes = (len(registros) + tamanho_lote - 1) // tamanho_lote
-
-            logger.info(
-                f"Importando lote {lote_numero}/{total_lotes} ({len(lote)} registros)")
-
-            try:
-                # Inserir lote no Supabase
-                result = self.supabase.table(
-                    'sinapi_manutencoes').insert(lote).execute()
-
-                if result.data:
-                    total_importados += len(result.data)
-                    logger.info(
-                        f"Lote {lote_numero} importado com sucesso: {len(result.data)} registros")
-                else:
-                    logger.error(
-                        f"Lote {lote_numero} falhou: nenhum dado retornado")
-                    total_erros += len(lote)
-
-            except Exception as e:
-                logger.error(f"Erro ao importar lote {lote_numero}: {e}")
-                total_erros += len(lote)
-
-                # Tentar importar registros individualmente em caso de erro
-                logger.info(
-                    f"Tentando importação individual para lote {lote_numero}")
-                for registro in lote:
-                    try:
-                        result = self.supabase.table(
-                            'sinapi_manutencoes').insert([registro]).execute()
-                        if result.data:
-                            total_importados += 1
-                    except Exception as e_individual:
-                        logger.warning(
-                            f"Erro ao importar registro individual: {e_individual}")
-                        total_erros += 1
-
-        logger.info(
-            f"Importação concluída: {total_importados} registros importados, {total_erros} erros")
+    def importar_em_lotes(self, registros: pd.DataFrame, tamanho_lote: Optional[int] = None,
+                          controlador: Optional[ControladorLotes] = None) -> bool:
+        """Importar dados em lotes adaptativos (tamanho_lote fixa o lote em linhas)"""
+        self.lotes = controlador or ControladorLotes('sinapi_manutencoes', linhas_fixas=tamanho_lote)
+        logger.info(f"Iniciando importação de {len(registros)} registros "
+                    f"(lotes {self.lotes.relatorio()['modo']})")
+
+        # Lotes recusados por erro de dados são reenviados registro a registro
+        _, total_erros = enviar_em_lotes(
+            self.supabase, 'sinapi_manutencoes', registros, self.lotes,
+            individual_em_erro=True, coluna_id='codigo_sinapi')
         return total_erros == 0
 
     def verificar_importacao(self) -> Dict[str, Any]:
@@ -246,27 +235,52 @@ class ImportadorSinapiManutencoes:
             logger.error(f"Erro na verificação: {e}")
             return {'status': 'erro', 'erro': str(e)}
 
-    def executar_importacao(self) -> bool:
-        """Executar todo o processo de importação"""
+    def verificar_integridade(self, registros: pd.DataFrame) -> bool:
+        """Confere os códigos referenciados contra o banco antes de qualquer escrita"""
+        self.relatorio_integridade, _ = verificar_integridade(
+            {'manutencoes': registros}, self.supabase)
+        if self.relatorio_integridade['erros'] and self.integridade_estrita:
+            logger.error(f"{self.relatorio_integridade['erros']} manutenção(ões) com código "
+                         f"de insumo desconhecido; carga cancelada (integridade estrita)")
+            return False
+        return True
+
+    def executar_importacao(self, registros: Optional[pd.DataFrame] = None) -> bool:
+        """
+        Executar todo o processo de importação
+
+        Args:
+            registros: Saída de processar_dados já calculada (o orquestrador
+                lê a planilha uma vez e confere a integridade antes); se
+                omitida, a planilha é lida e conferida aqui
+        """
         logger.info("=== INICIANDO IMPORTAÇÃO SINAPI MANUTENÇÕES ===")
 
         try:
-            # Validar arquivo
-            if not self.validar_arquivo():
-                return False
+            if registros is None:
+                # Validar arquivo
+                if not self.validar_arquivo():
+                    return False
 
-            # Ler planilha
-            df = self.ler_planilha()
+                # Ler planilha
+                df = self.ler_planilha()
 
-            # Processar dados
-            registros = self.processar_dados(df)
+                # Processar dados
+                registros = self.processar_dados(df)
 
-            if not registros:
+                if not registros.empty and not self.verificar_integridade(registros):
+                    return False
+
+            if registros.empty:
                 logger.error("Nenhum registro válido encontrado")
                 return False
 
-            # Importar dados
-            sucesso = self.importar_em_lotes(registros)
+            # Importar dados (opcionalmente sem índices secundários)
+            with CargaSemIndices(self.supabase, 'sinapi_manutencoes',
+                                 ativo=self.carga_sem_indices) as carga:
+                sucesso = self.importar_em_lotes(registros)
+            self.relatorio_carga = carga.relatorio
+            logger.info(f"Carga: {self.relatorio_carga}")
 
             # Verificar importação
             verificacao = self.verificar_importacao()
@@ -296,14 +310,22 @@ def main():
         from supabase import create_client
     except ImportError as e:
         print(f"❌ Dependência não encontrada: {e}")
-        print("Instale com: pip install pandas openpyxl supabase")
+        print("Instale com: pip install -r scripts/requirements.txt")
         return
 
     # Criar diretório de logs se não existir
     os.makedirs('logs', exist_ok=True)
-
-    # Executar importação
-    importador = ImportadorSinapiManutencoes()
+    exportar_ao_sair('importar_sinapi_manutencoes')
+    ativar_se_pedido('importar_sinapi_manutencoes')
+
+    # Executar importação (--carga-sem-indices: índices recriados após a carga;
+    # --profile: perfis de CPU e alocações por etapa em perfil/;
+    # --integridade-estrita: cancela a carga se houver código de insumo desconhecido)
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    importador = ImportadorSinapiManutencoes(
+        argumentos[0] if argumentos else None,
+        carga_sem_indices='--carga-sem-indices' in sys.argv,
+        integridade_estrita='--integridade-estrita' in sys.argv)
     sucesso = importador.executar_importacao()
 
     if sucesso:
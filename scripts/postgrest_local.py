@@ -0,0 +1,873 @@
+#!/usr/bin/env python3
+"""
+Servidor PostgREST Local para Testes de Throughput da Importação
+================================================================
+
+Substituto local do Supabase com a parte da API PostgREST usada pelos
+scripts SINAPI, para medir e ajustar a importação em CI ou no notebook sem
+um projeto Supabase real.
+
+Superfície suportada (/rest/v1):
+- POST   /{tabela}              insert (objeto ou lista), return=representation;
+                                as restrições UNIQUE das tabelas SINAPI (ex.:
+                                codigo_do_insumo + mes_referencia) recusam o
+                                lote inteiro com 409/23505, como no Postgres
+- GET    /{tabela}              select=, filtros eq/neq/gt/gte/lt/lte/in/is/like/ilike,
+                                order=, limit=, offset= e Prefer: count=exact
+- HEAD   /{tabela}              apenas Content-Range com a contagem
+- DELETE /{tabela}              com os mesmos filtros do GET
+- POST   /rpc/execute_sql       listagem de tabelas sinapi_*, inventário do
+                                catálogo e DROP TABLE sobre o store em memória;
+                                índices secundários (pg_index, DROP/CREATE
+                                INDEX, ANALYZE) como na RPC real, que recusa
+                                CONCURRENTLY por rodar dentro de transação;
+                                códigos distintos (sinapi_integridade.py);
+                                agregados de hash por faixa de chaves da
+                                reconciliação (sinapi_reconciliacao.py);
+                                outro SQL responde 0A000
+- POST   /rpc/sinapi_*          carga e retenção das partições mensais de
+                                sinapi_insumos (sinapi_particoes.py), com o
+                                remapeamento e as recusas por sinapi_insumo_id;
+                                com --sem-particoes, 404 como num banco sem a
+                                migração
+
+As formas de SQL aceitas em execute_sql estão escritas aqui como literais,
+independentes das consultas dos módulos clientes: uma consulta alterada num
+script passa a responder 0A000 até que a forma seja revista aqui. O servidor
+local não prova que o SQL está correto no Postgres; isso só se verifica
+contra um banco real.
+
+Condições de rede injetáveis:
+- latência fixa por request e latência por KB de payload
+- teto de throughput (bytes/s) compartilhado entre conexões
+- taxa de erros 503 (determinística via semente)
+- limite de corpo do POST (413), como o do gateway
+
+Uso:
+    python scripts/postgrest_local.py --porta 54321 --latencia 0.05 --taxa-erro 0.01
+
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_KEY=<chave impressa> \\
+        python scripts/importar_sinapi.py arquivo.csv
+
+Medição de throughput dos três importadores: scripts/benchmark_importacao.py.
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# Chave no formato JWT aceito pelo create_client (não é validada pelo servidor)
+CHAVE_LOCAL = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.local"
+
+OPERADORES = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a is not None and a > b,
+    'gte': lambda a, b: a is not None and a >= b,
+    'lt': lambda a, b: a is not None and a < b,
+    'lte': lambda a, b: a is not None and a <= b,
+}
+
+
+def _converter(valor_filtro: str, referencia: Any) -> Any:
+    """Converte o valor do filtro (texto da URL) para o tipo do valor da linha"""
+    if isinstance(referencia, bool):
+        return valor_filtro.lower() == 'true'
+    if isinstance(referencia, int):
+        try:
+            return int(valor_filtro)
+        except ValueError:
+            return float(valor_filtro)
+    if isinstance(referencia, float):
+        return float(valor_filtro)
+    return valor_filtro
+
+
+def _like_para_regex(padrao: str, ignorar_caixa: bool) -> re.Pattern:
+    regex = re.escape(padrao).replace(r'\*', '.*').replace('%', '.*').replace('_', '.')
+    return re.compile(f'^{regex}$', re.IGNORECASE if ignorar_caixa else 0)
+
+
+def _filtro(coluna: str, expressao: str):
+    """Cria o predicado de linha para um filtro PostgREST 'op.valor'"""
+    negar = expressao.startswith('not.')
+    if negar:
+        expressao = expressao[4:]
+    operador, _, valor = expressao.partition('.')
+
+    if operador in OPERADORES:
+        comparar = OPERADORES[operador]
+
+        def predicado(linha):
+            atual = linha.get(coluna)
+            try:
+                return comparar(atual, _converter(valor, atual))
+            except (TypeError, ValueError):
+                return False
+    elif operador == 'in':
+        itens = [v.strip().strip('"') for v in valor.strip('()').split(',')]
+
+        def predicado(linha):
+            atual = linha.get(coluna)
+            return any(atual == _converter(v, atual) for v in itens)
+    elif operador == 'is':
+        esperado = {'null': None, 'true': True, 'false': False}[valor.lower()]
+
+        def predicado(linha):
+            return linha.get(coluna) is esperado
+    elif operador in ('like', 'ilike'):
+        regex = _like_para_regex(valor, operador == 'ilike')
+
+        def predicado(linha):
+            atual = linha.get(coluna)
+            return atual is not None and bool(regex.match(str(atual)))
+    else:
+        raise ValueError(f"Operador não suportado: {operador}")
+
+    return (lambda linha: not predicado(linha)) if negar else predicado
+
+
+# Consultas de catálogo de sinapi_indices (texto normalizado, uma linha)
+_SQL_INDICES = re.compile(
+    r"^select i\.relname as indexname, pg_get_indexdef\(i\.oid\) as indexdef from pg_index x "
+    r"join pg_class t on t\.oid = x\.indrelid join pg_class i on i\.oid = x\.indexrelid "
+    r"join pg_namespace n on n\.oid = t\.relnamespace where n\.nspname = 'public' "
+    r"and t\.relname = '(?P<tabela>\w+)' and not x\.indisprimary and not x\.indisunique "
+    r"and not exists \(select 1 from pg_constraint c where c\.conindid = x\.indexrelid\) "
+    r"order by i\.relname$", re.IGNORECASE)
+_SQL_ESTATISTICAS = re.compile(
+    r"^select n_live_tup, n_dead_tup, last_analyze, last_autoanalyze, "
+    r"pg_indexes_size\(relid\) as tamanho_indices from pg_stat_user_tables "
+    r"where schemaname = 'public' and relname = '(?P<tabela>\w+)'$", re.IGNORECASE)
+
+# Consulta de faixas de sinapi_reconciliacao.LadoSupabase: agregados por faixa
+# (GROUP BY) ou linhas das faixas folha
+_LITERAL = r"(?:NULL|'(?:[^']|'')*')"
+_FAIXA_SQL = re.compile(rf"\((\d+), ({_LITERAL})::text, ({_LITERAL})::text\)")
+_FAIXAS_SQL = re.compile(
+    rf"^WITH faixas\(i, inicio, fim\) AS \(VALUES (?P<valores>{_FAIXA_SQL.pattern}(?:, {_FAIXA_SQL.pattern})*)\) "
+    r"SELECT (?P<selecao>f\.i, count\(t\.chave\) AS linhas, "
+    r"\(coalesce\(sum\(t\.h\), 0\) % 18446744073709551616\)::text AS hash|t\.chave, t\.h::text AS hash) "
+    r"FROM faixas f LEFT JOIN \(SELECT \((?P<chave>.*?)\) COLLATE \"C\" AS chave, "
+    r"\('x' \|\| substr\(md5\((?P<linha>.*)\), 1, 15\)\)::bit\(60\)::bigint AS h "
+    r"FROM public\.(?P<tabela>\w+)"
+    rf"(?: WHERE (?P<coluna_mes>\w+) IN \((?P<meses>'[^']*'(?:, '[^']*')*)\))?\) t "
+    r"ON \(f\.inicio IS NULL OR t\.chave >= f\.inicio COLLATE \"C\"\) "
+    r"AND \(f\.fim IS NULL OR t\.chave < f\.fim COLLATE \"C\"\) "
+    r"(?P<sufixo>GROUP BY f\.i ORDER BY f\.i|WHERE t\.chave IS NOT NULL)$")
+# Coluna da chave ou da linha: numérica arredondada a 2 casas ou texto
+_COLUNA_SQL = re.compile(r"coalesce\(round\((\w+)::numeric, 2\)::text, ''\)|coalesce\((\w+)::text, ''\)")
+_SEPARADOR_SQL = " || '|' || "
+
+
+def _normalizar_sql(query: str) -> str:
+    return ' '.join(query.split()).rstrip(';').rstrip()
+
+
+def _colunas_sql(expressao: str) -> List[Tuple[str, bool]]:
+    """(coluna, numérica) de cada parte da concatenação; 0A000 fora das formas conhecidas"""
+    colunas = []
+    for parte in expressao.split(_SEPARADOR_SQL):
+        achado = _COLUNA_SQL.fullmatch(parte)
+        if not achado:
+            raise ErroSql(f'Expressão de coluna não suportada pelo servidor local: {parte[:80]}', '0A000')
+        numero, texto = achado.groups()
+        colunas.append((numero or texto, bool(numero)))
+    return colunas
+
+
+def _literal_sql(literal: str) -> Optional[str]:
+    return None if literal == 'NULL' else literal[1:-1].replace("''", "'")
+
+
+def _texto_sql(valor: Any, numerico: bool) -> str:
+    """coalesce(col::text, '') / coalesce(round(col::numeric, 2)::text, '') do Postgres"""
+    if valor is None:
+        return ''
+    if numerico:
+        # round de numeric: meio para longe do zero sobre o decimal escrito
+        return str(Decimal(str(valor)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) + 0)
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    return str(valor)
+
+
+class ErroSql(Exception):
+    """Erro do Postgres simulado (vira resposta no formato do PostgREST, 400 por padrão)"""
+
+    def __init__(self, mensagem: str, codigo: str, status: int = 400,
+                 detalhes: Optional[str] = None):
+        super().__init__(mensagem)
+        self.codigo = codigo
+        self.status = status
+        self.detalhes = detalhes
+
+
+# Tabelas que compartilham a sequência de id de outra (carga -> partição)
+SEQUENCIAS = {'sinapi_insumos_carga': 'sinapi_insumos'}
+
+# Restrições UNIQUE das tabelas SINAPI (0000_initial_schema.sql e migração de
+# partições). A tabela de carga não tem índices: duplicatas só aparecem ao
+# publicar o mês, como no ATTACH real
+UNICAS = {
+    'sinapi_insumos': {'uk_sinapi_codigo_insumo_mes': ('codigo_do_insumo', 'mes_referencia')},
+    'sinapi_composicoes': {'uk_sinapi_composicoes_codigo': ('codigo_composicao',)},
+    'sinapi_dados_oficiais': {
+        'sinapi_dados_oficiais_codigo_sinapi_estado_mes_referencia_key':
+            ('codigo_sinapi', 'estado', 'mes_referencia')},
+}
+
+# Tabelas com sinapi_insumo_id: a publicação de um mês remapeia as referências
+# e a remoção recusa mês referenciado, como as funções da migração
+TABELAS_REFERENCIAS = ('coeficientes_tecnicos', 'composicao_insumos', 'itens_orcamento')
+
+
+def _chave_unica(linha: Dict[str, Any], colunas) -> Optional[tuple]:
+    # NULL não conflita em UNIQUE
+    valores = tuple(linha.get(c) for c in colunas)
+    if any(v is None for v in valores):
+        return None
+    return tuple(str(v)[:10] if c.startswith(('mes_', 'data_')) else str(v)
+                 for c, v in zip(colunas, valores))
+
+
+def _violacao_unica(restricao: str, colunas, chave: tuple) -> ErroSql:
+    return ErroSql(f'duplicate key value violates unique constraint "{restricao}"', '23505', 409,
+                   f"Key ({', '.join(colunas)})=({', '.join(chave)}) already exists.")
+
+
+class ArmazenamentoMemoria:
+    """Store em memória: tabela -> lista de linhas, com id sequencial"""
+
+    def __init__(self):
+        self.tabelas: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        # tabela -> {nome do índice: definição}
+        self.indices: Dict[str, Dict[str, str]] = defaultdict(dict)
+        self._proximo_id: Dict[str, int] = defaultdict(lambda: 1)
+        # (tabela, restrição) -> chaves presentes; refeito sob demanda
+        self._chaves: Dict[Tuple[str, str], set] = {}
+        # Meses ('AAAA-MM-01') com partição publicada em sinapi_insumos
+        self.particoes = set()
+        self.lock = threading.Lock()
+
+    def _chaves_da_restricao(self, tabela: str, restricao: str, colunas) -> set:
+        chaves = self._chaves.get((tabela, restricao))
+        if chaves is None:
+            chaves = {_chave_unica(l, colunas) for l in self.tabelas.get(tabela, [])} - {None}
+            self._chaves[(tabela, restricao)] = chaves
+        return chaves
+
+    def invalidar(self, tabela: str):
+        """Descarta as chaves UNIQUE em cache (após alterar self.tabelas diretamente)"""
+        for chave in [c for c in self._chaves if c[0] == tabela]:
+            del self._chaves[chave]
+
+    def verificar_unicas(self, tabela: str, linhas: List[Dict[str, Any]],
+                         existentes: bool = True) -> List[Tuple[set, set]]:
+        """
+        Checa as restrições UNIQUE da tabela para as linhas (entre si e, com
+        existentes, contra a tabela); chamar com o lock
+
+        Raises:
+            ErroSql: 23505 (409) na primeira chave repetida
+        """
+        novas_por_restricao = []
+        for restricao, colunas in UNICAS.get(tabela, {}).items():
+            presentes = self._chaves_da_restricao(tabela, restricao, colunas) if existentes else set()
+            novas = set()
+            for linha in linhas:
+                chave = _chave_unica(linha, colunas)
+                if chave is None:
+                    continue
+                if chave in presentes or chave in novas:
+                    raise _violacao_unica(restricao, colunas, chave)
+                novas.add(chave)
+            novas_por_restricao.append((presentes, novas))
+        return novas_por_restricao
+
+    def inserir(self, tabela: str, linhas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        sequencia = SEQUENCIAS.get(tabela, tabela)
+        with self.lock:
+            # Como um INSERT de várias linhas: uma chave repetida recusa o lote inteiro
+            novas_por_restricao = self.verificar_unicas(tabela, linhas)
+            inseridas = []
+            for linha in linhas:
+                linha = dict(linha)
+                if linha.get('id') is None:
+                    linha['id'] = self._proximo_id[sequencia]
+                    self._proximo_id[sequencia] += 1
+                inseridas.append(linha)
+            self.tabelas[tabela].extend(inseridas)
+            for presentes, novas in novas_por_restricao:
+                presentes |= novas
+            return inseridas
+
+    def selecionar(self, tabela: str, predicados) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [l for l in self.tabelas.get(tabela, [])
+                    if all(p(l) for p in predicados)]
+
+    def remover(self, tabela: str, predicados) -> List[Dict[str, Any]]:
+        with self.lock:
+            linhas = self.tabelas.get(tabela, [])
+            removidas = [l for l in linhas if all(p(l) for p in predicados)]
+            self.tabelas[tabela] = [l for l in linhas if not all(p(l) for p in predicados)]
+            self.invalidar(tabela)
+            return removidas
+
+    def descartar(self, tabela: str):
+        with self.lock:
+            self.tabelas.pop(tabela, None)
+            self.indices.pop(tabela, None)
+            self._proximo_id.pop(tabela, None)
+            self.invalidar(tabela)
+
+
+class LimitadorThroughput:
+    """Token bucket em bytes/s compartilhado por todas as conexões"""
+
+    def __init__(self, bytes_por_segundo: Optional[float]):
+        self.taxa = bytes_por_segundo
+        self._livre_em = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consumir(self, nbytes: int):
+        if not self.taxa:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            inicio = max(agora, self._livre_em)
+            self._livre_em = inicio + nbytes / self.taxa
+            espera = self._livre_em - agora
+        time.sleep(espera)
+
+
+# Formas de SQL aceitas por /rpc/execute_sql -> método de ServidorPostgrestLocal
+_COMANDOS_SQL = [
+    (re.compile(r'^create index concurrently\b', re.IGNORECASE), '_sql_indice_concorrente'),
+    (re.compile(r'^create index (?:if not exists )?(?P<indice>\w+) '
+                r'on (?:public\.)?(?P<tabela>\w+)\b', re.IGNORECASE), '_sql_criar_indice'),
+    (re.compile(r'^drop index (?:if exists )?(?:public\.)?(?P<indice>\w+)$', re.IGNORECASE),
+     '_sql_remover_indice'),
+    (re.compile(r'^drop table (?:if exists )?(?:public\.)?(?P<tabela>\w+)(?: cascade| restrict)?$',
+                re.IGNORECASE), '_sql_remover_tabela'),
+    (re.compile(r'^analyze (?:public\.)?(?P<tabela>\w+)$', re.IGNORECASE), '_sql_analyze'),
+    (_SQL_INDICES, '_sql_indices'),
+    (_SQL_ESTATISTICAS, '_sql_estatisticas'),
+    (_FAIXAS_SQL, '_consultar_faixas'),
+    # Códigos distintos de sinapi_integridade.py
+    (re.compile(r"^select string_agg\(distinct (?P<coluna>\w+)::text, ','\) as codigos "
+                r"from public\.(?P<tabela>\w+)$", re.IGNORECASE), '_sql_codigos_distintos'),
+    # Inventário e listagem de cleanup_sinapi_tables.py
+    (re.compile(r"^select c\.relname as tablename, .* from pg_class c .*relname like 'sinapi",
+                re.IGNORECASE), '_sql_inventario'),
+    (re.compile(r"^select tablename from pg_tables where tablename like 'sinapi_%'", re.IGNORECASE),
+     '_sql_tabelas'),
+]
+
+
+class ServidorPostgrestLocal:
+    """
+    Servidor PostgREST local em thread de fundo
+
+    Exemplo:
+        with ServidorPostgrestLocal(latencia=0.05) as servidor:
+            supabase = create_client(servidor.url, CHAVE_LOCAL)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', porta: int = 0, latencia: float = 0.0,
+                 latencia_por_kb: float = 0.0, bytes_por_segundo: Optional[float] = None,
+                 taxa_erro: float = 0.0, limite_corpo: Optional[int] = None, semente: int = 42,
+                 armazenamento: Optional[ArmazenamentoMemoria] = None, particionada: bool = True):
+        self.latencia = latencia
+        self.latencia_por_kb = latencia_por_kb
+        self.taxa_erro = taxa_erro
+        self.limite_corpo = limite_corpo
+        self.particionada = particionada
+        self.armazenamento = armazenamento or ArmazenamentoMemoria()
+        self.limitador = LimitadorThroughput(bytes_por_segundo)
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.estatisticas: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {'requests': 0, 'linhas': 0, 'bytes': 0, 'erros': 0})
+        self._servidor = ThreadingHTTPServer((host, porta), self._criar_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def _registrar(self, chave: str, linhas: int = 0, nbytes: int = 0, erro: bool = False):
+        with self._lock:
+            item = self.estatisticas[chave]
+            item['requests'] += 1
+            item['linhas'] += linhas
+            item['bytes'] += nbytes
+            item['erros'] += int(erro)
+
+    def _sortear_erro(self) -> bool:
+        with self._lock:
+            return self._aleatorio.random() < self.taxa_erro
+
+    def _executar_sql(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Executa no store os comandos de catálogo e DDL dos scripts SINAPI
+
+        As formas aceitas estão em _COMANDOS_SQL, escritas aqui e não
+        derivadas dos scripts. SQL fora delas é recusado com 0A000 em vez de
+        devolver vazio, para que uma consulta alterada num script falhe no
+        teste em vez de passar. Aceitar uma forma não prova que ela roda no
+        Postgres.
+        """
+        texto = _normalizar_sql(query)
+        for padrao, metodo in _COMANDOS_SQL:
+            achado = padrao.match(texto)
+            if achado:
+                return getattr(self, metodo)(achado, texto)
+        raise ErroSql(f'Comando não suportado pelo servidor local: {texto[:120]}', '0A000')
+
+    def _sql_indice_concorrente(self, achado, texto):
+        raise ErroSql('CREATE INDEX CONCURRENTLY cannot run inside a transaction block', '25001')
+
+    def _sql_criar_indice(self, achado, texto):
+        definicao = re.sub(r'(?i) IF NOT EXISTS', '', texto)
+        self.armazenamento.indices[achado.group('tabela')][achado.group('indice')] = definicao
+        return []
+
+    def _sql_remover_indice(self, achado, texto):
+        for indices in self.armazenamento.indices.values():
+            indices.pop(achado.group('indice'), None)
+        return []
+
+    def _sql_remover_tabela(self, achado, texto):
+        self.armazenamento.descartar(achado.group('tabela'))
+        return []
+
+    def _sql_analyze(self, achado, texto):
+        return []
+
+    def _sql_indices(self, achado, texto):
+        return [{'indexname': nome, 'indexdef': definicao} for nome, definicao
+                in sorted(self.armazenamento.indices.get(achado.group('tabela'), {}).items())]
+
+    def _sql_estatisticas(self, achado, texto):
+        return [{'n_live_tup': len(self.armazenamento.tabelas.get(achado.group('tabela'), [])),
+                 'n_dead_tup': 0, 'last_analyze': None, 'last_autoanalyze': None,
+                 'tamanho_indices': 0}]
+
+    def _sql_codigos_distintos(self, achado, texto):
+        coluna = achado.group('coluna')
+        codigos = {str(l[coluna]) for l in self.armazenamento.tabelas.get(achado.group('tabela'), [])
+                   if l.get(coluna) is not None}
+        return [{'codigos': ','.join(sorted(codigos)) if codigos else None}]
+
+    def _tabelas_sinapi(self) -> List[str]:
+        return sorted(t for t in self.armazenamento.tabelas if t.startswith('sinapi_'))
+
+    def _sql_inventario(self, achado, texto):
+        resultado = []
+        for tabela in self._tabelas_sinapi():
+            linhas = self.armazenamento.tabelas[tabela]
+            tamanho = len(json.dumps(linhas, default=str).encode('utf-8'))
+            resultado.append({'tablename': tabela, 'registros': len(linhas),
+                              'tamanho_tabela': tamanho, 'tamanho_indices': 0,
+                              'tamanho_total': tamanho})
+        return resultado
+
+    def _sql_tabelas(self, achado, texto):
+        return [{'tablename': t} for t in self._tabelas_sinapi()]
+
+    def _executar_rpc(self, funcao: str, parametros: Dict[str, Any]) -> Any:
+        """Funções de partição mensal de sinapi_insumos sobre o store em memória"""
+        funcoes = ('sinapi_preparar_carga', 'sinapi_publicar_mes', 'sinapi_remover_mes',
+                   'sinapi_reter_meses', 'sinapi_listar_particoes')
+        if not self.particionada or funcao not in funcoes:
+            raise ErroSql(f'Could not find the function public.{funcao} in the schema cache',
+                          'PGRST202', 404)
+        armazenamento = self.armazenamento
+        mes = str(parametros.get('p_mes', ''))[:7]
+
+        with armazenamento.lock:
+            linhas = armazenamento.tabelas['sinapi_insumos']
+            if funcao == 'sinapi_preparar_carga':
+                armazenamento.tabelas['sinapi_insumos_carga'] = []
+                return None
+            if funcao == 'sinapi_listar_particoes':
+                return [{'particao': f"sinapi_insumos_{m[:4]}_{m[5:7]}", 'mes': m,
+                         'linhas_estimadas': sum(str(l.get('mes_referencia', ''))[:7] == m[:7] for l in linhas)}
+                        for m in sorted(armazenamento.particoes)]
+            if funcao == 'sinapi_reter_meses':
+                manter = max(int(parametros.get('p_manter', 1)), 1)
+                removidos = sorted(armazenamento.particoes, reverse=True)[manter:]
+            else:
+                removidos = [f'{mes}-01'] if f'{mes}-01' in armazenamento.particoes else []
+
+            if funcao == 'sinapi_publicar_mes':
+                carga = armazenamento.tabelas.pop('sinapi_insumos_carga', [])
+                try:
+                    mapa = self._validar_publicacao(mes, linhas, carga)
+                except ErroSql:
+                    armazenamento.tabelas['sinapi_insumos_carga'] = carga
+                    raise
+                armazenamento.invalidar('sinapi_insumos')
+                linhas = [l for l in linhas if str(l.get('mes_referencia', ''))[:7] != mes]
+                armazenamento.tabelas['sinapi_insumos'] = linhas + carga
+                armazenamento.particoes.add(f'{mes}-01')
+                remapeadas = 0
+                for referencia in self._referencias():
+                    if referencia.get('sinapi_insumo_id') in mapa:
+                        referencia['sinapi_insumo_id'] = mapa[referencia['sinapi_insumo_id']]
+                        remapeadas += 1
+                return {'particao': f"sinapi_insumos_{mes.replace('-', '_')}", 'mes': f'{mes}-01',
+                        'linhas': len(carga), 'substituida': bool(removidos),
+                        'referencias_remapeadas': remapeadas}
+
+            if funcao == 'sinapi_remover_mes' and removidos:
+                referencias = self._referencias_mes(linhas, mes)
+                if referencias:
+                    raise ErroSql(f"sinapi_insumos_{mes.replace('-', '_')} não pode ser removida: "
+                                  f"{referencias} referência(s) por sinapi_insumo_id", '23503')
+            else:
+                # A retenção pula os meses ainda referenciados
+                removidos = [m for m in removidos if not self._referencias_mes(linhas, m[:7])]
+            meses = {m[:7] for m in removidos}
+            armazenamento.invalidar('sinapi_insumos')
+            armazenamento.tabelas['sinapi_insumos'] = [
+                l for l in linhas if str(l.get('mes_referencia', ''))[:7] not in meses]
+            armazenamento.particoes.difference_update(removidos)
+            if funcao == 'sinapi_remover_mes':
+                return bool(removidos)
+            return [f"sinapi_insumos_{m[:4]}_{m[5:7]}" for m in removidos]
+
+    def _referencias(self) -> List[Dict[str, Any]]:
+        """Linhas das tabelas que apontam para sinapi_insumos por sinapi_insumo_id"""
+        return [linha for tabela in TABELAS_REFERENCIAS
+                for linha in self.armazenamento.tabelas.get(tabela, [])
+                if linha.get('sinapi_insumo_id') is not None]
+
+    def _referencias_mes(self, linhas: List[Dict[str, Any]], mes: str) -> int:
+        ids = {l.get('id') for l in linhas if str(l.get('mes_referencia', ''))[:7] == mes}
+        return sum(r['sinapi_insumo_id'] in ids for r in self._referencias())
+
+    def _validar_publicacao(self, mes: str, linhas: List[Dict[str, Any]],
+                            carga: List[Dict[str, Any]]) -> Dict[Any, Any]:
+        """Recusas de sinapi_publicar_mes; retorna o mapa id antigo -> id novo"""
+        armazenamento = self.armazenamento
+        if not carga:
+            raise ErroSql('sinapi_insumos_carga está vazia', 'P0001')
+        fora = sum(str(l.get('mes_referencia', ''))[:7] != mes for l in carga)
+        if fora:
+            raise ErroSql(f'{fora} linha(s) da carga fora de {mes}', 'P0001')
+        # O ATTACH constrói o índice UNIQUE na partição nova
+        armazenamento.verificar_unicas('sinapi_insumos', carga, existentes=False)
+
+        do_mes = [l for l in linhas if str(l.get('mes_referencia', ''))[:7] == mes]
+        if f'{mes}-01' not in armazenamento.particoes and do_mes:
+            raise ErroSql(f'{len(do_mes)} linha(s) avulsa(s) de {mes} em sinapi_insumos_padrao; '
+                          'remova-as ou mova-as antes de publicar o mês', 'P0001')
+
+        referenciados = {r['sinapi_insumo_id'] for r in self._referencias()}
+        novos = {str(l.get('codigo_do_insumo')): l.get('id') for l in carga}
+        mapa, orfaos = {}, []
+        for linha in do_mes:
+            if linha.get('id') in referenciados:
+                codigo = str(linha.get('codigo_do_insumo'))
+                if codigo in novos:
+                    mapa[linha['id']] = novos[codigo]
+                else:
+                    orfaos.append(codigo)
+        if orfaos:
+            raise ErroSql(f"insumo(s) referenciado(s) de {mes} ausente(s) da carga: "
+                          f"{', '.join(sorted(orfaos))}", '23503')
+        return mapa
+
+    def _consultar_faixas(self, achado, query: str) -> List[Dict[str, Any]]:
+        """Agregados (linhas, soma dos hashes mod 2^64) ou (chave, hash) por faixa"""
+        faixas = [(int(i), _literal_sql(ini), _literal_sql(fim))
+                  for i, ini, fim in _FAIXA_SQL.findall(achado.group('valores'))]
+        chave = _colunas_sql(achado.group('chave'))
+        prefixo = f"({achado.group('chave')}){_SEPARADOR_SQL}"
+        if not achado.group('linha').startswith(prefixo):
+            raise ErroSql('O hash da linha precisa começar pela chave', '0A000')
+        linha = chave + _colunas_sql(achado.group('linha')[len(prefixo):])
+
+        with self.armazenamento.lock:
+            registros = list(self.armazenamento.tabelas.get(achado.group('tabela'), []))
+        if achado.group('coluna_mes'):
+            # Filtro de meses da reconciliação (coluna IN ('AAAA-MM-DD', ...))
+            coluna = achado.group('coluna_mes')
+            valores = {_literal_sql(v) for v in re.findall(r"'[^']*'", achado.group('meses'))}
+            registros = [r for r in registros if str(r.get(coluna))[:10] in valores]
+        hashes = []
+        for registro in registros:
+            texto = '|'.join(_texto_sql(registro.get(c), n) for c, n in linha)
+            hashes.append(('|'.join(_texto_sql(registro.get(c), n) for c, n in chave),
+                           int(hashlib.md5(texto.encode('utf-8')).hexdigest()[:15], 16)))
+
+        def dentro(chave_linha: str, inicio: Optional[str], fim: Optional[str]) -> bool:
+            # Ordem "C" = ordem dos bytes UTF-8 = ordem dos code points
+            return (inicio is None or chave_linha >= inicio) and (fim is None or chave_linha < fim)
+
+        if achado.group('sufixo').startswith('GROUP BY'):
+            resultado = []
+            for i, inicio, fim in faixas:
+                selecionados = [h for c, h in hashes if dentro(c, inicio, fim)]
+                resultado.append({'i': i, 'linhas': len(selecionados),
+                                  'hash': str(sum(selecionados) % 2 ** 64)})
+            return resultado
+        return [{'chave': c, 'hash': str(h)} for _, inicio, fim in faixas
+                for c, h in hashes if dentro(c, inicio, fim)]
+
+    def _criar_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status: int, corpo: Any = None,
+                           cabecalhos: Optional[Dict[str, str]] = None, incluir_corpo: bool = True):
+                dados = json.dumps(corpo, default=str).encode('utf-8') if corpo is not None else b''
+                servidor.limitador.consumir(len(dados))
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados) if incluir_corpo else 0))
+                for chave, valor in (cabecalhos or {}).items():
+                    self.send_header(chave, valor)
+                self.end_headers()
+                if incluir_corpo and dados:
+                    self.wfile.write(dados)
+
+            def _ler_corpo(self) -> bytes:
+                corpo = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+                servidor.limitador.consumir(len(corpo))
+                return corpo
+
+            def _preparar(self, nbytes: int) -> bool:
+                """Aplica latência e sorteia erro; retorna False se respondeu 503"""
+                atraso = servidor.latencia + servidor.latencia_por_kb * nbytes / 1024
+                if atraso:
+                    time.sleep(atraso)
+                if servidor._sortear_erro():
+                    self._erro(503, 'Erro simulado pelo servidor local', 'PGRST503')
+                    return False
+                return True
+
+            def _erro(self, status: int, mensagem: str, codigo: str,
+                      detalhes: Optional[str] = None):
+                # Mesmo formato de erro do PostgREST, para o cliente gerar APIError
+                self._responder(status, {'message': mensagem, 'code': codigo,
+                                         'details': detalhes, 'hint': None})
+
+            def _rota(self):
+                partes = urlsplit(self.path)
+                caminho = unquote(partes.path)
+                if not caminho.startswith('/rest/v1/'):
+                    return None, None, []
+                recurso = caminho[len('/rest/v1/'):].strip('/')
+                return recurso, partes.query, parse_qsl(partes.query, keep_blank_values=True)
+
+            def _consulta(self, params):
+                predicados, select, ordem, limite, offset = [], None, None, None, 0
+                for chave, valor in params:
+                    if chave == 'select':
+                        select = valor
+                    elif chave == 'order':
+                        ordem = valor
+                    elif chave == 'limit':
+                        limite = int(valor)
+                    elif chave == 'offset':
+                        offset = int(valor)
+                    elif chave in ('columns', 'on_conflict'):
+                        continue
+                    else:
+                        predicados.append(_filtro(chave, valor))
+                return predicados, select, ordem, limite, offset
+
+            def _com_tratamento(self, metodo):
+                try:
+                    metodo()
+                except Exception as e:
+                    self._erro(400, str(e), 'PGRST100')
+
+            def do_POST(self):
+                self._com_tratamento(self._post)
+
+            def do_GET(self):
+                self._com_tratamento(lambda: self._get(incluir_corpo=True))
+
+            def do_HEAD(self):
+                self._com_tratamento(lambda: self._get(incluir_corpo=False))
+
+            def do_DELETE(self):
+                self._com_tratamento(self._delete)
+
+            def do_PATCH(self):
+                self._ler_corpo()
+                self._erro(501, 'PATCH não suportado pelo servidor local', 'PGRST501')
+
+            def _post(self):
+                recurso, _, _ = self._rota()
+                corpo = self._ler_corpo()
+                if servidor.limite_corpo and len(corpo) > servidor.limite_corpo:
+                    # Como o gateway do Supabase: corpo recusado antes do PostgREST
+                    servidor._registrar(f'POST {recurso}', erro=True)
+                    self._erro(413, 'Payload too large', '413')
+                    return
+                if not self._preparar(len(corpo)):
+                    servidor._registrar(f'POST {recurso}', erro=True)
+                    return
+                payload = json.loads(corpo or b'null')
+                if recurso.startswith('rpc/'):
+                    funcao = recurso[4:]
+                    try:
+                        if funcao == 'execute_sql':
+                            resultado = servidor._executar_sql((payload or {}).get('query', ''))
+                        else:
+                            resultado = servidor._executar_rpc(funcao, payload or {})
+                    except ErroSql as e:
+                        servidor._registrar(f'RPC {funcao}', erro=True)
+                        self._erro(e.status, str(e), e.codigo, e.detalhes)
+                        return
+                    linhas = len(resultado) if isinstance(resultado, list) else 1
+                    servidor._registrar(f'RPC {funcao}', linhas=linhas, nbytes=len(corpo))
+                    self._responder(200, resultado)
+                    return
+                if not recurso or '/' in recurso:
+                    self._erro(404, f'Rota não suportada: {self.path}', 'PGRST404')
+                    return
+                linhas = payload if isinstance(payload, list) else [payload]
+                try:
+                    inseridas = servidor.armazenamento.inserir(recurso, linhas)
+                except ErroSql as e:
+                    servidor._registrar(f'POST {recurso}', erro=True)
+                    self._erro(e.status, str(e), e.codigo, e.detalhes)
+                    return
+                servidor._registrar(f'POST {recurso}', linhas=len(inseridas), nbytes=len(corpo))
+                if 'return=minimal' in self.headers.get('Prefer', ''):
+                    self._responder(201)
+                else:
+                    self._responder(201, inseridas)
+
+            def _get(self, incluir_corpo: bool):
+                recurso, _, params = self._rota()
+                # O corpo é sempre consumido para não corromper a conexão keep-alive
+                self._ler_corpo()
+                if not self._preparar(0):
+                    servidor._registrar(f'GET {recurso}', erro=True)
+                    return
+                predicados, select, ordem, limite, offset = self._consulta(params)
+                linhas = servidor.armazenamento.selecionar(recurso, predicados)
+                total = len(linhas)
+                if ordem:
+                    for termo in reversed(ordem.split(',')):
+                        coluna, *mods = termo.split('.')
+                        linhas.sort(key=lambda l: (l.get(coluna) is None, l.get(coluna)),
+                                    reverse='desc' in mods)
+                linhas = linhas[offset:offset + limite if limite is not None else None]
+                if select and select != '*':
+                    colunas = [c.strip() for c in select.split(',')]
+                    linhas = [{c: l.get(c) for c in colunas} for l in linhas]
+                cabecalhos = {}
+                if 'count=' in self.headers.get('Prefer', ''):
+                    fim = offset + len(linhas) - 1
+                    faixa = f'{offset}-{fim}' if linhas else '*'
+                    cabecalhos['Content-Range'] = f'{faixa}/{total}'
+                servidor._registrar(f'GET {recurso}', linhas=len(linhas))
+                self._responder(200, linhas, cabecalhos, incluir_corpo)
+
+            def _delete(self):
+                recurso, _, params = self._rota()
+                self._ler_corpo()
+                if not self._preparar(0):
+                    servidor._registrar(f'DELETE {recurso}', erro=True)
+                    return
+                predicados, *_ = self._consulta(params)
+                removidas = servidor.armazenamento.remover(recurso, predicados)
+                servidor._registrar(f'DELETE {recurso}', linhas=len(removidas))
+                self._responder(200, removidas)
+
+        return Handler
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"PostgREST local ouvindo em {self.url}")
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    def resumo(self) -> Dict[str, Dict[str, int]]:
+        """Estatísticas por operação e tabela (requests, linhas, bytes, erros)"""
+        with self._lock:
+            return {chave: dict(valor) for chave, valor in sorted(self.estatisticas.items())}
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Servidor PostgREST local para testes")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=54321)
+    parser.add_argument('--latencia', type=float, default=0.0,
+                        help="Latência fixa por request (s)")
+    parser.add_argument('--latencia-por-kb', type=float, default=0.0,
+                        help="Latência adicional por KB de payload (s)")
+    parser.add_argument('--throughput', type=float, default=None,
+                        help="Teto de throughput em bytes/s")
+    parser.add_argument('--taxa-erro', type=float, default=0.0,
+                        help="Probabilidade de responder 503")
+    parser.add_argument('--limite-corpo', type=int, default=None,
+                        help="Responde 413 a POSTs com corpo maior que N bytes")
+    parser.add_argument('--sem-particoes', action='store_true',
+                        help="Sem as RPCs de partição mensal (banco antes da migração)")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    servidor = ServidorPostgrestLocal(
+        host=args.host, porta=args.porta, latencia=args.latencia,
+        latencia_por_kb=args.latencia_por_kb, bytes_por_segundo=args.throughput,
+        taxa_erro=args.taxa_erro, limite_corpo=args.limite_corpo, semente=args.semente,
+        particionada=not args.sem_particoes)
+
+    # Cada script lê um par diferente de variáveis; imprime todos
+    for variavel in ('SUPABASE_URL', 'VITE_SUPABASE_URL'):
+        print(f"{variavel}={servidor.url}")
+    for variavel in ('SUPABASE_SERVICE_KEY', 'VITE_SUPABASE_ROLE_KEY', 'VITE_SUPABASE_ANON_KEY'):
+        print(f"{variavel}={CHAVE_LOCAL}")
+    try:
+        servidor._servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor._servidor.server_close()
+        print(json.dumps(servidor.resumo(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Índice Local de Descrições SINAPI para Casamento em Lote
+========================================================
+
+Casa itens de orçamento em texto livre com códigos SINAPI sem chamar a edge
+function sinapi-semantic-search uma vez por linha.
+
+- Descrições normalizadas (minúsculas, sem acento, só letras e números)
+- Postings de tokens e de trigramas de caracteres (tolera abreviações e
+  erros de digitação) em uma matriz esparsa documentos × termos com pesos
+  BM25 pré-calculados
+- Consulta de um lote inteiro de linhas com um produto esparso por bloco
+- Filtro opcional por unidade
+
+Uso:
+    python scripts/sinapi_busca.py <insumos.csv> <itens.csv> [--coluna-descricao descricao]
+        [--coluna-unidade unidade] [--top 3] [--saida casamentos.csv]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import logging
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Colunas de código/descrição/unidade conhecidas nos três importadores
+COLUNAS_CONHECIDAS = [
+    ('codigo_do_insumo', 'descricao_do_insumo', 'unidade'),
+    ('codigo_composicao', 'descricao', 'unidade'),
+    ('codigo_sinapi', 'descricao', None),
+]
+
+PESO_TRIGRAMA = 0.3
+TAMANHO_BLOCO = 256
+
+
+def normalizar_texto(texto) -> str:
+    """Minúsculas, sem acentos e apenas letras/números separados por espaço"""
+    if texto is None or (isinstance(texto, float) and np.isnan(texto)):
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[a-z0-9]+', texto))
+
+
+def _termos(texto_normalizado: str) -> List[str]:
+    """Tokens ('w:') e trigramas de cada token com bordas ('t:')"""
+    termos = []
+    for token in texto_normalizado.split():
+        termos.append('w:' + token)
+        marcado = f' {token} '
+        termos.extend('t:' + marcado[i:i + 3] for i in range(len(marcado) - 2))
+    return termos
+
+
+class IndiceDescricoes:
+    """Índice invertido BM25 sobre tokens e trigramas das descrições SINAPI"""
+
+    def __init__(self, codigos: Sequence, descricoes: Sequence,
+                 unidades: Optional[Sequence] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            codigos: Código SINAPI de cada descrição
+            descricoes: Descrições (texto original)
+            unidades: Unidade de cada código (opcional, habilita o filtro)
+            k1, b: Parâmetros BM25
+        """
+        self.codigos = np.asarray(codigos).astype(str)
+        self.descricoes = np.asarray(descricoes, dtype=object)
+        self.unidades = (np.array([normalizar_texto(u) for u in unidades], dtype=object)
+                         if unidades is not None else None)
+        self.vocabulario: Dict[str, int] = {}
+
+        linhas, colunas, contagens = [], [], []
+        for i, descricao in enumerate(self.descricoes):
+            freq = Counter(_termos(normalizar_texto(descricao)))
+            linhas.extend([i] * len(freq))
+            colunas.extend(self.vocabulario.setdefault(t, len(self.vocabulario)) for t in freq)
+            contagens.extend(freq.values())
+
+        n_docs, n_termos = len(self.descricoes), len(self.vocabulario)
+        tf = sparse.csr_matrix(
+            (np.asarray(contagens, dtype=np.float64), (linhas, colunas)),
+            shape=(n_docs, n_termos))
+
+        # BM25: idf(t) * tf*(k1+1) / (tf + k1*(1 - b + b*dl/avgdl))
+        df = np.bincount(tf.indices, minlength=n_termos)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        tamanho = np.asarray(tf.sum(axis=1)).ravel()
+        norma = k1 * (1 - b + b * tamanho / max(tamanho.mean(), 1e-9))
+        pesos = tf.copy()
+        pesos.data = (tf.data * (k1 + 1)) / (tf.data + np.repeat(norma, np.diff(tf.indptr)))
+        pesos = pesos.multiply(idf[None, :])
+
+        # Trigramas pesam menos que tokens inteiros
+        fator = np.array([PESO_TRIGRAMA if t.startswith('t:') else 1.0
+                          for t in self.vocabulario])
+        self._pesos_t = sparse.csr_matrix(pesos.multiply(fator[None, :]).T)
+
+        logging.info(
+            f"Índice de descrições: {n_docs} documentos, {n_termos} termos, "
+            f"{self._pesos_t.nnz} postings")
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame, coluna_codigo: Optional[str] = None,
+                     coluna_descricao: Optional[str] = None,
+                     coluna_unidade: Optional[str] = None) -> 'IndiceDescricoes':
+        """
+        Cria o índice a partir do DataFrame de um dos importadores
+
+        Sem colunas explícitas, reconhece os formatos de sinapi_insumos,
+        sinapi_composicoes_mao_obra e sinapi_manutencoes.
+        """
+        if coluna_codigo is None or coluna_descricao is None:
+            for codigo, descricao, unidade in COLUNAS_CONHECIDAS:
+                if codigo in df.columns and descricao in df.columns:
+                    coluna_codigo, coluna_descricao = codigo, descricao
+                    coluna_unidade = coluna_unidade or (unidade if unidade in df.columns else None)
+                    break
+            else:
+                raise ValueError("Colunas de código/descrição não reconhecidas")
+
+        df = df.drop_duplicates(coluna_codigo, keep='last')
+        return cls(df[coluna_codigo].to_numpy(), df[coluna_descricao].to_numpy(),
+                   df[coluna_unidade].to_numpy() if coluna_unidade else None)
+
+    def _vetorizar(self, textos: Iterable[str]) -> sparse.csr_matrix:
+        """Consultas × termos (1 por termo presente; termos fora do vocabulário ignorados)"""
+        indptr, indices = [0], []
+        for texto in textos:
+            ids = {self.vocabulario[t] for t in _termos(normalizar_texto(texto))
+                   if t in self.vocabulario}
+            indices.extend(ids)
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.ones(len(indices)), indices, indptr), shape=(len(indptr) - 1, len(self.vocabulario)))
+
+    def casar(self, textos: Sequence[str], unidades: Optional[Sequence] = None,
+              top: int = 3) -> pd.DataFrame:
+        """
+        Casa um lote de linhas de orçamento com os códigos SINAPI
+
+        Args:
+            textos: Descrições livres das linhas
+            unidades: Unidade de cada linha (opcional; vazio = sem filtro)
+            top: Quantidade de candidatos por linha
+
+        Returns:
+            DataFrame com linha, posicao, codigo, descricao, unidade e score
+            (linhas sem nenhum termo em comum não aparecem)
+        """
+        textos = list(textos)
+        unidades_q = (np.array([normalizar_texto(u) for u in unidades], dtype=object)
+                      if unidades is not None and self.unidades is not None else None)
+        top = min(top, len(self.codigos))
+        resultados = []
+
+        for inicio in range(0, len(textos), TAMANHO_BLOCO):
+            bloco = slice(inicio, inicio + TAMANHO_BLOCO)
+            scores = (self._vetorizar(textos[bloco]) @ self._pesos_t).toarray()
+
+            if unidades_q is not None:
+                uq = unidades_q[bloco]
+                filtrar = uq != ''
+                incompativel = filtrar[:, None] & (self.unidades[None, :] != uq[:, None])
+                scores[incompativel] = 0.0
+
+            # Top-k por linha sem ordenar o catálogo inteiro
+            candidatos = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            valores = np.take_along_axis(scores, candidatos, axis=1)
+            ordem = np.argsort(-valores, axis=1)
+            candidatos = np.take_along_axis(candidatos, ordem, axis=1)
+            valores = np.take_along_axis(valores, ordem, axis=1)
+
+            linhas, posicoes = np.nonzero(valores > 0)
+            docs = candidatos[linhas, posicoes]
+            resultados.append(pd.DataFrame({
+                'linha': linhas + inicio,
+                'posicao': posicoes + 1,
+                'codigo': self.codigos[docs],
+                'descricao': self.descricoes[docs],
+                'unidade': self.unidades[docs] if self.unidades is not None else None,
+                'score': valores[linhas, posicoes],
+            }))
+
+        if not resultados:
+            return pd.DataFrame(columns=['linha', 'posicao', 'codigo', 'descricao',
+                                         'unidade', 'score'])
+        return pd.concat(resultados, ignore_index=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Casamento em lote de itens de orçamento com códigos SINAPI")
+    parser.add_argument('catalogo', help="CSV SINAPI de insumos (formato do importador)")
+    parser.add_argument('itens', help="CSV com as linhas do orçamento")
+    parser.add_argument('--coluna-descricao', default='descricao')
+    parser.add_argument('--coluna-unidade', default=None)
+    parser.add_argument('--top', type=int, default=3)
+    parser.add_argument('--saida', default='casamentos_sinapi.csv')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from importar_sinapi import (ler_csv_sinapi, limpar_nomes_colunas,
+                                 mapear_colunas_sinapi, processar_dados_sinapi)
+
+    try:
+        df = limpar_nomes_colunas(ler_csv_sinapi(args.catalogo))
+        indice = IndiceDescricoes.de_dataframe(
+            processar_dados_sinapi(df, mapear_colunas_sinapi(df)))
+
+        itens = ler_csv_sinapi(args.itens)
+        unidades = itens[args.coluna_unidade] if args.coluna_unidade else None
+
+        inicio = time.perf_counter()
+        casamentos = indice.casar(itens[args.coluna_descricao].tolist(), unidades, top=args.top)
+        duracao = time.perf_counter() - inicio
+
+        casamentos.to_csv(args.saida, index=False)
+        logging.info(
+            f"{len(itens)} linhas casadas em {duracao:.3f}s "
+            f"({duracao / max(len(itens), 1) * 1000:.3f} ms/linha); resultado em {args.saida}")
+    except Exception as e:
+        logging.error(f"Erro no casamento de descrições: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
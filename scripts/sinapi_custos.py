@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Motor de Custo de Composições SINAPI (Matrizes Esparsas)
+========================================================
+
+Calcula o custo de todas as composições SINAPI para as 27 UFs a partir dos
+coeficientes composição → item (sinapi_familias_coeficientes.csv) e dos
+preços de insumos (saída de processar_dados_sinapi).
+
+Funcionalidades:
+- Coeficientes composição → insumo em matriz esparsa A (composições × insumos)
+- Coeficientes composição → composição em matriz esparsa B (subcomposições)
+- Preços em matriz densa P (insumos × UFs)
+- Custo direto A·P em multiplicações esparsas; composições aninhadas
+  resolvidas por nível topológico (C = A·P + B·C, filhos antes dos pais)
+- Detecção de ciclos e de composições com preço de insumo ausente
+- Recálculo incremental: índice reverso insumo → composições para
+  reprocessar só o que depende dos preços alterados
+
+Uso:
+    python scripts/sinapi_custos.py <coeficientes.csv> <insumos.csv> [--saida custos.csv]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import logging
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from sinapi_dtypes import ESTADOS
+
+COLUNAS_UF = [f'preco_{estado.lower()}' for estado in ESTADOS]
+COLUNAS_CUSTO = [f'custo_{estado.lower()}' for estado in ESTADOS]
+
+# Profundidade máxima de aninhamento antes de considerar que há ciclo
+MAX_NIVEIS = 64
+
+
+def mapear_colunas_coeficientes(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    """
+    Mapeia as colunas do CSV de coeficientes (nomes já limpos) para os campos
+    codigo_composicao, codigo_item, tipo_item e coeficiente
+    """
+    mapeamento = {'codigo_composicao': None, 'codigo_item': None,
+                  'tipo_item': None, 'coeficiente': None}
+
+    for coluna in df.columns:
+        coluna_lower = coluna.lower()
+        if 'coeficiente' in coluna_lower:
+            mapeamento['coeficiente'] = coluna
+        elif 'composição' in coluna_lower or 'composicao' in coluna_lower:
+            if 'código' in coluna_lower or 'codigo' in coluna_lower:
+                mapeamento['codigo_composicao'] = coluna
+        elif 'código do item' in coluna_lower or 'codigo do item' in coluna_lower \
+                or 'código do insumo' in coluna_lower or 'codigo do insumo' in coluna_lower:
+            mapeamento['codigo_item'] = coluna
+        elif coluna_lower.startswith('tipo'):
+            mapeamento['tipo_item'] = coluna
+
+    return mapeamento
+
+
+def normalizar_coeficientes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte o CSV bruto de coeficientes para o formato do motor
+
+    Returns:
+        DataFrame com codigo_composicao, codigo_item, tipo_item, coeficiente
+    """
+    from importar_sinapi import limpar_dados_precos, limpar_nomes_colunas
+
+    df = limpar_nomes_colunas(df)
+    mapeamento = mapear_colunas_coeficientes(df)
+    faltando = [campo for campo in ('codigo_composicao', 'codigo_item', 'coeficiente')
+                if not mapeamento[campo]]
+    if faltando:
+        raise ValueError(f"Colunas de coeficientes não encontradas: {faltando}")
+
+    coeficientes = pd.DataFrame({
+        'codigo_composicao': df[mapeamento['codigo_composicao']].astype(str).str.strip(),
+        'codigo_item': df[mapeamento['codigo_item']].astype(str).str.strip(),
+        'coeficiente': df[mapeamento['coeficiente']].map(limpar_dados_precos),
+    })
+    if mapeamento['tipo_item']:
+        coeficientes['tipo_item'] = df[mapeamento['tipo_item']].astype(str).str.upper()
+    return coeficientes.dropna(subset=['coeficiente'])
+
+
+def _eh_composicao(coeficientes: pd.DataFrame, codigos_composicao: np.ndarray) -> np.ndarray:
+    """Item é subcomposição se o tipo diz isso ou se o código é uma composição"""
+    pelo_codigo = np.isin(coeficientes['codigo_item'].to_numpy(dtype=str), codigos_composicao)
+    if 'tipo_item' in coeficientes.columns:
+        pelo_tipo = coeficientes['tipo_item'].astype(str).str.upper().str.startswith('COMP').to_numpy()
+        return pelo_tipo | pelo_codigo
+    return pelo_codigo
+
+
+def _niveis_aninhamento(B: sparse.csr_matrix) -> np.ndarray:
+    """
+    Nível de cada composição no grafo de subcomposições (0 = só insumos)
+
+    Raises:
+        ValueError: Se houver ciclo entre composições
+    """
+    n = B.shape[0]
+    nivel = np.zeros(n, dtype=np.int64)
+    tem_filhos = np.diff(B.indptr) > 0
+    if not tem_filhos.any():
+        return nivel
+    inicios = B.indptr[:-1][tem_filhos]
+    # nivel = 1 + max(nivel dos filhos); estabiliza em no máximo profundidade+1 passos
+    for _ in range(MAX_NIVEIS + 1):
+        novo = np.zeros(n, dtype=np.int64)
+        novo[tem_filhos] = np.maximum.reduceat(nivel[B.indices] + 1, inicios)
+        if np.array_equal(novo, nivel):
+            return nivel
+        nivel = novo
+    raise ValueError(
+        f"Ciclo entre composições detectado (aninhamento > {MAX_NIVEIS} níveis)")
+
+
+class MotorCustos:
+    """
+    Custos de composições por UF mantidos em memória, com recálculo
+    incremental quando apenas alguns preços de insumos mudam
+
+    Atributos principais:
+        composicoes / insumos: eixos ordenados de códigos
+        A: coeficientes composição → insumo (CSR, composições × insumos)
+        B: coeficientes composição → subcomposição (CSR, composições × composições)
+        P: preços dos insumos (insumos × UFs, NaN onde não há preço)
+        nivel: nível de aninhamento de cada composição
+    """
+
+    def __init__(self, coeficientes: pd.DataFrame, precos_insumos: pd.DataFrame):
+        """
+        Args:
+            coeficientes: DataFrame com codigo_composicao, codigo_item, coeficiente
+                e opcionalmente tipo_item (INSUMO/COMPOSICAO)
+            precos_insumos: DataFrame com codigo_do_insumo e colunas preco_xx
+
+        Raises:
+            ValueError: Se houver ciclo entre composições
+        """
+        coeficientes = coeficientes.copy()
+        coeficientes['codigo_composicao'] = coeficientes['codigo_composicao'].astype(str)
+        coeficientes['codigo_item'] = coeficientes['codigo_item'].astype(str)
+
+        composicoes = np.unique(coeficientes['codigo_composicao'].to_numpy(dtype=str))
+        eh_comp = _eh_composicao(coeficientes, composicoes)
+
+        # Subcomposições sem linhas próprias entram no eixo (custo indefinido)
+        self.composicoes = np.union1d(
+            composicoes, coeficientes.loc[eh_comp, 'codigo_item'].to_numpy(dtype=str))
+        n_comp = len(self.composicoes)
+
+        precos = precos_insumos.drop_duplicates('codigo_do_insumo', keep='last')
+        codigos_preco = precos['codigo_do_insumo'].astype(str).str.strip().to_numpy(dtype=str)
+        self.insumos = np.union1d(
+            codigos_preco, coeficientes.loc[~eh_comp, 'codigo_item'].to_numpy(dtype=str))
+
+        self.P = np.full((len(self.insumos), len(COLUNAS_UF)), np.nan)
+        self._definir_precos(precos)
+
+        linhas = np.searchsorted(
+            self.composicoes, coeficientes['codigo_composicao'].to_numpy(dtype=str))
+        valores = coeficientes['coeficiente'].to_numpy(dtype=np.float64)
+        ins = ~eh_comp
+        self.A = sparse.csr_matrix(
+            (valores[ins], (linhas[ins], np.searchsorted(
+                self.insumos, coeficientes.loc[ins, 'codigo_item'].to_numpy(dtype=str)))),
+            shape=(n_comp, len(self.insumos)))
+        self.B = sparse.csr_matrix(
+            (valores[eh_comp], (linhas[eh_comp], np.searchsorted(
+                self.composicoes, coeficientes.loc[eh_comp, 'codigo_item'].to_numpy(dtype=str)))),
+            shape=(n_comp, n_comp))
+
+        # Estruturas (0/1) para propagar "preço ausente" e índices reversos
+        self._A_estrutura = (self.A != 0).astype(np.float64)
+        self._B_estrutura = (self.B != 0).astype(np.float64)
+        self._A_csc = self._A_estrutura.tocsc()
+        self._B_csc = self._B_estrutura.tocsc()
+
+        self.sem_definicao = np.ones(n_comp, dtype=bool)
+        self.sem_definicao[np.unique(linhas)] = False
+
+        self.nivel = _niveis_aninhamento(self.B)
+        self._custo = np.zeros((n_comp, len(COLUNAS_UF)))
+        self._incompleta = np.zeros((n_comp, len(COLUNAS_UF)), dtype=bool)
+        self._avaliar(np.arange(n_comp))
+
+        logging.info(
+            f"Custos calculados: {n_comp} composições × {len(ESTADOS)} UFs, "
+            f"{self.A.nnz + self.B.nnz} coeficientes, "
+            f"{int(self.nivel.max()) if n_comp else 0} nível(is) de aninhamento")
+
+    def _definir_precos(self, precos: pd.DataFrame) -> np.ndarray:
+        """Grava os preços informados em P e retorna as linhas de insumo tocadas"""
+        codigos = precos['codigo_do_insumo'].astype(str).str.strip().to_numpy(dtype=str)
+        posicoes = np.searchsorted(self.insumos, codigos).clip(max=max(len(self.insumos) - 1, 0))
+        conhecidos = self.insumos[posicoes] == codigos if len(self.insumos) else np.zeros(len(codigos), bool)
+        posicoes = posicoes[conhecidos]
+        for j, coluna in enumerate(COLUNAS_UF):
+            if coluna in precos.columns:
+                self.P[posicoes, j] = pd.to_numeric(
+                    precos[coluna], errors='coerce').to_numpy(dtype=np.float64)[conhecidos]
+        self._P0 = np.nan_to_num(self.P)
+        self._faltante = np.isnan(self.P).astype(np.float64)
+        return np.unique(posicoes)
+
+    def _avaliar(self, linhas: np.ndarray):
+        """Recalcula as composições informadas, nível a nível (filhos antes dos pais)"""
+        niveis = self.nivel[linhas]
+        for nivel in np.unique(niveis):
+            g = linhas[niveis == nivel]
+            self._custo[g] = self.A[g] @ self._P0 + self.B[g] @ self._custo
+            self._incompleta[g] = (
+                (self._A_estrutura[g] @ self._faltante
+                 + self._B_estrutura[g] @ self._incompleta.astype(np.float64)) > 0
+            ) | self.sem_definicao[g, None]
+
+    def afetadas_por(self, linhas_insumo: np.ndarray) -> np.ndarray:
+        """
+        Composições que dependem (direta ou indiretamente) dos insumos informados
+
+        Args:
+            linhas_insumo: Posições dos insumos no eixo self.insumos
+
+        Returns:
+            Posições ordenadas das composições afetadas
+        """
+        afetadas = np.zeros(len(self.composicoes), dtype=bool)
+        fronteira = np.unique(self._A_csc[:, linhas_insumo].indices)
+        # Sobe pelo índice reverso filho → pais até não haver novas composições
+        while fronteira.size:
+            afetadas[fronteira] = True
+            pais = np.unique(self._B_csc[:, fronteira].indices)
+            fronteira = pais[~afetadas[pais]]
+        return np.flatnonzero(afetadas)
+
+    def custos_de(self, linhas: Optional[np.ndarray] = None) -> np.ndarray:
+        """Matriz de custos (NaN onde incompleta) das composições informadas"""
+        linhas = slice(None) if linhas is None else linhas
+        custo = self._custo[linhas].copy()
+        custo[self._incompleta[linhas]] = np.nan
+        return custo
+
+    @property
+    def custos(self) -> pd.DataFrame:
+        """Custos por UF (NaN na UF em que falta preço) e flag 'incompleta'"""
+        resultado = pd.DataFrame(
+            self.custos_de(), index=pd.Index(self.composicoes, name='codigo_composicao'),
+            columns=COLUNAS_CUSTO)
+        resultado['incompleta'] = self._incompleta.any(axis=1)
+        return resultado
+
+    def atualizar_precos(self, precos_alterados: pd.DataFrame) -> Dict:
+        """
+        Aplica novos preços e recalcula somente as composições afetadas
+
+        Args:
+            precos_alterados: DataFrame com codigo_do_insumo e as colunas preco_xx
+                que mudaram (colunas ausentes mantêm o preço atual)
+
+        Returns:
+            Dict com 'linhas' (posições recalculadas), 'anterior' e 'atual'
+            (matrizes de custo dessas linhas) e 'delta' (DataFrame longo com
+            codigo_composicao, uf, custo_anterior, custo_atual, variacao)
+        """
+        precos_alterados = precos_alterados.drop_duplicates('codigo_do_insumo', keep='last')
+        linhas_insumo = self._definir_precos(precos_alterados)
+        linhas = self.afetadas_por(linhas_insumo)
+
+        anterior = self.custos_de(linhas)
+        self._avaliar(linhas)
+        atual = self.custos_de(linhas)
+
+        mudou = ~((anterior == atual) | (np.isnan(anterior) & np.isnan(atual)))
+        i, j = np.nonzero(mudou)
+        delta = pd.DataFrame({
+            'codigo_composicao': self.composicoes[linhas[i]],
+            'uf': np.array(ESTADOS)[j],
+            'custo_anterior': anterior[i, j],
+            'custo_atual': atual[i, j],
+            'variacao': atual[i, j] - anterior[i, j],
+        })
+
+        logging.info(
+            f"Recalculadas {len(linhas)} de {len(self.composicoes)} composições "
+            f"para {len(linhas_insumo)} insumo(s) alterado(s); {len(delta)} custo(s) mudaram")
+        return {'linhas': linhas, 'anterior': anterior, 'atual': atual, 'delta': delta}
+
+
+def calcular_custos(coeficientes: pd.DataFrame, precos_insumos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula o custo de todas as composições para as 27 UFs
+
+    Args:
+        coeficientes: DataFrame com codigo_composicao, codigo_item, coeficiente
+            e opcionalmente tipo_item (INSUMO/COMPOSICAO)
+        precos_insumos: DataFrame com codigo_do_insumo e colunas preco_xx
+
+    Returns:
+        DataFrame indexado por codigo_composicao com colunas custo_xx (NaN
+        na UF em que falta preço de algum insumo necessário) e 'incompleta'
+        (True se isso ocorre em alguma UF)
+
+    Raises:
+        ValueError: Se houver ciclo entre composições
+    """
+    return MotorCustos(coeficientes, precos_insumos).custos
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Custo de composições SINAPI por UF")
+    parser.add_argument('coeficientes', help="CSV de coeficientes composição → item")
+    parser.add_argument('insumos', help="CSV de preços de insumos do SINAPI")
+    parser.add_argument('--saida', default='custos_composicoes_sinapi.csv')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from importar_sinapi import (ler_csv_sinapi, limpar_nomes_colunas,
+                                 mapear_colunas_sinapi, processar_dados_sinapi)
+
+    try:
+        coeficientes = normalizar_coeficientes(ler_csv_sinapi(args.coeficientes))
+        df_insumos = limpar_nomes_colunas(ler_csv_sinapi(args.insumos))
+        precos = processar_dados_sinapi(df_insumos, mapear_colunas_sinapi(df_insumos))
+
+        custos = calcular_custos(coeficientes, precos)
+        custos.to_csv(args.saida)
+        logging.info(
+            f"Custos salvos em: {args.saida} ({int(custos['incompleta'].sum())} incompletas)")
+    except Exception as e:
+        logging.error(f"Erro ao calcular custos: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
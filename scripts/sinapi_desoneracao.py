@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Comparação de Regimes de Desoneração para Orçamentos
+====================================================
+
+Sobre a saída de transform_data (import_sinapi_composicoes_mao_obra.py),
+com preco_sem_xx e preco_com_xx para as 27 UFs, compara os dois regimes
+sem a comparação manual item a item:
+
+- Deltas COM − SEM por composição e UF em matrizes código × UF
+- Orçamentos inteiros avaliados nos dois regimes e em todas as UFs de uma
+  vez (matriz esparsa orçamentos × composições multiplicada pelas matrizes
+  de preço)
+- Regime mais barato por orçamento e UF, com totais, economia e itens sem
+  preço (que tornam a comparação incompleta)
+
+Uso:
+    python scripts/sinapi_desoneracao.py <mao_de_obra.xlsx|.zip> <itens.csv>
+        [--uf SP RJ] [--saida regimes.csv]
+
+    itens.csv: codigo_composicao, quantidade e, opcionalmente, orcamento_id
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from sinapi_dtypes import ESTADOS, restaurar_precos
+
+COLUNAS_SEM = [f'preco_sem_{estado.lower()}' for estado in ESTADOS]
+COLUNAS_COM = [f'preco_com_{estado.lower()}' for estado in ESTADOS]
+
+
+class ComparadorRegimes:
+    """Preços SEM/COM desoneração em matrizes composição × UF"""
+
+    def __init__(self, composicoes: pd.DataFrame):
+        """
+        Args:
+            composicoes: Saída de transform_data (codigo_composicao,
+                preco_sem_xx e preco_com_xx)
+        """
+        composicoes = restaurar_precos(composicoes.drop_duplicates('codigo_composicao', keep='last'))
+        codigos = composicoes['codigo_composicao'].astype(str).str.strip().to_numpy()
+        ordem = np.argsort(codigos, kind='stable')
+        self.codigos = codigos[ordem]
+
+        def matriz(colunas: List[str]) -> np.ndarray:
+            valores = np.full((len(composicoes), len(ESTADOS)), np.nan)
+            for j, coluna in enumerate(colunas):
+                if coluna in composicoes.columns:
+                    valores[:, j] = pd.to_numeric(composicoes[coluna], errors='coerce')
+            return valores[ordem]
+
+        self.sem = matriz(COLUNAS_SEM)
+        self.com = matriz(COLUNAS_COM)
+        self.delta = self.com - self.sem
+
+    def deltas(self) -> pd.DataFrame:
+        """Delta COM − SEM por composição e UF (formato longo, só células com os dois preços)"""
+        linhas, ufs = np.nonzero(~np.isnan(self.delta))
+        sem = self.sem[linhas, ufs]
+        return pd.DataFrame({
+            'codigo_composicao': self.codigos[linhas],
+            'uf': np.array(ESTADOS)[ufs],
+            'preco_sem': sem,
+            'preco_com': self.com[linhas, ufs],
+            'delta': self.delta[linhas, ufs],
+            'delta_percentual': np.where(sem != 0, self.delta[linhas, ufs] / sem * 100, np.nan),
+        })
+
+    def avaliar(self, itens: pd.DataFrame, ufs: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Avalia orçamentos nos dois regimes e recomenda o mais barato por UF
+
+        Args:
+            itens: codigo_composicao, quantidade e, opcionalmente, orcamento_id
+                (sem ele, todos os itens formam um único orçamento)
+            ufs: UFs a avaliar (padrão: as 27)
+
+        Returns:
+            DataFrame com orcamento_id, uf, total_sem, total_com, economia
+            (valor poupado no regime recomendado), regime_recomendado
+            ('sem', 'com' ou None se incompleto), itens_sem_preco e
+            itens_desconhecidos
+        """
+        codigos = itens['codigo_composicao'].astype(str).str.strip().to_numpy()
+        posicoes = np.searchsorted(self.codigos, codigos).clip(max=max(len(self.codigos) - 1, 0))
+        conhecidos = (self.codigos[posicoes] == codigos) if len(self.codigos) else \
+            np.zeros(len(codigos), dtype=bool)
+        quantidades = pd.to_numeric(itens['quantidade'], errors='coerce').fillna(0).to_numpy(np.float64)
+
+        orcamento_ids = (itens['orcamento_id'].to_numpy() if 'orcamento_id' in itens.columns
+                         else np.zeros(len(itens), dtype=np.int64))
+        orcamentos, orcamento = np.unique(orcamento_ids, return_inverse=True)
+
+        # Orçamentos × composições (itens repetidos somam as quantidades)
+        q = sparse.csr_matrix(
+            (quantidades[conhecidos], (orcamento[conhecidos], posicoes[conhecidos])),
+            shape=(len(orcamentos), len(self.codigos)))
+        presenca = q.copy()
+        presenca.data = np.ones_like(presenca.data)
+
+        colunas = (np.arange(len(ESTADOS)) if ufs is None
+                   else pd.Index(ESTADOS).get_indexer([u.upper() for u in ufs]))
+        if (colunas < 0).any():
+            raise ValueError(f"UF inválida em {list(ufs)}")
+
+        sem, com = self.sem[:, colunas], self.com[:, colunas]
+        total_sem = np.asarray(q @ np.nan_to_num(sem))
+        total_com = np.asarray(q @ np.nan_to_num(com))
+        sem_preco = np.asarray(presenca @ (np.isnan(sem) | np.isnan(com)).astype(np.float64))
+        desconhecidos = np.bincount(orcamento[~conhecidos], minlength=len(orcamentos))
+
+        completo = sem_preco == 0
+        recomendado = np.where(total_com < total_sem, 'com', 'sem').astype(object)
+        recomendado[~completo] = None
+
+        n_ufs = len(colunas)
+        resultado = pd.DataFrame({
+            'orcamento_id': np.repeat(orcamentos, n_ufs),
+            'uf': np.tile(np.array(ESTADOS)[colunas], len(orcamentos)),
+            'total_sem': total_sem.ravel(),
+            'total_com': total_com.ravel(),
+            'economia': np.abs(total_sem - total_com).ravel(),
+            'regime_recomendado': recomendado.ravel(),
+            'itens_sem_preco': sem_preco.ravel().astype(np.int64),
+            'itens_desconhecidos': np.repeat(desconhecidos, n_ufs),
+        })
+        return resultado
+
+    def resumo(self, avaliacao: pd.DataFrame) -> pd.DataFrame:
+        """Recomendação agregada por UF: totais somados dos orçamentos completos"""
+        completos = avaliacao[avaliacao['regime_recomendado'].notna()]
+        por_uf = completos.groupby('uf', sort=False).agg(
+            orcamentos=('orcamento_id', 'size'),
+            total_sem=('total_sem', 'sum'),
+            total_com=('total_com', 'sum'),
+            orcamentos_com=('regime_recomendado', lambda r: int((r == 'com').sum())),
+        ).reset_index()
+        por_uf['regime_recomendado'] = np.where(
+            por_uf['total_com'] < por_uf['total_sem'], 'com', 'sem')
+        por_uf['economia'] = (por_uf['total_sem'] - por_uf['total_com']).abs()
+        return por_uf
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Regime de desoneração mais barato por UF para orçamentos")
+    parser.add_argument('planilha', help="Planilha (ou ZIP) de composições de mão de obra")
+    parser.add_argument('itens', help="CSV com codigo_composicao, quantidade [, orcamento_id]")
+    parser.add_argument('--uf', nargs='+', default=None)
+    parser.add_argument('--saida', default='regimes_desoneracao.csv')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra
+    from importar_sinapi import ler_csv_sinapi
+
+    try:
+        comparador = ComparadorRegimes(carregar_mao_de_obra(args.planilha))
+        itens = ler_csv_sinapi(args.itens)
+
+        inicio = time.perf_counter()
+        avaliacao = comparador.avaliar(itens, args.uf)
+        resumo = comparador.resumo(avaliacao)
+        duracao = time.perf_counter() - inicio
+
+        avaliacao.to_csv(args.saida, index=False)
+        print(resumo.to_string(index=False))
+        logging.info(
+            f"{len(itens)} itens avaliados nos dois regimes em {duracao * 1000:.1f} ms; "
+            f"detalhe por orçamento em {args.saida}")
+    except Exception as e:
+        logging.error(f"Erro na comparação de regimes: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
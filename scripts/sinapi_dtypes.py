@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Plano de Tipos Compactos para os Importadores SINAPI
+====================================================
+
+Representação compacta compartilhada pelos três importadores
+(importar_sinapi.py, import_sinapi_composicoes_mao_obra.py e
+importar_sinapi_manutencoes.py).
+
+- Colunas de baixa cardinalidade (unidade, categoria, tipo, grupo,
+  mes_referencia...) viram categóricas
+- Códigos SINAPI viram inteiros nullable de 32 bits
+- Preços viram float32 quando isso não altera nenhum valor em centavos
+- Medição de memória antes/depois para o relatório da importação
+
+Autor: Equipe ObrasAI
+"""
+
+import logging
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+ESTADOS = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
+           'MG', 'MS', 'MT', 'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN',
+           'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+
+# Colunas (nomes do banco) com poucos valores distintos
+COLUNAS_CATEGORICAS = [
+    'unidade', 'categoria', 'tipo', 'tipo_manutencao', 'grupo',
+    'mes_referencia', 'data_referencia', 'fonte_dados', 'codigo_da_familia',
+]
+
+# Códigos SINAPI numéricos
+COLUNAS_CODIGO = ['codigo_sinapi']
+
+# Preços SINAPI são publicados em centavos
+CASAS_DECIMAIS_PRECO = 2
+
+
+def colunas_preco(df: pd.DataFrame) -> list:
+    """Lista as colunas de preço por UF (preco_xx, preco_sem_xx, preco_com_xx)"""
+    return [c for c in df.columns if str(c).startswith('preco_')]
+
+
+def uso_memoria(df: pd.DataFrame) -> int:
+    """Bytes ocupados pelo DataFrame, incluindo o conteúdo das strings"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compactar_precos(serie: pd.Series) -> pd.Series:
+    """
+    Converte preços para float32 se todos os valores estiverem em centavos e
+    voltarem idênticos ao serem restaurados; caso contrário mantém float64
+
+    Args:
+        serie: Série numérica de preços
+
+    Returns:
+        Série float32 ou a série original
+    """
+    if not pd.api.types.is_float_dtype(serie) or serie.dtype == np.float32:
+        return serie
+    valores = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+    reduzidos = valores.astype(np.float32)
+    em_centavos = np.round(valores, CASAS_DECIMAIS_PRECO) == valores
+    restauraveis = np.round(reduzidos.astype(
+        np.float64), CASAS_DECIMAIS_PRECO) == valores
+    if np.all((em_centavos & restauraveis) | np.isnan(valores)):
+        return pd.Series(reduzidos, index=serie.index, name=serie.name)
+    return serie
+
+
+def restaurar_preco(valor) -> Optional[float]:
+    """Converte um preço float32 de volta para o float exato em centavos"""
+    if valor is None or pd.isna(valor):
+        return None
+    return round(float(valor), CASAS_DECIMAIS_PRECO)
+
+
+def restaurar_precos(df: pd.DataFrame) -> pd.DataFrame:
+    """Volta as colunas float32 para float64 exato antes de serializar"""
+    colunas = [c for c in df.columns if df[c].dtype == np.float32]
+    if not colunas:
+        return df
+    df = df.copy()
+    df[colunas] = df[colunas].astype(np.float64).round(CASAS_DECIMAIS_PRECO)
+    return df
+
+
+def compactar_dataframe(
+    df: pd.DataFrame,
+    categoricas: Optional[Iterable[str]] = None,
+    codigos: Optional[Iterable[str]] = None,
+    precos: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Aplica o plano de tipos compactos às colunas presentes no DataFrame
+
+    Args:
+        df: DataFrame processado (ou planilha bruta, informando as colunas)
+        categoricas: Colunas para 'category' (padrão: COLUNAS_CATEGORICAS)
+        codigos: Colunas para Int32 nullable (padrão: COLUNAS_CODIGO)
+        precos: Colunas de preço (padrão: colunas preco_*)
+
+    Returns:
+        Novo DataFrame com tipos compactos
+    """
+    df = df.copy()
+    categoricas = COLUNAS_CATEGORICAS if categoricas is None else categoricas
+    codigos = COLUNAS_CODIGO if codigos is None else codigos
+    precos = colunas_preco(df) if precos is None else precos
+
+    for coluna in categoricas:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype('category')
+
+    for coluna in codigos:
+        if coluna in df.columns:
+            numerico = pd.to_numeric(df[coluna], errors='coerce')
+            # Só converte se nenhum código válido se perder na conversão
+            if numerico.notna().sum() == df[coluna].notna().sum():
+                df[coluna] = numerico.round().astype('Int32')
+
+    for coluna in precos:
+        if coluna in df.columns:
+            df[coluna] = compactar_precos(df[coluna])
+
+    return df
+
+
+def compactar_com_medicao(df: pd.DataFrame, rotulo: str, **kwargs) -> tuple:
+    """
+    Compacta o DataFrame e mede a economia de memória
+
+    Args:
+        df: DataFrame a compactar
+        rotulo: Nome usado no log
+        **kwargs: Repassados para compactar_dataframe
+
+    Returns:
+        Tuple com (DataFrame compactado, dict de medição)
+    """
+    antes = uso_memoria(df)
+    compactado = compactar_dataframe(df, **kwargs)
+    depois = uso_memoria(compactado)
+    medicao = {
+        'bytes_antes': antes,
+        'bytes_depois': depois,
+        'reducao_percentual': round((1 - depois / antes) * 100, 1) if antes else 0.0,
+    }
+    logging.info(
+        f"Memória {rotulo}: {antes / 1024**2:.2f} MB -> {depois / 1024**2:.2f} MB "
+        f"(-{medicao['reducao_percentual']}%)")
+    return compactado, medicao
+
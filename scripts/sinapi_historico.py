@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Histórico Mensal de Preços SINAPI em Arrays Mapeados em Memória
+===============================================================
+
+Análises de índice (tendência de preço por insumo e UF ao longo de 24+
+meses) exigiam buscar de volta no banco as linhas de cada mês. Cada
+importação passa a registrar o seu mês num armazenamento local colunar:
+
+    <diretorio>/<conjunto>/historico.json   meses, colunas, contagens e geração
+    <diretorio>/<conjunto>/codigos.<g>.u32  índice de códigos (crescente)
+    <diretorio>/<conjunto>/precos.<g>.f32   float32[meses, códigos, colunas]
+
+O eixo de meses é contínuo (mês sem importação fica NaN) e é o mais
+externo: registrar o mês seguinte com os mesmos códigos só acrescenta um
+bloco ao fim do arquivo, e reimportar um mês reescreve o próprio bloco.
+Códigos novos ou meses anteriores ao início gravam uma geração nova de
+arquivos ao lado da atual; a troca do historico.json é o único ponto de
+confirmação (uma queda antes dela deixa a geração anterior intacta) e os
+arquivos de gerações não confirmadas são apagados na abertura seguinte.
+Históricos antigos sem geração usam codigos.u32 e precos.f32.
+
+As colunas são as preco_* de sinapi_insumos, ou preco_sem_* e preco_com_*
+da mão de obra (CONJUNTOS de sinapi_shards.py); preço ausente é NaN.
+
+As consultas são visões numpy do arquivo mapeado, sem rede, e os cálculos
+(média móvel, variação acumulada, tendência por mínimos quadrados) são
+vetorizados sobre o catálogo inteiro de uma vez.
+
+Uso:
+    python scripts/sinapi_historico.py --registrar insumos.csv [--mes 2025-04]
+    python scripts/sinapi_historico.py --resumo
+    python scripts/sinapi_historico.py --tendencia --uf SP --inicio 2024-01 [--top 20]
+    python scripts/sinapi_historico.py --serie 88316 --uf SP [--janela 3]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from sinapi_dtypes import ESTADOS
+from sinapi_particoes import normalizar_mes
+from sinapi_shards import CONJUNTOS, MAXIMO_CODIGO
+
+VERSAO = 1
+ARQUIVO_META = 'historico.json'
+ARQUIVO_CODIGOS = 'codigos.u32'
+ARQUIVO_PRECOS = 'precos.f32'
+DIRETORIO_PADRAO = 'historico'
+
+
+def _ordinal(mes: str) -> int:
+    """'AAAA-MM[-DD]' -> meses desde o ano 0 (diferença de ordinais = meses)"""
+    return int(mes[:4]) * 12 + int(mes[5:7]) - 1
+
+
+def _texto_mes(ordinal: int) -> str:
+    return f'{ordinal // 12:04d}-{ordinal % 12 + 1:02d}'
+
+
+def colunas_do_conjunto(conjunto: str) -> List[str]:
+    """Colunas de preço do conjunto, regime a regime, na ordem de ESTADOS"""
+    _, regimes = CONJUNTOS[conjunto]
+    return [f'{prefixo}{uf.lower()}' for prefixo in regimes.values() for uf in ESTADOS]
+
+
+def matriz_do_mes(dados: pd.DataFrame, conjunto: str):
+    """
+    Códigos (ordenados, únicos) e matriz float32[códigos, colunas] de um mês
+
+    Código repetido: vale a última linha, como nos shards.
+    """
+    coluna_codigo, _ = CONJUNTOS[conjunto]
+    colunas = colunas_do_conjunto(conjunto)
+    codigos = pd.to_numeric(dados[coluna_codigo].astype(str).str.strip(), errors='coerce')
+    validos = codigos.notna() & (codigos >= 0) & (codigos <= MAXIMO_CODIGO)
+    if not validos.all():
+        logging.warning(f"Histórico {conjunto}: {int((~validos).sum())} código(s) não numérico(s) ignorado(s)")
+
+    base = dados[validos].assign(_codigo=codigos[validos].astype(np.uint32))
+    base = base.drop_duplicates('_codigo', keep='last').sort_values('_codigo', kind='stable')
+    matriz = np.full((len(base), len(colunas)), np.nan, dtype=np.float32)
+    for j, coluna in enumerate(colunas):
+        if coluna in base:
+            matriz[:, j] = pd.to_numeric(base[coluna], errors='coerce').to_numpy(np.float32)
+    return base['_codigo'].to_numpy(np.uint32), matriz
+
+
+def media_movel(valores: np.ndarray, janela: int) -> np.ndarray:
+    """
+    Média móvel de `janela` meses no eixo 0; NaN até haver `janela` meses
+    seguidos com preço
+    """
+    if janela < 1:
+        raise ValueError("janela precisa ser ao menos 1")
+    presentes = ~np.isnan(valores)
+    soma = np.cumsum(np.where(presentes, valores, 0), axis=0, dtype=np.float64)
+    contagem = np.cumsum(presentes, axis=0, dtype=np.int32)
+    resultado = np.full(valores.shape, np.nan, dtype=np.float32)
+    if len(valores) >= janela:
+        # Soma e contagem da janela terminando em cada mês (diferença de prefixos)
+        total, n = soma[janela - 1:], contagem[janela - 1:]
+        total[1:] -= soma[:-janela]
+        n[1:] -= contagem[:-janela]
+        np.divide(total, janela, out=resultado[janela - 1:], where=n == janela, casting='same_kind')
+    return resultado
+
+
+def variacao_acumulada(valores: np.ndarray) -> np.ndarray:
+    """Variação (%) de cada mês sobre o primeiro mês com preço da série"""
+    presentes = ~np.isnan(valores)
+    primeiro = np.argmax(presentes, axis=0)[np.newaxis]
+    base = np.take_along_axis(valores, primeiro, axis=0).astype(np.float64)
+    base[base == 0] = np.nan
+    with np.errstate(invalid='ignore'):
+        return ((valores / base - 1) * 100).astype(np.float32)
+
+
+def tendencia(valores: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Reta de mínimos quadrados de cada série no eixo 0 (meses com preço)
+
+    Returns:
+        Dict com inclinacao (R$/mês), variacao_mensal_pct (inclinação sobre
+        a média da série) e observacoes, cada um no formato valores.shape[1:]
+    """
+    presentes = ~np.isnan(valores)
+    # Somas ponderadas pelo mês como produto matriz-vetor sobre o eixo 0
+    x = np.arange(len(valores), dtype=np.float64)
+    p = presentes.astype(np.float64)
+    y = np.where(presentes, valores, 0).astype(np.float64)
+    n = p.sum(axis=0)
+    sx = np.tensordot(x, p, axes=(0, 0))
+    sxx = np.tensordot(x * x, p, axes=(0, 0))
+    sy = y.sum(axis=0)
+    sxy = np.tensordot(x, y, axes=(0, 0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        divisor = n * sxx - sx * sx
+        inclinacao = np.where(divisor > 0, (n * sxy - sx * sy) / divisor, np.nan)
+        media = sy / n
+        percentual = np.where(media != 0, inclinacao / media * 100, np.nan)
+    return {'inclinacao': inclinacao, 'variacao_mensal_pct': percentual,
+            'observacoes': n.astype(np.int32)}
+
+
+@dataclass
+class Recorte:
+    """Cubo meses × códigos × colunas de uma consulta (visão do arquivo quando possível)"""
+    meses: List[str]
+    codigos: np.ndarray
+    colunas: List[str]
+    valores: np.ndarray
+
+    def media_movel(self, janela: int) -> np.ndarray:
+        return media_movel(self.valores, janela)
+
+    def variacao_acumulada(self) -> np.ndarray:
+        return variacao_acumulada(self.valores)
+
+    def tendencia(self, minimo_observacoes: int = 2) -> pd.DataFrame:
+        """Tendência de cada par código × coluna com ao menos `minimo_observacoes` meses"""
+        resultado = tendencia(self.valores)
+        linhas, colunas = np.nonzero(resultado['observacoes'] >= max(minimo_observacoes, 2))
+        return pd.DataFrame({
+            'codigo': self.codigos[linhas],
+            'coluna': np.asarray(self.colunas, dtype=object)[colunas],
+            'inclinacao': resultado['inclinacao'][linhas, colunas],
+            'variacao_mensal_pct': resultado['variacao_mensal_pct'][linhas, colunas],
+            'observacoes': resultado['observacoes'][linhas, colunas],
+        })
+
+
+class HistoricoPrecos:
+    """
+    Histórico mensal de um conjunto, mapeado em memória (somente leitura
+    nas consultas; registrar() grava e reabre)
+
+    Exemplo:
+        historico = HistoricoPrecos('historico')
+        recorte = historico.serie(uf='SP', inicio='2024-01')
+        medias = recorte.media_movel(3)
+    """
+
+    def __init__(self, diretorio: str = DIRETORIO_PADRAO, conjunto: str = 'insumos'):
+        self.conjunto = conjunto
+        self.diretorio = Path(diretorio) / conjunto
+        self.colunas = colunas_do_conjunto(conjunto)
+        self._abrir()
+
+    def _arquivos(self, geracao: int) -> Tuple[Path, Path]:
+        """Caminhos de codigos e precos de uma geração (0: nomes sem geração)"""
+        if not geracao:
+            return self.diretorio / ARQUIVO_CODIGOS, self.diretorio / ARQUIVO_PRECOS
+        codigos, precos = Path(ARQUIVO_CODIGOS), Path(ARQUIVO_PRECOS)
+        return (self.diretorio / f'{codigos.stem}.{geracao}{codigos.suffix}',
+                self.diretorio / f'{precos.stem}.{geracao}{precos.suffix}')
+
+    def _abrir(self):
+        caminho = self.diretorio / ARQUIVO_META
+        self.meta: Dict[str, Any] = (json.loads(caminho.read_text(encoding='utf-8'))
+                                     if caminho.exists() else {})
+        if self.meta and (self.meta.get('versao') != VERSAO or self.meta.get('colunas') != self.colunas):
+            raise ValueError(f"{caminho}: histórico de outra versão ou com outras colunas")
+        self.arquivo_codigos, self.arquivo_precos = self._arquivos(self.meta.get('geracao', 0))
+        self._descartar_geracoes()
+
+        n_meses, n_codigos = self.meta.get('meses', 0), self.meta.get('codigos', 0)
+        forma = (n_meses, n_codigos, len(self.colunas))
+        if n_meses and n_codigos:
+            # Códigos conferem antes de qualquer reparo em precos
+            if self.arquivo_codigos.stat().st_size != 4 * n_codigos:
+                raise ValueError(f"{self.arquivo_codigos}: tamanho não confere com {caminho}")
+            self._reparar_acrescimo(4 * n_meses * n_codigos * len(self.colunas))
+            self.codigos = np.memmap(self.arquivo_codigos, dtype='<u4', mode='r', shape=(n_codigos,))
+            self.precos = np.memmap(self.arquivo_precos, dtype='<f4', mode='r', shape=forma)
+        else:
+            self.codigos = np.empty(0, dtype=np.uint32)
+            self.precos = np.empty(forma, dtype=np.float32)
+
+    def _descartar_geracoes(self):
+        """Apaga arquivos de gerações que não são a confirmada no historico.json"""
+        if not self.diretorio.is_dir():
+            return
+        atuais = {self.arquivo_codigos.name, self.arquivo_precos.name}
+        for nome in (ARQUIVO_CODIGOS, ARQUIVO_PRECOS):
+            base = Path(nome)
+            for arquivo in self.diretorio.glob(f'{base.stem}*{base.suffix}'):
+                if arquivo.name not in atuais:
+                    logging.warning(f"{arquivo}: geração não confirmada em {ARQUIVO_META}; removido")
+                    arquivo.unlink()
+
+    def _reparar_acrescimo(self, esperado: int):
+        """
+        O acréscimo grava o bloco no fim de precos antes dos metadados: se o
+        processo cair entre os dois, o arquivo fica maior que o esperado e o
+        bloco (ainda não registrado) é descartado aqui
+
+        Raises:
+            ValueError: Se o arquivo for menor que o esperado pelos metadados
+        """
+        arquivo = self.arquivo_precos
+        tamanho = arquivo.stat().st_size
+        if tamanho > esperado:
+            logging.warning(f"{arquivo}: acréscimo interrompido ({tamanho - esperado} bytes além de "
+                            f"{ARQUIVO_META}); bloco descartado")
+            os.truncate(arquivo, esperado)
+        elif tamanho < esperado:
+            raise ValueError(f"{arquivo}: tamanho não confere com {self.diretorio / ARQUIVO_META}")
+
+    def fechar(self):
+        # Solta os mapas antes de trocar os arquivos
+        self.codigos = self.precos = None
+
+    @property
+    def vazio(self) -> bool:
+        return not self.meta.get('meses')
+
+    @property
+    def meses(self) -> List[str]:
+        """Eixo de meses 'AAAA-MM' (contínuo)"""
+        if self.vazio:
+            return []
+        inicio = _ordinal(self.meta['mes_inicial'])
+        return [_texto_mes(inicio + i) for i in range(self.meta['meses'])]
+
+    def _gravar_meta(self, mes_inicial: str, n_meses: int, n_codigos: int, registrados: Iterable[str],
+                     geracao: int):
+        self.meta = {
+            'versao': VERSAO, 'conjunto': self.conjunto, 'colunas': self.colunas,
+            'geracao': geracao, 'mes_inicial': mes_inicial, 'meses': n_meses, 'codigos': n_codigos,
+            'registrados': sorted(set(registrados)),
+            'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+        }
+        temporario = self.diretorio / (ARQUIVO_META + '.tmp')
+        temporario.write_text(json.dumps(self.meta, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(temporario, self.diretorio / ARQUIVO_META)
+
+    def registrar(self, dados: pd.DataFrame, mes_referencia: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Grava (ou substitui) o mês de uma importação
+
+        Args:
+            dados: processar_dados_sinapi (insumos) ou transform_data (mão de obra)
+            mes_referencia: Mês dos dados (padrão: o mais frequente em mes_referencia)
+
+        Returns:
+            Dict com mes, codigos, codigos_novos, modo ('acrescimo',
+            'substituicao' ou 'reescrita'), bytes e duracao_s
+        """
+        inicio = time.perf_counter()
+        if mes_referencia is None:
+            mes_referencia = dados['mes_referencia'].astype(str).mode().iloc[0]
+        mes = normalizar_mes(mes_referencia)[:7]
+        codigos, matriz = matriz_do_mes(dados, self.conjunto)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+
+        ordinal = _ordinal(mes)
+        registrados = self.meta.get('registrados', []) + [mes]
+        geracao = self.meta.get('geracao', 0)
+        novos = int((~np.isin(codigos, self.codigos)).sum())
+        if not self.vazio:
+            primeiro = _ordinal(self.meta['mes_inicial'])
+            ultimo = primeiro + self.meta['meses'] - 1
+
+        if not self.vazio and not novos and ordinal >= primeiro:
+            # Mesmos códigos: só o bloco do mês muda (ou entra no fim do arquivo)
+            bloco = np.full((len(self.codigos), len(self.colunas)), np.nan, dtype='<f4')
+            bloco[np.searchsorted(self.codigos, codigos)] = matriz
+            if ordinal <= ultimo:
+                modo = 'substituicao'
+                mapa = np.memmap(self.arquivo_precos, dtype='<f4', mode='r+',
+                                 shape=self.precos.shape)
+                mapa[ordinal - primeiro] = bloco
+                mapa.flush()
+                del mapa
+                n_meses = self.meta['meses']
+            else:
+                # Bloco no fim do arquivo e depois os metadados; uma queda entre
+                # os dois é reparada no próximo _abrir
+                modo = 'acrescimo'
+                lacuna = np.full((ordinal - ultimo - 1,) + bloco.shape, np.nan, dtype='<f4')
+                with open(self.arquivo_precos, 'ab') as arquivo:
+                    arquivo.write(lacuna.tobytes())
+                    arquivo.write(bloco.tobytes())
+                n_meses = ordinal - primeiro + 1
+            mes_inicial, n_codigos = self.meta['mes_inicial'], len(self.codigos)
+        else:
+            # Códigos novos ou mês antes do início: geração nova de arquivos ao
+            # lado da atual; só passa a valer quando historico.json apontar para ela
+            modo = 'reescrita'
+            geracao += 1
+            arquivo_codigos, arquivo_precos = self._arquivos(geracao)
+            todos = np.union1d(self.codigos, codigos).astype('<u4')
+            novo_primeiro = ordinal if self.vazio else min(primeiro, ordinal)
+            novo_ultimo = ordinal if self.vazio else max(ultimo, ordinal)
+            n_meses, n_codigos = novo_ultimo - novo_primeiro + 1, len(todos)
+            mapa = np.memmap(arquivo_precos, dtype='<f4', mode='w+',
+                             shape=(n_meses, n_codigos, len(self.colunas)))
+            mapa[:] = np.nan
+            if not self.vazio:
+                deslocamento = primeiro - novo_primeiro
+                posicoes = np.searchsorted(todos, self.codigos)
+                for i in range(self.meta['meses']):
+                    mapa[deslocamento + i, posicoes] = self.precos[i]
+            mapa[ordinal - novo_primeiro, np.searchsorted(todos, codigos)] = matriz
+            mapa.flush()
+            del mapa
+            arquivo_codigos.write_bytes(todos.tobytes())
+            self.fechar()
+            mes_inicial = _texto_mes(novo_primeiro)
+
+        # Ponto de confirmação; _abrir apaga a geração anterior
+        self._gravar_meta(mes_inicial, n_meses, n_codigos, registrados, geracao)
+        self._abrir()
+        resultado = {'conjunto': self.conjunto, 'mes': mes, 'codigos': int(len(codigos)),
+                     'codigos_novos': novos, 'modo': modo, 'meses': n_meses,
+                     'bytes': int(self.precos.nbytes), 'duracao_s': round(time.perf_counter() - inicio, 3)}
+        logging.info(f"Histórico {self.conjunto}: {mes} registrado ({modo}, {len(codigos)} códigos, "
+                     f"{novos} novo(s)); {n_meses} mês(es) × {n_codigos} códigos")
+        return resultado
+
+    def _indices_colunas(self, uf: Union[str, Sequence[str], None], regime: Optional[str]) -> List[int]:
+        if uf is None:
+            if regime is None:
+                return list(range(len(self.colunas)))
+            ufs = ESTADOS
+        else:
+            ufs = [uf] if isinstance(uf, str) else list(uf)
+        regimes = CONJUNTOS[self.conjunto][1]
+        prefixos = [regimes[regime]] if regime is not None else list(regimes.values())[:1]
+        try:
+            return [self.colunas.index(f'{p}{u.lower()}') for p in prefixos for u in ufs]
+        except (ValueError, KeyError):
+            raise ValueError(f"UF ou regime inválido: {uf!r} / {regime!r}") from None
+
+    def serie(self, codigos: Optional[Iterable[int]] = None, uf: Union[str, Sequence[str], None] = None,
+              regime: Optional[str] = None, inicio: Optional[str] = None,
+              fim: Optional[str] = None) -> Recorte:
+        """
+        Recorte do histórico; sem filtros, é uma visão do arquivo mapeado
+
+        Args:
+            codigos: Códigos (ausentes no histórico viram séries NaN); padrão: todos
+            uf: UF ou lista de UFs; padrão: todas as colunas
+            regime: 'sem' ou 'com' na mão de obra (padrão com uf: o primeiro)
+            inicio: Primeiro mês (AAAA-MM), inclusive
+            fim: Último mês (AAAA-MM), inclusive
+        """
+        meses = self.meses
+        if not meses:
+            return Recorte([], np.empty(0, dtype=np.uint32), [], np.empty((0, 0, 0), dtype=np.float32))
+        base = _ordinal(meses[0])
+        de = max(_ordinal(normalizar_mes(inicio)) - base, 0) if inicio else 0
+        ate = min(_ordinal(normalizar_mes(fim)) - base + 1, len(meses)) if fim else len(meses)
+        valores = self.precos[de:max(ate, de)]
+
+        if codigos is None:
+            selecionados = np.asarray(self.codigos)
+        else:
+            selecionados = np.asarray(list(codigos), dtype=np.int64)
+            posicoes = np.minimum(np.searchsorted(self.codigos, selecionados), max(len(self.codigos) - 1, 0))
+            achados = (self.codigos[posicoes] == selecionados) if len(self.codigos) else \
+                np.zeros(len(selecionados), dtype=bool)
+            cubo = np.full((len(valores), len(selecionados), len(self.colunas)), np.nan, dtype=np.float32)
+            cubo[:, achados] = valores[:, posicoes[achados]]
+            valores = cubo
+
+        indices = self._indices_colunas(uf, regime)
+        if len(indices) != len(self.colunas):
+            valores = valores[:, :, indices]
+        return Recorte(meses[de:max(ate, de)], selecionados, [self.colunas[i] for i in indices], valores)
+
+    def resumo(self) -> Dict[str, Any]:
+        return {'conjunto': self.conjunto, 'periodo': self.meses[:1] + self.meses[-1:],
+                'registrados': self.meta.get('registrados', []),
+                'codigos': int(len(self.codigos)), 'colunas': len(self.colunas),
+                'bytes': int(self.precos.nbytes)}
+
+
+def registrar_importacao(diretorio: str, dados: pd.DataFrame, conjunto: str = 'insumos',
+                         mes_referencia: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Registra cada mês de referência de uma importação no histórico do conjunto"""
+    historico = HistoricoPrecos(diretorio, conjunto)
+    if mes_referencia is not None or 'mes_referencia' not in dados:
+        return [historico.registrar(dados, mes_referencia)]
+    meses = dados['mes_referencia'].astype(str)
+    return [historico.registrar(grupo, mes) for mes, grupo in dados.groupby(meses, sort=True)]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Histórico mensal de preços SINAPI (mapeado em memória)")
+    parser.add_argument('--diretorio', default=DIRETORIO_PADRAO)
+    parser.add_argument('--conjunto', choices=sorted(CONJUNTOS), default='insumos')
+    parser.add_argument('--registrar', metavar='ARQUIVO', help="CSV/planilha (ou ZIP) a registrar")
+    parser.add_argument('--mes', help="Mês do arquivo registrado (AAAA-MM)")
+    parser.add_argument('--resumo', action='store_true')
+    parser.add_argument('--tendencia', action='store_true', help="Maiores tendências de alta no período")
+    parser.add_argument('--serie', type=int, nargs='+', metavar='CODIGO',
+                        help="Preço, média móvel e variação acumulada de códigos")
+    parser.add_argument('--uf', help="UF das consultas (padrão: todas)")
+    parser.add_argument('--regime', choices=['sem', 'com'], help="Regime (mão de obra)")
+    parser.add_argument('--inicio', help="Primeiro mês (AAAA-MM)")
+    parser.add_argument('--fim', help="Último mês (AAAA-MM)")
+    parser.add_argument('--janela', type=int, default=3, help="Meses da média móvel")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+    if not (args.registrar or args.resumo or args.tendencia or args.serie):
+        parser.error("informe --registrar, --resumo, --tendencia ou --serie")
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.registrar:
+        if args.conjunto == 'insumos':
+            from importar_sinapi import carregar_dados_sinapi
+            dados = carregar_dados_sinapi(args.registrar, mes_referencia=args.mes)
+        else:
+            from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra
+            dados = carregar_mao_de_obra(args.registrar, args.mes)
+        registrar_importacao(args.diretorio, dados, args.conjunto, args.mes)
+
+    historico = HistoricoPrecos(args.diretorio, args.conjunto)
+    if args.resumo:
+        print(json.dumps(historico.resumo(), indent=2, ensure_ascii=False))
+
+    if args.tendencia:
+        inicio = time.perf_counter()
+        recorte = historico.serie(uf=args.uf, regime=args.regime, inicio=args.inicio, fim=args.fim)
+        tabela = recorte.tendencia()
+        duracao = time.perf_counter() - inicio
+        print(tabela.nlargest(args.top, 'variacao_mensal_pct').to_string(index=False))
+        print(f"{len(tabela)} série(s) de {len(recorte.meses)} mês(es) em {duracao * 1000:.0f} ms")
+
+    if args.serie:
+        recorte = historico.serie(args.serie, uf=args.uf or 'SP', regime=args.regime,
+                                  inicio=args.inicio, fim=args.fim)
+        medias, variacao = recorte.media_movel(args.janela), recorte.variacao_acumulada()
+        for j, codigo in enumerate(recorte.codigos):
+            print(f"{codigo} {recorte.colunas[0]}")
+            for i, mes in enumerate(recorte.meses):
+                print(f"  {mes}  {recorte.valores[i, j, 0]:>12.2f}  "
+                      f"média {args.janela}m {medias[i, j, 0]:>12.2f}  acumulada {variacao[i, j, 0]:>8.2f}%")
+
+
+if __name__ == "__main__":
+    main()
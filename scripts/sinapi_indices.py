@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Carga em Massa sem Índices Secundários
+======================================
+
+Numa recarga completa de sinapi_insumos ou sinapi_manutencoes, cada linha
+inserida atualiza todos os índices secundários, e o planner segue com
+estatísticas velhas até o autovacuum rodar. No modo de carga em massa:
+
+1. As definições dos índices secundários (pg_get_indexdef) são gravadas em
+   um JSON de backup e os índices são removidos
+2. A carga roda sem manutenção de índices
+3. Os índices são recriados e a tabela passa por ANALYZE. A RPC
+   execute_sql roda dentro de uma transação, onde CREATE INDEX CONCURRENTLY
+   é recusado: o CREATE INDEX comum é o padrão e CONCURRENTLY fica como
+   opção para uma RPC que rode fora de transação
+4. Tempos de cada fase e estatísticas antes/depois vão para o relatório
+
+Chave primária, índices de constraints e índices UNIQUE não são tocados:
+removê-los mudaria a semântica da carga.
+
+Uso (recuperação manual se a carga for interrompida):
+    python scripts/sinapi_indices.py listar <tabela>
+    python scripts/sinapi_indices.py restaurar <indices_tabela.json> [--concorrente]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CONSULTA_INDICES = """
+SELECT i.relname AS indexname, pg_get_indexdef(i.oid) AS indexdef
+FROM pg_index x
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = 'public'
+AND t.relname = '{tabela}'
+AND NOT x.indisprimary
+AND NOT x.indisunique
+AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+ORDER BY i.relname;
+"""
+
+CONSULTA_ESTATISTICAS = """
+SELECT n_live_tup, n_dead_tup, last_analyze, last_autoanalyze,
+       pg_indexes_size(relid) AS tamanho_indices
+FROM pg_stat_user_tables
+WHERE schemaname = 'public' AND relname = '{tabela}';
+"""
+
+_NOME_VALIDO = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def _validar_nome(nome: str) -> str:
+    """Nomes vão interpolados no SQL: aceita só identificadores simples"""
+    if not _NOME_VALIDO.match(nome):
+        raise ValueError(f"Nome de tabela/índice inválido: {nome!r}")
+    return nome
+
+
+def executar_sql(supabase, query: str) -> List[Dict[str, Any]]:
+    """Executa SQL pela RPC execute_sql e devolve as linhas"""
+    return supabase.rpc('execute_sql', {'query': query}).execute().data or []
+
+
+def listar_indices_secundarios(supabase, tabela: str) -> List[Dict[str, str]]:
+    """Definições (indexname, indexdef) dos índices removíveis da tabela"""
+    return [
+        {'indexname': linha['indexname'], 'indexdef': linha['indexdef']}
+        for linha in executar_sql(
+            supabase, CONSULTA_INDICES.format(tabela=_validar_nome(tabela)))
+    ]
+
+
+def estatisticas_tabela(supabase, tabela: str) -> Dict[str, Any]:
+    """Linhas vivas/mortas, último ANALYZE e tamanho dos índices"""
+    try:
+        linhas = executar_sql(
+            supabase, CONSULTA_ESTATISTICAS.format(tabela=_validar_nome(tabela)))
+    except Exception as e:
+        logging.warning(f"Estatísticas de {tabela} indisponíveis: {e}")
+        return {}
+    return linhas[0] if linhas else {}
+
+
+def _definicao_concorrente(indexdef: str) -> str:
+    """CREATE INDEX nome ON ... -> CREATE INDEX CONCURRENTLY nome ON ..."""
+    return re.sub(r'^CREATE INDEX ', 'CREATE INDEX CONCURRENTLY ', indexdef, count=1)
+
+
+def recriar_indices(supabase, definicoes: List[Dict[str, str]],
+                    concorrente: bool = False) -> List[Dict[str, Any]]:
+    """
+    Recria os índices a partir das definições gravadas
+
+    Cada índice é removido antes de ser criado: um CREATE INDEX CONCURRENTLY
+    interrompido deixa um índice INVALID com o mesmo nome, que um
+    CREATE INDEX IF NOT EXISTS manteria no lugar do índice bom. Na
+    restauração de um índice que ainda existe, ele é reconstruído.
+
+    Args:
+        supabase: Cliente Supabase
+        definicoes: Lista de {indexname, indexdef}
+        concorrente: Tenta CONCURRENTLY primeiro (só funciona numa RPC fora
+            de transação); na primeira recusa segue sem CONCURRENTLY
+
+    Returns:
+        Lista com indice, concorrente, duracao_s e erro (se houver) por índice
+    """
+    resultados = []
+    for definicao in definicoes:
+        nome = definicao['indexname']
+        inicio = time.perf_counter()
+        resultado = {'indice': nome, 'concorrente': False, 'erro': None}
+
+        try:
+            executar_sql(supabase, f'DROP INDEX IF EXISTS public.{_validar_nome(nome)};')
+            if concorrente:
+                try:
+                    executar_sql(supabase, _definicao_concorrente(definicao['indexdef']))
+                    resultado['concorrente'] = True
+                except Exception as e:
+                    logging.info(f"CREATE INDEX CONCURRENTLY indisponível ({e}); "
+                                 f"recriando sem CONCURRENTLY")
+                    concorrente = False
+                    # Build concorrente interrompido no meio deixa o índice INVALID
+                    executar_sql(supabase, f'DROP INDEX IF EXISTS public.{nome};')
+            if not resultado['concorrente']:
+                executar_sql(supabase, definicao['indexdef'])
+        except Exception as e:
+            logging.error(f"❌ Erro ao recriar índice {nome}: {e}")
+            resultado['erro'] = str(e)
+
+        resultado['duracao_s'] = round(time.perf_counter() - inicio, 3)
+        logging.info(f"Índice {nome} recriado em {resultado['duracao_s']}s"
+                     f"{' (CONCURRENTLY)' if resultado['concorrente'] else ''}")
+        resultados.append(resultado)
+    return resultados
+
+
+class CargaSemIndices:
+    """
+    Contexto de carga em massa: remove índices secundários na entrada e os
+    recria (com ANALYZE) na saída, mesmo se a carga falhar
+
+    Com ativo=False não faz nada além de medir o tempo da carga, para que os
+    importadores usem o mesmo bloco nos dois modos.
+    """
+
+    def __init__(self, supabase, tabela: str, ativo: bool = True,
+                 arquivo_backup: Optional[str] = None, concorrente: bool = False):
+        self.supabase = supabase
+        self.tabela = _validar_nome(tabela)
+        self.ativo = ativo
+        self.concorrente = concorrente
+        self.arquivo_backup = Path(arquivo_backup or f'indices_{tabela}.json')
+        self.definicoes: List[Dict[str, str]] = []
+        self.relatorio: Dict[str, Any] = {'tabela': tabela, 'modo': 'sem_indices' if ativo else 'normal'}
+        self._inicio_carga = 0.0
+
+    def __enter__(self) -> 'CargaSemIndices':
+        if self.ativo:
+            self.relatorio['estatisticas_antes'] = estatisticas_tabela(self.supabase, self.tabela)
+            self.definicoes = listar_indices_secundarios(self.supabase, self.tabela)
+
+            # Backup antes de remover: permite restaurar se o processo morrer
+            self.arquivo_backup.write_text(
+                json.dumps({'tabela': self.tabela, 'indices': self.definicoes},
+                           indent=2, ensure_ascii=False), encoding='utf-8')
+
+            inicio = time.perf_counter()
+            for definicao in self.definicoes:
+                nome = _validar_nome(definicao['indexname'])
+                executar_sql(self.supabase, f'DROP INDEX IF EXISTS public.{nome};')
+            self.relatorio['indices'] = [d['indexname'] for d in self.definicoes]
+            self.relatorio['tempo_remocao_s'] = round(time.perf_counter() - inicio, 3)
+            logging.info(
+                f"{len(self.definicoes)} índice(s) secundário(s) de {self.tabela} removido(s) "
+                f"para a carga (backup em {self.arquivo_backup})")
+
+        self._inicio_carga = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento) -> bool:
+        self.relatorio['tempo_carga_s'] = round(time.perf_counter() - self._inicio_carga, 3)
+        if not self.ativo:
+            return False
+
+        inicio = time.perf_counter()
+        recriacao = recriar_indices(self.supabase, self.definicoes, self.concorrente)
+        self.relatorio['recriacao'] = recriacao
+        self.relatorio['tempo_recriacao_s'] = round(time.perf_counter() - inicio, 3)
+
+        inicio = time.perf_counter()
+        try:
+            executar_sql(self.supabase, f'ANALYZE public.{self.tabela};')
+        except Exception as e:
+            logging.error(f"❌ Erro no ANALYZE de {self.tabela}: {e}")
+        self.relatorio['tempo_analyze_s'] = round(time.perf_counter() - inicio, 3)
+        self.relatorio['estatisticas_depois'] = estatisticas_tabela(self.supabase, self.tabela)
+
+        if not any(r['erro'] for r in recriacao):
+            self.arquivo_backup.unlink(missing_ok=True)
+        else:
+            logging.warning(f"Índices com erro; definições mantidas em {self.arquivo_backup}")
+
+        logging.info(
+            f"Carga sem índices de {self.tabela}: remoção {self.relatorio['tempo_remocao_s']}s, "
+            f"carga {self.relatorio['tempo_carga_s']}s, recriação {self.relatorio['tempo_recriacao_s']}s, "
+            f"ANALYZE {self.relatorio['tempo_analyze_s']}s")
+        return False
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Índices secundários das tabelas SINAPI (listagem e restauração)")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('listar').add_argument('tabela')
+    restaurar = sub.add_parser('restaurar')
+    restaurar.add_argument('arquivo')
+    restaurar.add_argument('--concorrente', action='store_true',
+                           help='Tenta CREATE INDEX CONCURRENTLY (RPC fora de transação)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    url = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
+    chave = os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('VITE_SUPABASE_ROLE_KEY')
+    if not url or not chave:
+        logging.error("Variáveis de ambiente SUPABASE não encontradas")
+        sys.exit(1)
+    supabase = create_client(url, chave)
+
+    try:
+        if args.comando == 'listar':
+            print(json.dumps(listar_indices_secundarios(supabase, args.tabela),
+                             indent=2, ensure_ascii=False))
+        else:
+            backup = json.loads(Path(args.arquivo).read_text(encoding='utf-8'))
+            recriacao = recriar_indices(supabase, backup['indices'], args.concorrente)
+            executar_sql(supabase, f"ANALYZE public.{_validar_nome(backup['tabela'])};")
+            print(json.dumps(recriacao, indent=2, ensure_ascii=False))
+    except Exception as e:
+        logging.error(f"Erro: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
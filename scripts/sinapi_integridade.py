@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Integridade Referencial entre os Conjuntos SINAPI antes do Upload
+================================================================
+
+Insumos, composições de mão de obra e manutenções são carregados de forma
+independente; uma manutenção que aponta para um código desconhecido só
+aparecia depois, no banco ou nas consultas. Esta etapa roda antes de
+qualquer escrita:
+
+- Conjuntos de códigos (pd.Index, tabela hash) de cada destino: os dados
+  sendo carregados e os códigos distintos do banco (um SELECT agregado via
+  execute_sql; paginação por id se a RPC faltar), exceto para as tabelas
+  que a importação substitui por inteiro
+- Cada referência de origem conferida com um único isin vetorizado
+- Manutenções de exclusão/desativação ficam fora (o código deixou de
+  existir de propósito)
+- Relatório por referência (linhas órfãs, códigos distintos, amostra) e
+  DataFrame longo com as linhas órfãs
+
+Severidade 'erro' marca referências que precisam fechar (manutenção de
+INSUMO → sinapi_insumos); 'aviso' as de cobertura parcial
+(sinapi_composicoes_mao_obra só tem composições de mão de obra).
+
+Uso:
+    python scripts/sinapi_integridade.py --manutencoes manut.xlsx [--insumos insumos.csv]
+        [--mao-de-obra mao_de_obra.xlsx] [--sem-banco] [--saida orfaos.csv]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# conjunto -> (tabela, coluna do código)
+CHAVES = {
+    'insumos': ('sinapi_insumos', 'codigo_do_insumo'),
+    'mao_de_obra': ('sinapi_composicoes_mao_obra', 'codigo_composicao'),
+    'manutencoes': ('sinapi_manutencoes', 'codigo_sinapi'),
+}
+
+# Importações que apagam a tabela antes de inserir: o banco atual não conta
+SUBSTITUIDOS = {'mao_de_obra'}
+
+PAGINA = 1000  # max-rows padrão do PostgREST no Supabase
+
+# Uma linha só (o max-rows não corta): os códigos distintos separados por vírgula
+CONSULTA_CODIGOS = "SELECT string_agg(DISTINCT {coluna}::text, ',') AS codigos FROM public.{tabela};"
+AMOSTRA = 20
+
+
+@dataclass(frozen=True)
+class Referencia:
+    """Coluna de um conjunto que deve existir entre os códigos de outro"""
+    origem: str
+    coluna: str
+    destino: str
+    filtro: Optional[Tuple[str, str]] = None  # (coluna, valor) que seleciona as linhas
+    severidade: str = 'erro'
+    ignorar: Optional[str] = None  # regex em tipo_manutencao das linhas dispensadas
+
+    @property
+    def nome(self) -> str:
+        filtro = f"[{self.filtro[0]}={self.filtro[1]}]" if self.filtro else ''
+        return f"{self.origem}.{self.coluna}{filtro} -> {self.destino}"
+
+
+REFERENCIAS = [
+    Referencia('manutencoes', 'codigo_sinapi', 'insumos', ('tipo', 'INSUMO'),
+               ignorar='EXCLUS|DESATIV'),
+    Referencia('manutencoes', 'codigo_sinapi', 'mao_de_obra', ('tipo', 'COMPOSIÇÃO'),
+               severidade='aviso', ignorar='EXCLUS|DESATIV'),
+]
+
+
+def normalizar_codigos(serie: pd.Series) -> pd.Series:
+    """Códigos como inteiros (texto com zeros à esquerda e int comparam igual); inválidos viram NA"""
+    if pd.api.types.is_integer_dtype(serie):
+        return serie.astype('Int64')
+    return pd.to_numeric(serie.astype(str).str.strip(), errors='coerce').astype('Int64')
+
+
+def codigos_do_banco(supabase, conjunto: str, pagina: int = PAGINA) -> pd.Index:
+    """
+    Códigos distintos de uma tabela
+
+    O DISTINCT roda no banco, numa consulta: sinapi_insumos guarda um mês por
+    carga e baixar todas as linhas repetiria cada código uma vez por mês. Sem
+    a RPC execute_sql, pagina as linhas por id (keyset, sem OFFSET).
+    """
+    from sinapi_indices import _validar_nome, executar_sql
+
+    tabela, coluna = CHAVES[conjunto]
+    try:
+        linhas = executar_sql(supabase, CONSULTA_CODIGOS.format(
+            coluna=_validar_nome(coluna), tabela=_validar_nome(tabela)))
+    except Exception as e:
+        logging.info(f"execute_sql indisponível para {tabela} ({e}); paginando as linhas")
+    else:
+        texto = linhas[0]['codigos'] if linhas else None
+        return pd.Index(normalizar_codigos(pd.Series(texto.split(',') if texto else [], dtype=object))
+                        .dropna().unique())
+
+    partes, ultimo = [], None
+    while True:
+        consulta = supabase.table(tabela).select(f'id,{coluna}').order('id').limit(pagina)
+        if ultimo is not None:
+            consulta = consulta.gt('id', ultimo)
+        linhas = consulta.execute().data or []
+        if not linhas:
+            break
+        partes.append(pd.DataFrame(linhas)[coluna])
+        ultimo = linhas[-1]['id']
+        if len(linhas) < pagina:
+            break
+    if not partes:
+        return pd.Index([], dtype='Int64')
+    return pd.Index(normalizar_codigos(pd.concat(partes, ignore_index=True)).dropna().unique())
+
+
+def verificar_integridade(dados: Dict[str, pd.DataFrame], supabase=None,
+                          referencias: Optional[List[Referencia]] = None) -> Tuple[Dict, pd.DataFrame]:
+    """
+    Confere as referências dos conjuntos carregados
+
+    Args:
+        dados: Conjuntos sendo carregados (chaves de CHAVES) já processados
+        supabase: Cliente para o retrato do banco (None: só os arquivos)
+        referencias: Referências a conferir (padrão: REFERENCIAS)
+
+    Returns:
+        Tuple com (relatório por referência e totais de erros/avisos,
+        DataFrame de linhas órfãs com referencia, severidade, origem,
+        linha, codigo e tipo_manutencao)
+    """
+    inicio = time.perf_counter()
+    referencias = [r for r in (referencias or REFERENCIAS) if r.origem in dados]
+    destinos: Dict[str, pd.Index] = {}
+    fontes: Dict[str, List[str]] = {}
+
+    for destino in sorted({r.destino for r in referencias}):
+        partes, fontes[destino] = [], []
+        if destino in dados:
+            partes.append(normalizar_codigos(dados[destino][CHAVES[destino][1]]).dropna())
+            fontes[destino].append('arquivo')
+        if supabase is not None and not (destino in dados and destino in SUBSTITUIDOS):
+            try:
+                partes.append(codigos_do_banco(supabase, destino).to_series())
+                fontes[destino].append('banco')
+            except Exception as e:
+                logging.warning(f"Códigos de {CHAVES[destino][0]} indisponíveis no banco: {e}")
+        destinos[destino] = pd.Index(pd.concat(partes, ignore_index=True).unique()) if partes \
+            else pd.Index([], dtype='Int64')
+
+    relatorio = {'referencias': {}, 'erros': 0, 'avisos': 0}
+    orfas = []
+    for ref in referencias:
+        origem = dados[ref.origem]
+        selecionadas = np.ones(len(origem), dtype=bool)
+        if ref.filtro:
+            selecionadas &= (origem[ref.filtro[0]].astype(str) == ref.filtro[1]).to_numpy()
+        dispensadas = np.zeros(len(origem), dtype=bool)
+        if ref.ignorar and 'tipo_manutencao' in origem:
+            dispensadas = origem['tipo_manutencao'].astype(str).str.upper() \
+                .str.contains(ref.ignorar, regex=True).to_numpy() & selecionadas
+            selecionadas &= ~dispensadas
+
+        codigos = normalizar_codigos(origem[ref.coluna])
+        presentes = codigos.isin(destinos[ref.destino]).to_numpy()
+        orfaos = selecionadas & ~presentes
+        codigos_orfaos = codigos[orfaos]
+
+        relatorio['referencias'][ref.nome] = {
+            'severidade': ref.severidade,
+            'destino': CHAVES[ref.destino][0],
+            'fontes_destino': fontes[ref.destino],
+            'codigos_destino': len(destinos[ref.destino]),
+            'verificadas': int(selecionadas.sum()),
+            'dispensadas': int(dispensadas.sum()),
+            'linhas_orfas': int(orfaos.sum()),
+            'codigos_orfaos': int(codigos_orfaos.nunique(dropna=False)),
+            'amostra': [None if pd.isna(c) else int(c) for c in codigos_orfaos.unique()[:AMOSTRA]],
+        }
+        relatorio['erros' if ref.severidade == 'erro' else 'avisos'] += int(orfaos.sum())
+
+        if orfaos.any():
+            linhas = np.flatnonzero(orfaos)
+            orfas.append(pd.DataFrame({
+                'referencia': ref.nome,
+                'severidade': ref.severidade,
+                'origem': ref.origem,
+                'linha': linhas,
+                'codigo': codigos_orfaos.to_numpy(),
+                'tipo_manutencao': (origem['tipo_manutencao'].to_numpy()[linhas]
+                                    if 'tipo_manutencao' in origem else None),
+            }))
+
+    relatorio['duracao_s'] = round(time.perf_counter() - inicio, 3)
+    for nome, item in relatorio['referencias'].items():
+        registrar = logging.warning if item['linhas_orfas'] and item['severidade'] == 'erro' else logging.info
+        registrar(f"Integridade {nome}: {item['linhas_orfas']} de {item['verificadas']} linha(s) órfã(s) "
+                  f"({item['codigos_orfaos']} código(s); destino: {'+'.join(item['fontes_destino']) or '-'})")
+
+    colunas = ['referencia', 'severidade', 'origem', 'linha', 'codigo', 'tipo_manutencao']
+    return relatorio, (pd.concat(orfas, ignore_index=True) if orfas else pd.DataFrame(columns=colunas))
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Integridade referencial dos conjuntos SINAPI antes do upload")
+    parser.add_argument('--insumos', help="CSV (ou ZIP) de insumos")
+    parser.add_argument('--mao-de-obra', dest='mao_de_obra', help="Planilha (ou ZIP) de mão de obra")
+    parser.add_argument('--manutencoes', help="Planilha (ou ZIP) de manutenções")
+    parser.add_argument('--sem-banco', action='store_true',
+                        help="Confere só entre os arquivos, sem o retrato do banco")
+    parser.add_argument('--saida', help="CSV com as linhas órfãs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    dados = {}
+    if args.insumos:
+        from importar_sinapi import carregar_dados_sinapi
+        dados['insumos'] = carregar_dados_sinapi(args.insumos)
+    if args.mao_de_obra:
+        from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra
+        dados['mao_de_obra'] = carregar_mao_de_obra(args.mao_de_obra)
+    supabase = None
+    if not args.sem_banco:
+        from importar_sinapi import conectar_supabase
+        supabase = conectar_supabase()
+        if not supabase:
+            sys.exit(1)
+    if args.manutencoes:
+        from importar_sinapi_manutencoes import ImportadorSinapiManutencoes
+        importador = ImportadorSinapiManutencoes(args.manutencoes, supabase=supabase)
+        dados['manutencoes'] = importador.processar_dados(importador.ler_planilha())
+    if not dados:
+        parser.error("informe ao menos um conjunto")
+
+    relatorio, orfas = verificar_integridade(dados, supabase)
+    if args.saida:
+        orfas.to_csv(args.saida, index=False)
+        logging.info(f"{len(orfas)} linha(s) órfã(s) em {args.saida}")
+    print(f"Erros: {relatorio['erros']}  Avisos: {relatorio['avisos']}  ({relatorio['duracao_s']}s)")
+    sys.exit(1 if relatorio['erros'] else 0)
+
+
+if __name__ == "__main__":
+    main()
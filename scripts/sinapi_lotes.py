@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Lotes Adaptativos por Bytes para os Uploads SINAPI
+=================================================
+
+Os importadores usavam lotes fixos em linhas (100 em insumos e mão de
+obra, 1000 em manutenções), mas a largura da linha vai de 5 campos a mais
+de 60 colunas de preço. Aqui o lote é dimensionado pelo corpo JSON
+serializado e ajustado durante a carga:
+
+- Linhas por lote = bytes alvo / bytes por linha (média móvel dos corpos
+  enviados; a primeira estimativa serializa uma amostra)
+- Crescimento: após JANELA lotes no mesmo tamanho, se a vazão (bytes/s do
+  POST) melhorou mais que GANHO_MINIMO, o alvo cresce FATOR_CRESCIMENTO;
+  quando para de melhorar, volta ao melhor tamanho medido e fica nele
+- Redução: 413 ou timeout (408, 504, statement timeout 57014) cortam o
+  alvo pela metade, limitam o teto e o mesmo trecho é reenviado em lotes
+  menores; 429/5xx reduzem o alvo e tentam de novo até TENTATIVAS vezes
+- Timeouts não reduzem o lote abaixo de BYTES_MINIMO (ali só há novas
+  tentativas), e TIMEOUTS_SEGUIDOS timeouts em sequência encerram o envio
+  da tabela: os registros restantes contam como erro em vez de esperar um
+  timeout do cliente por linha
+- O teto baixado por timeout volta a subir depois de RECUPERACAO_TETO
+  lotes aceitos em sequência; o limite de corpo de um 413 é permanente
+- Erros de dados (400, 409...) não mexem no tamanho: o lote conta como
+  erro ou, nos importadores que já faziam isso, é reenviado linha a linha
+
+O melhor alvo de cada tabela e o limite de corpo observado (413) ficam em
+ARQUIVO_ESTADO, e a próxima execução já começa perto do tamanho ideal.
+
+Uso (tamanhos aprendidos por tabela):
+    python scripts/sinapi_lotes.py [--esquecer sinapi_insumos]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from sinapi_metricas import METRICAS
+from sinapi_serializacao import inserir_json, serializar_registros
+
+ARQUIVO_ESTADO = '.sinapi_lotes.json'
+BYTES_INICIAL = 256 * 1024
+BYTES_MAXIMO = 8 * 1024 * 1024
+FATOR_CRESCIMENTO = 1.5
+FATOR_REDUCAO = 0.5
+FATOR_REDUCAO_TRANSITORIA = 0.7
+FATOR_TETO = 0.9  # margem abaixo do corpo recusado: a largura da linha varia
+BYTES_MINIMO = 16 * 1024  # abaixo disso um timeout não é culpa do tamanho do lote
+GANHO_MINIMO = 0.05
+JANELA = 3
+TENTATIVAS = 3
+TIMEOUTS_SEGUIDOS = 5
+RECUPERACAO_TETO = 10
+AMOSTRA_LARGURA = 50
+
+STATUS_TAMANHO = {413}
+STATUS_TIMEOUT = {408, 504}
+CODIGOS_TIMEOUT = {'57014'}  # canceling statement due to statement timeout
+STATUS_TRANSITORIOS = {429, 500, 502, 503}
+
+_lock_estado = threading.Lock()
+
+
+def classificar_falha(erro: Exception) -> str:
+    """
+    Classifica a falha de um POST para o controlador
+
+    Returns:
+        'tamanho' (413), 'timeout', 'transitoria' (429/5xx, conexão) ou
+        'dados' (recusa do banco que não depende do tamanho do lote)
+    """
+    import httpx
+
+    if isinstance(erro, httpx.TimeoutException):
+        return 'timeout'
+    if isinstance(erro, httpx.TransportError):
+        return 'transitoria'
+    status = getattr(erro, 'status', None)
+    codigo = str(getattr(erro, 'code', '') or '')
+    if status is None and codigo.isdigit():
+        status = int(codigo)
+    if status in STATUS_TAMANHO:
+        return 'tamanho'
+    if status in STATUS_TIMEOUT or codigo in CODIGOS_TIMEOUT:
+        return 'timeout'
+    if status in STATUS_TRANSITORIOS:
+        return 'transitoria'
+    return 'dados'
+
+
+def _ler_estado(arquivo: Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        return json.loads(arquivo.read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+class ControladorLotes:
+    """
+    Tamanho de lote de uma tabela, ajustado pela vazão e pelas falhas
+
+    Com linhas_fixas, devolve sempre esse número de linhas (sem adaptação),
+    para reproduzir o comportamento antigo ou depurar.
+    """
+
+    def __init__(self, tabela: str, bytes_alvo: Optional[int] = None,
+                 bytes_maximo: int = BYTES_MAXIMO, linhas_fixas: Optional[int] = None,
+                 arquivo_estado: Optional[str] = ARQUIVO_ESTADO):
+        self.tabela = tabela
+        self.linhas_fixas = linhas_fixas
+        self.arquivo_estado = Path(arquivo_estado) if arquivo_estado else None
+        estado = _ler_estado(self.arquivo_estado).get(tabela, {}) if self.arquivo_estado else {}
+
+        self.limite_corpo: Optional[int] = estado.get('limite_corpo')
+        # teto_corpo só desce com 413; teto também desce com timeout e se recupera
+        self.teto_corpo = bytes_maximo
+        if self.limite_corpo:
+            self.teto_corpo = min(self.teto_corpo, int(self.limite_corpo * FATOR_TETO))
+        self.teto = self.teto_corpo
+        self.bytes_alvo = min(bytes_alvo or estado.get('bytes_alvo') or BYTES_INICIAL, self.teto)
+        self.bytes_por_linha: Optional[float] = estado.get('bytes_por_linha')
+
+        self.crescendo = True
+        self.melhor_alvo = self.bytes_alvo
+        self.melhor_vazao = 0.0
+        self._janela: List[Tuple[int, float]] = []
+        self.timeouts_seguidos = 0
+        self._aceitos_seguidos = 0
+        self.lotes = 0
+        self.linhas = 0
+        self.bytes = 0
+        self.segundos = 0.0
+        self.falhas: Counter = Counter()
+
+    @property
+    def adaptativo(self) -> bool:
+        return self.linhas_fixas is None
+
+    def linhas_do_lote(self, dados: pd.DataFrame, inicio: int) -> int:
+        """Número de linhas do próximo lote a partir de `inicio`"""
+        if not self.adaptativo:
+            return self.linhas_fixas
+        if self.bytes_por_linha is None:
+            amostra = dados.iloc[inicio:inicio + AMOSTRA_LARGURA]
+            self.bytes_por_linha = max(1.0, len(serializar_registros(amostra)) / max(1, len(amostra)))
+        return max(1, int(self.bytes_alvo / self.bytes_por_linha))
+
+    def registrar_sucesso(self, linhas: int, nbytes: int, duracao: float):
+        """Contabiliza um lote aceito e decide se o alvo cresce, volta ou fica"""
+        self.lotes += 1
+        self.linhas += linhas
+        self.bytes += nbytes
+        self.segundos += duracao
+        largura = nbytes / max(1, linhas)
+        self.bytes_por_linha = largura if self.bytes_por_linha is None else \
+            0.8 * self.bytes_por_linha + 0.2 * largura
+        self.timeouts_seguidos = 0
+        if not self.adaptativo:
+            return
+
+        self._aceitos_seguidos += 1
+        if self.teto < self.teto_corpo and self._aceitos_seguidos >= RECUPERACAO_TETO:
+            # Timeout antigo não limita o resto da carga: o teto sobe aos poucos
+            self._aceitos_seguidos = 0
+            self.teto = min(self.teto_corpo, int(self.teto * FATOR_CRESCIMENTO))
+            self.crescendo = True
+            logging.info(f"Lotes {self.tabela}: teto sobe para {self.teto / 1024:.0f} KiB")
+
+        self._janela.append((nbytes, duracao))
+        if len(self._janela) < JANELA:
+            return
+        vazao = sum(b for b, _ in self._janela) / max(1e-9, sum(d for _, d in self._janela))
+        self._janela.clear()
+
+        if vazao > self.melhor_vazao * (1 + GANHO_MINIMO):
+            self.melhor_vazao, self.melhor_alvo = vazao, self.bytes_alvo
+            if self.crescendo and self.bytes_alvo < self.teto:
+                self.bytes_alvo = min(int(self.bytes_alvo * FATOR_CRESCIMENTO), self.teto)
+                logging.info(f"Lotes {self.tabela}: {vazao / 1024:.0f} KiB/s, "
+                             f"alvo sobe para {self.bytes_alvo / 1024:.0f} KiB")
+        elif self.crescendo:
+            # Lotes maiores pararam de compensar: fica no melhor tamanho medido
+            self.crescendo = False
+            self.bytes_alvo = self.melhor_alvo
+            logging.info(f"Lotes {self.tabela}: vazão estável, alvo fixado em "
+                         f"{self.bytes_alvo / 1024:.0f} KiB")
+        else:
+            # Atualiza a referência para que uma queda de vazão não trave o ajuste
+            self.melhor_vazao = vazao
+
+    def registrar_falha(self, tipo: str, nbytes: int) -> bool:
+        """
+        Reduz o alvo conforme o tipo de falha (classificar_falha)
+
+        Returns:
+            True se o alvo foi reduzido (o trecho pode ir de novo em lotes menores)
+        """
+        self.falhas[tipo] += 1
+        self.timeouts_seguidos = self.timeouts_seguidos + 1 if tipo == 'timeout' else 0
+        if tipo != 'dados':
+            self._aceitos_seguidos = 0
+        if not self.adaptativo or tipo == 'dados':
+            return False
+        if tipo == 'timeout' and nbytes <= BYTES_MINIMO:
+            # Lote já pequeno: o timeout é do servidor, não do tamanho
+            return False
+        if tipo == 'tamanho':
+            self.limite_corpo = min(self.limite_corpo or nbytes, nbytes)
+            self.teto_corpo = max(1, min(self.teto_corpo, int(nbytes * FATOR_TETO)))
+            self.teto = min(self.teto, self.teto_corpo)
+            self.bytes_alvo = max(1, int(min(self.bytes_alvo, nbytes) * FATOR_REDUCAO))
+        elif tipo == 'timeout':
+            self.teto = min(self.teto_corpo, max(BYTES_MINIMO, min(self.teto, int(nbytes * FATOR_TETO))))
+            self.bytes_alvo = min(self.teto, max(BYTES_MINIMO, int(min(self.bytes_alvo, nbytes) * FATOR_REDUCAO)))
+        else:
+            self.bytes_alvo = max(1, int(self.bytes_alvo * FATOR_REDUCAO_TRANSITORIA))
+        # Vazões medidas antes da falha não valem mais como referência
+        self.crescendo = True
+        self.melhor_alvo = self.bytes_alvo
+        self.melhor_vazao = 0.0
+        self._janela.clear()
+        logging.warning(f"Lotes {self.tabela}: falha '{tipo}' com {nbytes / 1024:.0f} KiB, "
+                        f"alvo reduzido para {self.bytes_alvo / 1024:.0f} KiB")
+        return True
+
+    def salvar(self):
+        """Grava o melhor alvo da tabela em ARQUIVO_ESTADO (seguro entre threads)"""
+        if not self.arquivo_estado or not self.adaptativo or not self.lotes:
+            return
+        with _lock_estado:
+            estado = _ler_estado(self.arquivo_estado)
+            estado[self.tabela] = {
+                'bytes_alvo': self.melhor_alvo,
+                'bytes_por_linha': round(self.bytes_por_linha, 1),
+                'limite_corpo': self.limite_corpo,
+                'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+            }
+            self.arquivo_estado.write_text(json.dumps(estado, indent=2, ensure_ascii=False),
+                                           encoding='utf-8')
+
+    def relatorio(self) -> Dict[str, Any]:
+        """Resumo para os relatórios de importação"""
+        return {
+            'modo': 'adaptativo' if self.adaptativo else 'fixo',
+            'lotes': self.lotes,
+            'bytes_alvo': self.melhor_alvo if self.adaptativo else None,
+            'linhas_por_lote': self.linhas_fixas or (
+                int(self.melhor_alvo / self.bytes_por_linha) if self.bytes_por_linha else None),
+            'kib_por_segundo': round(self.bytes / self.segundos / 1024, 1) if self.segundos else None,
+            'linhas_por_segundo': round(self.linhas / self.segundos) if self.segundos else None,
+            'limite_corpo': self.limite_corpo,
+            'falhas': dict(self.falhas),
+        }
+
+
+def _inserir_individualmente(supabase, tabela: str, lote: pd.DataFrame,
+                             coluna_id: Optional[str]) -> Tuple[int, int]:
+    """Reenvia um lote recusado linha a linha para isolar os registros com problema"""
+    importados = erros = 0
+    for j in range(len(lote)):
+        try:
+            inserir_json(supabase, tabela, serializar_registros(lote.iloc[[j]]))
+            importados += 1
+        except Exception as e:
+            registro = lote[coluna_id].iloc[j] if coluna_id else lote.index[j]
+            logging.warning(f"Erro no registro {registro} de {tabela}: {e}")
+            erros += 1
+    return importados, erros
+
+
+def enviar_em_lotes(supabase, tabela: str, dados: pd.DataFrame,
+                    controlador: Optional[ControladorLotes] = None,
+                    individual_em_erro: bool = False,
+                    coluna_id: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Envia o DataFrame para a tabela em lotes dimensionados pelo controlador
+
+    Args:
+        supabase: Cliente Supabase
+        tabela: Tabela de destino
+        dados: Registros com os nomes de coluna da tabela
+        controlador: Controlador da tabela (um novo, adaptativo, se omitido)
+        individual_em_erro: Reenvia linha a linha os lotes recusados por erro de dados
+        coluna_id: Coluna usada para identificar registros nos logs de erro
+
+    Returns:
+        Tuple com (registros_importados, registros_erro)
+    """
+    controlador = controlador or ControladorLotes(tabela)
+    url = f'/rest/v1/{tabela}'
+    total = len(dados)
+    importados = erros = 0
+    inicio = numero = tentativas = 0
+
+    while inicio < total:
+        lote = dados.iloc[inicio:inicio + controlador.linhas_do_lote(dados, inicio)]
+        corpo = serializar_registros(lote)
+        comeco = time.perf_counter()
+        try:
+            inserir_json(supabase, tabela, corpo)
+        except Exception as e:
+            tipo = classificar_falha(e)
+            reduziu = controlador.registrar_falha(tipo, len(corpo))
+            if controlador.timeouts_seguidos >= TIMEOUTS_SEGUIDOS:
+                logging.error(f"Envio para {tabela} interrompido após {TIMEOUTS_SEGUIDOS} timeouts "
+                              f"seguidos: {total - inicio} registro(s) restante(s) contados como erro")
+                erros += total - inicio
+                break
+            if tipo in ('tamanho', 'timeout') and reduziu and len(lote) > 1:
+                # Mesmo trecho reenviado em lotes menores
+                METRICAS.registrar_retentativa('POST', url, 'return=minimal')
+                continue
+            if tipo in ('timeout', 'transitoria') and tentativas < TENTATIVAS:
+                tentativas += 1
+                METRICAS.registrar_retentativa('POST', url, 'return=minimal')
+                time.sleep(min(0.5 * 2 ** tentativas, 8))
+                continue
+
+            numero += 1
+            logging.error(f"Erro no lote {numero} de {tabela} ({len(lote)} registros): {e}")
+            if individual_em_erro and tipo == 'dados':
+                ok, falhos = _inserir_individualmente(supabase, tabela, lote, coluna_id)
+                importados += ok
+                erros += falhos
+            else:
+                erros += len(lote)
+        else:
+            duracao = time.perf_counter() - comeco
+            numero += 1
+            controlador.registrar_sucesso(len(lote), len(corpo), duracao)
+            importados += len(lote)
+            logging.info(f"Lote {numero} de {tabela}: {len(lote)} registros "
+                         f"({len(corpo) / 1024:.0f} KiB) em {duracao:.2f}s")
+        inicio += len(lote)
+        tentativas = 0
+
+    controlador.salvar()
+    logging.info(f"Envio para {tabela} concluído - Sucesso: {importados}, Erros: {erros}, "
+                 f"lotes: {controlador.relatorio()}")
+    return importados, erros
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Tamanhos de lote aprendidos por tabela")
+    parser.add_argument('--estado', default=ARQUIVO_ESTADO)
+    parser.add_argument('--esquecer', nargs='+', default=[], metavar='TABELA',
+                        help="Descarta o tamanho aprendido (volta a BYTES_INICIAL)")
+    args = parser.parse_args(argv)
+
+    arquivo = Path(args.estado)
+    estado = _ler_estado(arquivo)
+    if args.esquecer:
+        for tabela in args.esquecer:
+            estado.pop(tabela, None)
+        arquivo.write_text(json.dumps(estado, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    if not estado:
+        print(f"Nenhum tamanho aprendido em {arquivo}")
+    for tabela, item in sorted(estado.items()):
+        linhas = int(item['bytes_alvo'] / item['bytes_por_linha']) if item.get('bytes_por_linha') else '-'
+        limite = f"{item['limite_corpo'] / 1024:.0f} KiB" if item.get('limite_corpo') else '-'
+        print(f"{tabela:32} {item['bytes_alvo'] / 1024:8.0f} KiB  ~{linhas} linhas  "
+              f"limite {limite}  ({item.get('atualizado_em', '-')})")
+
+
+if __name__ == "__main__":
+    main()
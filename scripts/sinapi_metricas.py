@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Métricas por Operação das Chamadas HTTP ao Supabase
+===================================================
+
+Uma importação lenta só aparecia como tempo total alto. Este módulo mede
+cada chamada HTTP dos scripts (insert/select/delete/update/upsert em
+tabelas, RPCs e edge functions) sem mudar o código que faz as chamadas:
+
+- instrumentar_cliente(supabase) envolve o send() da sessão httpx do
+  PostgREST; instrumentar_sessao() faz o mesmo com uma requests.Session
+- Por tabela (ou RPC/função) e operação: histograma de latência, bytes
+  enviados/recebidos, contagem por status HTTP (ou exceção) e retentativas
+- exportar_ao_sair() grava tudo no fim da execução em JSON ou no formato
+  texto do Prometheus (extensão .prom)
+
+O arquivo padrão é logs/metricas_<script>_<timestamp>.json; a variável de
+ambiente METRICAS_ARQUIVO troca o destino (e o formato, pela extensão).
+
+Uso (resumo de um arquivo exportado):
+    python scripts/sinapi_metricas.py logs/metricas_importar_sinapi_20250101_120000.json
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# Limites superiores (s) dos buckets do histograma de latência
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OPERACOES_METODO = {
+    'GET': 'select',
+    'HEAD': 'count',
+    'POST': 'insert',
+    'PATCH': 'update',
+    'PUT': 'upsert',
+    'DELETE': 'delete',
+}
+
+
+def classificar(metodo: str, url: str, prefer: str = '') -> Tuple[str, str]:
+    """
+    Alvo e operação de uma chamada a partir do método e da URL
+
+    Returns:
+        Tuple com (tabela, RPC ou função, operação): /rest/v1/<tabela> pelo
+        método (POST com resolution=merge-duplicates é upsert),
+        /rest/v1/rpc/<nome> como 'rpc' e /functions/v1/<nome> como 'function'
+    """
+    partes = [p for p in urlsplit(str(url)).path.split('/') if p]
+    metodo = metodo.upper()
+    if len(partes) >= 4 and partes[:3] == ['rest', 'v1', 'rpc']:
+        return partes[3], 'rpc'
+    if len(partes) >= 3 and partes[:2] == ['rest', 'v1']:
+        if metodo == 'POST' and 'resolution=' in (prefer or ''):
+            return partes[2], 'upsert'
+        return partes[2], OPERACOES_METODO.get(metodo, metodo.lower())
+    if len(partes) >= 3 and partes[:2] == ['functions', 'v1']:
+        return partes[2], 'function'
+    return '/'.join(partes) or '/', metodo.lower()
+
+
+class MetricasHttp:
+    """Coletor thread-safe de latência, bytes, status e retentativas por (alvo, operação)"""
+
+    def __init__(self, limites: Sequence[float] = LIMITES_LATENCIA):
+        self.limites = tuple(limites)
+        self._series: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+
+    def _serie(self, alvo: str, operacao: str) -> Dict[str, Any]:
+        chave = (alvo, operacao)
+        if chave not in self._series:
+            self._series[chave] = {
+                'requisicoes': 0, 'retentativas': 0, 'soma_s': 0.0,
+                'min_s': None, 'max_s': 0.0,
+                'buckets': [0] * (len(self.limites) + 1),
+                'bytes_enviados': 0, 'bytes_recebidos': 0, 'status': {},
+            }
+        return self._series[chave]
+
+    def registrar(self, alvo: str, operacao: str, duracao: float, status: Any,
+                  enviados: int = 0, recebidos: int = 0):
+        """Registra uma chamada (status: código HTTP ou nome da exceção)"""
+        with self._lock:
+            serie = self._serie(alvo, operacao)
+            serie['requisicoes'] += 1
+            serie['soma_s'] += duracao
+            serie['min_s'] = duracao if serie['min_s'] is None else min(serie['min_s'], duracao)
+            serie['max_s'] = max(serie['max_s'], duracao)
+            serie['buckets'][bisect_left(self.limites, duracao)] += 1
+            serie['bytes_enviados'] += enviados
+            serie['bytes_recebidos'] += recebidos
+            serie['status'][str(status)] = serie['status'].get(str(status), 0) + 1
+
+    def registrar_retentativa(self, metodo: str, url: str, prefer: str = ''):
+        """Conta uma nova tentativa da mesma chamada (feita pelo código do script)"""
+        alvo, operacao = classificar(metodo, url, prefer)
+        with self._lock:
+            self._serie(alvo, operacao)['retentativas'] += 1
+
+    def _quantil(self, buckets: List[int], q: float) -> Optional[float]:
+        """Quantil estimado pelo limite superior do bucket (como histogram_quantile)"""
+        total = sum(buckets)
+        if not total:
+            return None
+        acumulado = 0
+        for limite, quantidade in zip(self.limites + (float('inf'),), buckets):
+            acumulado += quantidade
+            if acumulado >= q * total:
+                return limite if limite != float('inf') else None
+        return None
+
+    def resumo(self) -> Dict[str, Any]:
+        """Séries por alvo/operação com média, p50/p95/p99 estimados e totais"""
+        with self._lock:
+            series = {chave: json.loads(json.dumps(serie)) for chave, serie in self._series.items()}
+
+        operacoes = []
+        for (alvo, operacao), serie in sorted(series.items()):
+            n = serie['requisicoes']
+            operacoes.append({
+                'alvo': alvo,
+                'operacao': operacao,
+                **{k: v for k, v in serie.items() if k != 'buckets'},
+                'media_s': round(serie['soma_s'] / n, 6) if n else None,
+                'p50_s': self._quantil(serie['buckets'], 0.50),
+                'p95_s': self._quantil(serie['buckets'], 0.95),
+                'p99_s': self._quantil(serie['buckets'], 0.99),
+                'histograma': dict(zip([str(l) for l in self.limites] + ['+Inf'], serie['buckets'])),
+            })
+        return {
+            'inicio': datetime.fromtimestamp(self.inicio).isoformat(),
+            'duracao_execucao_s': round(time.time() - self.inicio, 3),
+            'total_requisicoes': sum(o['requisicoes'] for o in operacoes),
+            'total_retentativas': sum(o['retentativas'] for o in operacoes),
+            'operacoes': operacoes,
+        }
+
+    def para_prometheus(self, prefixo: str = 'obrasai_http') -> str:
+        """Formato texto de exposição do Prometheus (histograma + contadores)"""
+        with self._lock:
+            series = sorted((chave, json.loads(json.dumps(serie)))
+                            for chave, serie in self._series.items())
+
+        def rotulos(alvo: str, operacao: str, **extra) -> str:
+            pares = {'alvo': alvo, 'operacao': operacao, **extra}
+            return ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                            for k, v in pares.items())
+
+        linhas = [f'# HELP {prefixo}_duracao_segundos Latência das chamadas HTTP',
+                  f'# TYPE {prefixo}_duracao_segundos histogram']
+        for (alvo, operacao), serie in series:
+            acumulado = 0
+            for limite, quantidade in zip([str(l) for l in self.limites] + ['+Inf'], serie['buckets']):
+                acumulado += quantidade
+                linhas.append(f'{prefixo}_duracao_segundos_bucket'
+                              f'{{{rotulos(alvo, operacao, le=limite)}}} {acumulado}')
+            linhas.append(f'{prefixo}_duracao_segundos_sum{{{rotulos(alvo, operacao)}}} {serie["soma_s"]}')
+            linhas.append(f'{prefixo}_duracao_segundos_count{{{rotulos(alvo, operacao)}}} {serie["requisicoes"]}')
+
+        for nome, campo, ajuda in (
+                ('bytes_enviados_total', 'bytes_enviados', 'Bytes enviados no corpo'),
+                ('bytes_recebidos_total', 'bytes_recebidos', 'Bytes recebidos no corpo'),
+                ('retentativas_total', 'retentativas', 'Novas tentativas feitas pelos scripts')):
+            linhas += [f'# HELP {prefixo}_{nome} {ajuda}', f'# TYPE {prefixo}_{nome} counter']
+            linhas += [f'{prefixo}_{nome}{{{rotulos(alvo, operacao)}}} {serie[campo]}'
+                       for (alvo, operacao), serie in series]
+
+        linhas += [f'# HELP {prefixo}_respostas_total Respostas por status HTTP (ou exceção)',
+                   f'# TYPE {prefixo}_respostas_total counter']
+        for (alvo, operacao), serie in series:
+            for status, quantidade in sorted(serie['status'].items()):
+                linhas.append(f'{prefixo}_respostas_total'
+                              f'{{{rotulos(alvo, operacao, status=status)}}} {quantidade}')
+        return '\n'.join(linhas) + '\n'
+
+    def exportar(self, caminho) -> Path:
+        """Grava em Prometheus (.prom/.txt) ou JSON (demais extensões)"""
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        if caminho.suffix in ('.prom', '.txt'):
+            caminho.write_text(self.para_prometheus(), encoding='utf-8')
+        else:
+            caminho.write_text(json.dumps(self.resumo(), indent=2, ensure_ascii=False),
+                               encoding='utf-8')
+        return caminho
+
+
+# Coletor único do processo, compartilhado pelos clientes instrumentados
+METRICAS = MetricasHttp()
+
+
+def _bytes_requisicao(requisicao) -> int:
+    corpo = getattr(requisicao, 'body', None)  # requests.PreparedRequest
+    if corpo is None:
+        try:
+            corpo = requisicao.content  # httpx.Request
+        except Exception:
+            return 0
+    return len(corpo.encode('utf-8') if isinstance(corpo, str) else corpo or b'')
+
+
+def _bytes_resposta(resposta) -> int:
+    try:
+        return len(resposta.content)
+    except Exception:
+        # Resposta em streaming ainda não lida
+        return int(resposta.headers.get('content-length') or 0)
+
+
+def instrumentar_sessao(sessao, metricas: Optional[MetricasHttp] = None):
+    """
+    Envolve sessao.send (httpx.Client ou requests.Session) para registrar
+    cada chamada no coletor; chamar de novo na mesma sessão não duplica
+
+    Returns:
+        A própria sessão
+    """
+    if getattr(sessao, '_metricas', None) is not None:
+        return sessao
+    metricas = metricas or METRICAS
+    enviar = sessao.send
+
+    def send(requisicao, *args, **kwargs):
+        alvo, operacao = classificar(requisicao.method, requisicao.url,
+                                     requisicao.headers.get('Prefer', ''))
+        enviados = _bytes_requisicao(requisicao)
+        inicio = time.perf_counter()
+        try:
+            resposta = enviar(requisicao, *args, **kwargs)
+        except Exception as e:
+            metricas.registrar(alvo, operacao, time.perf_counter() - inicio,
+                               type(e).__name__, enviados)
+            raise
+        metricas.registrar(alvo, operacao, time.perf_counter() - inicio,
+                           resposta.status_code, enviados, _bytes_resposta(resposta))
+        return resposta
+
+    sessao.send = send
+    sessao._metricas = metricas
+    return sessao
+
+
+def instrumentar_cliente(supabase, metricas: Optional[MetricasHttp] = None):
+    """Instrumenta a sessão PostgREST (tabelas e RPCs) de um cliente Supabase"""
+    instrumentar_sessao(supabase.postgrest.session, metricas)
+    return supabase
+
+
+def exportar_ao_sair(nome_execucao: str, metricas: Optional[MetricasHttp] = None,
+                     caminho: Optional[str] = None):
+    """
+    Agenda a exportação das métricas para o fim do processo (inclusive em
+    sys.exit), uma vez por execução
+
+    Args:
+        nome_execucao: Nome do script, usado no arquivo padrão
+        caminho: Destino; padrão METRICAS_ARQUIVO ou logs/metricas_<nome>_<timestamp>.json
+    """
+    metricas = metricas or METRICAS
+    if getattr(metricas, '_exportacao_agendada', False):
+        return
+    metricas._exportacao_agendada = True
+    caminho = caminho or os.getenv('METRICAS_ARQUIVO') or (
+        Path('logs') / f"metricas_{nome_execucao}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+    def exportar():
+        if not metricas.resumo()['total_requisicoes']:
+            return
+        try:
+            destino = metricas.exportar(caminho)
+            logging.info(f"Métricas HTTP salvas em {destino}")
+        except OSError as e:
+            logging.warning(f"Não foi possível salvar as métricas HTTP: {e}")
+
+    atexit.register(exportar)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Resumo por operação de um arquivo de métricas HTTP exportado em JSON")
+    parser.add_argument('arquivo')
+    args = parser.parse_args(argv)
+
+    resumo = json.loads(Path(args.arquivo).read_text(encoding='utf-8'))
+    print(f"{'alvo':32} {'operacao':8} {'n':>6} {'retry':>5} {'media_s':>8} {'p95_s':>6} "
+          f"{'MB env':>7} {'MB rec':>7}  status")
+    for op in resumo['operacoes']:
+        print(f"{op['alvo'][:32]:32} {op['operacao']:8} {op['requisicoes']:6} {op['retentativas']:5} "
+              f"{op['media_s'] or 0:8.3f} {op['p95_s'] or 0:6} "
+              f"{op['bytes_enviados'] / 1024**2:7.2f} {op['bytes_recebidos'] / 1024**2:7.2f}  "
+              f"{op['status']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Orquestrador da Atualização Completa do SINAPI
+==============================================
+
+Substitui a sequência manual cleanup_sinapi_tables.py → importar_sinapi.py →
+import_sinapi_composicoes_mao_obra.py → importar_sinapi_manutencoes.py por
+um grafo de dependências executado em um único processo:
+
+    integridade ── limpeza ──┬── insumos ──────┬── verificacao
+                             ├── mao_de_obra ──┤
+                             └── manutencoes ──┘
+    insumos + mao_de_obra ── shards (só com --shards)
+    insumos + mao_de_obra ── historico (só com --historico)
+
+- Confirmação não interativa: etapas destrutivas (remoção de tabelas e
+  limpeza de sinapi_composicoes_mao_obra) só rodam com --sim
+- As importações independentes rodam em paralelo (threads) com um único
+  cliente Supabase, ou seja, um único pool de conexões HTTP
+- Os módulos dos importadores (e o pandas) são importados só quando a
+  primeira etapa que precisa deles começa
+- Uma etapa só roda se as dependências terminaram sem exceção; a
+  verificação roda mesmo com falhas, para registrar o estado final
+- Relatório único com início/fim/duração de cada etapa, ganho do
+  paralelismo e métricas HTTP por operação
+- Com manutenções no plano, a integridade referencial (sinapi_integridade.py)
+  é conferida antes de qualquer escrita; com --integridade-estrita, códigos
+  de insumo desconhecidos cancelam a atualização inteira
+- Cada arquivo é lido e processado uma única vez por execução (cache de
+  DataFrames compartilhado entre integridade, importações e shards)
+- Com --shards DIR, grava os shards binários de preço por UF
+  (sinapi_shards.py) dos conjuntos importados com sucesso
+- Com --historico DIR, registra o mês dos conjuntos importados no
+  histórico local de preços mapeado em memória (sinapi_historico.py)
+
+Uso:
+    python scripts/sinapi_orquestrador.py --pacote SINAPI_2025_04.zip --sim
+    python scripts/sinapi_orquestrador.py --insumos insumos.csv --manutencoes manut.xlsx \\
+        [--mao-de-obra mao_de_obra.xlsx] [--sem-limpeza] [--carga-sem-indices] [--shards shards/]
+        [--historico historico/] [--mes 2025-04]
+        [--integridade-estrita] [--plano] [--profile]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TABELAS = {
+    'insumos': 'sinapi_insumos',
+    'mao_de_obra': 'sinapi_composicoes_mao_obra',
+    'manutencoes': 'sinapi_manutencoes',
+}
+
+# Coluna do mês de referência de cada tabela (a verificação conta só os meses importados)
+COLUNAS_MES = {
+    'insumos': 'mes_referencia',
+    'mao_de_obra': 'mes_referencia',
+    'manutencoes': 'data_referencia',
+}
+
+
+@dataclass
+class Etapa:
+    """Nó do grafo: função(contexto) -> resultado, executada após as dependências"""
+    nome: str
+    funcao: Callable[['Contexto'], Dict[str, Any]]
+    dependencias: Tuple[str, ...] = ()
+    destrutiva: bool = False
+    requer_sucesso: bool = True  # False: roda mesmo se alguma dependência falhou
+
+
+@dataclass
+class Contexto:
+    """Estado compartilhado entre as etapas"""
+    supabase: Any
+    arquivos: Dict[str, str]
+    carga_sem_indices: bool = False
+    log_file: Optional[str] = None
+    shards: Optional[str] = None
+    integridade_estrita: bool = False
+    historico: Optional[str] = None
+    mes: Optional[str] = None  # Mês dos arquivos (padrão: conteúdo ou nome do arquivo)
+    resultados: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    dados: Dict[str, Any] = field(default_factory=dict)
+    _locks: Dict[str, threading.Lock] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def carregar(self, nome: str):
+        """DataFrame processado do arquivo da importação `nome`, lido uma única vez"""
+        with self._lock:
+            lock = self._locks.setdefault(nome, threading.Lock())
+        with lock:
+            if nome not in self.dados:
+                self.dados[nome] = LEITORES[nome](self)
+            return self.dados[nome]
+
+
+def _ler_insumos(ctx: Contexto):
+    from importar_sinapi import carregar_dados_sinapi
+
+    return carregar_dados_sinapi(ctx.arquivos['insumos'], mes_referencia=ctx.mes)
+
+
+def _ler_mao_de_obra(ctx: Contexto):
+    from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra
+
+    return carregar_mao_de_obra(ctx.arquivos['mao_de_obra'], ctx.mes)
+
+
+def _ler_manutencoes(ctx: Contexto):
+    from importar_sinapi_manutencoes import ImportadorSinapiManutencoes
+
+    importador = ImportadorSinapiManutencoes(ctx.arquivos['manutencoes'], supabase=ctx.supabase)
+    if not importador.validar_arquivo():
+        raise FileNotFoundError(f"Planilha de manutenções inválida: {ctx.arquivos['manutencoes']}")
+    return importador.processar_dados(importador.ler_planilha())
+
+
+LEITORES = {'insumos': _ler_insumos, 'mao_de_obra': _ler_mao_de_obra,
+            'manutencoes': _ler_manutencoes}
+
+
+def _integridade(ctx: Contexto) -> Dict[str, Any]:
+    """Lê os arquivos (em paralelo) e confere as referências antes de qualquer escrita"""
+    from sinapi_integridade import verificar_integridade
+
+    nomes = [nome for nome in LEITORES if nome in ctx.arquivos]
+    with ThreadPoolExecutor(max_workers=len(nomes), thread_name_prefix='leitura') as executor:
+        dados = dict(zip(nomes, executor.map(ctx.carregar, nomes)))
+    relatorio, _ = verificar_integridade(dados, ctx.supabase)
+    if relatorio['erros'] and ctx.integridade_estrita:
+        raise RuntimeError(f"{relatorio['erros']} referência(s) órfã(s) com severidade erro "
+                           f"(integridade estrita)")
+    return relatorio
+
+
+def _limpeza(ctx: Contexto) -> Dict[str, Any]:
+    from cleanup_sinapi_tables import LimpadorTabelasSinapi
+
+    limpador = LimpadorTabelasSinapi(ctx.supabase)
+    sucesso = limpador.executar_limpeza()
+    if not sucesso:
+        # Banco sem tabelas SINAPI ou tabela que não pôde ser removida:
+        # as importações não dependem dessas tabelas
+        logging.warning("Limpeza sem sucesso completo; seguindo com as importações")
+    return {'sucesso': sucesso, 'tabelas': limpador.tabelas_para_remover}
+
+
+def _insumos(ctx: Contexto) -> Dict[str, Any]:
+    from importar_sinapi import executar_importacao
+
+    relatorio = executar_importacao(ctx.arquivos['insumos'], ctx.supabase, ctx.log_file,
+                                    carga_sem_indices=ctx.carga_sem_indices,
+                                    dados=ctx.carregar('insumos'))
+    if relatorio['status'] == 'ERRO':
+        raise RuntimeError(f"Nenhum registro importado de {ctx.arquivos['insumos']}")
+    return {'status': relatorio['status'], 'total': relatorio['total_registros'],
+            'importados': relatorio['registros_importados'],
+            'erros': relatorio['registros_erro'],
+            'violacoes_qualidade': relatorio['qualidade']['total_violacoes'],
+            'lotes': relatorio.get('lotes')}
+
+
+def _mao_de_obra(ctx: Contexto) -> Dict[str, Any]:
+    from import_sinapi_composicoes_mao_obra import importar_composicoes
+
+    resultado = importar_composicoes(ctx.supabase, ctx.arquivos['mao_de_obra'],
+                                     ctx.carga_sem_indices, ctx.carregar('mao_de_obra'))
+    if resultado['inseridos'] == 0:
+        raise RuntimeError(f"Nenhum registro importado de {ctx.arquivos['mao_de_obra']}")
+    return {'total': resultado['total'], 'importados': resultado['inseridos'],
+            'erros': resultado['erros'],
+            'violacoes_qualidade': resultado['qualidade']['total_violacoes'],
+            'lotes': resultado['lotes']}
+
+
+def _manutencoes(ctx: Contexto) -> Dict[str, Any]:
+    from importar_sinapi_manutencoes import ImportadorSinapiManutencoes
+
+    importador = ImportadorSinapiManutencoes(
+        ctx.arquivos['manutencoes'], ctx.carga_sem_indices, supabase=ctx.supabase)
+    if not importador.executar_importacao(ctx.carregar('manutencoes')):
+        raise RuntimeError("Importação de manutenções falhou ou ficou parcial (ver log)")
+    return {'carga': importador.relatorio_carga, 'lotes': importador.lotes.relatorio()}
+
+
+def _shards(ctx: Contexto) -> Dict[str, Any]:
+    """Grava os shards por UF dos conjuntos importados (sinapi_shards.py)"""
+    from sinapi_shards import atualizar_manifesto, exportar_shards
+
+    entradas = []
+    for nome in ('insumos', 'mao_de_obra'):
+        if nome in ctx.arquivos:
+            entradas += exportar_shards(ctx.carregar(nome), nome, ctx.shards)
+    return {'manifesto': str(atualizar_manifesto(ctx.shards, entradas)),
+            'shards': len(entradas), 'bytes': sum(e['bytes'] for e in entradas)}
+
+
+def _historico(ctx: Contexto) -> Dict[str, Any]:
+    """Registra o mês dos conjuntos importados no histórico local (sinapi_historico.py)"""
+    from sinapi_historico import registrar_importacao
+
+    registrados = []
+    for nome in ('insumos', 'mao_de_obra'):
+        if nome in ctx.arquivos:
+            registrados += registrar_importacao(ctx.historico, ctx.carregar(nome), nome)
+    return {'diretorio': ctx.historico, 'meses': registrados}
+
+
+def _meses_importados(ctx: Contexto, etapa: str) -> List[str]:
+    """Meses ('AAAA-MM-DD') presentes nos dados lidos da importação `etapa`"""
+    dados = ctx.dados.get(etapa)
+    if dados is None or COLUNAS_MES[etapa] not in dados:
+        return []
+    return sorted({str(m)[:10] for m in dados[COLUNAS_MES[etapa]].dropna().unique()})
+
+
+def _verificacao(ctx: Contexto) -> Dict[str, Any]:
+    """Contagem dos meses importados de cada tabela contra o número de linhas enviadas"""
+    verificacao = {}
+    for etapa, tabela in TABELAS.items():
+        if etapa not in ctx.arquivos:
+            continue
+        consulta = ctx.supabase.table(tabela).select('id', count='exact', head=True)
+        # Sem o filtro, os meses anteriores guardados na tabela inflariam a contagem
+        meses = _meses_importados(ctx, etapa)
+        if meses:
+            consulta = consulta.in_(COLUNAS_MES[etapa], meses)
+        resposta = consulta.execute()
+        esperado = ctx.resultados.get(etapa, {}).get('importados')
+        verificacao[tabela] = {
+            'meses': meses,
+            'registros': resposta.count,
+            'esperado': esperado,
+            'status': ('importacao_falhou' if etapa not in ctx.resultados
+                       else 'ok' if esperado is None or resposta.count >= esperado
+                       else 'divergente'),
+        }
+    logging.info(f"Verificação: {verificacao}")
+    return verificacao
+
+
+def montar_grafo(arquivos: Dict[str, str], limpeza: bool = True,
+                 shards: bool = False, historico: bool = False) -> List[Etapa]:
+    """Etapas do grafo para as importações com arquivo informado"""
+    funcoes = {'insumos': _insumos, 'mao_de_obra': _mao_de_obra, 'manutencoes': _manutencoes}
+    # Só manutenções referenciam outros conjuntos (sinapi_integridade.REFERENCIAS)
+    etapas = [Etapa('integridade', _integridade)] if 'manutencoes' in arquivos else []
+    raiz = tuple(e.nome for e in etapas)
+    if limpeza:
+        etapas.append(Etapa('limpeza', _limpeza, raiz, destrutiva=True))
+        raiz = ('limpeza',)
+    importacoes = [Etapa(nome, funcoes[nome], raiz, destrutiva=nome == 'mao_de_obra')
+                   for nome in funcoes if nome in arquivos]
+    etapas += importacoes
+    if importacoes:
+        etapas.append(Etapa('verificacao', _verificacao,
+                            tuple(e.nome for e in importacoes), requer_sucesso=False))
+    fontes = tuple(nome for nome in ('insumos', 'mao_de_obra') if nome in arquivos)
+    if shards and fontes:
+        etapas.append(Etapa('shards', _shards, fontes))
+    if historico and fontes:
+        etapas.append(Etapa('historico', _historico, fontes))
+    return etapas
+
+
+def executar_grafo(etapas: List[Etapa], ctx: Contexto, paralelo: int = 3) -> List[Dict[str, Any]]:
+    """
+    Executa as etapas respeitando as dependências, com até `paralelo`
+    etapas simultâneas
+
+    Returns:
+        Lista (na ordem do grafo) com nome, status ('ok', 'falha' ou
+        'pulada'), inicio_s/fim_s relativos ao início, duracao_s, erro e
+        resultado de cada etapa
+    """
+    por_nome = {e.nome: e for e in etapas}
+    status: Dict[str, Dict[str, Any]] = {}
+    inicio = time.perf_counter()
+    lock = threading.Lock()
+
+    def rodar(etapa: Etapa) -> Dict[str, Any]:
+        registro = {'nome': etapa.nome, 'inicio_s': round(time.perf_counter() - inicio, 3)}
+        logging.info(f"▶ Etapa {etapa.nome} iniciada")
+        try:
+            resultado = etapa.funcao(ctx)
+            with lock:
+                ctx.resultados[etapa.nome] = resultado
+            registro.update(status='ok', resultado=resultado)
+        except Exception as e:
+            logging.exception(f"Etapa {etapa.nome} falhou")
+            registro.update(status='falha', erro=str(e))
+        registro['fim_s'] = round(time.perf_counter() - inicio, 3)
+        registro['duracao_s'] = round(registro['fim_s'] - registro['inicio_s'], 3)
+        logging.info(f"■ Etapa {etapa.nome}: {registro['status']} em {registro['duracao_s']}s")
+        return registro
+
+    pendentes = list(etapas)
+    em_execucao = {}
+    with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix='etapa') as executor:
+        while pendentes or em_execucao:
+            liberadas = 0
+            for etapa in list(pendentes):
+                estados = [status.get(d, {}).get('status') for d in etapa.dependencias]
+                if None in estados:
+                    continue  # dependência ainda não terminou
+                pendentes.remove(etapa)
+                liberadas += 1
+                if etapa.requer_sucesso and any(s != 'ok' for s in estados):
+                    status[etapa.nome] = {'nome': etapa.nome, 'status': 'pulada',
+                                          'erro': 'dependência sem sucesso'}
+                    logging.warning(f"Etapa {etapa.nome} pulada (dependência sem sucesso)")
+                else:
+                    em_execucao[executor.submit(rodar, etapa)] = etapa.nome
+
+            if not em_execucao:
+                if not liberadas:
+                    raise ValueError(f"Dependências inexistentes ou cíclicas: {[e.nome for e in pendentes]}")
+                continue  # etapas puladas podem liberar outras
+            concluidas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidas:
+                status[em_execucao.pop(futuro)] = futuro.result()
+
+    return [status[nome] for nome in por_nome]
+
+
+def relatorio_orquestracao(execucao: List[Dict[str, Any]], duracao_total: float) -> Dict[str, Any]:
+    """Relatório combinado: etapas, ganho do paralelismo e métricas HTTP"""
+    from sinapi_metricas import METRICAS
+
+    soma = sum(e.get('duracao_s', 0) for e in execucao)
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'status': 'SUCESSO' if all(e['status'] == 'ok' for e in execucao) else 'FALHA',
+        'duracao_total_s': round(duracao_total, 3),
+        'soma_etapas_s': round(soma, 3),
+        'ganho_paralelismo': round(soma / duracao_total, 2) if duracao_total else None,
+        'etapas': execucao,
+        'http': METRICAS.resumo(),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Limpeza, importações SINAPI em paralelo e verificação num único processo")
+    parser.add_argument('--pacote', help="ZIP oficial do SINAPI (fonte das três importações)")
+    parser.add_argument('--insumos', help="CSV (ou ZIP) de insumos")
+    parser.add_argument('--mao-de-obra', dest='mao_de_obra', help="Planilha (ou ZIP) de mão de obra")
+    parser.add_argument('--manutencoes', help="Planilha (ou ZIP) de manutenções")
+    parser.add_argument('--sem-limpeza', action='store_true', help="Não roda cleanup_sinapi_tables")
+    parser.add_argument('--carga-sem-indices', action='store_true')
+    parser.add_argument('--sim', action='store_true',
+                        help="Confirma as etapas destrutivas sem perguntar")
+    parser.add_argument('--shards', metavar='DIR',
+                        help="Grava shards de preço por UF após as importações")
+    parser.add_argument('--historico', metavar='DIR',
+                        help="Registra os meses importados no histórico local de preços")
+    parser.add_argument('--integridade-estrita', action='store_true',
+                        help="Cancela tudo se a integridade referencial acusar erros")
+    parser.add_argument('--mes', metavar='AAAA-MM',
+                        help="Mês dos arquivos (padrão: conteúdo ou nome do arquivo)")
+    parser.add_argument('--paralelo', type=int, default=3)
+    parser.add_argument('--plano', action='store_true', help="Só mostra o grafo")
+    parser.add_argument('--profile', action='store_true',
+                        help="Perfis de CPU e alocações por etapa (perfil/)")
+    args = parser.parse_args(argv)
+
+    arquivos = {nome: getattr(args, nome) or args.pacote for nome in TABELAS
+                if getattr(args, nome) or args.pacote}
+    etapas = montar_grafo(arquivos, limpeza=not args.sem_limpeza, shards=bool(args.shards),
+                          historico=bool(args.historico))
+
+    if args.plano or not etapas:
+        for etapa in etapas:
+            print(f"{etapa.nome:12} <- {', '.join(etapa.dependencias) or '-':30} "
+                  f"{'(destrutiva)' if etapa.destrutiva else ''}")
+        return
+
+    destrutivas = [e.nome for e in etapas if e.destrutiva]
+    if destrutivas and not args.sim:
+        print(f"Etapas destrutivas no plano: {', '.join(destrutivas)}. "
+              f"Reexecute com --sim para confirmar.")
+        sys.exit(1)
+
+    # Logs antes dos imports tardios (o importador de manutenções grava em logs/)
+    Path('logs').mkdir(exist_ok=True)
+    log_file = f"logs/orquestracao_sinapi_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s',
+        handlers=[logging.FileHandler(log_file, encoding='utf-8'),
+                  logging.StreamHandler(sys.stdout)])
+
+    from importar_sinapi import conectar_supabase
+    from sinapi_metricas import exportar_ao_sair
+    from sinapi_perfil import ativar_se_pedido
+
+    exportar_ao_sair('sinapi_orquestrador')
+    ativar_se_pedido('sinapi_orquestrador', argv)
+    supabase = conectar_supabase()
+    if not supabase:
+        sys.exit(1)
+
+    ctx = Contexto(supabase, arquivos, args.carga_sem_indices, log_file, args.shards,
+                   args.integridade_estrita, args.historico, args.mes)
+    inicio = time.perf_counter()
+    execucao = executar_grafo(etapas, ctx, args.paralelo)
+    relatorio = relatorio_orquestracao(execucao, time.perf_counter() - inicio)
+
+    caminho = Path(log_file).with_suffix('.json')
+    caminho.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str),
+                       encoding='utf-8')
+
+    print(f"\n{'etapa':12} {'status':7} {'início':>8} {'fim':>8} {'duração':>8}")
+    for etapa in execucao:
+        print(f"{etapa['nome']:12} {etapa['status']:7} {etapa.get('inicio_s', 0):8.1f} "
+              f"{etapa.get('fim_s', 0):8.1f} {etapa.get('duracao_s', 0):8.1f}")
+    print(f"Total {relatorio['duracao_total_s']:.1f}s (soma das etapas {relatorio['soma_etapas_s']:.1f}s, "
+          f"ganho {relatorio['ganho_paralelismo']}x); relatório em {caminho}")
+    sys.exit(0 if relatorio['status'] == 'SUCESSO' else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Carga de sinapi_insumos por Partição Mensal
+===========================================
+
+sinapi_insumos é particionada por mes_referencia (migração
+20261019000000_particionar_sinapi_insumos.sql), uma partição por mês do
+SINAPI. A importação de um mês:
+
+1. Descobre o mês de referência no conteúdo (coluna de mês/data) ou no nome
+   do arquivo (SINAPI_2025_04, ..._202504_..., ..._04_2025, 04-2025)
+2. Esvazia a tabela de carga (RPC sinapi_preparar_carga)
+3. Envia os registros para sinapi_insumos_carga, que não tem índices
+4. Publica o mês (RPC sinapi_publicar_mes): a tabela de carga vira a
+   partição do mês por ATTACH, sem cópia, substituindo a partição anterior
+   do mesmo mês; com erro de envio o mês não é publicado e a partição
+   anterior continua valendo
+
+Remover um mês antigo é DETACH + DROP (sinapi_remover_mes,
+sinapi_reter_meses): só metadados, sem DELETE linha a linha.
+
+Integridade de sinapi_insumo_id (coeficientes_tecnicos, composicao_insumos,
+itens_orcamento), que deixou de ter FK: a publicação remapeia as referências
+do mês substituído para os ids novos pelo código do insumo e é recusada se um
+insumo referenciado faltar na carga ou se houver linhas avulsas do mês na
+partição padrão; a remoção recusa mês referenciado e a retenção o mantém.
+
+Uso (retenção manual):
+    python scripts/sinapi_particoes.py --listar
+    python scripts/sinapi_particoes.py --remover 2024-01 [2024-02 ...]
+    python scripts/sinapi_particoes.py --manter 24
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import logging
+import re
+import sys
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from sinapi_lotes import ControladorLotes, enviar_em_lotes
+
+TABELA = 'sinapi_insumos'
+TABELA_CARGA = 'sinapi_insumos_carga'
+
+# Ano-mês (2025_04, 202504, 2025-04) e mês-ano (04_2025, 042025, 04/2025)
+_ANO_MES = re.compile(r'(?<!\d)(20\d{2})[-_./ ]?(0[1-9]|1[0-2])(?!\d)')
+_MES_ANO = re.compile(r'(?<!\d)(0[1-9]|1[0-2])[-_./ ]?(20\d{2})(?!\d)')
+
+# Colunas do CSV que podem trazer o mês de referência
+_COLUNA_MES = re.compile(r'm[eê]s|refer[eê]ncia|compet[eê]ncia|data', re.IGNORECASE)
+
+# RPC ausente: banco ainda sem a migração de particionamento
+_CODIGOS_SEM_FUNCAO = {'PGRST202', '42883'}
+
+
+class ParticoesIndisponiveis(RuntimeError):
+    """O banco não tem as funções de carga por partição"""
+
+
+def mes_do_texto(texto: Any) -> Optional[str]:
+    """Primeiro ano-mês (ou mês-ano) encontrado no texto, como 'AAAA-MM-01'"""
+    if isinstance(texto, (datetime, date, pd.Timestamp)):
+        return date(texto.year, texto.month, 1).isoformat()
+    texto = str(texto)
+    achado = _ANO_MES.search(texto)
+    if achado:
+        return f'{achado.group(1)}-{achado.group(2)}-01'
+    achado = _MES_ANO.search(texto)
+    if achado:
+        return f'{achado.group(2)}-{achado.group(1)}-01'
+    return None
+
+
+def normalizar_mes(valor: Any) -> str:
+    """
+    Mês de referência como 'AAAA-MM-01' (aceita AAAA-MM, MM/AAAA, datas)
+
+    Raises:
+        ValueError: Se o valor não tiver ano e mês reconhecíveis
+    """
+    mes = mes_do_texto(valor)
+    if mes is None:
+        raise ValueError(f"Mês de referência inválido: {valor!r} (use AAAA-MM)")
+    return mes
+
+
+def mes_do_conteudo(df: pd.DataFrame, amostra: int = 1000) -> Optional[str]:
+    """Mês mais frequente nas colunas de mês/data do CSV (antes do mapeamento)"""
+    for coluna in df.columns:
+        if not _COLUNA_MES.search(str(coluna)):
+            continue
+        meses = df[coluna].dropna().head(amostra).astype(str).map(mes_do_texto).dropna()
+        if not meses.empty:
+            return meses.value_counts().index[0]
+    return None
+
+
+def detectar_mes_referencia(df: Optional[pd.DataFrame] = None, *nomes: Optional[str]) -> Optional[str]:
+    """
+    Mês de referência de um arquivo SINAPI: o conteúdo tem precedência,
+    depois os nomes na ordem dada (membro do ZIP, pacote)
+
+    Returns:
+        'AAAA-MM-01' ou None se não houver pista
+    """
+    if df is not None:
+        mes = mes_do_conteudo(df)
+        if mes:
+            return mes
+    for nome in nomes:
+        if nome:
+            mes = mes_do_texto(nome)
+            if mes:
+                return mes
+    return None
+
+
+def _rpc(supabase, funcao: str, parametros: Optional[Dict[str, Any]] = None) -> Any:
+    try:
+        return supabase.rpc(funcao, parametros or {}).execute().data
+    except Exception as e:
+        if getattr(e, 'code', None) in _CODIGOS_SEM_FUNCAO:
+            raise ParticoesIndisponiveis(
+                f"RPC {funcao} ausente; aplique a migração de particionamento") from e
+        raise
+
+
+def preparar_carga(supabase):
+    """Esvazia sinapi_insumos_carga (resto de uma carga interrompida)"""
+    _rpc(supabase, 'sinapi_preparar_carga')
+
+
+def publicar_mes(supabase, mes: Any) -> Dict[str, Any]:
+    """Transforma a tabela de carga na partição do mês, substituindo a anterior"""
+    return _rpc(supabase, 'sinapi_publicar_mes', {'p_mes': normalizar_mes(mes)}) or {}
+
+
+def remover_mes(supabase, mes: Any) -> bool:
+    """DETACH + DROP da partição do mês; False se o mês não existir (recusada se referenciado)"""
+    return bool(_rpc(supabase, 'sinapi_remover_mes', {'p_mes': normalizar_mes(mes)}))
+
+
+def reter_meses(supabase, manter: int) -> List[str]:
+    """Mantém só os `manter` meses mais recentes e os referenciados; retorna as removidas"""
+    return list(_rpc(supabase, 'sinapi_reter_meses', {'p_manter': int(manter)}) or [])
+
+
+def listar_particoes(supabase) -> List[Dict[str, Any]]:
+    """Partições mensais publicadas (particao, mes, linhas_estimadas)"""
+    return list(_rpc(supabase, 'sinapi_listar_particoes') or [])
+
+
+def carregar_particoes(supabase, dados: pd.DataFrame,
+                       controlador: Optional[ControladorLotes] = None) -> Tuple[int, int, Dict[str, Any]]:
+    """
+    Carrega cada mês de referência dos dados como partição nova de sinapi_insumos
+
+    Args:
+        dados: Registros processados (coluna mes_referencia 'AAAA-MM-01')
+        controlador: Controlador de lotes de sinapi_insumos
+
+    Returns:
+        Tuple com (registros_importados, registros_erro, relatório da carga)
+
+    Raises:
+        ParticoesIndisponiveis: Se o banco não tiver a migração (nada foi enviado)
+    """
+    controlador = controlador or ControladorLotes(TABELA)
+    inicio = time.perf_counter()
+    importados = erros = 0
+    particoes = []
+
+    for mes, grupo in dados.groupby(dados['mes_referencia'].astype(str), sort=True):
+        mes = normalizar_mes(mes)
+        inicio_mes = time.perf_counter()
+        preparar_carga(supabase)
+        ok, falhos = enviar_em_lotes(supabase, TABELA_CARGA, grupo, controlador)
+        importados, erros = importados + ok, erros + falhos
+        item = {'mes': mes, 'registros': len(grupo), 'importados': ok, 'erros': falhos}
+
+        if falhos:
+            # Partição pela metade não entra: o mês anterior continua publicado
+            logging.error(f"Mês {mes[:7]} não publicado: {falhos} registro(s) com erro na carga")
+            item['publicado'] = False
+        else:
+            try:
+                item.update(publicar_mes(supabase, mes), publicado=True)
+            except ParticoesIndisponiveis:
+                raise
+            except Exception as e:
+                # Recusa do banco (insumo referenciado fora da carga, linhas avulsas do
+                # mês): nada foi publicado e a partição anterior continua valendo
+                motivo = getattr(e, 'message', None) or str(e)
+                logging.error(f"Mês {mes[:7]} não publicado: {motivo}")
+                importados, erros = importados - ok, erros + ok
+                item.update(importados=0, erros=ok, publicado=False, erro=motivo)
+            else:
+                remapeadas = item.get('referencias_remapeadas') or 0
+                logging.info(f"Mês {mes[:7]} publicado em {item.get('particao')} ({ok} registros"
+                             f"{', substituindo a partição anterior' if item.get('substituida') else ''}"
+                             f"{f', {remapeadas} referência(s) remapeada(s)' if remapeadas else ''})")
+        item['tempo_s'] = round(time.perf_counter() - inicio_mes, 3)
+        particoes.append(item)
+
+    relatorio = {'tabela': TABELA, 'modo': 'particoes', 'particoes': particoes,
+                 'tempo_carga_s': round(time.perf_counter() - inicio, 3)}
+    return importados, erros, relatorio
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Partições mensais de sinapi_insumos")
+    parser.add_argument('--listar', action='store_true', help="Lista os meses publicados")
+    parser.add_argument('--remover', nargs='+', metavar='AAAA-MM', help="Remove meses (DETACH + DROP)")
+    parser.add_argument('--manter', type=int, metavar='N', help="Mantém só os N meses mais recentes")
+    args = parser.parse_args(argv)
+    if not (args.listar or args.remover or args.manter):
+        parser.error("informe --listar, --remover ou --manter")
+    if args.manter is not None and args.manter < 1:
+        parser.error("--manter precisa ser ao menos 1")
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from importar_sinapi import conectar_supabase
+    supabase = conectar_supabase()
+    if not supabase:
+        sys.exit(1)
+
+    recusados = 0
+    try:
+        for mes in args.remover or []:
+            try:
+                removido = remover_mes(supabase, mes)
+            except ParticoesIndisponiveis:
+                raise
+            except Exception as e:
+                # Mês ainda referenciado por sinapi_insumo_id
+                logging.error(f"{normalizar_mes(mes)[:7]}: remoção recusada: "
+                              f"{getattr(e, 'message', None) or e}")
+                recusados += 1
+                continue
+            logging.info(f"{normalizar_mes(mes)[:7]}: {'removido' if removido else 'sem partição'}")
+        if args.manter:
+            removidas = reter_meses(supabase, args.manter)
+            logging.info(f"Retenção de {args.manter} mês(es): {len(removidas)} partição(ões) removida(s) "
+                         f"{removidas}")
+            mantidas = listar_particoes(supabase)[:-args.manter]
+            if mantidas:
+                logging.warning(f"{len(mantidas)} partição(ões) além das {args.manter} mais recentes "
+                                f"mantida(s) por referências: {[p['particao'] for p in mantidas]}")
+        if args.listar:
+            for particao in listar_particoes(supabase):
+                print(f"{str(particao['mes'])[:7]}  {particao['particao']:28} "
+                      f"~{particao['linhas_estimadas']} linhas")
+    except (ParticoesIndisponiveis, ValueError) as e:
+        logging.error(str(e))
+        sys.exit(1)
+    if recusados:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
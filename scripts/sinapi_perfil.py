@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Perfilamento Detalhado das Importações (--profile)
+=================================================
+
+Quando uma importação regride, os totais por etapa não dizem qual função
+esquentou nem onde a memória foi alocada. Com --profile:
+
+- cProfile por etapa (leitura, cabecalhos, mapeamento, processamento,
+  serializacao, upload); etapas aninhadas pausam o perfil da etapa externa
+- Amostragem da pilha (thread auxiliar, a cada INTERVALO_AMOSTRAGEM) em
+  formato "collapsed stacks", com a etapa como raiz
+- tracemalloc: diferença de snapshots na primeira execução de cada etapa,
+  com as TOP_N linhas que mais alocaram
+
+Sem --profile, etapa() devolve um contexto nulo compartilhado e
+@perfilar custa uma chamada de função extra.
+
+Saída em perfil/<script>_<timestamp>/:
+- <etapa>.prof          pstats (snakeviz, flameprof, pstats); no 3.12+, etapa que
+                        correu junto com outra pode ficar sem (perfil_cpu falso)
+- flamegraph.folded     flamegraph.pl, inferno ou speedscope
+- alocacoes.txt         top-N alocações por etapa
+- resumo.json           chamadas, tempo, funções mais caras e memória por etapa
+
+Com pacotes ZIP, os membros processados em subprocessos (sinapi_zip) não
+entram no perfil: só o tempo total da etapa de leitura.
+
+Uso (resumo de um perfil gravado):
+    python scripts/sinapi_perfil.py perfil/importar_sinapi_20250101_120000/resumo.json
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import atexit
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+TOP_N = 20
+INTERVALO_AMOSTRAGEM = 0.005  # s
+QUADROS_TRACEMALLOC = 1  # mais quadros multiplicam o custo do tracemalloc (10 quadros: ~20x)
+
+_CONTEXTO_NULO = contextlib.nullcontext()
+
+
+def _ligar(perfil: cProfile.Profile):
+    try:
+        perfil.enable()
+    except ValueError:
+        # Python 3.12+: um único profiler ativo por processo; as etapas
+        # concorrentes ficam só com a amostragem de pilha
+        pass
+
+
+def _estatisticas(perfis: List[cProfile.Profile]) -> Optional[pstats.Stats]:
+    """Soma os perfis de uma etapa; None se nenhum chegou a coletar (3.12+)"""
+    estatisticas = None
+    for perfil in perfis:
+        perfil.create_stats()
+        if not perfil.stats:
+            continue
+        if estatisticas is None:
+            estatisticas = pstats.Stats(perfil, stream=io.StringIO())
+        else:
+            estatisticas.add(perfil)
+    return estatisticas
+
+
+class _Etapa:
+    """Contexto de uma etapa perfilada (uma instância por entrada)"""
+
+    def __init__(self, perfilador: 'Perfilador', nome: str):
+        self.perfilador = perfilador
+        self.nome = nome
+        self.snapshot = None
+
+    def __enter__(self):
+        p = self.perfilador
+        self.thread = threading.get_ident()
+        with p._lock:
+            pilha = p._pilhas.setdefault(self.thread, [])
+            primeira = self.nome not in p._memoria
+            if primeira:
+                p._memoria[self.nome] = None
+            p._chamadas[self.nome] += 1
+        if pilha:
+            p._perfil(pilha[-1], self.thread).disable()
+        if primeira:
+            self.snapshot = tracemalloc.take_snapshot()
+        pilha.append(self.nome)
+        self.inicio = time.perf_counter()
+        _ligar(p._perfil(self.nome, self.thread))
+        return self
+
+    def __exit__(self, *exc):
+        p = self.perfilador
+        p._perfil(self.nome, self.thread).disable()
+        duracao = time.perf_counter() - self.inicio
+        pilha = p._pilhas[self.thread]
+        pilha.pop()
+        if self.snapshot is not None:
+            diferenca = tracemalloc.take_snapshot().compare_to(self.snapshot, 'lineno')
+            with p._lock:
+                p._memoria[self.nome] = [d for d in diferenca if d.size_diff > 0][:p.top_n]
+        with p._lock:
+            p._tempos[self.nome] += duracao
+        if pilha:
+            _ligar(p._perfil(pilha[-1], self.thread))
+        return False
+
+
+class Perfilador:
+    """Perfis de CPU, pilhas amostradas e alocações por etapa"""
+
+    def __init__(self):
+        self.ativo = False
+        self.top_n = TOP_N
+        self._lock = threading.Lock()
+        self._perfis: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._pilhas: Dict[int, List[str]] = {}
+        self._chamadas: Counter = Counter()
+        self._tempos: Counter = Counter()
+        self._memoria: Dict[str, Optional[list]] = {}
+        self._amostras: Counter = Counter()
+        self._parar = threading.Event()
+        self._amostrador: Optional[threading.Thread] = None
+
+    def ativar(self, nome_execucao: str, diretorio: Optional[str] = None,
+               top_n: int = TOP_N, intervalo: float = INTERVALO_AMOSTRAGEM):
+        """Liga o perfilamento até finalizar()"""
+        if self.ativo:
+            return
+        self.ativo = True
+        self.top_n = top_n
+        self.nome_execucao = nome_execucao
+        self.diretorio = Path(diretorio or Path('perfil') /
+                              f"{nome_execucao}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self.intervalo = intervalo
+        self._parar.clear()
+        tracemalloc.start(QUADROS_TRACEMALLOC)
+        self._amostrador = threading.Thread(target=self._amostrar, name='perfil-amostrador',
+                                            daemon=True)
+        self._amostrador.start()
+        logging.info(f"Perfilamento ativo ({self.diretorio})")
+
+    def etapa(self, nome: str):
+        """Contexto que perfila o bloco como a etapa `nome` (nulo se inativo)"""
+        if not self.ativo:
+            return _CONTEXTO_NULO
+        return _Etapa(self, nome)
+
+    def _perfil(self, nome: str, thread: int) -> cProfile.Profile:
+        # Um Profile por etapa e thread: o cProfile não é reentrante entre threads
+        chave = (nome, thread)
+        perfil = self._perfis.get(chave)
+        if perfil is None:
+            with self._lock:
+                perfil = self._perfis.setdefault(chave, cProfile.Profile())
+        return perfil
+
+    def _amostrar(self):
+        """Registra a pilha de cada thread que está dentro de uma etapa"""
+        while not self._parar.wait(self.intervalo):
+            quadros = sys._current_frames()
+            for thread, pilha in list(self._pilhas.items()):
+                try:
+                    etapa = pilha[-1]
+                    quadro = quadros[thread]
+                except (IndexError, KeyError):
+                    continue
+                funcoes = []
+                while quadro is not None:
+                    codigo = quadro.f_code
+                    funcoes.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}"
+                                   f":{codigo.co_firstlineno})")
+                    quadro = quadro.f_back
+                self._amostras[';'.join([etapa] + funcoes[::-1])] += 1
+
+    def finalizar(self) -> Optional[Path]:
+        """Para a coleta e grava os arquivos; devolve o diretório de saída"""
+        if not self.ativo:
+            return None
+        self.ativo = False
+        self._parar.set()
+        if self._amostrador:
+            self._amostrador.join()
+        tracemalloc.stop()
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+
+        resumo = {'execucao': self.nome_execucao, 'etapas': {}}
+        alocacoes = []
+        for nome in sorted(self._chamadas, key=lambda n: -self._tempos[n]):
+            estatisticas = _estatisticas(
+                [p for (etapa, _), p in self._perfis.items() if etapa == nome])
+            if estatisticas is None:
+                logging.warning(f"Perfil {nome}: sem dados de cProfile (outro profiler ativo); "
+                                f"só a amostragem de pilha")
+                funcoes = []
+            else:
+                estatisticas.dump_stats(str(self.diretorio / f'{nome}.prof'))
+                funcoes = sorted(estatisticas.stats.items(), key=lambda item: -item[1][3])
+            memoria = self._memoria.get(nome) or []
+            resumo['etapas'][nome] = {
+                'chamadas': self._chamadas[nome],
+                'tempo_s': round(self._tempos[nome], 4),
+                'perfil_cpu': estatisticas is not None,
+                'funcoes': [{'funcao': f"{os.path.basename(arquivo)}:{linha}({funcao})",
+                             'chamadas': total, 'tempo_proprio_s': round(proprio, 4),
+                             'tempo_acumulado_s': round(acumulado, 4)}
+                            for (arquivo, linha, funcao), (_, total, proprio, acumulado, _)
+                            in funcoes[:self.top_n]],
+                'memoria_primeira_chamada_kb': round(sum(d.size_diff for d in memoria) / 1024, 1),
+            }
+            alocacoes.append(f"== {nome} (primeira chamada) ==")
+            alocacoes += [f"{d.size_diff / 1024:10.1f} KiB {d.count_diff:8} blocos  {d.traceback}"
+                          for d in memoria]
+            alocacoes.append('')
+
+        (self.diretorio / 'flamegraph.folded').write_text(
+            ''.join(f'{pilha} {n}\n' for pilha, n in self._amostras.most_common()),
+            encoding='utf-8')
+        (self.diretorio / 'alocacoes.txt').write_text('\n'.join(alocacoes), encoding='utf-8')
+        (self.diretorio / 'resumo.json').write_text(
+            json.dumps(resumo, indent=2, ensure_ascii=False), encoding='utf-8')
+
+        for nome, etapa in resumo['etapas'].items():
+            mais_cara = etapa['funcoes'][0]['funcao'] if etapa['funcoes'] else '-'
+            logging.info(f"Perfil {nome}: {etapa['chamadas']} chamada(s), {etapa['tempo_s']}s, "
+                         f"{etapa['memoria_primeira_chamada_kb']} KiB na 1ª; mais cara: {mais_cara}")
+        logging.info(f"Perfil salvo em {self.diretorio}")
+        return self.diretorio
+
+
+# Perfilador único do processo
+PERFIL = Perfilador()
+
+
+def etapa(nome: str):
+    """Atalho para PERFIL.etapa"""
+    return PERFIL.etapa(nome)
+
+
+def perfilar(nome: str):
+    """Decorador: cada chamada da função conta como a etapa `nome`"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not PERFIL.ativo:
+                return funcao(*args, **kwargs)
+            with _Etapa(PERFIL, nome):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def ativar_se_pedido(nome_execucao: str, argv: Optional[List[str]] = None) -> bool:
+    """Liga o perfilamento se --profile estiver nos argumentos e grava no fim do processo"""
+    if '--profile' not in (sys.argv if argv is None else argv):
+        return False
+    PERFIL.ativar(nome_execucao)
+    atexit.register(PERFIL.finalizar)
+    return True
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Resumo de um perfil gravado com --profile")
+    parser.add_argument('resumo', help="resumo.json do diretório do perfil")
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    resumo = json.loads(Path(args.resumo).read_text(encoding='utf-8'))
+    for nome, dados in resumo['etapas'].items():
+        print(f"\n{nome}: {dados['chamadas']} chamada(s), {dados['tempo_s']}s, "
+              f"{dados['memoria_primeira_chamada_kb']} KiB alocados na 1ª")
+        for funcao in dados['funcoes'][:args.top]:
+            print(f"  {funcao['tempo_acumulado_s']:9.4f}s acum {funcao['tempo_proprio_s']:9.4f}s próprio "
+                  f"{funcao['chamadas']:8}x  {funcao['funcao']}")
+
+
+if __name__ == "__main__":
+    main()
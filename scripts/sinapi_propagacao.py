@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Propagação Incremental de Preços SINAPI até os Orçamentos
+=========================================================
+
+Índice de dependências reverso insumo → composições → orçamentos. Dado um
+conjunto de codigo_do_insumo alterados, recalcula apenas as composições e
+os orçamentos afetados e devolve o delta, para que a reprecificação mensal
+escale com o tamanho da mudança e não com o tamanho do catálogo.
+
+- Insumo → composições: índice reverso do MotorCustos (sinapi_custos.py)
+- Composição → itens de orçamento: itens ordenados por composição com
+  ponteiros de início (estilo CSR)
+- Totais dos orçamentos mantidos em cache e atualizados só pelo delta
+
+Autor: Equipe ObrasAI
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from sinapi_custos import MotorCustos
+from sinapi_dtypes import ESTADOS
+
+
+class IndiceOrcamentos:
+    """Índice reverso composição → itens de orçamento, com totais em cache"""
+
+    def __init__(self, motor: MotorCustos, itens: pd.DataFrame):
+        """
+        Args:
+            motor: Motor de custos já calculado
+            itens: DataFrame com orcamento_id, codigo_composicao, quantidade e
+                uf (sigla da UF usada para precificar o item)
+        """
+        self.motor = motor
+        codigos = itens['codigo_composicao'].astype(str).str.strip().to_numpy(dtype=str)
+        posicoes = np.searchsorted(motor.composicoes, codigos).clip(
+            max=max(len(motor.composicoes) - 1, 0))
+        conhecidos = motor.composicoes[posicoes] == codigos
+        if not conhecidos.all():
+            logging.warning(
+                f"{int((~conhecidos).sum())} item(ns) de orçamento com composição desconhecida ignorado(s)")
+
+        uf = itens['uf'].astype(str).str.upper().to_numpy()
+        uf_posicao = pd.Index(ESTADOS).get_indexer(uf)
+        validos = conhecidos & (uf_posicao >= 0)
+
+        self.orcamentos, orcamento_posicao = np.unique(
+            itens['orcamento_id'].to_numpy()[validos], return_inverse=True)
+
+        # Itens ordenados por composição + ponteiros: itens da composição c
+        # ficam em ordem[inicio[c]:inicio[c + 1]]
+        comp = posicoes[validos]
+        ordem = np.argsort(comp, kind='stable')
+        self._comp = comp[ordem]
+        self._uf = uf_posicao[validos][ordem]
+        self._quantidade = pd.to_numeric(
+            itens['quantidade'], errors='coerce').to_numpy(dtype=np.float64)[validos][ordem]
+        self._orcamento = orcamento_posicao[ordem]
+        self._inicio = np.searchsorted(self._comp, np.arange(len(motor.composicoes) + 1))
+
+        custos = motor.custos_de()
+        self.totais = np.bincount(
+            self._orcamento,
+            weights=self._quantidade * custos[self._comp, self._uf],
+            minlength=len(self.orcamentos))
+
+    def itens_de(self, linhas_composicao: np.ndarray) -> np.ndarray:
+        """Posições (no índice) dos itens que usam as composições informadas"""
+        if not len(linhas_composicao):
+            return np.zeros(0, dtype=np.int64)
+        inicios = self._inicio[linhas_composicao]
+        fins = self._inicio[linhas_composicao + 1]
+        tamanhos = fins - inicios
+        # Concatena os intervalos [inicio, fim) sem laço Python
+        deslocamento = np.repeat(inicios - np.cumsum(tamanhos) + tamanhos, tamanhos)
+        return deslocamento + np.arange(tamanhos.sum())
+
+
+def propagar_alteracoes(motor: MotorCustos, indice: IndiceOrcamentos,
+                        precos_alterados: pd.DataFrame) -> Dict:
+    """
+    Aplica preços alterados e propaga até os orçamentos
+
+    Args:
+        motor: Motor de custos (é atualizado no lugar)
+        indice: Índice de orçamentos construído sobre o mesmo motor
+        precos_alterados: DataFrame com codigo_do_insumo e colunas preco_xx
+
+    Returns:
+        Dict com 'composicoes' (delta longo por composição/UF), 'orcamentos'
+        (orcamento_id, total_anterior, total_atual, variacao dos orçamentos
+        afetados) e 'estatisticas'
+    """
+    resultado = motor.atualizar_precos(precos_alterados)
+    linhas = resultado['linhas']
+
+    itens = indice.itens_de(linhas)
+    # Linha de cada item dentro das matrizes anterior/atual (linhas é ordenado)
+    k = np.searchsorted(linhas, indice._comp[itens])
+    uf = indice._uf[itens]
+    variacao_item = indice._quantidade[itens] * (
+        resultado['atual'][k, uf] - resultado['anterior'][k, uf])
+
+    afetados = np.unique(indice._orcamento[itens])
+    variacao = np.bincount(indice._orcamento[itens], weights=variacao_item,
+                           minlength=len(indice.orcamentos))[afetados]
+
+    anterior = indice.totais[afetados].copy()
+    indice.totais[afetados] = anterior + variacao
+    # Total anterior indefinido (preço ausente) só se resolve recalculando os itens
+    indefinidos = afetados[np.isnan(indice.totais[afetados])]
+    if indefinidos.size:
+        custos = motor.custos_de()
+        todos = np.isin(indice._orcamento, indefinidos)
+        indice.totais[indefinidos] = np.bincount(
+            indice._orcamento[todos],
+            weights=indice._quantidade[todos] * custos[indice._comp[todos], indice._uf[todos]],
+            minlength=len(indice.orcamentos))[indefinidos]
+
+    orcamentos = pd.DataFrame({
+        'orcamento_id': indice.orcamentos[afetados],
+        'total_anterior': anterior,
+        'total_atual': indice.totais[afetados],
+    })
+    orcamentos['variacao'] = orcamentos['total_atual'] - orcamentos['total_anterior']
+
+    estatisticas = {
+        'composicoes_recalculadas': int(len(linhas)),
+        'custos_alterados': int(len(resultado['delta'])),
+        'itens_reprecificados': int(len(itens)),
+        'orcamentos_afetados': int(len(afetados)),
+    }
+    logging.info(f"Propagação concluída: {estatisticas}")
+    return {'composicoes': resultado['delta'], 'orcamentos': orcamentos,
+            'estatisticas': estatisticas}
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Regras de Qualidade dos Preços SINAPI antes da Importação
+========================================================
+
+Roda todas as regras numa única passada vetorizada sobre a matriz
+código × UF (× regime de desoneração) montada a partir das colunas
+preco_xx (sinapi_insumos) ou preco_sem_xx/preco_com_xx
+(sinapi_composicoes_mao_obra), e devolve um relatório compacto de violações
+para anexar ao resultado da importação.
+
+Regras:
+- preco_negativo / preco_zero: valores impossíveis
+- sem_precos: código sem nenhum preço em nenhuma UF
+- zscore_uf: z-score robusto (mediana/MAD do log do preço) entre as UFs da
+  mesma linha
+- fora_da_mediana: preço mais de FATOR_MEDIANA vezes acima ou abaixo da
+  mediana nacional da linha
+- com_acima_sem: preço COM desoneração maior que o SEM na mesma UF
+- regime_ausente: UF com preço em apenas um dos regimes
+- preco_unidade: mediana da linha implausível para a unidade (z-score
+  robusto entre os códigos da mesma unidade)
+
+Uso:
+    python scripts/sinapi_qualidade.py <arquivo.csv> [--saida violacoes.csv]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sinapi_dtypes import ESTADOS, restaurar_precos
+from sinapi_perfil import perfilar
+
+# Limites das regras
+Z_MAXIMO = 3.5
+FATOR_MEDIANA = 10.0
+TOLERANCIA_REGIME = 0.005
+MAD_MINIMO = 0.1  # ~10% no log: linhas quase constantes só acusam desvios acima de ~40%
+DESVIO_MINIMO = 0.10  # R$: arredondamento de centavos em preços ínfimos não é outlier
+MINIMO_POR_UNIDADE = 20
+AMOSTRAS_POR_REGRA = 5
+
+COLUNAS_CODIGO = ['codigo_do_insumo', 'codigo_composicao', 'codigo_sinapi']
+
+# Prefixo das colunas de cada regime
+REGIMES = {
+    'unico': 'preco_',
+    'sem': 'preco_sem_',
+    'com': 'preco_com_',
+}
+
+
+def montar_matriz(dados: pd.DataFrame) -> Tuple[List[str], np.ndarray]:
+    """
+    Monta o cubo regimes × linhas × UFs (NaN onde não há coluna ou valor)
+
+    Returns:
+        Tuple com (nomes dos regimes presentes, array float64)
+    """
+    regimes, camadas = [], []
+    for regime, prefixo in REGIMES.items():
+        colunas = [f'{prefixo}{estado.lower()}' for estado in ESTADOS]
+        presentes = [c for c in colunas if c in dados.columns]
+        if not presentes:
+            continue
+        camada = np.full((len(dados), len(ESTADOS)), np.nan)
+        indices = [colunas.index(c) for c in presentes]
+        camada[:, indices] = restaurar_precos(dados[presentes]).apply(
+            pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        regimes.append(regime)
+        camadas.append(camada)
+
+    if not camadas:
+        return [], np.empty((0, len(dados), len(ESTADOS)))
+    return regimes, np.stack(camadas)
+
+
+def _z_robusto(valores: np.ndarray, eixo: int) -> np.ndarray:
+    """(x - mediana) / (1.4826 * MAD) ao longo do eixo, ignorando NaN"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        mediana = np.nanmedian(valores, axis=eixo, keepdims=True)
+        mad = np.nanmedian(np.abs(valores - mediana), axis=eixo, keepdims=True)
+    return (valores - mediana) / np.maximum(1.4826 * mad, MAD_MINIMO)
+
+
+@perfilar('qualidade')
+def verificar_qualidade(dados: pd.DataFrame, coluna_codigo: Optional[str] = None,
+                        coluna_unidade: Optional[str] = 'unidade') -> Tuple[Dict, pd.DataFrame]:
+    """
+    Aplica as regras de qualidade a um DataFrame de preços
+
+    Args:
+        dados: DataFrame de insumos ou de composições de mão de obra
+        coluna_codigo: Coluna do código (padrão: a primeira conhecida presente)
+        coluna_unidade: Coluna da unidade (None desliga a regra preco_unidade)
+
+    Returns:
+        Tuple com (relatório compacto, DataFrame longo de violações com
+        codigo, regra, regime, uf, valor e referencia — a mediana da linha,
+        o preço SEM desoneração ou a mediana da unidade, conforme a regra)
+    """
+    inicio = time.perf_counter()
+    if coluna_codigo is None:
+        coluna_codigo = next((c for c in COLUNAS_CODIGO if c in dados.columns), None)
+    codigos = (dados[coluna_codigo].astype(str).to_numpy() if coluna_codigo
+               else np.arange(len(dados)).astype(str))
+
+    regimes, cubo = montar_matriz(dados)
+    estados = np.array(ESTADOS)
+    partes = []
+
+    def registrar(regra: str, mascara: np.ndarray, referencia: np.ndarray):
+        """Converte uma máscara regimes × linhas × UFs em violações longas"""
+        r, linha, uf = np.nonzero(mascara)
+        if len(linha):
+            partes.append(pd.DataFrame({
+                'codigo': codigos[linha],
+                'regra': regra,
+                'regime': np.array(regimes, dtype=object)[r],
+                'uf': estados[uf],
+                'valor': cubo[r, linha, uf],
+                'referencia': np.broadcast_to(referencia, cubo.shape)[r, linha, uf],
+            }))
+
+    if len(regimes):
+        positivos = np.where(cubo > 0, cubo, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            mediana_linha = np.nanmedian(positivos, axis=2, keepdims=True)
+
+        registrar('preco_negativo', cubo < 0, np.float64(0))
+        registrar('preco_zero', cubo == 0, np.float64(0))
+
+        # Dispersão entre UFs da mesma linha, no log do preço
+        z = _z_robusto(np.log(positivos), eixo=2)
+        registrar('zscore_uf',
+                  (np.abs(z) > Z_MAXIMO) & (np.abs(cubo - mediana_linha) >= DESVIO_MINIMO),
+                  mediana_linha)
+
+        razao = positivos / mediana_linha
+        registrar('fora_da_mediana',
+                  (razao > FATOR_MEDIANA) | (razao < 1 / FATOR_MEDIANA), mediana_linha)
+
+        # Linha sem nenhum preço em nenhum regime/UF
+        sem_precos = np.isnan(cubo).all(axis=(0, 2))
+        if sem_precos.any():
+            linhas = np.flatnonzero(sem_precos)
+            partes.append(pd.DataFrame({
+                'codigo': codigos[linhas], 'regra': 'sem_precos', 'regime': None,
+                'uf': None, 'valor': np.nan, 'referencia': np.nan}))
+
+        # Consistência entre regimes (COM desoneração não deve custar mais)
+        if 'sem' in regimes and 'com' in regimes:
+            sem, com = cubo[regimes.index('sem')], cubo[regimes.index('com')]
+            mascara = np.zeros_like(cubo, dtype=bool)
+            mascara[regimes.index('com')] = com > sem * (1 + TOLERANCIA_REGIME)
+            registrar('com_acima_sem', mascara, cubo[[regimes.index('sem')]])
+
+            mascara = np.zeros_like(cubo, dtype=bool)
+            mascara[regimes.index('sem')] = np.isnan(sem) != np.isnan(com)
+            registrar('regime_ausente', mascara, np.float64(np.nan))
+
+        # Plausibilidade preço × unidade: mediana da linha entre códigos da mesma unidade
+        if coluna_unidade and coluna_unidade in dados.columns:
+            nivel = pd.Series(np.log(mediana_linha[0, :, 0]))
+            unidade = dados[coluna_unidade].astype(str).str.strip().str.upper().to_numpy()
+            grupo = nivel.groupby(unidade)
+            centro = grupo.transform('median')
+            mad = (nivel - centro).abs().groupby(unidade).transform('median')
+            tamanho = grupo.transform('count')
+            z_unidade = ((nivel - centro) / np.maximum(1.4826 * mad, MAD_MINIMO)).to_numpy()
+            suspeitos = (np.abs(z_unidade) > Z_MAXIMO) & (tamanho.to_numpy() >= MINIMO_POR_UNIDADE)
+            if suspeitos.any():
+                linhas = np.flatnonzero(suspeitos)
+                partes.append(pd.DataFrame({
+                    'codigo': codigos[linhas], 'regra': 'preco_unidade',
+                    'regime': None, 'uf': None,
+                    'valor': np.exp(nivel.to_numpy()[linhas]),
+                    'referencia': np.exp(centro.to_numpy()[linhas])}))
+
+    colunas = ['codigo', 'regra', 'regime', 'uf', 'valor', 'referencia']
+    violacoes = (pd.concat(partes, ignore_index=True) if partes
+                 else pd.DataFrame(columns=colunas))[colunas]
+
+    por_regra = violacoes.groupby('regra').size()
+    amostras = {
+        regra: grupo.head(AMOSTRAS_POR_REGRA).replace({np.nan: None}).to_dict('records')
+        for regra, grupo in violacoes.groupby('regra')
+    }
+    relatorio = {
+        'linhas_verificadas': int(len(dados)),
+        'regimes': regimes,
+        'total_violacoes': int(len(violacoes)),
+        'codigos_afetados': int(violacoes['codigo'].nunique()),
+        'violacoes_por_regra': {k: int(v) for k, v in por_regra.items()},
+        'violacoes_por_uf': {k: int(v) for k, v in
+                             violacoes.dropna(subset=['uf']).groupby('uf').size().items()},
+        'amostras': amostras,
+        'duracao_s': round(time.perf_counter() - inicio, 3),
+    }
+    logging.info(
+        f"Qualidade: {relatorio['total_violacoes']} violações em "
+        f"{relatorio['codigos_afetados']} códigos ({relatorio['violacoes_por_regra']}) "
+        f"em {relatorio['duracao_s']}s")
+    return relatorio, violacoes
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Regras de qualidade dos preços SINAPI (sem importar)")
+    parser.add_argument('arquivo', help="CSV SINAPI de insumos (formato do importador)")
+    parser.add_argument('--saida', default='violacoes_sinapi.csv')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from importar_sinapi import (ler_csv_sinapi, limpar_nomes_colunas,
+                                 mapear_colunas_sinapi, processar_dados_sinapi)
+
+    try:
+        df = limpar_nomes_colunas(ler_csv_sinapi(args.arquivo))
+        relatorio, violacoes = verificar_qualidade(
+            processar_dados_sinapi(df, mapear_colunas_sinapi(df)))
+        violacoes.to_csv(args.saida, index=False)
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str))
+        logging.info(f"Violações salvas em {args.saida}")
+    except Exception as e:
+        logging.error(f"Erro na verificação de qualidade: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Reconciliação Origem × Banco por Árvore de Hashes (Merkle)
+=========================================================
+
+Depois de uma importação com falha parcial, descobre quais linhas faltam,
+sobram ou diferem sem baixar a tabela inteira:
+
+- Cada linha vira um hash de 60 bits (md5 do texto canônico das colunas),
+  calculado igual no pandas e no Postgres
+- O hash de uma faixa de chaves (ordem "C") é a soma dos hashes mod 2^64,
+  obtida no banco com um único SELECT agregado por nível da árvore
+- Só as faixas divergentes são subdivididas (FANOUT faixas pelos quantis das
+  chaves da origem); faixas pequenas baixam apenas (chave, hash) das linhas
+- Resultado: chaves a inserir, atualizar e excluir
+
+Os dois lados implementam a mesma interface (agregados e linhas por faixa):
+LadoDataFrame para os dados processados e LadoSupabase para a tabela via
+RPC execute_sql. Comparar dois DataFrames (ex.: dois dumps) também funciona.
+
+Nas tabelas com um mês por carga (insumos, mão de obra) a chave inclui
+mes_referencia e o lado do banco só lê os meses da origem (ou o de --mes):
+os meses anteriores guardados na tabela não viram exclusões.
+
+Uso:
+    python scripts/sinapi_reconciliacao.py <tabela> <arquivo> [--mes AAAA-MM] [--saida reconciliacao.json]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sys
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sinapi_dtypes import ESTADOS
+
+FANOUT = 16
+LIMITE_FOLHA = 64
+MODULO = 2 ** 64
+
+# Chave (colunas e tipos), colunas comparadas e coluna de mês (que limita o
+# lado do banco aos meses da origem) de cada tabela SINAPI.
+# Tipos: texto, inteiro, numero (2 casas), booleano, data
+PERFIS = {
+    'sinapi_insumos': {
+        'chave': {'codigo_do_insumo': 'texto', 'mes_referencia': 'data'},
+        'mes': 'mes_referencia',
+        'colunas': {'descricao_do_insumo': 'texto', 'unidade': 'texto',
+                    **{f'preco_{e.lower()}': 'numero' for e in ESTADOS}},
+    },
+    'sinapi_composicoes_mao_obra': {
+        'chave': {'codigo_composicao': 'texto', 'mes_referencia': 'data'},
+        'mes': 'mes_referencia',
+        'colunas': {'descricao': 'texto', 'unidade': 'texto',
+                    **{f'preco_sem_{e.lower()}': 'numero' for e in ESTADOS},
+                    **{f'preco_com_{e.lower()}': 'numero' for e in ESTADOS}},
+    },
+    'sinapi_manutencoes': {
+        'chave': {'codigo_sinapi': 'inteiro', 'data_referencia': 'data',
+                  'tipo_manutencao': 'texto'},
+        'colunas': {'tipo': 'texto', 'descricao': 'texto'},
+    },
+}
+
+Faixa = Tuple[Optional[str], Optional[str]]
+CENTAVOS = Decimal('0.01')
+
+
+def _duas_casas(valor: float) -> str:
+    """
+    round(valor::numeric, 2)::text do Postgres: arredonda o decimal escrito
+    (1.005 -> 1.01, -1.005 -> -1.01), não o binário como o round do numpy
+    (1.005 -> 1.00); o zero sai sem sinal, como no numeric
+    """
+    return str(Decimal(str(float(valor))).quantize(CENTAVOS, rounding=ROUND_HALF_UP) + 0)
+
+
+def _texto_python(serie: pd.Series, tipo: str) -> pd.Series:
+    """Texto canônico de uma coluna, igual ao produzido por _texto_sql"""
+    if tipo == 'numero':
+        valores = pd.to_numeric(serie, errors='coerce').astype(np.float64)
+        return valores.map(lambda v: '' if np.isnan(v) else _duas_casas(v))
+    if tipo == 'inteiro':
+        valores = pd.to_numeric(serie, errors='coerce').astype('Int64')
+        return valores.astype(str).where(valores.notna(), '')
+    if tipo == 'booleano':
+        return serie.map(lambda v: '' if pd.isna(v) else ('true' if v else 'false'))
+    if tipo == 'data':
+        datas = pd.to_datetime(serie, errors='coerce')
+        return datas.dt.strftime('%Y-%m-%d').where(datas.notna(), '')
+    return serie.astype(object).where(serie.notna(), '').astype(str)
+
+
+def _texto_sql(coluna: str, tipo: str) -> str:
+    if tipo == 'numero':
+        return f"coalesce(round({coluna}::numeric, 2)::text, '')"
+    return f"coalesce({coluna}::text, '')"
+
+
+def _concatenar(partes: List[pd.Series]) -> pd.Series:
+    texto = partes[0]
+    for parte in partes[1:]:
+        texto = texto + '|' + parte
+    return texto
+
+
+def _literal(valor: Optional[str]) -> str:
+    return 'NULL' if valor is None else "'" + valor.replace("'", "''") + "'"
+
+
+class LadoDataFrame:
+    """Linhas em memória com chaves ordenadas e somas prefixadas dos hashes"""
+
+    def __init__(self, dados: pd.DataFrame, chave: Dict[str, str], colunas: Dict[str, str]):
+        chaves = _concatenar([_texto_python(dados[c], t) for c, t in chave.items()])
+        linhas = _concatenar([chaves] + [
+            _texto_python(dados[c], t) if c in dados.columns else pd.Series('', index=dados.index)
+            for c, t in colunas.items()])
+        hashes = np.fromiter(
+            (int(hashlib.md5(l.encode('utf-8')).hexdigest()[:15], 16) for l in linhas),
+            dtype=np.uint64, count=len(linhas))
+
+        chaves = chaves.to_numpy(dtype=str)
+        ordem = np.argsort(chaves, kind='stable')
+        self.chaves = chaves[ordem]
+        self.hashes = hashes[ordem]
+        # Soma prefixada com estouro natural do uint64 = soma mod 2^64
+        self._prefixo = np.concatenate([[np.uint64(0)], np.cumsum(self.hashes, dtype=np.uint64)])
+        self.consultas = 0
+
+    def _posicoes(self, faixa: Faixa) -> Tuple[int, int]:
+        inicio, fim = faixa
+        lo = 0 if inicio is None else int(np.searchsorted(self.chaves, inicio, side='left'))
+        hi = len(self.chaves) if fim is None else int(np.searchsorted(self.chaves, fim, side='left'))
+        return lo, hi
+
+    def agregados(self, faixas: Sequence[Faixa]) -> List[Tuple[int, int]]:
+        """(linhas, soma dos hashes mod 2^64) de cada faixa [inicio, fim)"""
+        self.consultas += 1
+        resultado = []
+        for faixa in faixas:
+            lo, hi = self._posicoes(faixa)
+            resultado.append((hi - lo, (int(self._prefixo[hi]) - int(self._prefixo[lo])) % MODULO))
+        return resultado
+
+    def linhas(self, faixas: Sequence[Faixa]) -> List[Tuple[str, int]]:
+        """(chave, hash) de todas as linhas das faixas"""
+        self.consultas += 1
+        resultado = []
+        for faixa in faixas:
+            lo, hi = self._posicoes(faixa)
+            resultado.extend(zip(self.chaves[lo:hi].tolist(), self.hashes[lo:hi].tolist()))
+        return resultado
+
+    def dividir(self, faixa: Faixa, partes: int) -> List[Faixa]:
+        """Subdivide a faixa pelos quantis das próprias chaves"""
+        lo, hi = self._posicoes(faixa)
+        cortes = sorted({self.chaves[lo + k * (hi - lo) // partes] for k in range(1, partes)}
+                        - {faixa[0]})
+        limites = [faixa[0], *cortes, faixa[1]]
+        return list(zip(limites[:-1], limites[1:]))
+
+
+class LadoSupabase:
+    """Tabela no banco: agregados e linhas por faixa via RPC execute_sql"""
+
+    def __init__(self, supabase, tabela: str, chave: Dict[str, str], colunas: Dict[str, str],
+                 coluna_mes: Optional[str] = None, meses: Optional[Sequence[str]] = None):
+        from sinapi_indices import _validar_nome, executar_sql
+        from sinapi_particoes import normalizar_mes
+
+        self.supabase = supabase
+        self._executar_sql = executar_sql
+        self.tabela = _validar_nome(tabela)
+        for coluna in [*chave, *colunas]:
+            _validar_nome(coluna)
+
+        chave_sql = " || '|' || ".join(_texto_sql(c, t) for c, t in chave.items())
+        linha_sql = " || '|' || ".join(
+            [f'({chave_sql})'] + [_texto_sql(c, t) for c, t in colunas.items()])
+        self._subconsulta = (
+            f"SELECT ({chave_sql}) COLLATE \"C\" AS chave, "
+            f"('x' || substr(md5({linha_sql}), 1, 15))::bit(60)::bigint AS h "
+            f"FROM public.{self.tabela}")
+        if coluna_mes and meses:
+            # Nas tabelas particionadas o filtro também poda as partições
+            literais = ', '.join(_literal(normalizar_mes(m)) for m in meses)
+            self._subconsulta += f" WHERE {_validar_nome(coluna_mes)} IN ({literais})"
+        self.consultas = 0
+
+    def _com_faixas(self, faixas: Sequence[Faixa], selecao: str, sufixo: str) -> str:
+        valores = ', '.join(f"({i}, {_literal(ini)}::text, {_literal(fim)}::text)"
+                            for i, (ini, fim) in enumerate(faixas))
+        return (
+            f"WITH faixas(i, inicio, fim) AS (VALUES {valores}) "
+            f"SELECT {selecao} FROM faixas f LEFT JOIN ({self._subconsulta}) t "
+            f"ON (f.inicio IS NULL OR t.chave >= f.inicio COLLATE \"C\") "
+            f"AND (f.fim IS NULL OR t.chave < f.fim COLLATE \"C\") {sufixo};")
+
+    def agregados(self, faixas: Sequence[Faixa]) -> List[Tuple[int, int]]:
+        self.consultas += 1
+        linhas = self._executar_sql(self.supabase, self._com_faixas(
+            faixas, "f.i, count(t.chave) AS linhas, "
+                    "(coalesce(sum(t.h), 0) % 18446744073709551616)::text AS hash",
+            "GROUP BY f.i ORDER BY f.i"))
+        return [(int(l['linhas']), int(l['hash'])) for l in linhas]
+
+    def linhas(self, faixas: Sequence[Faixa]) -> List[Tuple[str, int]]:
+        self.consultas += 1
+        linhas = self._executar_sql(self.supabase, self._com_faixas(
+            faixas, "t.chave, t.h::text AS hash", "WHERE t.chave IS NOT NULL"))
+        return [(l['chave'], int(l['hash'])) for l in linhas]
+
+
+def reconciliar(origem: LadoDataFrame, destino, fanout: int = FANOUT,
+                limite_folha: int = LIMITE_FOLHA) -> Dict:
+    """
+    Compara origem e destino descendo só pelas faixas divergentes
+
+    Args:
+        origem: Dados processados (define os cortes das faixas)
+        destino: LadoSupabase (ou outro LadoDataFrame)
+        fanout: Subfaixas por faixa divergente
+        limite_folha: Faixas com até esse nº de linhas em algum dos lados
+            são comparadas linha a linha
+
+    Returns:
+        Dict com 'inserir', 'atualizar', 'excluir' (chaves canônicas; nas
+        chaves compostas as partes são separadas por '|'), 'duplicadas'
+        (chaves repetidas no destino) e 'estatisticas'
+    """
+    inicio = time.perf_counter()
+    pendentes: List[Faixa] = [(None, None)]
+    inserir, atualizar, excluir, duplicadas = [], [], [], []
+    niveis = linhas_baixadas = 0
+
+    while pendentes:
+        niveis += 1
+        agregados_origem = origem.agregados(pendentes)
+        agregados_destino = destino.agregados(pendentes)
+
+        folhas, proximos = [], []
+        for faixa, (n_o, h_o), (n_d, h_d) in zip(pendentes, agregados_origem, agregados_destino):
+            if n_o == n_d and h_o == h_d:
+                continue
+            subfaixas = origem.dividir(faixa, fanout) if min(n_o, n_d) > limite_folha else []
+            if len(subfaixas) > 1:
+                proximos.extend(subfaixas)
+            else:
+                folhas.append(faixa)
+
+        if folhas:
+            linhas_origem = dict(origem.linhas(folhas))
+            linhas_destino = destino.linhas(folhas)
+            linhas_baixadas += len(linhas_destino)
+
+            vistas: Dict[str, int] = {}
+            for chave, hash_destino in linhas_destino:
+                if chave in vistas:
+                    duplicadas.append(chave)
+                    continue
+                vistas[chave] = hash_destino
+                if chave not in linhas_origem:
+                    excluir.append(chave)
+                elif linhas_origem[chave] != hash_destino:
+                    atualizar.append(chave)
+            inserir.extend(c for c in linhas_origem if c not in vistas)
+
+        pendentes = proximos
+
+    estatisticas = {
+        'linhas_origem': int(len(origem.chaves)),
+        'niveis': niveis,
+        'consultas_destino': destino.consultas,
+        'linhas_baixadas': linhas_baixadas,
+        'duracao_s': round(time.perf_counter() - inicio, 3),
+    }
+    logging.info(
+        f"Reconciliação: {len(inserir)} a inserir, {len(atualizar)} a atualizar, "
+        f"{len(excluir)} a excluir ({estatisticas})")
+    return {'inserir': sorted(inserir), 'atualizar': sorted(atualizar),
+            'excluir': sorted(excluir), 'duplicadas': sorted(set(duplicadas)),
+            'estatisticas': estatisticas}
+
+
+def _carregar_origem(tabela: str, arquivo: str, mes: Optional[str] = None) -> pd.DataFrame:
+    """Dados processados pelo importador correspondente à tabela"""
+    if tabela == 'sinapi_insumos':
+        # Mesmo pipeline da importação: ZIP, regime e mês pelo conteúdo ou nome do arquivo
+        from importar_sinapi import carregar_dados_sinapi
+        return carregar_dados_sinapi(arquivo, mes_referencia=mes)
+    if tabela == 'sinapi_composicoes_mao_obra':
+        from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra
+        return carregar_mao_de_obra(arquivo, mes)
+    if tabela == 'sinapi_manutencoes':
+        from importar_sinapi_manutencoes import ImportadorSinapiManutencoes
+        importador = ImportadorSinapiManutencoes(arquivo)
+        return importador.processar_dados(importador.ler_planilha())
+    raise ValueError(f"Tabela sem perfil de reconciliação: {tabela}")
+
+
+def meses_da_origem(dados: pd.DataFrame, coluna_mes: str, mes: Optional[str] = None) -> List[str]:
+    """Meses ('AAAA-MM-DD') presentes na origem, ou só `mes` quando informado"""
+    if mes:
+        from sinapi_particoes import normalizar_mes
+        return [normalizar_mes(mes)]
+    return sorted(set(_texto_python(dados[coluna_mes], 'data')) - {''})
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Reconciliação de uma tabela SINAPI com o arquivo de origem")
+    parser.add_argument('tabela', choices=sorted(PERFIS))
+    parser.add_argument('arquivo', help="Arquivo de origem (CSV, planilha ou ZIP)")
+    parser.add_argument('--mes', metavar='AAAA-MM',
+                        help="Mês reconciliado (padrão: os meses presentes na origem)")
+    parser.add_argument('--saida', default='reconciliacao_sinapi.json')
+    args = parser.parse_args(argv)
+    if args.mes and 'mes' not in PERFIS[args.tabela]:
+        parser.error(f"--mes não se aplica a {args.tabela}")
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from importar_sinapi import conectar_supabase
+
+    try:
+        perfil = PERFIS[args.tabela]
+        supabase = conectar_supabase()
+        if not supabase:
+            sys.exit(1)
+
+        dados = _carregar_origem(args.tabela, args.arquivo, args.mes)
+        coluna_mes = perfil.get('mes')
+        meses = None
+        if coluna_mes:
+            meses = meses_da_origem(dados, coluna_mes, args.mes)
+            datas = _texto_python(dados[coluna_mes], 'data')
+            dados = dados[datas.isin(meses)]
+            logging.info(f"Meses reconciliados: {meses}")
+
+        origem = LadoDataFrame(dados, perfil['chave'], perfil['colunas'])
+        destino = LadoSupabase(supabase, args.tabela, perfil['chave'], perfil['colunas'],
+                               coluna_mes, meses)
+        resultado = reconciliar(origem, destino)
+
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        logging.info(f"Resultado salvo em {args.saida}")
+    except Exception as e:
+        logging.error(f"Erro na reconciliação: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
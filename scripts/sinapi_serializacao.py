@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Serialização Colunar dos Lotes SINAPI para o Corpo JSON do PostgREST
+===================================================================
+
+Os importadores enviavam cada lote como lista de dicts: to_dict('records'),
+um laço com pd.isna por chave para trocar NaN por None e, por fim, o
+json.dumps do httpx. Aqui o lote vai direto das colunas para o corpo da
+requisição:
+
+- Encoder C do pandas (to_json orient='records'), sem dict por linha
+- NaN/None/NaT/pd.NA viram null na própria codificação
+- Preços float32 restaurados para o valor exato em centavos antes
+- POST do corpo pronto em /rest/v1/{tabela} (URL e chave do cliente),
+  com Prefer: return=minimal
+
+Uso (benchmark do caminho antigo contra o colunar):
+    python scripts/sinapi_serializacao.py [--tamanhos 100 1000 10000] [--repeticoes 5]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from sinapi_dtypes import ESTADOS, compactar_dataframe, restaurar_precos
+from sinapi_perfil import perfilar
+
+CONTENT_TYPE_JSON = 'application/json'
+# Mesmo timeout padrão do postgrest-py (s)
+TIMEOUT_PADRAO = 120
+
+
+@perfilar('serializacao')
+def serializar_registros(df: pd.DataFrame) -> bytes:
+    """
+    Serializa o DataFrame como array JSON de objetos (um por linha)
+
+    Args:
+        df: Lote com os nomes de coluna da tabela de destino
+
+    Returns:
+        Corpo UTF-8 pronto para o POST; valores ausentes viram null
+    """
+    return restaurar_precos(df).to_json(
+        orient='records', force_ascii=False, date_format='iso').encode('utf-8')
+
+
+def serializar_registros_dicts(df: pd.DataFrame) -> bytes:
+    """Caminho antigo (to_dict + pd.isna por valor + json.dumps), mantido para comparação"""
+    registros = restaurar_precos(df).to_dict('records')
+    for registro in registros:
+        for chave, valor in registro.items():
+            if pd.isna(valor):
+                registro[chave] = None
+    return json.dumps(registros).encode('utf-8')
+
+
+_sessoes: Dict[str, Any] = {}
+_lock_sessoes = threading.Lock()
+
+
+def _sessao_rest(supabase):
+    """
+    httpx.Client (keep-alive) da URL REST do projeto, um por processo
+
+    Se o cliente Supabase foi instrumentado (instrumentar_cliente), a sessão
+    registra no mesmo coletor de métricas.
+    """
+    import httpx
+
+    url_rest = f"{str(supabase.supabase_url).rstrip('/')}/rest/v1"
+    with _lock_sessoes:
+        sessao = _sessoes.get(url_rest)
+        if sessao is None:
+            timeout = getattr(supabase.options, 'postgrest_client_timeout', None) or TIMEOUT_PADRAO
+            sessao = _sessoes[url_rest] = httpx.Client(base_url=url_rest, timeout=timeout)
+        if getattr(sessao, '_metricas', None) is None:
+            metricas = getattr(supabase.postgrest.session, '_metricas', None)
+            if metricas is not None:
+                from sinapi_metricas import instrumentar_sessao
+                instrumentar_sessao(sessao, metricas)
+    return sessao
+
+
+@perfilar('upload')
+def inserir_json(supabase, tabela: str, corpo: bytes):
+    """
+    Insere um corpo JSON já serializado na tabela
+
+    POST direto em {SUPABASE_URL}/rest/v1/{tabela} com a chave do cliente
+    (apikey + Bearer); o insert() do postgrest-py só aceita objetos Python.
+
+    Args:
+        supabase: Cliente Supabase
+        tabela: Nome da tabela
+        corpo: Array JSON de objetos (serializar_registros)
+
+    Returns:
+        Resposta httpx (2xx)
+
+    Raises:
+        APIError: Se o PostgREST responder com erro (status HTTP em .status)
+    """
+    from postgrest.exceptions import APIError
+
+    cabecalhos = {
+        'apikey': supabase.supabase_key,
+        'Authorization': f'Bearer {supabase.supabase_key}',
+        'Content-Type': CONTENT_TYPE_JSON,
+        'Prefer': 'return=minimal',
+    }
+    resposta = _sessao_rest(supabase).post(f'/{tabela}', content=corpo, headers=cabecalhos)
+
+    if not resposta.is_success:
+        try:
+            erro = resposta.json()
+        except ValueError:
+            erro = {'message': resposta.text}
+        if not isinstance(erro, dict):
+            erro = {'message': str(erro)}
+        erro.setdefault('code', str(resposta.status_code))
+        excecao = APIError(erro)
+        # O code do PostgREST (ex.: 57014) esconde o status HTTP (413, 504...)
+        excecao.status = resposta.status_code
+        raise excecao
+    return resposta
+
+
+def _lote_sintetico(linhas: int, semente: int = 42) -> pd.DataFrame:
+    """Lote no formato de sinapi_insumos, com 10% de preços ausentes"""
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame({
+        'codigo_do_insumo': rng.integers(1000, 99999, linhas).astype(str),
+        'descricao_do_insumo': rng.choice([
+            'CIMENTO PORTLAND COMPOSTO CP II-32', 'AREIA MEDIA - POSTO JAZIDA/FORNECEDOR',
+            'PEDREIRO COM ENCARGOS COMPLEMENTARES', 'TUBO PVC, SOLDAVEL, DN 25 MM, ÁGUA FRIA'],
+            linhas),
+        'unidade': rng.choice(['KG', 'M3', 'UN', 'H'], linhas),
+        'mes_referencia': '2025-04-01',
+    })
+    for estado in ESTADOS:
+        precos = np.round(rng.uniform(1, 5000, linhas), 2)
+        precos[rng.random(linhas) < 0.1] = np.nan
+        df[f'preco_{estado.lower()}'] = precos
+    return compactar_dataframe(df)
+
+
+def comparar_serializadores(tamanhos: Sequence[int] = (100, 1000, 10000),
+                            repeticoes: int = 5) -> List[Dict]:
+    """
+    Mede linhas/s e MB/s dos dois caminhos para cada tamanho de lote
+
+    Returns:
+        Lista de dicts com linhas, caminho, linhas_por_segundo, mb_por_segundo
+        e bytes (os dois corpos são conferidos como JSON equivalente)
+    """
+    resultados = []
+    for linhas in tamanhos:
+        lote = _lote_sintetico(linhas)
+        corpos = {}
+        for nome, funcao in (('dicts', serializar_registros_dicts),
+                             ('colunar', serializar_registros)):
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                corpos[nome] = funcao(lote)
+            duracao = (time.perf_counter() - inicio) / repeticoes
+            resultados.append({
+                'linhas': linhas,
+                'caminho': nome,
+                'linhas_por_segundo': round(linhas / duracao),
+                'mb_por_segundo': round(len(corpos[nome]) / duracao / 1024**2, 1),
+                'bytes': len(corpos[nome]),
+            })
+        if json.loads(corpos['dicts']) != json.loads(corpos['colunar']):
+            raise AssertionError(f"Corpos divergentes para lote de {linhas} linhas")
+    return resultados
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark da serialização de lotes SINAPI (dicts x colunar)")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    resultados = pd.DataFrame(comparar_serializadores(args.tamanhos, args.repeticoes))
+    print(resultados.to_string(index=False))
+
+    por_tamanho = resultados.pivot(index='linhas', columns='caminho', values='linhas_por_segundo')
+    for linhas, linha in por_tamanho.iterrows():
+        logging.info(f"Lote de {linhas}: colunar {linha['colunar'] / linha['dicts']:.1f}x mais rápido")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Shards Binários de Preço por UF para Carga Sob Demanda
+======================================================
+
+Quem orça em um estado só usa uma das 27 colunas preco_*, mas o frontend e
+as edge functions buscam as linhas inteiras de sinapi_insumos e
+sinapi_composicoes_mao_obra. Esta etapa, depois das importações, grava um
+arquivo por UF (e por regime de desoneração, na mão de obra) com apenas
+código e preço, ~1/27 dos dados:
+
+    <saida>/insumos/SP.bin
+    <saida>/mao_de_obra/sem/SP.bin, <saida>/mao_de_obra/com/SP.bin
+    <saida>/manifest.json      registros, bytes e CRC32 de cada shard
+
+Formato (little-endian, tamanho fixo, mapeável em memória):
+
+    0   4s   magico b'SNPS'
+    4   u16  versao (1)
+    6   u16  tamanho do cabeçalho (64)
+    8   2s   UF
+    10  3s   regime ('sem', 'com' ou vazio)
+    13  16s  conjunto ('insumos', 'mao_de_obra')
+    29  10s  mes_referencia (AAAA-MM-DD)
+    39  u32  n (registros)
+    43  u32  CRC32 do corpo
+    64  u32[n] códigos em ordem crescente
+    64+4n  i32[n] preços em centavos, alinhados aos códigos
+
+Códigos sem preço na UF ficam fora do shard; a consulta de um código é uma
+busca binária (np.searchsorted) direto sobre o arquivo mapeado.
+
+Uso:
+    python scripts/sinapi_shards.py --insumos insumos.csv --mao-de-obra mao_de_obra.xlsx --saida shards/ \
+        [--mes 2025-04]
+    python scripts/sinapi_shards.py --consultar shards/insumos/SP.bin 88316 88309
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sinapi_dtypes import ESTADOS, restaurar_precos
+
+MAGICO = b'SNPS'
+VERSAO = 1
+CABECALHO = struct.Struct('<4sHH2s3s16s10sII17x')
+MAXIMO_CENTAVOS = np.iinfo(np.int32).max
+MAXIMO_CODIGO = np.iinfo(np.uint32).max
+
+# conjunto -> (coluna de código, {regime: prefixo das colunas de preço})
+CONJUNTOS = {
+    'insumos': ('codigo_do_insumo', {'': 'preco_'}),
+    'mao_de_obra': ('codigo_composicao', {'sem': 'preco_sem_', 'com': 'preco_com_'}),
+}
+
+
+def _texto(valor: bytes) -> str:
+    return valor.rstrip(b'\0').decode('ascii')
+
+
+def escrever_shard(caminho: Path, codigos: np.ndarray, centavos: np.ndarray, uf: str,
+                   regime: str, conjunto: str, mes_referencia: str) -> Dict[str, Any]:
+    """
+    Grava um shard (códigos já ordenados e únicos); a troca do arquivo é
+    atômica, então leitores nunca veem um shard pela metade
+
+    Returns:
+        Entrada do manifesto (arquivo, registros, bytes, crc32)
+    """
+    corpo = codigos.astype('<u4').tobytes() + centavos.astype('<i4').tobytes()
+    crc = zlib.crc32(corpo)
+    cabecalho = CABECALHO.pack(MAGICO, VERSAO, CABECALHO.size, uf.encode('ascii'),
+                               regime.encode('ascii'), conjunto.encode('ascii'),
+                               str(mes_referencia)[:10].encode('ascii'), len(codigos), crc)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix('.tmp')
+    temporario.write_bytes(cabecalho + corpo)
+    os.replace(temporario, caminho)
+    return {'conjunto': conjunto, 'regime': regime, 'uf': uf, 'arquivo': caminho.as_posix(),
+            'registros': int(len(codigos)), 'bytes': CABECALHO.size + len(corpo), 'crc32': crc}
+
+
+def exportar_shards(dados: pd.DataFrame, conjunto: str, saida: str,
+                    mes_referencia: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Grava os shards de um conjunto (um por UF e regime) a partir da saída
+    do importador
+
+    Args:
+        dados: processar_dados_sinapi (insumos) ou transform_data (mão de obra)
+        conjunto: Chave de CONJUNTOS
+        saida: Diretório raiz dos shards
+        mes_referencia: Mês gravado no cabeçalho (padrão: coluna mes_referencia)
+
+    Returns:
+        Entradas do manifesto, uma por shard
+    """
+    coluna_codigo, regimes = CONJUNTOS[conjunto]
+    if mes_referencia is None:
+        mes_referencia = str(dados['mes_referencia'].iloc[0]) if 'mes_referencia' in dados and len(dados) else ''
+
+    codigos = pd.to_numeric(dados[coluna_codigo].astype(str).str.strip(), errors='coerce')
+    validos = codigos.notna() & (codigos >= 0) & (codigos <= MAXIMO_CODIGO)
+    if not validos.all():
+        logging.warning(f"Shards {conjunto}: {int((~validos).sum())} código(s) não numérico(s) ignorado(s)")
+
+    # Código repetido: vale a última linha, como nos comparadores
+    base = restaurar_precos(dados[validos].assign(_codigo=codigos[validos].astype(np.uint32)))
+    base = base.drop_duplicates('_codigo', keep='last').sort_values('_codigo', kind='stable')
+    ordenados = base['_codigo'].to_numpy(np.uint32)
+
+    entradas = []
+    for regime, prefixo in regimes.items():
+        for uf in ESTADOS:
+            coluna = f'{prefixo}{uf.lower()}'
+            if coluna not in base:
+                continue
+            centavos = np.rint(pd.to_numeric(base[coluna], errors='coerce').to_numpy(np.float64) * 100)
+            com_preco = ~np.isnan(centavos)
+            if (np.abs(centavos[com_preco]) > MAXIMO_CENTAVOS).any():
+                raise ValueError(f"Preço fora do intervalo int32 (centavos) em {coluna}")
+            caminho = Path(saida) / conjunto / regime / f'{uf}.bin'
+            entradas.append(escrever_shard(caminho, ordenados[com_preco],
+                                           centavos[com_preco].astype(np.int32),
+                                           uf, regime, conjunto, mes_referencia))
+    logging.info(f"Shards {conjunto}: {len(entradas)} arquivo(s), {len(ordenados)} código(s), "
+                 f"{sum(e['bytes'] for e in entradas) / 1024:.0f} KiB em {saida}")
+    return entradas
+
+
+def atualizar_manifesto(saida: str, entradas: List[Dict[str, Any]]) -> Path:
+    """Substitui no manifest.json as entradas dos conjuntos exportados agora"""
+    caminho = Path(saida) / 'manifest.json'
+    try:
+        manifesto = json.loads(caminho.read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        manifesto = {'shards': []}
+    conjuntos = {e['conjunto'] for e in entradas}
+    manifesto['versao'] = VERSAO
+    manifesto['gerado_em'] = datetime.now().isoformat(timespec='seconds')
+    manifesto['shards'] = [e for e in manifesto['shards'] if e['conjunto'] not in conjuntos] + entradas
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(json.dumps(manifesto, indent=2, ensure_ascii=False), encoding='utf-8')
+    return caminho
+
+
+class ShardPrecos:
+    """
+    Shard mapeado em memória; códigos e centavos são visões do arquivo,
+    sem cópia
+
+    Exemplo:
+        with ShardPrecos('shards/insumos/SP.bin') as shard:
+            shard.preco(88316)
+    """
+
+    def __init__(self, caminho: str, verificar: bool = True):
+        self.caminho = Path(caminho)
+        self._arquivo = open(self.caminho, 'rb')
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        (magico, versao, tamanho, uf, regime, conjunto, mes,
+         n, self.crc32) = CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO or versao != VERSAO:
+            self.fechar()
+            raise ValueError(f"{caminho} não é um shard SINAPI v{VERSAO}")
+        self.uf, self.regime, self.conjunto, self.mes_referencia = map(_texto, (uf, regime, conjunto, mes))
+        self.codigos = np.frombuffer(self._mapa, dtype='<u4', count=n, offset=tamanho)
+        self.centavos = np.frombuffer(self._mapa, dtype='<i4', count=n, offset=tamanho + 4 * n)
+        if verificar and zlib.crc32(self._mapa[tamanho:tamanho + 8 * n]) != self.crc32:
+            self.fechar()
+            raise ValueError(f"CRC32 divergente em {caminho}")
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def preco(self, codigo: int) -> Optional[float]:
+        """Preço do código na UF do shard (None se ausente)"""
+        if not 0 <= codigo <= MAXIMO_CODIGO:
+            return None
+        # Chave no dtype do arquivo: com int64 o numpy converteria o array inteiro
+        chave = np.uint32(codigo)
+        i = int(np.searchsorted(self.codigos, chave))
+        if i < len(self.codigos) and self.codigos[i] == chave:
+            return int(self.centavos[i]) / 100
+        return None
+
+    def precos(self, codigos: Iterable[int]) -> np.ndarray:
+        """Preços de vários códigos de uma vez (NaN para os ausentes)"""
+        procurados = np.asarray(codigos if isinstance(codigos, np.ndarray) else list(codigos),
+                                dtype=np.int64)
+        resultado = np.full(len(procurados), np.nan)
+        validos = np.flatnonzero((procurados >= 0) & (procurados <= MAXIMO_CODIGO))
+        chaves = procurados[validos].astype(np.uint32)
+        posicoes = np.minimum(np.searchsorted(self.codigos, chaves), max(len(self.codigos) - 1, 0))
+        if len(self.codigos):
+            achados = self.codigos[posicoes] == chaves
+            resultado[validos[achados]] = self.centavos[posicoes[achados]] / 100
+        return resultado
+
+    def fechar(self):
+        # As visões numpy precisam sair antes do mmap fechar
+        self.codigos = self.centavos = None
+        self._mapa.close()
+        self._arquivo.close()
+
+    def __enter__(self) -> 'ShardPrecos':
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Shards binários de preço por UF (e regime)")
+    parser.add_argument('--insumos', help="CSV (ou ZIP) de insumos")
+    parser.add_argument('--mao-de-obra', dest='mao_de_obra', help="Planilha (ou ZIP) de mão de obra")
+    parser.add_argument('--saida', default='shards')
+    parser.add_argument('--mes', metavar='AAAA-MM',
+                        help="Mês dos arquivos (padrão: conteúdo ou nome do arquivo)")
+    parser.add_argument('--consultar', nargs='+', metavar=('SHARD', 'CODIGO'),
+                        help="Consulta códigos em um shard gravado")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.consultar:
+        with ShardPrecos(args.consultar[0]) as shard:
+            print(f"{shard.conjunto} {shard.regime or '-'} {shard.uf} {shard.mes_referencia}: "
+                  f"{len(shard)} códigos")
+            for codigo in args.consultar[1:]:
+                print(f"  {codigo}: {shard.preco(int(codigo))}")
+        return
+
+    if not (args.insumos or args.mao_de_obra):
+        parser.error("informe --insumos e/ou --mao-de-obra (ou --consultar)")
+
+    inicio = time.perf_counter()
+    entradas = []
+    if args.insumos:
+        from importar_sinapi import carregar_dados_sinapi
+        entradas += exportar_shards(carregar_dados_sinapi(args.insumos, mes_referencia=args.mes),
+                                    'insumos', args.saida)
+    if args.mao_de_obra:
+        from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra
+        entradas += exportar_shards(carregar_mao_de_obra(args.mao_de_obra, args.mes),
+                                    'mao_de_obra', args.saida)
+    manifesto = atualizar_manifesto(args.saida, entradas)
+    logging.info(f"{len(entradas)} shard(s) em {time.perf_counter() - inicio:.1f}s; manifesto {manifesto}")
+    sys.exit(0 if entradas else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Índice de Validade de Códigos SINAPI
+====================================
+
+Responde "este código é válido na data X e o que o substitui?" para lotes
+inteiros de códigos, a partir do histórico de manutenções importado por
+importar_sinapi_manutencoes.py, sem uma consulta .in() seguida de uma
+consulta por código inválido como na edge function validate-sinapi-batch.
+
+- Eventos ordenados por chave (tipo, código, mês) em arrays int64, com
+  consulta vetorizada por np.searchsorted
+- Ciclo de vida por código: CRIAÇÃO/INÍCIO DIVULGAÇÃO abre um intervalo de
+  validade e DESATIVAÇÃO/COMPOSIÇÃO DESATIVADA fecha; códigos sem evento de
+  criação existiam antes do histórico
+- Alternativas para códigos desativados pelo índice de descrições
+  (sinapi_busca.py), filtradas por tipo e validade na mesma data
+
+Uso:
+    python scripts/sinapi_validade.py <manutencoes.xlsx|.zip> <codigos.csv>
+        [--coluna-codigo codigo] [--data 2025-04-01] [--alternativas] [--saida validacao.csv]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from sinapi_busca import IndiceDescricoes, normalizar_texto
+from sinapi_zip import eh_zip, ler_membro, listar_membros
+
+# Mesma aba/colunas lidas por importar_sinapi_manutencoes.py
+PADRAO_ZIP = '*manutenc*.xlsx'
+COLUNAS_PLANILHA = {
+    'Referência': 'data_referencia',
+    'Tipo': 'tipo',
+    'Código': 'codigo_sinapi',
+    'Descrição': 'descricao',
+    'Manutenção': 'tipo_manutencao',
+}
+
+# Efeito de cada tipo de manutenção no ciclo de vida (prefixo normalizado)
+EVENTOS_ABERTURA = ('criacao', 'inicio divulgacao')
+EVENTOS_FECHAMENTO = ('desativacao', 'composicao desativada')
+
+ABERTURA, ALTERACAO, FECHAMENTO = 1, 0, -1
+
+# Chave int64: tipo << 52 | código << 16 | mês (ano * 12 + mês - 1)
+_BITS_MES = 16
+_BITS_CODIGO = 36
+
+CANDIDATOS_ALTERNATIVA = 10
+
+
+def _mes(datas) -> np.ndarray:
+    """Ordinal do mês (ano * 12 + mês - 1) de uma data ou array de datas"""
+    datas = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(datas)))
+    return (datas.year * 12 + datas.month - 1).to_numpy(dtype=np.int64)
+
+
+def _efeito(tipo_manutencao: str) -> int:
+    texto = normalizar_texto(tipo_manutencao)
+    if texto.startswith(EVENTOS_FECHAMENTO):
+        return FECHAMENTO
+    if texto.startswith(EVENTOS_ABERTURA):
+        return ABERTURA
+    return ALTERACAO
+
+
+class IndiceValidade:
+    """Histórico de manutenções em arrays ordenados para validação em lote"""
+
+    def __init__(self, manutencoes: pd.DataFrame):
+        """
+        Args:
+            manutencoes: Registros do importador de manutenções (data_referencia,
+                tipo, codigo_sinapi, descricao, tipo_manutencao)
+        """
+        df = manutencoes.dropna(subset=['data_referencia', 'codigo_sinapi'])
+        self.tipos = np.array(sorted(df['tipo'].astype(str).str.upper().unique()), dtype=object)
+
+        tipo = pd.Index(self.tipos).get_indexer(df['tipo'].astype(str).str.upper())
+        codigo = df['codigo_sinapi'].to_numpy(dtype=np.int64)
+        mes = _mes(df['data_referencia'])
+        manutencao = pd.Categorical(df['tipo_manutencao'].astype(str))
+        efeito = np.array([_efeito(c) for c in manutencao.categories], dtype=np.int8)
+
+        chaves = self._chave(tipo, codigo, mes)
+        # Mesmo mês: aberturas, depois alterações e fechamentos por último
+        ordem = np.lexsort((-efeito[manutencao.codes], chaves))
+        self._chaves = chaves[ordem]
+        self._manutencao = pd.Categorical.from_codes(
+            manutencao.codes[ordem], manutencao.categories)
+        self._descricao = df['descricao'].astype(str).to_numpy(dtype=object)[ordem]
+
+        # Só os eventos que mudam o estado do código
+        ciclo = efeito[self._manutencao.codes] != ALTERACAO
+        self._chaves_ciclo = self._chaves[ciclo]
+        self._efeito_ciclo = efeito[self._manutencao.codes][ciclo]
+
+        self.mes_mais_recente = int(mes.max()) if len(mes) else 0
+        self._indice_descricoes: Optional[IndiceDescricoes] = None
+
+        logging.info(
+            f"Índice de validade: {len(self._chaves)} eventos, "
+            f"{len(np.unique(self._chaves >> _BITS_MES))} códigos, "
+            f"{len(self._chaves_ciclo)} eventos de ciclo de vida")
+
+    @staticmethod
+    def _chave(tipo: np.ndarray, codigo: np.ndarray, mes: np.ndarray) -> np.ndarray:
+        return ((np.asarray(tipo, dtype=np.int64) << (_BITS_CODIGO + _BITS_MES))
+                | (np.asarray(codigo, dtype=np.int64) << _BITS_MES)
+                | np.asarray(mes, dtype=np.int64))
+
+    @classmethod
+    def de_planilha(cls, caminho: str) -> 'IndiceValidade':
+        """Cria o índice a partir da planilha (ou ZIP) de manutenções"""
+        origem = caminho
+        if eh_zip(caminho):
+            origem = ler_membro(caminho, listar_membros(caminho, PADRAO_ZIP)[0])
+
+        df = pd.read_excel(origem, sheet_name='Manutenções')
+        return cls(df.rename(columns=COLUNAS_PLANILHA))
+
+    def _ultimo(self, chaves: np.ndarray, consulta: np.ndarray) -> np.ndarray:
+        """Posição do último evento do mesmo código até o mês consultado (-1 se não houver)"""
+        posicao = np.searchsorted(chaves, consulta, side='right') - 1
+        encontrado = posicao >= 0
+        encontrado[encontrado] = (chaves[posicao[encontrado]] >> _BITS_MES) == \
+            (consulta[encontrado] >> _BITS_MES)
+        return np.where(encontrado, posicao, -1)
+
+    def _estado(self, tipo: np.ndarray, codigo: np.ndarray, mes: np.ndarray):
+        """Status, posição do evento de ciclo e da última manutenção até o mês"""
+        consulta = self._chave(tipo, codigo, mes)
+        base = self._chave(tipo, codigo, 0)
+
+        ciclo = self._ultimo(self._chaves_ciclo, consulta)
+        ultimo = self._ultimo(self._chaves, consulta)
+
+        # Primeiro evento de ciclo do código (define se ele já existia antes do histórico)
+        primeiro = np.searchsorted(self._chaves_ciclo, base)
+        tem_ciclo = primeiro < len(self._chaves_ciclo)
+        tem_ciclo[tem_ciclo] = (self._chaves_ciclo[primeiro[tem_ciclo]] >> _BITS_MES) == \
+            (base[tem_ciclo] >> _BITS_MES)
+        primeiro_abre = tem_ciclo & (
+            self._efeito_ciclo[primeiro.clip(max=max(len(self._chaves_ciclo) - 1, 0))] == ABERTURA)
+
+        existe = np.searchsorted(self._chaves, base, side='left')
+        conhecido = existe < len(self._chaves)
+        conhecido[conhecido] = (self._chaves[existe[conhecido]] >> _BITS_MES) == \
+            (base[conhecido] >> _BITS_MES)
+
+        efeito = np.where(ciclo >= 0, self._efeito_ciclo[ciclo.clip(min=0)], 0)
+        status = np.select(
+            [~conhecido, efeito == FECHAMENTO, efeito == ABERTURA, primeiro_abre],
+            ['nao_encontrado', 'desativado', 'ativo', 'nao_criado'],
+            default='ativo')
+        return status, ciclo, ultimo
+
+    def _resolver_tipos(self, codigo: np.ndarray, tipos) -> np.ndarray:
+        """Índice do tipo de cada código; sem tipo informado, o primeiro com histórico"""
+        if tipos is not None:
+            tipo = pd.Index(self.tipos).get_indexer(
+                pd.Series(np.broadcast_to(np.asarray(tipos, dtype=object), codigo.shape))
+                .astype(str).str.upper())
+            return tipo
+
+        tipo = np.full(codigo.shape, -1, dtype=np.int64)
+        for t in range(len(self.tipos)):
+            base = self._chave(t, codigo, 0)
+            posicao = np.searchsorted(self._chaves, base).clip(max=len(self._chaves) - 1)
+            achou = (self._chaves[posicao] >> _BITS_MES) == (base >> _BITS_MES)
+            tipo = np.where((tipo < 0) & achou, t, tipo)
+        return tipo
+
+    def validar(self, codigos: Sequence, data: Union[str, Sequence, None] = None,
+                tipos: Union[str, Sequence, None] = None,
+                alternativas: bool = False) -> pd.DataFrame:
+        """
+        Valida um lote de códigos em uma data de referência
+
+        Args:
+            codigos: Códigos SINAPI
+            data: Data de referência (única ou uma por código); padrão: mês
+                mais recente do histórico
+            tipos: 'INSUMO'/'COMPOSIÇÃO' (único ou um por código); sem tipo,
+                usa o primeiro tipo com histórico para o código
+            alternativas: Sugere um código ativo de descrição semelhante para
+                os desativados
+
+        Returns:
+            DataFrame com codigo, tipo, status ('ativo', 'desativado',
+            'nao_criado' ou 'nao_encontrado'), valido, data_evento,
+            ultima_manutencao, data_ultima_manutencao e, opcionalmente,
+            alternativa
+        """
+        codigo = pd.to_numeric(pd.Series(codigos), errors='coerce').fillna(-1).to_numpy(np.int64)
+        mes = (np.full(codigo.shape, self.mes_mais_recente, dtype=np.int64) if data is None
+               else np.broadcast_to(_mes(data), codigo.shape).copy())
+        tipo = self._resolver_tipos(codigo, tipos)
+
+        valido_tipo = (tipo >= 0) & (codigo >= 0)
+        status, ciclo, ultimo = self._estado(tipo.clip(min=0), codigo.clip(min=0), mes)
+        status = np.where(valido_tipo, status, 'nao_encontrado')
+
+        def _data(chaves):
+            meses = (chaves & ((1 << _BITS_MES) - 1)) - 1970 * 12
+            return pd.Series(np.where(chaves >= 0, meses, np.iinfo(np.int64).min)
+                             .astype('datetime64[M]').astype('datetime64[ns]'))
+
+        evento = np.where(valido_tipo & (ciclo >= 0), self._chaves_ciclo[ciclo.clip(min=0)], -1)
+        ultimo = np.where(valido_tipo, ultimo, -1)
+
+        resultado = pd.DataFrame({
+            'codigo': codigos if not isinstance(codigos, pd.Series) else codigos.to_numpy(),
+            'tipo': np.where(tipo >= 0, self.tipos[tipo.clip(min=0)], None),
+            'status': status,
+            'valido': status == 'ativo',
+            'data_evento': _data(evento),
+            'ultima_manutencao': np.where(
+                ultimo >= 0, np.asarray(self._manutencao)[ultimo.clip(min=0)], None),
+            'data_ultima_manutencao': _data(
+                np.where(ultimo >= 0, self._chaves[ultimo.clip(min=0)], -1)),
+        })
+
+        if alternativas:
+            resultado['alternativa'] = self._alternativas(tipo, codigo, mes, status == 'desativado')
+        return resultado
+
+    def _alternativas(self, tipo: np.ndarray, codigo: np.ndarray, mes: np.ndarray,
+                      desativados: np.ndarray) -> np.ndarray:
+        """Código ativo (mesmo tipo e data) mais parecido com cada desativado"""
+        saida = np.full(codigo.shape, None, dtype=object)
+        linhas = np.flatnonzero(desativados)
+        if not len(linhas):
+            return saida
+
+        # Última descrição conhecida de cada (tipo, código)
+        codigos_indice = self._chaves >> _BITS_MES
+        ultima = np.r_[codigos_indice[1:] != codigos_indice[:-1], True]
+        chaves_codigo = codigos_indice[ultima]
+        if self._indice_descricoes is None:
+            self._indice_descricoes = IndiceDescricoes(
+                np.arange(len(chaves_codigo)), self._descricao[ultima])
+
+        consulta = (self._chave(tipo[linhas], codigo[linhas], 0) >> _BITS_MES)
+        descricoes = self._descricao[ultima][np.searchsorted(chaves_codigo, consulta)]
+        casamentos = self._indice_descricoes.casar(descricoes, top=CANDIDATOS_ALTERNATIVA)
+        if casamentos.empty:
+            return saida
+
+        candidato = chaves_codigo[casamentos['codigo'].astype(np.int64).to_numpy()]
+        linha = linhas[casamentos['linha'].to_numpy()]
+        tipo_c = candidato >> _BITS_CODIGO
+        codigo_c = candidato & ((1 << _BITS_CODIGO) - 1)
+        status_c, _, _ = self._estado(tipo_c, codigo_c, mes[linha])
+        aceito = (status_c == 'ativo') & (tipo_c == tipo[linha]) & (codigo_c != codigo[linha])
+
+        # casar() devolve os candidatos de cada linha em ordem de score
+        escolhidos = pd.DataFrame({'linha': linha[aceito], 'codigo': codigo_c[aceito]}) \
+            .drop_duplicates('linha', keep='first')
+        saida[escolhidos['linha'].to_numpy()] = escolhidos['codigo'].to_numpy()
+        return saida
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Validação em lote de códigos SINAPI pelo histórico de manutenções")
+    parser.add_argument('manutencoes', help="Planilha (ou ZIP) de manutenções SINAPI")
+    parser.add_argument('codigos', help="CSV com os códigos a validar")
+    parser.add_argument('--coluna-codigo', default='codigo')
+    parser.add_argument('--coluna-tipo', default=None)
+    parser.add_argument('--data', default=None, help="Data de referência (padrão: mês mais recente)")
+    parser.add_argument('--alternativas', action='store_true')
+    parser.add_argument('--saida', default='validacao_sinapi.csv')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from importar_sinapi import ler_csv_sinapi
+
+    try:
+        indice = IndiceValidade.de_planilha(args.manutencoes)
+        itens = ler_csv_sinapi(args.codigos)
+        tipos = itens[args.coluna_tipo] if args.coluna_tipo else None
+
+        inicio = time.perf_counter()
+        resultado = indice.validar(itens[args.coluna_codigo], args.data, tipos,
+                                   alternativas=args.alternativas)
+        duracao = time.perf_counter() - inicio
+
+        resultado.to_csv(args.saida, index=False)
+        logging.info(
+            f"{len(resultado)} códigos validados em {duracao * 1000:.1f} ms: "
+            f"{resultado['status'].value_counts().to_dict()}; resultado em {args.saida}")
+    except Exception as e:
+        logging.error(f"Erro na validação de códigos: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Motor de Variação de Preços SINAPI entre Releases
+=================================================
+
+Compara duas releases mensais do SINAPI (saída de processar_dados_sinapi) e
+mostra o que mudou, sem passar pelo banco de dados.
+
+Funcionalidades:
+- Alinhamento das duas releases por codigo_do_insumo em arrays ordenados
+- Deltas absolutos e percentuais por insumo e por UF numa única passada
+  vetorizada sobre matrizes código × UF
+- Dataset compacto apenas com as células que mudaram
+- Códigos novos e removidos
+- Estatísticas por UF, maiores aumentos e maiores reduções
+
+Uso:
+    python scripts/sinapi_variacao.py <csv_anterior> <csv_atual> [--saida DIR] [--top N] [--padrao GLOB]
+
+Autor: Equipe ObrasAI
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sinapi_dtypes import ESTADOS
+
+COLUNAS_UF = [f'preco_{estado.lower()}' for estado in ESTADOS]
+
+
+def _matriz_precos(dados: pd.DataFrame, posicoes: np.ndarray, total: int) -> np.ndarray:
+    """Espalha os preços de uma release nas linhas do eixo de códigos unificado"""
+    matriz = np.full((total, len(COLUNAS_UF)), np.nan)
+    presentes = [i for i, c in enumerate(COLUNAS_UF) if c in dados.columns]
+    if presentes:
+        colunas = [COLUNAS_UF[i] for i in presentes]
+        valores = dados[colunas].apply(
+            pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        matriz[np.ix_(posicoes, presentes)] = valores
+    return matriz
+
+
+def _preparar_release(dados: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza o código e remove duplicatas (fica a última ocorrência)"""
+    dados = dados.copy()
+    dados['codigo_do_insumo'] = dados['codigo_do_insumo'].astype(str).str.strip()
+    return dados.drop_duplicates('codigo_do_insumo', keep='last')
+
+
+def comparar_releases(
+    anterior: pd.DataFrame,
+    atual: pd.DataFrame,
+    top: int = 20,
+    tolerancia: float = 0.005
+) -> Dict:
+    """
+    Compara duas releases SINAPI processadas
+
+    Args:
+        anterior: DataFrame da release anterior (processar_dados_sinapi)
+        atual: DataFrame da release nova
+        top: Quantidade de maiores aumentos/reduções no resumo
+        tolerancia: Diferença absoluta abaixo da qual o preço é considerado igual
+
+    Returns:
+        Dict com 'deltas' (DataFrame longo só com células alteradas),
+        'novos', 'removidos' (listas de códigos) e 'resumo' (estatísticas)
+    """
+    anterior = _preparar_release(anterior)
+    atual = _preparar_release(atual)
+
+    # Eixo de códigos unificado e ordenado; searchsorted dá a linha de cada release
+    codigos = np.union1d(anterior['codigo_do_insumo'].to_numpy(dtype=str),
+                         atual['codigo_do_insumo'].to_numpy(dtype=str))
+    pos_ant = np.searchsorted(codigos, anterior['codigo_do_insumo'].to_numpy(dtype=str))
+    pos_atu = np.searchsorted(codigos, atual['codigo_do_insumo'].to_numpy(dtype=str))
+
+    em_ant = np.zeros(len(codigos), dtype=bool)
+    em_atu = np.zeros(len(codigos), dtype=bool)
+    em_ant[pos_ant] = True
+    em_atu[pos_atu] = True
+
+    m_ant = _matriz_precos(anterior, pos_ant, len(codigos))
+    m_atu = _matriz_precos(atual, pos_atu, len(codigos))
+
+    delta = m_atu - m_ant
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentual = np.where(m_ant != 0, delta / m_ant * 100, np.nan)
+
+    # Células alteradas: ambos os preços presentes e diferença acima da tolerância
+    alterado = (em_ant & em_atu)[:, None] & ~np.isnan(delta) & (np.abs(delta) >= tolerancia)
+    linhas, colunas = np.nonzero(alterado)
+
+    deltas = pd.DataFrame({
+        'codigo_do_insumo': codigos[linhas],
+        'uf': np.array(ESTADOS)[colunas],
+        'preco_anterior': m_ant[linhas, colunas],
+        'preco_atual': m_atu[linhas, colunas],
+        'variacao_abs': delta[linhas, colunas],
+        'variacao_pct': percentual[linhas, colunas],
+    })
+    deltas['uf'] = deltas['uf'].astype('category')
+
+    novos = codigos[em_atu & ~em_ant].tolist()
+    removidos = codigos[em_ant & ~em_atu].tolist()
+
+    comuns = em_ant & em_atu
+    pct_comuns = percentual[comuns]
+    por_uf = {}
+    for j, estado in enumerate(ESTADOS):
+        coluna = pct_comuns[:, j]
+        coluna = coluna[~np.isnan(coluna)]
+        por_uf[estado] = {
+            'alterados': int(alterado[:, j].sum()),
+            'variacao_media_pct': round(float(coluna.mean()), 4) if coluna.size else None,
+            'variacao_mediana_pct': round(float(np.median(coluna)), 4) if coluna.size else None,
+        }
+
+    # Rankings separados: aumentos só com variação > 0, reduções só com < 0
+    # (variação sem base, NaN ou infinita, fica fora dos dois)
+    finitos = deltas[np.isfinite(deltas['variacao_pct'].to_numpy(dtype=np.float64))]
+    aumentos = finitos[finitos['variacao_pct'] > 0].nlargest(top, 'variacao_pct')
+    reducoes = finitos[finitos['variacao_pct'] < 0].nsmallest(top, 'variacao_pct')
+    resumo = {
+        'codigos_anterior': int(em_ant.sum()),
+        'codigos_atual': int(em_atu.sum()),
+        'codigos_comuns': int(comuns.sum()),
+        'codigos_novos': len(novos),
+        'codigos_removidos': len(removidos),
+        'celulas_alteradas': int(alterado.sum()),
+        'insumos_alterados': int(alterado.any(axis=1).sum()),
+        'por_uf': por_uf,
+        'maiores_aumentos': _para_registros(aumentos),
+        'maiores_reducoes': _para_registros(reducoes),
+    }
+
+    logging.info(
+        f"Comparação concluída: {resumo['insumos_alterados']} insumos alterados, "
+        f"{len(novos)} novos, {len(removidos)} removidos")
+    return {'deltas': deltas, 'novos': novos, 'removidos': removidos, 'resumo': resumo}
+
+
+def _para_registros(df: pd.DataFrame) -> List[Dict]:
+    registros = df.astype({'uf': str}).round(4).to_dict('records')
+    return [{k: (None if isinstance(v, float) and np.isnan(v) else v)
+             for k, v in r.items()} for r in registros]
+
+
+def carregar_release(caminho_csv: str, padrao: Optional[str] = None) -> pd.DataFrame:
+    """Lê um CSV (ou ZIP) SINAPI com o mesmo pipeline do importador"""
+    from importar_sinapi import carregar_dados_sinapi
+
+    return carregar_dados_sinapi(caminho_csv, padrao)
+
+
+def salvar_resultado(resultado: Dict, diretorio: str) -> Dict[str, str]:
+    """
+    Salva deltas (CSV) e resumo com novos/removidos (JSON)
+
+    Returns:
+        Dict com os caminhos gerados
+    """
+    saida = Path(diretorio)
+    saida.mkdir(parents=True, exist_ok=True)
+    arquivo_deltas = saida / 'variacao_deltas.csv'
+    arquivo_resumo = saida / 'variacao_resumo.json'
+
+    resultado['deltas'].to_csv(arquivo_deltas, index=False)
+    with open(arquivo_resumo, 'w', encoding='utf-8') as f:
+        json.dump({**resultado['resumo'], 'novos': resultado['novos'],
+                   'removidos': resultado['removidos']},
+                  f, indent=2, ensure_ascii=False)
+
+    logging.info(f"Variação salva em: {arquivo_deltas} e {arquivo_resumo}")
+    return {'deltas': str(arquivo_deltas), 'resumo': str(arquivo_resumo)}
+
+
+def main(argv: Optional[List[str]] = None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Variação de preços SINAPI entre duas releases")
+    parser.add_argument('anterior', help="CSV (ou ZIP) da release anterior")
+    parser.add_argument('atual', help="CSV (ou ZIP) da release nova")
+    parser.add_argument('--saida', default='variacao_sinapi')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--padrao', help="Padrão dos membros CSV quando a entrada é ZIP")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        resultado = comparar_releases(
+            carregar_release(args.anterior, args.padrao),
+            carregar_release(args.atual, args.padrao), top=args.top)
+        salvar_resultado(resultado, args.saida)
+    except Exception as e:
+        logging.error(f"Erro ao comparar releases: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
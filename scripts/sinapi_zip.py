@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Leitura Direta dos Pacotes ZIP Oficiais do SINAPI
+=================================================
+
+O SINAPI é publicado em pacotes ZIP com planilhas e CSVs por UF e regime.
+Este módulo permite que os importadores leiam esses arquivos direto do ZIP,
+sem extração manual para docs/sinapi/ e sem gravar cópias extraídas em disco.
+
+- Listagem dos membros do ZIP filtrados por padrão (glob, sem acento/caixa)
+- Leitura de um membro para memória (BytesIO), aceito por pandas e pyarrow
+- Processamento paralelo de membros independentes em processos separados
+
+Autor: Equipe ObrasAI
+"""
+
+import fnmatch
+import io
+import logging
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+
+def eh_zip(caminho: str) -> bool:
+    """Indica se o caminho aponta para um pacote ZIP"""
+    return str(caminho).lower().endswith('.zip') and zipfile.is_zipfile(caminho)
+
+
+def _normalizar(nome: str) -> str:
+    nome = unicodedata.normalize('NFKD', nome.lower())
+    return ''.join(c for c in nome if not unicodedata.combining(c))
+
+
+def listar_membros(caminho_zip: str, padroes: Union[str, Iterable[str]]) -> List[str]:
+    """
+    Lista os arquivos do ZIP cujo nome (sem diretório) casa com algum padrão
+
+    Args:
+        caminho_zip: Caminho do pacote ZIP
+        padroes: Padrão glob ou lista de padrões (ex.: '*mao*de*obra*.xlsx');
+            a comparação ignora acentos e maiúsculas
+
+    Returns:
+        Lista ordenada com os nomes completos dos membros
+    """
+    if isinstance(padroes, str):
+        padroes = [padroes]
+    padroes = [_normalizar(p) for p in padroes]
+
+    with zipfile.ZipFile(caminho_zip) as arquivo_zip:
+        membros = [
+            info.filename for info in arquivo_zip.infolist()
+            if not info.is_dir()
+            and any(fnmatch.fnmatch(_normalizar(PurePosixPath(info.filename).name), p)
+                    for p in padroes)
+        ]
+
+    logging.info(
+        f"{len(membros)} arquivo(s) selecionado(s) em {caminho_zip}: {membros}")
+    return sorted(membros)
+
+
+def ler_membro(caminho_zip: str, nome_membro: str) -> io.BytesIO:
+    """
+    Lê um membro do ZIP para memória
+
+    Args:
+        caminho_zip: Caminho do pacote ZIP
+        nome_membro: Nome completo do membro
+
+    Returns:
+        BytesIO posicionado no início (aceito por read_csv/read_excel/pyarrow)
+    """
+    with zipfile.ZipFile(caminho_zip) as arquivo_zip:
+        with arquivo_zip.open(nome_membro) as membro:
+            return io.BytesIO(membro.read())
+
+
+def processar_membros(
+    caminho_zip: str,
+    membros: List[str],
+    funcao: Callable[[str, str], Any],
+    max_workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Aplica funcao(caminho_zip, nome_membro) a cada membro em paralelo
+
+    Cada processo abre o ZIP por conta própria (ZipFile não é seguro entre
+    threads), então funcao deve ser uma função de módulo (picklable).
+
+    Args:
+        caminho_zip: Caminho do pacote ZIP
+        membros: Membros a processar
+        funcao: Função de parsing/processamento de um membro
+        max_workers: Máximo de processos (padrão: um por membro, até o nº de CPUs)
+
+    Returns:
+        Dict nome_membro -> resultado, na ordem de membros
+    """
+    if len(membros) <= 1:
+        return {nome: funcao(caminho_zip, nome) for nome in membros}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {nome: executor.submit(funcao, caminho_zip, nome)
+                   for nome in membros}
+        return {nome: futuro.result() for nome, futuro in futuros.items()}
@@ -0,0 +1,16 @@
+"""
+Configuração dos testes dos scripts SINAPI
+
+Os scripts são módulos soltos em scripts/ (importados pelo nome, como nos
+próprios scripts); os testes rodam a partir da raiz do repositório:
+
+    pip install -r scripts/requirements-dev.txt
+    python -m pytest scripts/tests
+
+Autor: Equipe ObrasAI
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,89 @@
+"""Testes das formas de SQL aceitas pelo servidor local (postgrest_local.py)"""
+
+import pandas as pd
+import pytest
+
+from postgrest_local import ErroSql, ServidorPostgrestLocal, _texto_sql
+from sinapi_indices import CONSULTA_ESTATISTICAS, CONSULTA_INDICES
+from sinapi_reconciliacao import PERFIS, LadoSupabase, _texto_python
+
+
+@pytest.fixture
+def servidor():
+    servidor = ServidorPostgrestLocal()
+    servidor.armazenamento.inserir('sinapi_insumos', [
+        {'codigo_do_insumo': '1', 'mes_referencia': '2025-04-01', 'preco_sp': 10.0}])
+    servidor.armazenamento.indices['sinapi_insumos']['idx_descricao'] = 'CREATE INDEX idx_descricao ...'
+    yield servidor
+    servidor._servidor.server_close()
+
+
+def _faixas(lado: LadoSupabase) -> str:
+    return lado._com_faixas([(None, None)], "t.chave, t.h::text AS hash", "WHERE t.chave IS NOT NULL")
+
+
+def test_consultas_atuais_dos_scripts_sao_aceitas(servidor):
+    perfil = PERFIS['sinapi_insumos']
+    lado = LadoSupabase(None, 'sinapi_insumos', perfil['chave'], perfil['colunas'],
+                        coluna_mes='mes_referencia', meses=['2025-04'])
+
+    assert servidor._executar_sql(CONSULTA_INDICES.format(tabela='sinapi_insumos')) == \
+        [{'indexname': 'idx_descricao', 'indexdef': 'CREATE INDEX idx_descricao ...'}]
+    assert servidor._executar_sql(CONSULTA_ESTATISTICAS.format(tabela='sinapi_insumos'))[0]['n_live_tup'] == 1
+    assert [l['chave'] for l in servidor._executar_sql(_faixas(lado))] == ['1|2025-04-01']
+
+
+@pytest.mark.parametrize('original, alterado', [
+    ('AND NOT x.indisunique', ''),
+    ("n.nspname = 'public'", "n.nspname = 'private'"),
+])
+def test_consulta_de_indices_alterada_e_recusada(servidor, original, alterado):
+    consulta = CONSULTA_INDICES.format(tabela='sinapi_insumos').replace(original, alterado)
+
+    with pytest.raises(ErroSql) as erro:
+        servidor._executar_sql(consulta)
+    assert erro.value.codigo == '0A000'
+
+
+@pytest.mark.parametrize('original, alterado', [
+    ('::numeric, 2)', '::numeric, 3)'),
+    ('substr(md5(', 'substr(sha256('),
+    ('COLLATE "C" AS chave', 'AS chave'),
+])
+def test_consulta_de_faixas_alterada_e_recusada(servidor, original, alterado):
+    perfil = PERFIS['sinapi_insumos']
+    consulta = _faixas(LadoSupabase(None, 'sinapi_insumos', perfil['chave'], perfil['colunas']))
+    assert original in consulta
+
+    with pytest.raises(ErroSql) as erro:
+        servidor._executar_sql(consulta.replace(original, alterado))
+    assert erro.value.codigo == '0A000'
+
+
+def test_texto_numerico_arredonda_como_o_postgres():
+    valores = [1.005, -1.005, 2.675, -0.001, 3, None]
+
+    esperado = ['1.01', '-1.01', '2.68', '0.00', '3.00', '']
+    assert [_texto_sql(v, True) for v in valores] == esperado
+    assert _texto_python(pd.Series(valores, dtype=float), 'numero').tolist() == esperado
+
+
+def test_codigos_distintos_numa_consulta(servidor):
+    pytest.importorskip('supabase')
+    from supabase import create_client
+
+    from postgrest_local import CHAVE_LOCAL
+    from sinapi_integridade import CONSULTA_CODIGOS, codigos_do_banco
+
+    # Três meses do mesmo conjunto de códigos: mais linhas que o max-rows
+    servidor.armazenamento.inserir('sinapi_insumos', [
+        {'codigo_do_insumo': f'{c:05d}', 'mes_referencia': mes}
+        for mes in ('2025-01-01', '2025-02-01', '2025-03-01') for c in range(2, 1502)])
+    consulta = CONSULTA_CODIGOS.format(coluna='codigo_do_insumo', tabela='sinapi_insumos')
+    with pytest.raises(ErroSql):
+        servidor._executar_sql(consulta.replace('DISTINCT ', ''))
+
+    with servidor:
+        codigos = codigos_do_banco(create_client(servidor.url, CHAVE_LOCAL), 'insumos')
+
+    assert sorted(codigos.tolist()) == list(range(1, 1502))
@@ -0,0 +1,112 @@
+"""Testes do índice BM25 de descrições SINAPI (sinapi_busca.py)"""
+
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sinapi_busca
+from sinapi_busca import PESO_TRIGRAMA, IndiceDescricoes, _termos, normalizar_texto
+
+DESCRICOES = [
+    'CIMENTO PORTLAND COMPOSTO CP II-32',
+    'AREIA MÉDIA - POSTO JAZIDA/FORNECEDOR',
+    'PEDREIRO COM ENCARGOS COMPLEMENTARES',
+    'TUBO PVC, SOLDÁVEL, DN 25 MM, ÁGUA FRIA',
+    'TUBO PVC, SOLDÁVEL, DN 50 MM, ÁGUA FRIA',
+]
+UNIDADES = ['KG', 'M3', 'H', 'M', 'M']
+
+
+@pytest.fixture
+def indice():
+    return IndiceDescricoes(['1', '2', '3', '4', '5'], DESCRICOES, UNIDADES)
+
+
+def _bm25_referencia(consulta: str, k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """BM25 termo a termo, sem matrizes esparsas"""
+    documentos = [Counter(_termos(normalizar_texto(d))) for d in DESCRICOES]
+    media = sum(sum(d.values()) for d in documentos) / len(documentos)
+    termos = set(_termos(normalizar_texto(consulta)))
+    scores = np.zeros(len(documentos))
+    for i, documento in enumerate(documentos):
+        tamanho = sum(documento.values())
+        for termo in termos & set(documento):
+            df = sum(termo in d for d in documentos)
+            idf = math.log(1 + (len(documentos) - df + 0.5) / (df + 0.5))
+            tf = documento[termo]
+            peso = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * tamanho / media))
+            scores[i] += peso * (PESO_TRIGRAMA if termo.startswith('t:') else 1.0)
+    return scores
+
+
+def test_normalizar_texto():
+    assert normalizar_texto('Tubo PVC, Soldável - DN 25mm') == 'tubo pvc soldavel dn 25mm'
+    assert normalizar_texto(None) == ''
+    assert normalizar_texto(float('nan')) == ''
+
+
+def test_scores_iguais_ao_bm25_de_referencia(indice):
+    consulta = 'tubo pvc soldavel 25 mm'
+
+    casamentos = indice.casar([consulta], top=5)
+
+    referencia = _bm25_referencia(consulta)
+    obtidos = dict(zip(casamentos['codigo'], casamentos['score']))
+    for i, codigo in enumerate(indice.codigos):
+        assert obtidos.get(codigo, 0.0) == pytest.approx(referencia[i])
+
+
+def test_melhor_candidato_e_ordem(indice):
+    casamentos = indice.casar(['cimento portland cp ii', 'tubo pvc dn 50'], top=2)
+
+    primeiro = casamentos[casamentos['posicao'] == 1].set_index('linha')['codigo']
+    assert primeiro.to_dict() == {0: '1', 1: '5'}
+    for _, grupo in casamentos.groupby('linha'):
+        assert grupo['score'].is_monotonic_decreasing
+
+
+def test_trigramas_toleram_erro_de_digitacao(indice):
+    casamentos = indice.casar(['pedrero encargo'], top=1)
+
+    assert casamentos['codigo'].tolist() == ['3']
+
+
+def test_filtro_de_unidade(indice):
+    sem_filtro = indice.casar(['tubo cimento'], top=5)
+    com_filtro = indice.casar(['tubo cimento'], unidades=['KG'], top=5)
+
+    assert set(sem_filtro['codigo']) >= {'1', '4', '5'}
+    assert com_filtro['codigo'].tolist() == ['1']
+    # Unidade vazia na linha: sem filtro
+    assert len(indice.casar(['tubo cimento'], unidades=[''], top=5)) == len(sem_filtro)
+
+
+def test_linha_sem_termo_em_comum(indice):
+    assert indice.casar(['xyzw qqq'], top=3).empty
+
+
+def test_lote_maior_que_o_bloco(indice, monkeypatch):
+    consultas = ['areia media', 'tubo pvc 25', 'pedreiro'] * 3
+    inteiro = indice.casar(consultas, top=2)
+
+    monkeypatch.setattr(sinapi_busca, 'TAMANHO_BLOCO', 2)
+    em_blocos = indice.casar(consultas, top=2)
+
+    pd.testing.assert_frame_equal(inteiro, em_blocos)
+
+
+def test_de_dataframe_reconhece_colunas_dos_importadores():
+    insumos = pd.DataFrame({'codigo_do_insumo': ['1', '1', '2'],
+                            'descricao_do_insumo': ['ANTIGA', 'CIMENTO', 'AREIA'],
+                            'unidade': ['KG', 'KG', 'M3']})
+
+    indice = IndiceDescricoes.de_dataframe(insumos)
+
+    assert indice.codigos.tolist() == ['1', '2']
+    assert indice.descricoes.tolist() == ['CIMENTO', 'AREIA']
+    assert indice.unidades.tolist() == ['kg', 'm3']
+    with pytest.raises(ValueError):
+        IndiceDescricoes.de_dataframe(pd.DataFrame({'x': [1]}))
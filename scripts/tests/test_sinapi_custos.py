@@ -0,0 +1,73 @@
+"""Testes do motor de custo de composições (sinapi_custos.py)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sinapi_custos import COLUNAS_UF, MotorCustos, calcular_custos
+
+
+def _coeficientes(linhas):
+    return pd.DataFrame(linhas, columns=['codigo_composicao', 'codigo_item', 'tipo_item', 'coeficiente'])
+
+
+@pytest.fixture
+def coeficientes():
+    # C1 = 2·I1 + 1·C2 ; C2 = 3·I2 ; C3 = 1·I3 (sem preço em nenhuma UF)
+    return _coeficientes([
+        ('C1', 'I1', 'INSUMO', 2.0),
+        ('C1', 'C2', 'COMPOSICAO', 1.0),
+        ('C2', 'I2', 'INSUMO', 3.0),
+        ('C3', 'I3', 'INSUMO', 1.0),
+    ])
+
+
+@pytest.fixture
+def precos():
+    return pd.DataFrame({'codigo_do_insumo': ['I1', 'I2'],
+                         'preco_sp': [10.0, 5.0], 'preco_ac': [20.0, np.nan]})
+
+
+def test_custo_com_subcomposicao(coeficientes, precos):
+    custos = calcular_custos(coeficientes, precos)
+
+    assert custos.loc['C2', 'custo_sp'] == pytest.approx(15.0)
+    assert custos.loc['C1', 'custo_sp'] == pytest.approx(2 * 10.0 + 15.0)
+
+
+def test_preco_ausente_propaga_para_os_pais(coeficientes, precos):
+    custos = calcular_custos(coeficientes, precos)
+
+    # I2 sem preço no AC: C2 e C1 (que usa C2) ficam indefinidos nessa UF
+    assert np.isnan(custos.loc['C2', 'custo_ac'])
+    assert np.isnan(custos.loc['C1', 'custo_ac'])
+    assert np.isnan(custos.loc['C3', 'custo_sp'])
+    assert custos['incompleta'].all()
+
+
+def test_ciclo_entre_composicoes():
+    ciclo = _coeficientes([('C1', 'C2', 'COMPOSICAO', 1.0), ('C2', 'C1', 'COMPOSICAO', 1.0)])
+
+    with pytest.raises(ValueError, match='Ciclo'):
+        MotorCustos(ciclo, pd.DataFrame({'codigo_do_insumo': []}))
+
+
+def test_niveis_de_aninhamento(coeficientes, precos):
+    motor = MotorCustos(coeficientes, precos)
+    nivel = dict(zip(motor.composicoes, motor.nivel))
+
+    assert nivel == {'C1': 1, 'C2': 0, 'C3': 0}
+
+
+def test_atualizar_precos_igual_ao_calculo_completo(coeficientes, precos):
+    motor = MotorCustos(coeficientes, precos)
+    novos = pd.DataFrame({'codigo_do_insumo': ['I2'], 'preco_sp': [7.0], 'preco_ac': [1.0]})
+
+    resultado = motor.atualizar_precos(novos)
+    completo = calcular_custos(coeficientes, pd.concat([precos, novos]))
+
+    # Só C2 e C1 dependem de I2
+    assert motor.composicoes[resultado['linhas']].tolist() == ['C1', 'C2']
+    colunas = [c.replace('preco_', 'custo_') for c in COLUNAS_UF]
+    np.testing.assert_allclose(motor.custos[colunas].to_numpy(), completo[colunas].to_numpy())
+    assert set(resultado['delta']['codigo_composicao']) == {'C1', 'C2'}
@@ -0,0 +1,201 @@
+"""Testes do histórico mensal de preços (sinapi_historico.py)"""
+
+import json
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sinapi_historico import (ARQUIVO_CODIGOS, ARQUIVO_META, ARQUIVO_PRECOS, HistoricoPrecos,
+                              media_movel, tendencia, variacao_acumulada)
+
+
+def _serie(n_meses=12, n_codigos=5, semente=7):
+    aleatorio = np.random.default_rng(semente)
+    valores = aleatorio.uniform(10, 100, (n_meses, n_codigos)).astype(np.float32)
+    valores[aleatorio.random(valores.shape) < 0.2] = np.nan
+    return valores
+
+
+def _mes(precos, mes):
+    """Uma linha por código; precos: código -> preço em SP (RJ = SP + 1)"""
+    return pd.DataFrame({'codigo_do_insumo': [str(c) for c in precos],
+                         'preco_sp': list(precos.values()),
+                         'preco_rj': [p + 1 for p in precos.values()],
+                         'mes_referencia': mes})
+
+
+@pytest.mark.parametrize('janela', [1, 3, 12, 13])
+def test_media_movel_igual_ao_rolling_do_pandas(janela):
+    valores = _serie()
+
+    esperado = pd.DataFrame(valores.astype(np.float64)).rolling(janela).mean().to_numpy()
+
+    np.testing.assert_allclose(media_movel(valores, janela), esperado, rtol=1e-5)
+
+
+def test_media_movel_em_cubo_e_janela_invalida():
+    valores = _serie(n_codigos=6).reshape(12, 2, 3)
+
+    resultado = media_movel(valores, 3)
+
+    assert resultado.shape == valores.shape
+    esperado = pd.DataFrame(valores.reshape(12, 6).astype(np.float64)).rolling(3).mean().to_numpy()
+    np.testing.assert_allclose(resultado.reshape(12, 6), esperado, rtol=1e-5)
+    with pytest.raises(ValueError):
+        media_movel(valores, 0)
+
+
+def test_variacao_acumulada_sobre_o_primeiro_mes_com_preco():
+    valores = np.array([[np.nan, 10.0, 0.0],
+                        [50.0, 12.0, 5.0],
+                        [np.nan, 9.0, 6.0],
+                        [75.0, np.nan, 7.0]], dtype=np.float32)
+
+    resultado = variacao_acumulada(valores)
+
+    np.testing.assert_allclose(resultado[:, 0], [np.nan, 0, np.nan, 50], rtol=1e-6)
+    np.testing.assert_allclose(resultado[:, 1], [0, 20, -10, np.nan], rtol=1e-5, atol=1e-5)
+    # Base zero não tem variação percentual
+    assert np.isnan(resultado[:, 2]).all()
+
+
+def test_tendencia_igual_ao_polyfit():
+    valores = _serie(n_meses=24, n_codigos=8)
+    valores[:, 0] = np.nan
+    valores[1:, 1] = np.nan
+
+    resultado = tendencia(valores)
+
+    for j in range(valores.shape[1]):
+        presentes = ~np.isnan(valores[:, j])
+        assert resultado['observacoes'][j] == presentes.sum()
+        if presentes.sum() < 2:
+            assert np.isnan(resultado['inclinacao'][j])
+            continue
+        x = np.flatnonzero(presentes)
+        y = valores[presentes, j].astype(np.float64)
+        inclinacao = np.polyfit(x, y, 1)[0]
+        assert resultado['inclinacao'][j] == pytest.approx(inclinacao, rel=1e-6, abs=1e-9)
+        assert resultado['variacao_mensal_pct'][j] == pytest.approx(inclinacao / y.mean() * 100, rel=1e-6)
+
+
+def test_registrar_acrescimo_substituicao_e_reescrita(tmp_path):
+    historico = HistoricoPrecos(str(tmp_path))
+    assert historico.vazio
+
+    assert historico.registrar(_mes({10: 1.0, 20: 2.0}, '2025-01-01'))['modo'] == 'reescrita'
+    assert historico.registrar(_mes({10: 1.5, 20: 2.5}, '2025-03-01'))['modo'] == 'acrescimo'
+    assert historico.registrar(_mes({20: 2.2}, '2025-03-01'))['modo'] == 'substituicao'
+    assert historico.registrar(_mes({5: 0.5, 10: 0.9}, '2024-12-01'))['modo'] == 'reescrita'
+
+    reaberto = HistoricoPrecos(str(tmp_path))
+    assert reaberto.meses == ['2024-12', '2025-01', '2025-02', '2025-03']
+    assert reaberto.meta['registrados'] == ['2024-12', '2025-01', '2025-03']
+
+    recorte = reaberto.serie(codigos=[10, 20, 5, 99], uf='SP')
+    assert recorte.colunas == ['preco_sp']
+    np.testing.assert_array_equal(recorte.valores[:, :, 0], np.array([
+        [0.9, np.nan, 0.5, np.nan],
+        [1.0, 2.0, np.nan, np.nan],
+        [np.nan, np.nan, np.nan, np.nan],
+        # A substituição troca o bloco inteiro do mês: o código 10 sai
+        [np.nan, 2.2, np.nan, np.nan],
+    ], dtype=np.float32))
+
+    rj = reaberto.serie(codigos=[20], uf='RJ', inicio='2025-01', fim='2025-01')
+    assert rj.meses == ['2025-01']
+    assert rj.valores[0, 0, 0] == 3.0
+
+
+def test_acrescimo_interrompido_e_reparado_ao_abrir(tmp_path):
+    historico = HistoricoPrecos(str(tmp_path))
+    historico.registrar(_mes({10: 1.0}, '2025-01-01'))
+    arquivo = historico.arquivo_precos
+    tamanho = arquivo.stat().st_size
+
+    # Bloco gravado sem os metadados (queda entre os dois passos do acréscimo)
+    with open(arquivo, 'ab') as f:
+        f.write(b'\0' * 100)
+    reaberto = HistoricoPrecos(str(tmp_path))
+
+    assert arquivo.stat().st_size == tamanho
+    assert reaberto.meses == ['2025-01']
+    assert reaberto.registrar(_mes({10: 2.0}, '2025-02-01'))['modo'] == 'acrescimo'
+    assert reaberto.serie(codigos=[10], uf='SP').valores[:, 0, 0].tolist() == [1.0, 2.0]
+
+    os.truncate(arquivo, tamanho - 4)
+    with pytest.raises(ValueError, match='tamanho'):
+        HistoricoPrecos(str(tmp_path))
+
+
+def test_carregar_mao_de_obra_detecta_o_mes_pelo_nome(tmp_path):
+    pytest.importorskip('supabase')
+    pytest.importorskip('openpyxl')
+    from import_sinapi_composicoes_mao_obra import carregar_mao_de_obra, detectar_mes
+
+    planilha = tmp_path / 'SINAPI_mao_de_obra_2025_06.xlsx'
+    pagina = pd.DataFrame({'Código da\nComposição': [88316, 88309], 'Grupo': ['ALVENARIA'] * 2,
+                           'Descrição': ['SERVENTE', 'PEDREIRO'], 'Unidade': ['H', 'H'],
+                           'SP': ['25,10', '30,00']})
+    with pd.ExcelWriter(planilha) as escritor:
+        pagina.to_excel(escritor, sheet_name='SEM Desoneração', index=False)
+        pagina.assign(SP=['22,90', '27,50']).to_excel(escritor, sheet_name='COM Desoneração', index=False)
+    pacote = tmp_path / 'pacote.zip'
+    with zipfile.ZipFile(pacote, 'w') as zf:
+        zf.write(planilha, 'SINAPI_mao_de_obra_2025_05.xlsx')
+
+    registros = carregar_mao_de_obra(str(planilha))
+
+    assert registros['mes_referencia'].unique().tolist() == ['2025-06-01']
+    assert registros['preco_com_sp'].tolist() == [22.9, 27.5]
+    assert detectar_mes(str(pacote)) == '2025-05-01'
+    assert carregar_mao_de_obra(str(planilha), '04/2025')['mes_referencia'].iloc[0] == '2025-04-01'
+
+
+def test_reescrita_interrompida_mantem_a_geracao_anterior(tmp_path, monkeypatch):
+    historico = HistoricoPrecos(str(tmp_path))
+    historico.registrar(_mes({10: 1.0, 20: 2.0}, '2025-01-01'))
+    historico.registrar(_mes({10: 1.5, 20: 2.5}, '2025-02-01'))
+    diretorio = tmp_path / 'insumos'
+    antes = sorted(p.name for p in diretorio.iterdir())
+
+    # Queda depois de gravar a geração nova e antes do historico.json
+    def queda(*args, **kwargs):
+        raise OSError('queda simulada')
+
+    monkeypatch.setattr(HistoricoPrecos, '_gravar_meta', queda)
+    with pytest.raises(OSError):
+        historico.registrar(_mes({5: 0.5, 10: 0.9, 30: 3.0}, '2024-11-01'))
+    monkeypatch.undo()
+    assert len(list(diretorio.iterdir())) == len(antes) + 2
+
+    reaberto = HistoricoPrecos(str(tmp_path))
+
+    assert sorted(p.name for p in diretorio.iterdir()) == antes
+    assert reaberto.meses == ['2025-01', '2025-02']
+    np.testing.assert_array_equal(reaberto.serie(uf='SP').valores[:, :, 0],
+                                  np.array([[1.0, 2.0], [1.5, 2.5]], dtype=np.float32))
+    assert reaberto.registrar(_mes({5: 0.5, 10: 0.9, 30: 3.0}, '2024-11-01'))['modo'] == 'reescrita'
+    assert reaberto.meses == ['2024-11', '2024-12', '2025-01', '2025-02']
+    assert len(list(diretorio.iterdir())) == len(antes)
+
+
+def test_abre_historico_sem_geracao(tmp_path):
+    historico = HistoricoPrecos(str(tmp_path))
+    historico.registrar(_mes({10: 1.0}, '2025-01-01'))
+    diretorio = tmp_path / 'insumos'
+    historico.arquivo_codigos.rename(diretorio / ARQUIVO_CODIGOS)
+    historico.arquivo_precos.rename(diretorio / ARQUIVO_PRECOS)
+    meta = json.loads((diretorio / ARQUIVO_META).read_text(encoding='utf-8'))
+    del meta['geracao']
+    (diretorio / ARQUIVO_META).write_text(json.dumps(meta), encoding='utf-8')
+
+    antigo = HistoricoPrecos(str(tmp_path))
+    assert antigo.serie(uf='SP').valores[0, 0, 0] == 1.0
+    assert antigo.registrar(_mes({10: 2.0}, '2025-02-01'))['modo'] == 'acrescimo'
+    assert antigo.registrar(_mes({11: 3.0}, '2025-02-01'))['modo'] == 'reescrita'
+    assert not (diretorio / ARQUIVO_PRECOS).exists()
+    assert HistoricoPrecos(str(tmp_path)).serie(codigos=[10], uf='SP').valores[:, 0, 0].tolist() == [1.0, 2.0]
@@ -0,0 +1,104 @@
+"""Testes da recriação de índices da carga em massa (sinapi_indices.py)"""
+
+import re
+
+import pytest
+
+import sinapi_indices
+from sinapi_indices import CargaSemIndices, recriar_indices
+
+DEFINICOES = [
+    {'indexname': 'idx_a', 'indexdef': 'CREATE INDEX idx_a ON public.t USING btree (a)'},
+    {'indexname': 'idx_b', 'indexdef': 'CREATE INDEX idx_b ON public.t USING btree (b)'},
+]
+
+
+class _Catalogo:
+    """
+    Índices como no Postgres: nome -> (definição, válido); IF NOT EXISTS não
+    mexe em índice existente e o build concorrente que falha deixa o índice
+    INVALID
+    """
+
+    def __init__(self, falha_concorrente=None):
+        self.indices = {}
+        self.comandos = []
+        self.falha_concorrente = falha_concorrente
+
+    def executar_sql(self, supabase, query):
+        self.comandos.append(query)
+        achado = re.match(r'DROP INDEX IF EXISTS public\.(\w+);$', query)
+        if achado:
+            self.indices.pop(achado.group(1), None)
+            return []
+        achado = re.match(r'CREATE INDEX (CONCURRENTLY )?(IF NOT EXISTS )?(\w+) ', query)
+        if achado:
+            concorrente, se_nao_existe, nome = achado.groups()
+            if nome in self.indices:
+                if se_nao_existe:
+                    return []
+                raise RuntimeError(f'relation "{nome}" already exists')
+            definicao = re.sub(r'CONCURRENTLY |IF NOT EXISTS ', '', query)
+            if concorrente and self.falha_concorrente:
+                self.indices[nome] = (definicao, False)
+                raise RuntimeError(self.falha_concorrente)
+            self.indices[nome] = (definicao, True)
+            return []
+        return []
+
+
+@pytest.fixture
+def catalogo(monkeypatch):
+    catalogo = _Catalogo()
+    monkeypatch.setattr(sinapi_indices, 'executar_sql', catalogo.executar_sql)
+    return catalogo
+
+
+def test_indice_invalido_que_sobrou_e_substituido(catalogo):
+    catalogo.indices['idx_a'] = ('CREATE INDEX idx_a ON public.t USING btree (a)', False)
+
+    resultado = recriar_indices(None, DEFINICOES)
+
+    assert [r['erro'] for r in resultado] == [None, None]
+    assert catalogo.indices == {d['indexname']: (d['indexdef'], True) for d in DEFINICOES}
+    assert not any('CONCURRENTLY' in c for c in catalogo.comandos)
+
+
+def test_build_concorrente_interrompido_nao_fica_invalido(catalogo):
+    catalogo.falha_concorrente = 'canceling statement due to statement timeout'
+
+    resultado = recriar_indices(None, DEFINICOES, concorrente=True)
+
+    assert [r['concorrente'] for r in resultado] == [False, False]
+    assert [r['erro'] for r in resultado] == [None, None]
+    assert all(valido for _, valido in catalogo.indices.values())
+    # Depois da primeira recusa os demais vão direto para o CREATE INDEX comum
+    assert sum('CONCURRENTLY' in c for c in catalogo.comandos) == 1
+
+
+def test_concorrente_quando_a_rpc_permite(catalogo):
+    resultado = recriar_indices(None, DEFINICOES, concorrente=True)
+
+    assert [r['concorrente'] for r in resultado] == [True, True]
+    assert all(valido for _, valido in catalogo.indices.values())
+
+
+def test_carga_sem_indices_pelo_servidor_local(tmp_path):
+    pytest.importorskip('supabase')
+    from supabase import create_client
+
+    from postgrest_local import CHAVE_LOCAL, ServidorPostgrestLocal
+
+    with ServidorPostgrestLocal() as servidor:
+        indices = servidor.armazenamento.indices['sinapi_insumos']
+        indices['idx_descricao'] = 'CREATE INDEX idx_descricao ON public.sinapi_insumos USING btree (descricao)'
+        antes = dict(indices)
+        supabase = create_client(servidor.url, CHAVE_LOCAL)
+
+        with CargaSemIndices(supabase, 'sinapi_insumos',
+                             arquivo_backup=str(tmp_path / 'indices.json')) as carga:
+            assert indices == {}
+
+        assert indices == antes
+        assert [r['erro'] for r in carga.relatorio['recriacao']] == [None]
+        assert not (tmp_path / 'indices.json').exists()
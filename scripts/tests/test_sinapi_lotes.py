@@ -0,0 +1,273 @@
+"""Testes do controlador de lotes adaptativos (sinapi_lotes.py)"""
+
+import json
+
+import httpx
+import pandas as pd
+import pytest
+
+import sinapi_lotes
+from sinapi_lotes import (BYTES_INICIAL, BYTES_MINIMO, FATOR_CRESCIMENTO, FATOR_TETO, JANELA,
+                          RECUPERACAO_TETO, TIMEOUTS_SEGUIDOS, ControladorLotes,
+                          classificar_falha, enviar_em_lotes)
+
+
+class _ErroHttp(Exception):
+    """Imita o APIError do postgrest-py (atributos status/code)"""
+
+    def __init__(self, status=None, code=None):
+        super().__init__(f'{status} {code}')
+        self.status = status
+        self.code = code
+
+
+def _janela(controlador, nbytes, duracao):
+    for _ in range(JANELA):
+        controlador.registrar_sucesso(10, nbytes, duracao)
+
+
+def _dados(linhas):
+    return pd.DataFrame({'codigo': [str(i) for i in range(linhas)],
+                         'descricao': [f'ITEM {i:05d}' for i in range(linhas)]})
+
+
+def test_classificar_falha():
+    requisicao = httpx.Request('POST', 'http://local/rest/v1/t')
+
+    assert classificar_falha(_ErroHttp(status=413)) == 'tamanho'
+    assert classificar_falha(_ErroHttp(code='413')) == 'tamanho'
+    assert classificar_falha(_ErroHttp(status=504)) == 'timeout'
+    assert classificar_falha(_ErroHttp(status=400, code='57014')) == 'timeout'
+    assert classificar_falha(_ErroHttp(status=503)) == 'transitoria'
+    assert classificar_falha(_ErroHttp(status=409, code='23505')) == 'dados'
+    assert classificar_falha(ValueError('sem status')) == 'dados'
+    assert classificar_falha(httpx.ReadTimeout('lento', request=requisicao)) == 'timeout'
+    assert classificar_falha(httpx.ConnectError('recusada', request=requisicao)) == 'transitoria'
+
+
+def test_alvo_cresce_enquanto_a_vazao_melhora_e_fixa_no_melhor():
+    controlador = ControladorLotes('t', arquivo_estado=None)
+
+    _janela(controlador, 1000, 1.0)
+    assert controlador.bytes_alvo == int(BYTES_INICIAL * FATOR_CRESCIMENTO)
+
+    _janela(controlador, 2000, 1.0)
+    segundo = controlador.bytes_alvo
+    assert segundo == int(BYTES_INICIAL * FATOR_CRESCIMENTO * FATOR_CRESCIMENTO)
+
+    # Vazão igual à anterior: volta ao melhor alvo medido e para de crescer
+    _janela(controlador, 2000, 1.0)
+    assert not controlador.crescendo
+    assert controlador.bytes_alvo == controlador.melhor_alvo == int(BYTES_INICIAL * FATOR_CRESCIMENTO)
+
+    _janela(controlador, 4000, 1.0)
+    assert controlador.bytes_alvo == int(BYTES_INICIAL * FATOR_CRESCIMENTO)
+
+
+def test_crescimento_respeita_o_teto():
+    controlador = ControladorLotes('t', bytes_alvo=900, bytes_maximo=1000, arquivo_estado=None)
+
+    _janela(controlador, 1000, 1.0)
+
+    assert controlador.bytes_alvo == 1000
+
+
+def test_falha_de_tamanho_reduz_alvo_e_limita_o_teto():
+    controlador = ControladorLotes('t', bytes_alvo=100_000, arquivo_estado=None)
+
+    controlador.registrar_falha('tamanho', 80_000)
+
+    assert controlador.bytes_alvo == 40_000
+    assert controlador.teto == int(80_000 * FATOR_TETO)
+    assert controlador.limite_corpo == 80_000
+    assert controlador.falhas['tamanho'] == 1
+
+    # O crescimento seguinte não passa do teto
+    for _ in range(5):
+        _janela(controlador, 1000 * (2 ** controlador.lotes), 1.0)
+    assert controlador.bytes_alvo <= controlador.teto
+
+
+def test_falhas_transitorias_e_de_dados():
+    controlador = ControladorLotes('t', bytes_alvo=100_000, arquivo_estado=None)
+
+    controlador.registrar_falha('dados', 100_000)
+    assert controlador.bytes_alvo == 100_000
+
+    controlador.registrar_falha('transitoria', 100_000)
+    assert controlador.bytes_alvo == 70_000
+    assert controlador.limite_corpo is None
+
+
+def test_modo_fixo_nao_adapta():
+    controlador = ControladorLotes('t', linhas_fixas=7, arquivo_estado=None)
+
+    controlador.registrar_falha('tamanho', 10)
+    _janela(controlador, 1000, 1.0)
+
+    assert controlador.linhas_do_lote(_dados(20), 0) == 7
+    assert controlador.bytes_alvo == BYTES_INICIAL
+    assert controlador.relatorio()['modo'] == 'fixo'
+
+
+def test_linhas_do_lote_pela_largura_da_amostra():
+    dados = _dados(200)
+    controlador = ControladorLotes('t', bytes_alvo=1000, arquivo_estado=None)
+
+    linhas = controlador.linhas_do_lote(dados, 0)
+
+    largura = len(sinapi_lotes.serializar_registros(dados.iloc[:sinapi_lotes.AMOSTRA_LARGURA])) \
+        / sinapi_lotes.AMOSTRA_LARGURA
+    assert linhas == int(1000 / largura)
+
+
+def test_estado_salvo_e_retomado(tmp_path):
+    arquivo = tmp_path / 'lotes.json'
+    controlador = ControladorLotes('t', bytes_alvo=100_000, arquivo_estado=str(arquivo))
+    controlador.registrar_falha('tamanho', 60_000)
+    controlador.registrar_sucesso(10, 20_000, 0.1)
+    controlador.salvar()
+
+    estado = json.loads(arquivo.read_text(encoding='utf-8'))['t']
+    assert estado['bytes_alvo'] == 30_000
+    assert estado['limite_corpo'] == 60_000
+
+    retomado = ControladorLotes('t', arquivo_estado=str(arquivo))
+    assert retomado.bytes_alvo == 30_000
+    assert retomado.teto == int(60_000 * FATOR_TETO)
+    assert retomado.bytes_por_linha == estado['bytes_por_linha']
+    assert ControladorLotes('outra', arquivo_estado=str(arquivo)).bytes_alvo == BYTES_INICIAL
+
+
+def test_enviar_em_lotes_reenvia_trecho_recusado_por_tamanho(monkeypatch):
+    limite = 2000
+    recebidos = []
+
+    def inserir_json(supabase, tabela, corpo):
+        if len(corpo) > limite:
+            raise _ErroHttp(status=413)
+        recebidos.extend(json.loads(corpo))
+
+    monkeypatch.setattr(sinapi_lotes, 'inserir_json', inserir_json)
+    dados = _dados(300)
+    controlador = ControladorLotes('t', bytes_alvo=8000, arquivo_estado=None)
+
+    importados, erros = enviar_em_lotes(None, 't', dados, controlador)
+
+    assert (importados, erros) == (300, 0)
+    assert [r['codigo'] for r in recebidos] == dados['codigo'].tolist()
+    assert controlador.falhas['tamanho'] >= 1
+    assert controlador.limite_corpo > limite
+    assert controlador.teto <= controlador.limite_corpo
+
+
+def test_enviar_em_lotes_tenta_de_novo_as_falhas_transitorias(monkeypatch):
+    falhas = [_ErroHttp(status=503), _ErroHttp(status=429)]
+    recebidos = []
+
+    def inserir_json(supabase, tabela, corpo):
+        if falhas:
+            raise falhas.pop(0)
+        recebidos.extend(json.loads(corpo))
+
+    monkeypatch.setattr(sinapi_lotes, 'inserir_json', inserir_json)
+    monkeypatch.setattr(sinapi_lotes.time, 'sleep', lambda s: None)
+    controlador = ControladorLotes('t', arquivo_estado=None)
+
+    assert enviar_em_lotes(None, 't', _dados(50), controlador) == (50, 0)
+    assert len(recebidos) == 50
+    assert controlador.falhas['transitoria'] == 2
+
+
+def test_enviar_em_lotes_isola_registros_com_erro_de_dados(monkeypatch):
+    def inserir_json(supabase, tabela, corpo):
+        registros = json.loads(corpo)
+        if any(r['codigo'] == '7' for r in registros):
+            raise _ErroHttp(status=409, code='23505')
+
+    monkeypatch.setattr(sinapi_lotes, 'inserir_json', inserir_json)
+    controlador = ControladorLotes('t', arquivo_estado=None)
+    alvo = controlador.bytes_alvo
+
+    resultado = enviar_em_lotes(None, 't', _dados(20), controlador,
+                                individual_em_erro=True, coluna_id='codigo')
+
+    assert resultado == (19, 1)
+    assert controlador.bytes_alvo == alvo
+
+
+def test_timeout_nao_reduz_abaixo_do_minimo():
+    controlador = ControladorLotes('t', bytes_alvo=30_000, arquivo_estado=None)
+
+    assert controlador.registrar_falha('timeout', 30_000)
+    assert controlador.bytes_alvo == BYTES_MINIMO
+    assert not controlador.registrar_falha('timeout', BYTES_MINIMO)
+    assert controlador.bytes_alvo == BYTES_MINIMO
+    assert controlador.timeouts_seguidos == 2
+
+    controlador.registrar_sucesso(10, 1000, 0.1)
+    assert controlador.timeouts_seguidos == 0
+
+
+def test_teto_de_timeout_se_recupera_e_o_de_413_nao():
+    controlador = ControladorLotes('t', bytes_alvo=200_000, bytes_maximo=1_000_000,
+                                   arquivo_estado=None)
+    controlador.registrar_falha('tamanho', 500_000)
+    controlador.registrar_falha('timeout', 100_000)
+    assert controlador.teto == int(100_000 * FATOR_TETO)
+
+    for _ in range(RECUPERACAO_TETO * 10):
+        controlador.registrar_sucesso(10, 1000, 0.1)
+
+    assert controlador.teto == controlador.teto_corpo == int(500_000 * FATOR_TETO)
+
+
+def test_enviar_em_lotes_desiste_apos_timeouts_seguidos(monkeypatch):
+    requisicao = httpx.Request('POST', 'http://local/rest/v1/t')
+    chamadas = []
+
+    def inserir_json(supabase, tabela, corpo):
+        chamadas.append(len(corpo))
+        raise httpx.ConnectTimeout('sem resposta', request=requisicao)
+
+    monkeypatch.setattr(sinapi_lotes, 'inserir_json', inserir_json)
+    monkeypatch.setattr(sinapi_lotes.time, 'sleep', lambda s: None)
+    controlador = ControladorLotes('t', arquivo_estado=None)
+
+    assert enviar_em_lotes(None, 't', _dados(2000), controlador) == (0, 2000)
+    assert len(chamadas) == TIMEOUTS_SEGUIDOS
+
+
+def _posts(falhar_em, linhas=20_000):
+    """
+    POSTs de uma carga cujo servidor responde 504 nas chamadas de falhar_em;
+    cada POST leva 50 ms mais 1 s por MB no relógio simulado
+    """
+    chamadas = []
+    relogio = [0.0]
+
+    def inserir_json(supabase, tabela, corpo):
+        chamadas.append(len(corpo))
+        relogio[0] += 0.05 + len(corpo) / 1e6
+        if len(chamadas) in falhar_em:
+            raise _ErroHttp(status=504)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(sinapi_lotes, 'inserir_json', inserir_json)
+        mp.setattr(sinapi_lotes.time, 'perf_counter', lambda: relogio[0])
+        largura = len(sinapi_lotes.serializar_registros(_dados(1)))
+        controlador = ControladorLotes('t', bytes_alvo=100 * largura, bytes_maximo=2000 * largura,
+                                       arquivo_estado=None)
+        assert enviar_em_lotes(None, 't', _dados(linhas), controlador) == (linhas, 0)
+    return len(chamadas), controlador
+
+
+def test_timeouts_isolados_nao_travam_o_teto():
+    sem_falha, _ = _posts(set())
+    com_uma, controlador = _posts({8})
+    com_tres, _ = _posts({8, 20, 30})
+
+    assert controlador.teto == controlador.teto_corpo
+    # Sem recuperação do teto eram 108 e 134 POSTs contra 28
+    assert com_uma <= sem_falha + 5
+    assert com_tres <= 2 * sem_falha
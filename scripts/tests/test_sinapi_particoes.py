@@ -0,0 +1,106 @@
+"""Testes da detecção do mês e da carga por partição (sinapi_particoes.py)"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from sinapi_particoes import (detectar_mes_referencia, mes_do_conteudo, mes_do_texto,
+                              normalizar_mes)
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('SINAPI_Preco_Ref_Insumos_SP_2025_04_NaoDesonerado.csv', '2025-04-01'),
+    ('SINAPI_202504.zip', '2025-04-01'),
+    ('Relatorio_04_2025.xlsx', '2025-04-01'),
+    ('Referência 11/2024', '2024-11-01'),
+    ('2025-12', '2025-12-01'),
+    (date(2025, 6, 17), '2025-06-01'),
+    (pd.Timestamp('2024-02-29'), '2024-02-01'),
+    ('SINAPI_2025_13.zip', None),
+    ('lote 12345678', None),
+    ('sem data', None),
+])
+def test_mes_do_texto(texto, esperado):
+    assert mes_do_texto(texto) == esperado
+
+
+def test_normalizar_mes():
+    assert normalizar_mes('2025-04') == '2025-04-01'
+    assert normalizar_mes('04/2025') == '2025-04-01'
+    with pytest.raises(ValueError, match='inválido'):
+        normalizar_mes('abril')
+
+
+def test_mes_do_conteudo_usa_o_mais_frequente():
+    df = pd.DataFrame({'Codigo': ['1', '2', '3'],
+                       'Data Preço': ['05/2025', '04/2025', '04/2025'],
+                       'Mês de Referência': ['2024-01', '2024-01', '2024-01']})
+
+    assert mes_do_conteudo(df) == '2025-04-01'
+    assert mes_do_conteudo(df[['Codigo']]) is None
+
+
+def test_detectar_mes_referencia_precedencia():
+    df = pd.DataFrame({'mes_referencia': ['2025-03-01']})
+
+    assert detectar_mes_referencia(df, 'SINAPI_2025_04.csv') == '2025-03-01'
+    assert detectar_mes_referencia(df[[]], None, 'membro.csv', 'SINAPI_2025_04.zip') == '2025-04-01'
+    assert detectar_mes_referencia(None, 'SINAPI_2025_05.csv', 'SINAPI_2025_04.zip') == '2025-05-01'
+    assert detectar_mes_referencia(None, 'insumos.csv') is None
+
+
+def _mes(codigos, mes):
+    return pd.DataFrame({'codigo_do_insumo': codigos, 'descricao_do_insumo': [f'INSUMO {c}' for c in codigos],
+                         'unidade': 'UN', 'preco_sp': 10.0, 'mes_referencia': mes})
+
+
+def test_carga_por_particao_preserva_as_referencias():
+    pytest.importorskip('supabase')
+    from supabase import create_client
+
+    from postgrest_local import CHAVE_LOCAL, ServidorPostgrestLocal
+    from sinapi_lotes import ControladorLotes
+    from sinapi_particoes import (TABELA, ParticoesIndisponiveis, carregar_particoes,
+                                  remover_mes, reter_meses)
+
+    def carregar(supabase, dados):
+        return carregar_particoes(supabase, dados, ControladorLotes(TABELA, arquivo_estado=None))
+
+    def id_do_codigo(armazenamento, codigo, mes='2025-04'):
+        return next(l['id'] for l in armazenamento.tabelas['sinapi_insumos']
+                    if l['codigo_do_insumo'] == codigo and l['mes_referencia'].startswith(mes))
+
+    with ServidorPostgrestLocal() as servidor:
+        armazenamento = servidor.armazenamento
+        supabase = create_client(servidor.url, CHAVE_LOCAL)
+
+        assert carregar(supabase, _mes(['1', '2', '3'], '2025-04-01'))[:2] == (3, 0)
+        armazenamento.inserir('itens_orcamento', [{'sinapi_insumo_id': id_do_codigo(armazenamento, '2')}])
+
+        # Republicar o mês remapeia a referência para a linha nova do mesmo código
+        importados, erros, relatorio = carregar(supabase, _mes(['1', '2', '3'], '2025-04-01'))
+        assert (importados, erros) == (3, 0)
+        assert relatorio['particoes'][0]['referencias_remapeadas'] == 1
+        referencia = armazenamento.tabelas['itens_orcamento'][0]
+        assert referencia['sinapi_insumo_id'] == id_do_codigo(armazenamento, '2')
+
+        # Código referenciado ausente da carga: a publicação é recusada e o mês fica como estava
+        antes = list(armazenamento.tabelas['sinapi_insumos'])
+        importados, erros, relatorio = carregar(supabase, _mes(['1', '3'], '2025-04-01'))
+        item = relatorio['particoes'][0]
+        assert (importados, erros) == (0, 2)
+        assert item['publicado'] is False and '2' in item['erro']
+        assert armazenamento.tabelas['sinapi_insumos'] == antes
+
+        # Mês referenciado não sai nem pela remoção nem pela retenção
+        carregar(supabase, _mes(['1'], '2025-05-01'))
+        with pytest.raises(Exception, match='não pode ser removida'):
+            remover_mes(supabase, '2025-04')
+        assert reter_meses(supabase, 1) == []
+        armazenamento.tabelas['itens_orcamento'].clear()
+        assert reter_meses(supabase, 1) == ['sinapi_insumos_2025_04']
+
+    with ServidorPostgrestLocal(particionada=False) as servidor:
+        with pytest.raises(ParticoesIndisponiveis):
+            carregar(create_client(servidor.url, CHAVE_LOCAL), _mes(['1'], '2025-04-01'))
@@ -0,0 +1,53 @@
+"""Testes do perfilamento por etapa (sinapi_perfil.py)"""
+
+import json
+import threading
+
+from sinapi_perfil import Perfilador
+
+
+def _trabalho():
+    return sum(i * i for i in range(20_000))
+
+
+def test_etapas_concorrentes_em_threads(tmp_path):
+    perfilador = Perfilador()
+    perfilador.ativar('teste', diretorio=str(tmp_path / 'perfil'), intervalo=0.001)
+    # As duas etapas ficam abertas ao mesmo tempo (no 3.12+ só uma pega o cProfile)
+    dentro = threading.Barrier(2)
+
+    def importar(nome):
+        with perfilador.etapa(nome):
+            dentro.wait()
+            _trabalho()
+            dentro.wait()
+
+    threads = [threading.Thread(target=importar, args=(nome,)) for nome in ('insumos', 'mao_de_obra')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    saida = perfilador.finalizar()
+
+    resumo = json.loads((saida / 'resumo.json').read_text(encoding='utf-8'))
+    assert set(resumo['etapas']) == {'insumos', 'mao_de_obra'}
+    for nome, etapa in resumo['etapas'].items():
+        assert etapa['chamadas'] == 1
+        assert (saida / f'{nome}.prof').exists() == etapa['perfil_cpu']
+    assert any(etapa['perfil_cpu'] for etapa in resumo['etapas'].values())
+    assert (saida / 'flamegraph.folded').exists()
+
+
+def test_etapas_aninhadas_na_mesma_thread(tmp_path):
+    perfilador = Perfilador()
+    perfilador.ativar('teste', diretorio=str(tmp_path / 'perfil'))
+
+    with perfilador.etapa('upload'):
+        with perfilador.etapa('serializacao'):
+            _trabalho()
+        _trabalho()
+
+    resumo = json.loads((perfilador.finalizar() / 'resumo.json').read_text(encoding='utf-8'))
+    assert all(etapa['perfil_cpu'] for etapa in resumo['etapas'].values())
+    assert resumo['etapas']['upload']['tempo_s'] >= resumo['etapas']['serializacao']['tempo_s']
@@ -0,0 +1,105 @@
+"""Testes da propagação incremental até os orçamentos (sinapi_propagacao.py)"""
+
+import numpy as np
+import pandas as pd
+
+from sinapi_custos import COLUNAS_UF, MotorCustos
+from sinapi_dtypes import ESTADOS
+from sinapi_propagacao import IndiceOrcamentos, propagar_alteracoes
+
+
+def _catalogo(semente: int = 7):
+    """Composições aninhadas sem ciclo (só apontam para as anteriores) e orçamentos"""
+    aleatorio = np.random.default_rng(semente)
+    insumos = [f'I{i}' for i in range(40)]
+    linhas = []
+    for c in range(25):
+        for item in aleatorio.choice(insumos, 3, replace=False):
+            linhas.append((f'C{c:02d}', item, 'INSUMO', round(float(aleatorio.uniform(0.1, 5)), 3)))
+        if c >= 5 and aleatorio.random() < 0.6:
+            linhas.append((f'C{c:02d}', f'C{int(aleatorio.integers(0, c)):02d}', 'COMPOSICAO', 1.5))
+    coeficientes = pd.DataFrame(
+        linhas, columns=['codigo_composicao', 'codigo_item', 'tipo_item', 'coeficiente'])
+
+    precos = pd.DataFrame({'codigo_do_insumo': insumos})
+    for coluna in COLUNAS_UF:
+        valores = aleatorio.uniform(1, 100, len(insumos)).round(2)
+        valores[aleatorio.random(len(insumos)) < 0.05] = np.nan
+        precos[coluna] = valores
+
+    itens = pd.DataFrame({
+        'orcamento_id': aleatorio.integers(1, 9, 200),
+        'codigo_composicao': aleatorio.choice(coeficientes['codigo_composicao'].unique(), 200),
+        'quantidade': aleatorio.uniform(1, 50, 200).round(2),
+        'uf': aleatorio.choice(ESTADOS, 200),
+    })
+    return coeficientes, precos, itens
+
+
+def _alteracoes(precos: pd.DataFrame, semente: int = 8) -> pd.DataFrame:
+    aleatorio = np.random.default_rng(semente)
+    alterados = precos.sample(6, random_state=semente).copy()
+    for coluna in COLUNAS_UF:
+        valores = alterados[coluna].to_numpy() * aleatorio.uniform(0.8, 1.3, len(alterados))
+        # Preço que some e preço que volta também propagam
+        valores[0] = np.nan
+        valores[1] = 42.0
+        alterados[coluna] = valores
+    return alterados
+
+
+def test_propagacao_incremental_igual_ao_recalculo_completo():
+    coeficientes, precos, itens = _catalogo()
+    motor = MotorCustos(coeficientes, precos)
+    indice = IndiceOrcamentos(motor, itens)
+    alterados = _alteracoes(precos)
+
+    resultado = propagar_alteracoes(motor, indice, alterados)
+
+    completo_motor = MotorCustos(coeficientes, pd.concat([precos, alterados]))
+    completo = IndiceOrcamentos(completo_motor, itens)
+    np.testing.assert_allclose(motor.custos_de(), completo_motor.custos_de(), equal_nan=True)
+    np.testing.assert_allclose(indice.totais, completo.totais, equal_nan=True)
+
+    # Os orçamentos reportados são exatamente os que mudaram
+    mudaram = ~np.isclose(indice.totais, IndiceOrcamentos(MotorCustos(coeficientes, precos), itens).totais,
+                          equal_nan=True)
+    assert set(resultado['orcamentos']['orcamento_id']) >= set(indice.orcamentos[mudaram])
+
+
+def test_propagacao_em_sequencia():
+    coeficientes, precos, itens = _catalogo(semente=11)
+    motor = MotorCustos(coeficientes, precos)
+    indice = IndiceOrcamentos(motor, itens)
+
+    acumulado = precos
+    for semente in (1, 2, 3):
+        alterados = _alteracoes(acumulado, semente)
+        propagar_alteracoes(motor, indice, alterados)
+        acumulado = pd.concat([acumulado, alterados]).drop_duplicates('codigo_do_insumo', keep='last')
+
+    completo = IndiceOrcamentos(MotorCustos(coeficientes, acumulado), itens)
+    np.testing.assert_allclose(indice.totais, completo.totais, equal_nan=True)
+
+
+def test_itens_de_concatena_os_intervalos():
+    coeficientes, precos, itens = _catalogo()
+    indice = IndiceOrcamentos(MotorCustos(coeficientes, precos), itens)
+    linhas = np.array([0, 3, 4])
+
+    posicoes = indice.itens_de(linhas)
+
+    assert sorted(np.unique(indice._comp[posicoes])) == sorted(set(linhas) & set(indice._comp))
+    assert len(posicoes) == int(np.isin(indice._comp, linhas).sum())
+    assert indice.itens_de(np.array([], dtype=np.int64)).size == 0
+
+
+def test_composicao_desconhecida_e_ignorada(caplog):
+    coeficientes, precos, itens = _catalogo()
+    itens = pd.concat([itens, pd.DataFrame({'orcamento_id': [99], 'codigo_composicao': ['X'],
+                                            'quantidade': [1.0], 'uf': ['SP']})])
+
+    indice = IndiceOrcamentos(MotorCustos(coeficientes, precos), itens)
+
+    assert 99 not in indice.orcamentos
+    assert 'composição desconhecida' in caplog.text
@@ -0,0 +1,113 @@
+"""Testes das regras de qualidade de preços (sinapi_qualidade.py)"""
+
+import numpy as np
+import pandas as pd
+
+from sinapi_dtypes import ESTADOS
+from sinapi_qualidade import REGIMES, montar_matriz, verificar_qualidade
+
+UFS = [e.lower() for e in ESTADOS]
+
+
+def _insumos(precos_por_codigo, unidade='KG'):
+    """Uma linha por código; cada valor é um preço único ou um dict UF -> preço sobre 100"""
+    linhas = []
+    for codigo, precos in precos_por_codigo.items():
+        linha = {'codigo_do_insumo': codigo, 'unidade': unidade}
+        base = {uf: 100.0 + i for i, uf in enumerate(UFS)}
+        if isinstance(precos, dict):
+            base.update(precos)
+        elif precos is None:
+            base = {uf: np.nan for uf in UFS}
+        linha.update({f'preco_{uf}': v for uf, v in base.items()})
+        linhas.append(linha)
+    return pd.DataFrame(linhas)
+
+
+def _regras(violacoes: pd.DataFrame) -> dict:
+    return violacoes.groupby('codigo')['regra'].agg(lambda r: set(r)).to_dict()
+
+
+def test_montar_matriz_com_colunas_ausentes():
+    dados = pd.DataFrame({'preco_sp': [1.0, 2.0], 'preco_com_rj': ['3.5', None]})
+
+    regimes, cubo = montar_matriz(dados)
+
+    assert regimes == ['unico', 'com']
+    assert cubo.shape == (2, 2, len(ESTADOS))
+    assert cubo[0, 1, ESTADOS.index('SP')] == 2.0
+    assert cubo[1, 0, ESTADOS.index('RJ')] == 3.5
+    assert np.isnan(cubo[1, 1, ESTADOS.index('RJ')])
+    assert set(REGIMES) >= set(regimes)
+
+
+def test_regras_por_linha():
+    dados = _insumos({
+        'OK': {},
+        'NEG': {'sp': -5.0},
+        'ZERO': {'rj': 0.0},
+        'VAZIO': None,
+        'OUT': {'am': 2500.0},
+    })
+
+    relatorio, violacoes = verificar_qualidade(dados)
+    regras = _regras(violacoes)
+
+    assert 'OK' not in regras
+    assert regras['NEG'] == {'preco_negativo'}
+    assert regras['ZERO'] == {'preco_zero'}
+    assert regras['VAZIO'] == {'sem_precos'}
+    assert regras['OUT'] == {'zscore_uf', 'fora_da_mediana'}
+    fora = violacoes[(violacoes['codigo'] == 'OUT') & (violacoes['regra'] == 'fora_da_mediana')]
+    assert fora['uf'].tolist() == ['AM']
+    assert relatorio['total_violacoes'] == len(violacoes)
+    assert relatorio['codigos_afetados'] == 4
+
+
+def test_variacao_pequena_entre_ufs_nao_e_outlier():
+    # Linha quase constante: centavos de diferença não acusam z-score
+    dados = _insumos({'CONST': {uf: 0.50 for uf in UFS} | {'sp': 0.52}})
+
+    _, violacoes = verificar_qualidade(dados)
+
+    assert violacoes.empty
+
+
+def test_regimes_de_desoneracao():
+    linha = {'codigo_composicao': '88316', 'unidade': 'H'}
+    for i, uf in enumerate(UFS):
+        linha[f'preco_sem_{uf}'] = 20.0 + i / 10
+        linha[f'preco_com_{uf}'] = 18.0 + i / 10
+    linha['preco_com_sp'] = 30.0
+    linha['preco_com_rj'] = np.nan
+
+    _, violacoes = verificar_qualidade(pd.DataFrame([linha]))
+
+    com_acima = violacoes[violacoes['regra'] == 'com_acima_sem']
+    assert com_acima[['regime', 'uf']].values.tolist() == [['com', 'SP']]
+    assert com_acima['referencia'].iloc[0] == linha['preco_sem_sp']
+    ausente = violacoes[violacoes['regra'] == 'regime_ausente']
+    assert ausente[['regime', 'uf']].values.tolist() == [['sem', 'RJ']]
+
+
+def test_preco_implausivel_para_a_unidade():
+    aleatorio = np.random.default_rng(3)
+    precos = {f'K{i}': {uf: float(p) for uf in UFS}
+              for i, p in enumerate(aleatorio.uniform(80, 120, 25))}
+    precos['CARO'] = {uf: 100000.0 for uf in UFS}
+
+    _, violacoes = verificar_qualidade(_insumos(precos))
+
+    unidade = violacoes[violacoes['regra'] == 'preco_unidade']
+    assert unidade['codigo'].tolist() == ['CARO']
+    assert 80 <= unidade['referencia'].iloc[0] <= 120
+
+
+def test_poucos_codigos_por_unidade_nao_avaliam_a_regra():
+    precos = {f'K{i}': {} for i in range(5)}
+    precos['CARO'] = {uf: 100000.0 for uf in UFS}
+
+    _, violacoes = verificar_qualidade(_insumos(precos))
+
+    assert 'preco_unidade' not in set(violacoes['regra'])
+    assert verificar_qualidade(_insumos(precos), coluna_unidade=None)[1].empty
@@ -0,0 +1,128 @@
+"""Testes da reconciliação por árvore de hashes (sinapi_reconciliacao.py)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sinapi_reconciliacao import (PERFIS, LadoDataFrame, LadoSupabase, _texto_python,
+                                  meses_da_origem, reconciliar)
+
+PERFIL = PERFIS['sinapi_insumos']
+
+
+def _insumos(linhas: int, mes: str = '2025-04-01') -> pd.DataFrame:
+    aleatorio = np.random.default_rng(5)
+    return pd.DataFrame({
+        'codigo_do_insumo': [str(i) for i in range(linhas)],
+        'descricao_do_insumo': [f'INSUMO {i}' for i in range(linhas)],
+        'unidade': 'UN',
+        'preco_sp': aleatorio.uniform(1, 1000, linhas).round(2),
+        'mes_referencia': mes,
+    })
+
+
+def _lado(dados: pd.DataFrame) -> LadoDataFrame:
+    return LadoDataFrame(dados, PERFIL['chave'], PERFIL['colunas'])
+
+
+def _chave(codigo, mes='2025-04-01') -> str:
+    return f'{codigo}|{mes}'
+
+
+def test_texto_canonico():
+    # Como round(col::numeric, 2) do Postgres: meio para longe do zero
+    assert _texto_python(pd.Series([1.005, 2, np.nan, '3,5']), 'numero').tolist() == \
+        ['1.01', '2.00', '', '']
+    assert _texto_python(pd.Series([-1.005, -2.675, -0.001, 0.125]), 'numero').tolist() == \
+        ['-1.01', '-2.68', '0.00', '0.13']
+    assert _texto_python(pd.Series([7.0, None]), 'inteiro').tolist() == ['7', '']
+    assert _texto_python(pd.Series(['2025-04-01', None]), 'data').tolist() == ['2025-04-01', '']
+    assert _texto_python(pd.Series([True, False, None]), 'booleano').tolist() == ['true', 'false', '']
+    assert _texto_python(pd.Series(['a', None]), 'texto').tolist() == ['a', '']
+
+
+def test_lados_iguais_param_na_raiz():
+    dados = _insumos(500)
+
+    resultado = reconciliar(_lado(dados), _lado(dados.sample(frac=1, random_state=1)))
+
+    assert resultado['inserir'] == resultado['atualizar'] == resultado['excluir'] == []
+    assert resultado['estatisticas']['niveis'] == 1
+    assert resultado['estatisticas']['linhas_baixadas'] == 0
+
+
+def test_diferencas_iguais_a_comparacao_direta():
+    origem = _insumos(5000)
+    destino = origem.drop(index=[10, 2000, 4999]).copy()
+    destino.loc[[7, 3000], 'preco_sp'] += 1
+    destino.loc[1234, 'descricao_do_insumo'] = 'OUTRA'
+    extras = _insumos(3).assign(codigo_do_insumo=['A1', 'A2', 'Z9'])
+    destino = pd.concat([destino, extras], ignore_index=True)
+
+    resultado = reconciliar(_lado(origem), _lado(destino), limite_folha=32)
+
+    assert resultado['inserir'] == sorted(_chave(c) for c in ('10', '2000', '4999'))
+    assert resultado['atualizar'] == sorted(_chave(c) for c in ('7', '3000', '1234'))
+    assert resultado['excluir'] == sorted(_chave(c) for c in ('A1', 'A2', 'Z9'))
+    # Só as faixas divergentes descem: bem menos linhas baixadas que a tabela
+    assert resultado['estatisticas']['linhas_baixadas'] < len(destino) / 10
+
+
+def test_mes_faz_parte_da_chave():
+    origem = _insumos(50)
+    destino = pd.concat([origem, _insumos(50, mes='2025-03-01')], ignore_index=True)
+
+    resultado = reconciliar(_lado(origem), _lado(destino))
+
+    assert resultado['excluir'] == sorted(_chave(i, '2025-03-01') for i in range(50))
+    assert resultado['inserir'] == resultado['atualizar'] == []
+
+
+def test_chaves_duplicadas_no_destino():
+    origem = _insumos(100)
+    destino = pd.concat([origem, origem.iloc[[3]]], ignore_index=True)
+
+    resultado = reconciliar(_lado(origem), _lado(destino))
+
+    assert resultado['duplicadas'] == [_chave(3)]
+
+
+def test_chave_composta_de_manutencoes():
+    perfil = PERFIS['sinapi_manutencoes']
+    origem = pd.DataFrame({'codigo_sinapi': [1, 1, 2], 'tipo_manutencao': ['A', 'B', 'A'],
+                           'data_referencia': '2025-04-01', 'tipo': 'INSUMO', 'descricao': 'x'})
+    destino = origem.iloc[:2].assign(descricao=['x', 'y'])
+
+    resultado = reconciliar(LadoDataFrame(origem, perfil['chave'], perfil['colunas']),
+                            LadoDataFrame(destino, perfil['chave'], perfil['colunas']))
+
+    assert resultado['inserir'] == ['2|2025-04-01|A']
+    assert resultado['atualizar'] == ['1|2025-04-01|B']
+
+
+def test_meses_da_origem():
+    dados = pd.DataFrame({'mes_referencia': ['2025-04-01', '2025-04-01', '2025-05-01', None]})
+
+    assert meses_da_origem(dados, 'mes_referencia') == ['2025-04-01', '2025-05-01']
+    assert meses_da_origem(dados, 'mes_referencia', '03/2025') == ['2025-03-01']
+
+
+def test_lado_supabase_le_so_os_meses_da_origem():
+    pytest.importorskip('supabase')
+    from supabase import create_client
+
+    from postgrest_local import CHAVE_LOCAL, ServidorPostgrestLocal
+
+    origem = _insumos(300)
+    with ServidorPostgrestLocal() as servidor:
+        armazenamento = servidor.armazenamento
+        armazenamento.inserir('sinapi_insumos', _insumos(300, mes='2025-03-01').to_dict('records'))
+        armazenamento.inserir('sinapi_insumos', origem.drop(index=[5]).to_dict('records'))
+        destino = LadoSupabase(create_client(servidor.url, CHAVE_LOCAL), 'sinapi_insumos',
+                               PERFIL['chave'], PERFIL['colunas'], 'mes_referencia',
+                               meses_da_origem(origem, 'mes_referencia'))
+
+        resultado = reconciliar(_lado(origem), destino)
+
+    assert resultado['inserir'] == [_chave(5)]
+    assert resultado['excluir'] == resultado['atualizar'] == []
@@ -0,0 +1,97 @@
+"""Testes dos shards binários de preço por UF (sinapi_shards.py)"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sinapi_dtypes import ESTADOS
+from sinapi_shards import CABECALHO, ShardPrecos, atualizar_manifesto, exportar_shards
+
+
+def _insumos():
+    dados = pd.DataFrame({'codigo_do_insumo': ['300', '10', ' 2000 ', 'ABC', '10'],
+                          'mes_referencia': '2025-04-01'})
+    for i, uf in enumerate(ESTADOS):
+        dados[f'preco_{uf.lower()}'] = [3.0 + i, 1.0, 20.55, 9.0, 1.25 + i]
+    dados.loc[0, 'preco_sp'] = np.nan
+    return dados
+
+
+def test_round_trip_de_insumos(tmp_path):
+    entradas = exportar_shards(_insumos(), 'insumos', str(tmp_path))
+
+    assert len(entradas) == len(ESTADOS)
+    assert {e['regime'] for e in entradas} == {''}
+
+    with ShardPrecos(tmp_path / 'insumos' / 'RJ.bin') as shard:
+        indice = ESTADOS.index('RJ')
+        assert (shard.conjunto, shard.regime, shard.uf) == ('insumos', '', 'RJ')
+        assert shard.mes_referencia == '2025-04-01'
+        assert shard.codigos.tolist() == [10, 300, 2000]
+        # Código repetido: vale a última linha
+        assert shard.preco(10) == pytest.approx(1.25 + indice)
+        assert shard.preco(2000) == 20.55
+        assert shard.preco(300) == pytest.approx(3.0 + indice)
+        assert shard.preco(11) is None
+        assert shard.preco(-1) is None
+
+    # Sem preço na UF, o código fica fora do shard
+    with ShardPrecos(tmp_path / 'insumos' / 'SP.bin') as shard:
+        assert len(shard) == 2
+        assert shard.preco(300) is None
+        np.testing.assert_array_equal(shard.precos([2000, 300, 10, 2 ** 40]),
+                                      [20.55, np.nan, 1.25 + ESTADOS.index('SP'), np.nan])
+
+
+def test_mao_de_obra_por_regime(tmp_path):
+    dados = pd.DataFrame({'codigo_composicao': ['88316', '88309'], 'mes_referencia': '2025-06-01',
+                          'preco_sem_sp': [25.1, 30.0], 'preco_com_sp': [22.9, 27.5]})
+
+    entradas = exportar_shards(dados, 'mao_de_obra', str(tmp_path), mes_referencia='2025-05-01')
+
+    assert {(e['regime'], e['uf']) for e in entradas} == {('sem', 'SP'), ('com', 'SP')}
+    with ShardPrecos(tmp_path / 'mao_de_obra' / 'com' / 'SP.bin') as shard:
+        assert shard.regime == 'com'
+        assert shard.mes_referencia == '2025-05-01'
+        assert shard.preco(88316) == 22.9
+        assert shard.preco(88309) == 27.5
+
+
+def test_crc_detecta_corpo_corrompido(tmp_path):
+    entrada = exportar_shards(_insumos(), 'insumos', str(tmp_path))[0]
+    caminho = tmp_path / 'insumos' / f"{entrada['uf']}.bin"
+    conteudo = bytearray(caminho.read_bytes())
+    assert len(conteudo) == entrada['bytes'] == CABECALHO.size + 8 * entrada['registros']
+
+    conteudo[CABECALHO.size + 4 * entrada['registros']] ^= 0xFF
+    caminho.write_bytes(bytes(conteudo))
+
+    with pytest.raises(ValueError, match='CRC32'):
+        ShardPrecos(caminho)
+    with ShardPrecos(caminho, verificar=False) as shard:
+        assert len(shard) == entrada['registros']
+
+
+def test_arquivo_que_nao_e_shard(tmp_path):
+    caminho = tmp_path / 'outro.bin'
+    caminho.write_bytes(b'\0' * 128)
+
+    with pytest.raises(ValueError, match='não é um shard'):
+        ShardPrecos(caminho)
+
+
+def test_manifesto_substitui_so_o_conjunto_exportado(tmp_path):
+    insumos = exportar_shards(_insumos(), 'insumos', str(tmp_path))
+    mao_obra = exportar_shards(pd.DataFrame({'codigo_composicao': ['1'], 'preco_sem_sp': [2.0]}),
+                               'mao_de_obra', str(tmp_path))
+    atualizar_manifesto(str(tmp_path), insumos)
+    atualizar_manifesto(str(tmp_path), mao_obra)
+
+    caminho = atualizar_manifesto(str(tmp_path), insumos[:1])
+
+    manifesto = json.loads(caminho.read_text(encoding='utf-8'))
+    assert [(e['conjunto'], e['uf']) for e in manifesto['shards']] == \
+        [('mao_de_obra', 'SP'), ('insumos', insumos[0]['uf'])]
+    assert manifesto['shards'][1]['crc32'] == insumos[0]['crc32']
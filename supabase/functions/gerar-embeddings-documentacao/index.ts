@@ -17,7 +17,7 @@ Deno.serve(async (req) => {
   }
 
   try {
-    const { documento, chunks } = await req.json();
+    const { documento, chunks, nome_documento, manter_ids } = await req.json();
 
     if (!documento || !chunks || !Array.isArray(chunks)) {
       return new Response(
@@ -29,6 +29,49 @@ Deno.serve(async (req) => {
       );
     }
 
+    // Limpeza: remove as linhas do documento cujo id não está na versão atual
+    if (Array.isArray(manter_ids)) {
+      let consulta = supabase
+        .from("embeddings_conhecimento")
+        .delete()
+        .eq("tipo_conteudo", documento)
+        .eq("titulo", nome_documento || documento);
+      if (manter_ids.length > 0) {
+        consulta = consulta.not("id", "in", `(${manter_ids.join(",")})`);
+      }
+      const { data: removidos, error: deleteError } = await consulta.select(
+        "id",
+      );
+
+      if (deleteError) {
+        console.error("Erro ao remover chunks antigos:", deleteError);
+        return new Response(
+          JSON.stringify({
+            error: "Erro ao remover chunks antigos",
+            details: deleteError.message || deleteError,
+          }),
+          {
+            status: 500,
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          },
+        );
+      }
+
+      if (chunks.length === 0) {
+        return new Response(
+          JSON.stringify({
+            success: true,
+            documento,
+            chunks_processados: 0,
+            removidos: removidos?.length ?? 0,
+          }),
+          {
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          },
+        );
+      }
+    }
+
     // Verificar se a chave da API OpenAI está configurada
     const openaiApiKey = Deno.env.get("OPENAI_API_KEY");
     if (!openaiApiKey) {
@@ -99,21 +142,24 @@ Deno.serve(async (req) => {
       // Tentar inserir diretamente - se a tabela não existir, será criada automaticamente
       // através da migração SQL que deve estar aplicada no banco
 
-      // Inserir no banco de dados (nova tabela)
+      // O chunk_id (estável por conteúdo) é o id da linha: reenviar o mesmo
+      // chunk atualiza a linha existente em vez de duplicá-la
+      const id = chunk.chunk_id ?? crypto.randomUUID();
       const { data: insertData, error: insertError } = await supabase
         .from("embeddings_conhecimento")
-        .insert([
+        .upsert([
           {
+            id,
             obra_id: null,
             tipo_conteudo: documento,
-            referencia_id: crypto.randomUUID(),
+            referencia_id: id,
             titulo: chunk.nome_documento || documento,
             conteudo: chunk.conteudo,
             conteudo_resumido: chunk.conteudo.slice(0, 120),
             // supabase-js will cast number[] → vector
             embedding,
           },
-        ])
+        ], { onConflict: "id" })
         .select();
 
       if (insertError) {
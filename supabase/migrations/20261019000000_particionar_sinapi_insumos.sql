@@ -0,0 +1,428 @@
+-- =====================================================
+-- sinapi_insumos particionada por mês de referência
+-- =====================================================
+-- Cada mês do SINAPI vira uma partição (sinapi_insumos_AAAA_MM):
+-- consultas do mês corrente só leem a própria partição e a retenção
+-- (remover um mês antigo) é DETACH + DROP, sem DELETE linha a linha.
+--
+-- Carga de um mês (scripts/importar_sinapi.py):
+--   1. sinapi_preparar_carga()        esvazia sinapi_insumos_carga
+--   2. POSTs em sinapi_insumos_carga  (tabela comum, sem índices)
+--   3. sinapi_publicar_mes(mes)       a tabela de carga vira a partição do
+--                                     mês (sem cópia), substituindo a antiga
+-- Retenção: sinapi_remover_mes(mes) e sinapi_reter_meses(n).
+--
+-- Tabelas particionadas exigem a chave de partição nas restrições únicas:
+-- a PK passa a ser (id, mes_referencia) e as FKs por id de
+-- coeficientes_tecnicos, composicao_insumos e itens_orcamento não podem mais
+-- apontar para sinapi_insumos (o id continua único pela sequência). No lugar
+-- delas:
+--   - um gatilho recusa sinapi_insumo_id inexistente em INSERT/UPDATE;
+--   - um gatilho recusa DELETE de insumo ainda referenciado;
+--   - sinapi_publicar_mes remapeia as referências do mês substituído para os
+--     ids novos por (codigo_do_insumo, mes_referencia) e recusa a carga se um
+--     insumo referenciado não estiver nela;
+--   - sinapi_remover_mes recusa e sinapi_reter_meses pula mês referenciado.
+
+CREATE OR REPLACE FUNCTION "public"."sinapi_particao_mes"("p_mes" "date") RETURNS "text"
+    LANGUAGE "sql" IMMUTABLE
+    AS $$
+    SELECT 'sinapi_insumos_' || to_char(date_trunc('month', p_mes), 'YYYY_MM')
+$$;
+
+
+-- 1. Nova tabela particionada com as partições dos meses já carregados
+CREATE TABLE "public"."sinapi_insumos_particionada" (
+    LIKE "public"."sinapi_insumos" INCLUDING DEFAULTS
+) PARTITION BY RANGE ("mes_referencia");
+
+-- Linhas avulsas (ex.: inserção manual de admin) em mês sem partição
+CREATE TABLE "public"."sinapi_insumos_padrao"
+    PARTITION OF "public"."sinapi_insumos_particionada" DEFAULT;
+
+DO $$
+DECLARE
+    v_mes date;
+BEGIN
+    FOR v_mes IN SELECT DISTINCT date_trunc('month', "mes_referencia")::date FROM "public"."sinapi_insumos" LOOP
+        EXECUTE format('CREATE TABLE public.%I PARTITION OF public.sinapi_insumos_particionada '
+                       'FOR VALUES FROM (%L) TO (%L)',
+                       public.sinapi_particao_mes(v_mes), v_mes, (v_mes + interval '1 month')::date);
+    END LOOP;
+END
+$$;
+
+INSERT INTO "public"."sinapi_insumos_particionada" SELECT * FROM "public"."sinapi_insumos";
+
+
+-- 2. Troca das tabelas (views religadas antes de remover a antiga)
+ALTER TABLE "public"."coeficientes_tecnicos" DROP CONSTRAINT "coeficientes_tecnicos_sinapi_insumo_id_fkey";
+ALTER TABLE "public"."composicao_insumos" DROP CONSTRAINT "composicao_insumos_sinapi_insumo_id_fkey";
+ALTER TABLE "public"."itens_orcamento" DROP CONSTRAINT "itens_orcamento_sinapi_insumo_id_fkey";
+
+ALTER TABLE "public"."sinapi_insumos" RENAME TO "sinapi_insumos_legado";
+ALTER TABLE "public"."sinapi_insumos_particionada" RENAME TO "sinapi_insumos";
+ALTER SEQUENCE "public"."sinapi_insumos_id_seq" OWNED BY "public"."sinapi_insumos"."id";
+
+CREATE OR REPLACE VIEW "public"."v_coeficientes_tecnicos_sinapi" AS
+ SELECT "ct"."id",
+    "ct"."tipo_obra",
+    "ct"."padrao_obra",
+    "ct"."categoria",
+    "ct"."etapa",
+    "ct"."insumo",
+    "ct"."quantidade_por_m2",
+    "ct"."unidade_medida",
+    "ct"."fonte_tecnica",
+    "ct"."codigo_sinapi",
+    "ct"."validado_oficialmente",
+    "si"."descricao_do_insumo" AS "sinapi_descricao",
+    "si"."unidade" AS "sinapi_unidade",
+    "si"."categoria" AS "sinapi_categoria",
+    "si"."mes_referencia" AS "sinapi_mes_referencia",
+    "si"."preco_sp",
+    "si"."preco_rj",
+    "si"."preco_mg",
+    "si"."preco_rs",
+    "si"."preco_pr",
+    "ct"."ativo",
+    "ct"."created_at",
+    "ct"."updated_at"
+   FROM ("public"."coeficientes_tecnicos" "ct"
+     LEFT JOIN "public"."sinapi_insumos" "si" ON (("ct"."sinapi_insumo_id" = "si"."id")));
+
+CREATE OR REPLACE VIEW "public"."v_itens_orcamento_sinapi" AS
+ SELECT "io"."id",
+    "io"."orcamento_id",
+    "io"."categoria",
+    "io"."etapa",
+    "io"."insumo",
+    "io"."quantidade_estimada",
+    "io"."unidade_medida",
+    "io"."valor_unitario_base",
+    "io"."valor_total",
+    "io"."codigo_sinapi",
+    "io"."estado_referencia_preco",
+    "io"."usa_preco_sinapi",
+    "io"."observacoes",
+    "si"."codigo_do_insumo" AS "sinapi_codigo",
+    "si"."descricao_do_insumo" AS "sinapi_descricao",
+    "si"."unidade" AS "sinapi_unidade",
+    "si"."categoria" AS "sinapi_categoria",
+    "si"."mes_referencia" AS "sinapi_mes_referencia",
+    "public"."obter_preco_sinapi_por_estado"("io"."codigo_sinapi", COALESCE("io"."estado_referencia_preco", 'SP'::character varying), CURRENT_DATE) AS "preco_sinapi_atual",
+        CASE
+            WHEN ("io"."usa_preco_sinapi" = true) THEN 'SINAPI_OFICIAL'::"text"
+            WHEN ("io"."codigo_sinapi" IS NOT NULL) THEN 'MANUAL_COM_REFERENCIA'::"text"
+            ELSE 'MANUAL_SEM_REFERENCIA'::"text"
+        END AS "tipo_precificacao",
+        CASE
+            WHEN (("io"."codigo_sinapi" IS NOT NULL) AND ("public"."obter_preco_sinapi_por_estado"("io"."codigo_sinapi", COALESCE("io"."estado_referencia_preco", 'SP'::character varying), CURRENT_DATE) > (0)::numeric)) THEN "round"(((("io"."valor_unitario_base" - "public"."obter_preco_sinapi_por_estado"("io"."codigo_sinapi", COALESCE("io"."estado_referencia_preco", 'SP'::character varying), CURRENT_DATE)) / "public"."obter_preco_sinapi_por_estado"("io"."codigo_sinapi", COALESCE("io"."estado_referencia_preco", 'SP'::character varying), CURRENT_DATE)) * (100)::numeric), 2)
+            ELSE NULL::numeric
+        END AS "diferenca_percentual_sinapi",
+    "io"."created_at",
+    "io"."updated_at"
+   FROM ("public"."itens_orcamento" "io"
+     LEFT JOIN "public"."sinapi_insumos" "si" ON (("io"."sinapi_insumo_id" = "si"."id")))
+  WHERE ("io"."orcamento_id" IS NOT NULL);
+
+DROP TABLE "public"."sinapi_insumos_legado";
+
+
+-- 3. Restrições e índices (criados em cada partição pelo Postgres).
+-- idx_sinapi_mes_ref e idx_sinapi_mes_ativo saem: o filtro por mês é a poda de partições
+ALTER TABLE "public"."sinapi_insumos"
+    ADD CONSTRAINT "sinapi_insumos_pkey" PRIMARY KEY ("id", "mes_referencia");
+ALTER TABLE "public"."sinapi_insumos"
+    ADD CONSTRAINT "uk_sinapi_codigo_insumo_mes" UNIQUE ("codigo_do_insumo", "mes_referencia");
+
+CREATE INDEX "idx_sinapi_ativo" ON "public"."sinapi_insumos" USING "btree" ("ativo");
+CREATE INDEX "idx_sinapi_codigo_familia" ON "public"."sinapi_insumos" USING "btree" ("codigo_da_familia");
+CREATE INDEX "idx_sinapi_codigo_insumo" ON "public"."sinapi_insumos" USING "btree" ("codigo_do_insumo");
+CREATE INDEX "idx_sinapi_unidade" ON "public"."sinapi_insumos" USING "btree" ("unidade");
+
+
+-- 4. Integridade de sinapi_insumo_id (substitui as FKs removidas em 2)
+CREATE OR REPLACE FUNCTION "public"."sinapi_validar_insumo_id"() RETURNS "trigger"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+    IF NEW.sinapi_insumo_id IS NOT NULL
+       AND NOT EXISTS (SELECT 1 FROM public.sinapi_insumos WHERE id = NEW.sinapi_insumo_id) THEN
+        RAISE EXCEPTION 'sinapi_insumo_id % não existe em sinapi_insumos', NEW.sinapi_insumo_id
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER "trigger_sinapi_insumo_id_valido" BEFORE INSERT OR UPDATE OF "sinapi_insumo_id" ON "public"."coeficientes_tecnicos" FOR EACH ROW EXECUTE FUNCTION "public"."sinapi_validar_insumo_id"();
+CREATE OR REPLACE TRIGGER "trigger_sinapi_insumo_id_valido" BEFORE INSERT OR UPDATE OF "sinapi_insumo_id" ON "public"."composicao_insumos" FOR EACH ROW EXECUTE FUNCTION "public"."sinapi_validar_insumo_id"();
+CREATE OR REPLACE TRIGGER "trigger_sinapi_insumo_id_valido" BEFORE INSERT OR UPDATE OF "sinapi_insumo_id" ON "public"."itens_orcamento" FOR EACH ROW EXECUTE FUNCTION "public"."sinapi_validar_insumo_id"();
+
+CREATE OR REPLACE FUNCTION "public"."sinapi_insumo_referenciado"("p_id" bigint) RETURNS boolean
+    LANGUAGE "sql" STABLE SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+    SELECT EXISTS (SELECT 1 FROM public.coeficientes_tecnicos WHERE sinapi_insumo_id = p_id)
+        OR EXISTS (SELECT 1 FROM public.composicao_insumos WHERE sinapi_insumo_id = p_id)
+        OR EXISTS (SELECT 1 FROM public.itens_orcamento WHERE sinapi_insumo_id = p_id)
+$$;
+
+CREATE OR REPLACE FUNCTION "public"."sinapi_impedir_exclusao_referenciada"() RETURNS "trigger"
+    LANGUAGE "plpgsql"
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+    IF public.sinapi_insumo_referenciado(OLD.id) THEN
+        RAISE EXCEPTION 'insumo % (%) ainda é referenciado por sinapi_insumo_id', OLD.codigo_do_insumo, OLD.id
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN OLD;
+END;
+$$;
+
+-- DETACH/DROP não disparam gatilhos: as funções de partição checam à parte
+CREATE OR REPLACE TRIGGER "trigger_sinapi_exclusao_referenciada" BEFORE DELETE ON "public"."sinapi_insumos" FOR EACH ROW EXECUTE FUNCTION "public"."sinapi_impedir_exclusao_referenciada"();
+
+-- Referências (das três tabelas) a insumos de um mês
+CREATE OR REPLACE FUNCTION "public"."sinapi_referencias_mes"("p_mes" "date") RETURNS bigint
+    LANGUAGE "sql" STABLE SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+    WITH insumos AS (
+        SELECT id FROM public.sinapi_insumos
+         WHERE mes_referencia >= date_trunc('month', p_mes)::date
+           AND mes_referencia < (date_trunc('month', p_mes) + interval '1 month')::date
+    )
+    SELECT (SELECT count(*) FROM public.coeficientes_tecnicos WHERE sinapi_insumo_id IN (SELECT id FROM insumos))
+         + (SELECT count(*) FROM public.composicao_insumos WHERE sinapi_insumo_id IN (SELECT id FROM insumos))
+         + (SELECT count(*) FROM public.itens_orcamento WHERE sinapi_insumo_id IN (SELECT id FROM insumos))
+$$;
+
+
+-- 5. Segurança: políticas na tabela-mãe; partições com RLS e sem políticas
+-- (acesso direto só pelo service_role)
+ALTER TABLE "public"."sinapi_insumos" ENABLE ROW LEVEL SECURITY;
+
+DO $$
+DECLARE
+    v_particao regclass;
+BEGIN
+    FOR v_particao IN SELECT "inhrelid"::regclass FROM "pg_inherits"
+                      WHERE "inhparent" = 'public.sinapi_insumos'::regclass LOOP
+        EXECUTE format('ALTER TABLE %s ENABLE ROW LEVEL SECURITY', v_particao);
+    END LOOP;
+END
+$$;
+
+CREATE POLICY "Permitir atualização SINAPI para admins" ON "public"."sinapi_insumos" FOR UPDATE TO "authenticated" USING ((EXISTS ( SELECT 1
+   FROM "public"."profiles" "p"
+  WHERE (("p"."id" = "auth"."uid"()) AND ("p"."role" = 'admin'::"text"))))) WITH CHECK ((EXISTS ( SELECT 1
+   FROM "public"."profiles" "p"
+  WHERE (("p"."id" = "auth"."uid"()) AND ("p"."role" = 'admin'::"text")))));
+
+CREATE POLICY "Permitir exclusão SINAPI para admins" ON "public"."sinapi_insumos" FOR DELETE TO "authenticated" USING ((EXISTS ( SELECT 1
+   FROM "public"."profiles" "p"
+  WHERE (("p"."id" = "auth"."uid"()) AND ("p"."role" = 'admin'::"text")))));
+
+CREATE POLICY "Permitir inserção SINAPI para admins" ON "public"."sinapi_insumos" FOR INSERT TO "authenticated" WITH CHECK ((EXISTS ( SELECT 1
+   FROM "public"."profiles" "p"
+  WHERE (("p"."id" = "auth"."uid"()) AND ("p"."role" = 'admin'::"text")))));
+
+CREATE POLICY "Permitir leitura SINAPI para usuários autenticados" ON "public"."sinapi_insumos" FOR SELECT TO "authenticated" USING (true);
+
+GRANT ALL ON TABLE "public"."sinapi_insumos" TO "anon";
+GRANT ALL ON TABLE "public"."sinapi_insumos" TO "authenticated";
+GRANT ALL ON TABLE "public"."sinapi_insumos" TO "service_role";
+
+
+-- 6. Tabela de carga (uma carga de mês por vez)
+CREATE TABLE "public"."sinapi_insumos_carga" (
+    LIKE "public"."sinapi_insumos" INCLUDING DEFAULTS
+);
+ALTER TABLE "public"."sinapi_insumos_carga" ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE "public"."sinapi_insumos_carga" FROM "anon", "authenticated";
+GRANT ALL ON TABLE "public"."sinapi_insumos_carga" TO "service_role";
+
+COMMENT ON TABLE "public"."sinapi_insumos_carga" IS 'Carga em andamento de um mês do SINAPI; vira partição de sinapi_insumos em sinapi_publicar_mes';
+
+
+-- 7. Funções de carga e retenção (service_role via RPC)
+CREATE OR REPLACE FUNCTION "public"."sinapi_preparar_carga"() RETURNS "void"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+BEGIN
+    TRUNCATE public.sinapi_insumos_carga;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION "public"."sinapi_publicar_mes"("p_mes" "date") RETURNS "jsonb"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+DECLARE
+    v_inicio date := date_trunc('month', p_mes)::date;
+    v_fim date := (date_trunc('month', p_mes) + interval '1 month')::date;
+    v_nome text := public.sinapi_particao_mes(p_mes);
+    v_linhas bigint;
+    v_fora bigint;
+    v_avulsas bigint;
+    v_orfaos text;
+    v_remapeadas bigint := 0;
+    v_n bigint;
+    v_substituida boolean := false;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('sinapi_insumos_carga'));
+
+    SELECT count(*), count(*) FILTER (WHERE mes_referencia < v_inicio OR mes_referencia >= v_fim)
+      INTO v_linhas, v_fora
+      FROM public.sinapi_insumos_carga;
+    IF v_linhas = 0 THEN
+        RAISE EXCEPTION 'sinapi_insumos_carga está vazia';
+    END IF;
+    IF v_fora > 0 THEN
+        RAISE EXCEPTION '% linha(s) da carga fora de %', v_fora, to_char(v_inicio, 'YYYY-MM');
+    END IF;
+
+    -- O ATTACH falharia com linhas do mês na partição padrão; elas não são
+    -- descartadas em silêncio: quem publica decide movê-las ou removê-las
+    SELECT count(*) INTO v_avulsas FROM public.sinapi_insumos_padrao
+     WHERE mes_referencia >= v_inicio AND mes_referencia < v_fim;
+    IF v_avulsas > 0 THEN
+        RAISE EXCEPTION '% linha(s) avulsa(s) de % em sinapi_insumos_padrao; remova-as ou mova-as antes de publicar o mês',
+            v_avulsas, to_char(v_inicio, 'YYYY-MM');
+    END IF;
+
+    -- Insumos referenciados do mês publicado -> id novo do mesmo código na carga
+    DROP TABLE IF EXISTS pg_temp.sinapi_mapa_ids;
+    CREATE TEMP TABLE sinapi_mapa_ids ON COMMIT DROP AS
+        SELECT antigo.id AS id_antigo, antigo.codigo_do_insumo, novo.id AS id_novo
+          FROM public.sinapi_insumos antigo
+          LEFT JOIN public.sinapi_insumos_carga novo ON novo.codigo_do_insumo = antigo.codigo_do_insumo
+         WHERE antigo.mes_referencia >= v_inicio AND antigo.mes_referencia < v_fim
+           AND public.sinapi_insumo_referenciado(antigo.id);
+    SELECT string_agg(codigo_do_insumo, ', ' ORDER BY codigo_do_insumo) INTO v_orfaos
+      FROM pg_temp.sinapi_mapa_ids WHERE id_novo IS NULL;
+    IF v_orfaos IS NOT NULL THEN
+        RAISE EXCEPTION 'insumo(s) referenciado(s) de % ausente(s) da carga: %', to_char(v_inicio, 'YYYY-MM'), v_orfaos
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+
+    -- Mês já publicado: a partição antiga sai (só metadados) antes da nova entrar
+    IF to_regclass(format('public.%I', v_nome)) IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE public.sinapi_insumos DETACH PARTITION public.%I', v_nome);
+        EXECUTE format('DROP TABLE public.%I', v_nome);
+        v_substituida := true;
+    END IF;
+
+    -- A tabela de carga vira a partição, sem cópia; o CHECK dispensa a varredura do ATTACH
+    EXECUTE format('ALTER TABLE public.sinapi_insumos_carga ADD CONSTRAINT %I '
+                   'CHECK (mes_referencia >= %L AND mes_referencia < %L)', v_nome || '_mes', v_inicio, v_fim);
+    EXECUTE format('ALTER TABLE public.sinapi_insumos_carga RENAME TO %I', v_nome);
+    EXECUTE format('ALTER TABLE public.sinapi_insumos ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                   v_nome, v_inicio, v_fim);
+    EXECUTE format('ALTER TABLE public.%I DROP CONSTRAINT %I', v_nome, v_nome || '_mes');
+    EXECUTE format('ANALYZE public.%I', v_nome);
+
+    -- Com a partição nova anexada os ids novos existem para o gatilho de validação
+    -- (em itens_orcamento o gatilho de preço relê o preço do insumo republicado)
+    UPDATE public.coeficientes_tecnicos t SET sinapi_insumo_id = m.id_novo
+      FROM pg_temp.sinapi_mapa_ids m WHERE t.sinapi_insumo_id = m.id_antigo;
+    GET DIAGNOSTICS v_n = ROW_COUNT;
+    v_remapeadas := v_remapeadas + v_n;
+    UPDATE public.composicao_insumos t SET sinapi_insumo_id = m.id_novo
+      FROM pg_temp.sinapi_mapa_ids m WHERE t.sinapi_insumo_id = m.id_antigo;
+    GET DIAGNOSTICS v_n = ROW_COUNT;
+    v_remapeadas := v_remapeadas + v_n;
+    UPDATE public.itens_orcamento t SET sinapi_insumo_id = m.id_novo
+      FROM pg_temp.sinapi_mapa_ids m WHERE t.sinapi_insumo_id = m.id_antigo;
+    GET DIAGNOSTICS v_n = ROW_COUNT;
+    v_remapeadas := v_remapeadas + v_n;
+
+    CREATE TABLE public.sinapi_insumos_carga (LIKE public.sinapi_insumos INCLUDING DEFAULTS);
+    ALTER TABLE public.sinapi_insumos_carga ENABLE ROW LEVEL SECURITY;
+    REVOKE ALL ON TABLE public.sinapi_insumos_carga FROM anon, authenticated;
+    GRANT ALL ON TABLE public.sinapi_insumos_carga TO service_role;
+    NOTIFY pgrst, 'reload schema';
+
+    RETURN jsonb_build_object('particao', v_nome, 'mes', v_inicio, 'linhas', v_linhas,
+                              'substituida', v_substituida, 'referencias_remapeadas', v_remapeadas);
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION "public"."sinapi_listar_particoes"()
+    RETURNS TABLE("particao" "text", "mes" "date", "linhas_estimadas" bigint)
+    LANGUAGE "sql" STABLE SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+    SELECT c.relname::text,
+           to_date(substring(c.relname FROM '(\d{4}_\d{2})$'), 'YYYY_MM'),
+           greatest(c.reltuples, 0)::bigint
+      FROM pg_inherits i
+      JOIN pg_class c ON c.oid = i.inhrelid
+     WHERE i.inhparent = 'public.sinapi_insumos'::regclass
+       AND c.relname ~ '^sinapi_insumos_\d{4}_\d{2}$'
+     ORDER BY 2
+$$;
+
+
+CREATE OR REPLACE FUNCTION "public"."sinapi_remover_mes"("p_mes" "date") RETURNS boolean
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+DECLARE
+    v_nome text := public.sinapi_particao_mes(p_mes);
+    v_referencias bigint;
+BEGIN
+    IF to_regclass(format('public.%I', v_nome)) IS NULL THEN
+        RETURN false;
+    END IF;
+    v_referencias := public.sinapi_referencias_mes(p_mes);
+    IF v_referencias > 0 THEN
+        RAISE EXCEPTION '% não pode ser removida: % referência(s) por sinapi_insumo_id', v_nome, v_referencias
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    EXECUTE format('ALTER TABLE public.sinapi_insumos DETACH PARTITION public.%I', v_nome);
+    EXECUTE format('DROP TABLE public.%I', v_nome);
+    RETURN true;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION "public"."sinapi_reter_meses"("p_manter" integer) RETURNS SETOF "text"
+    LANGUAGE "plpgsql" SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+DECLARE
+    v_mes date;
+BEGIN
+    FOR v_mes IN SELECT mes FROM public.sinapi_listar_particoes() ORDER BY mes DESC OFFSET greatest(p_manter, 1) LOOP
+        -- Mês ainda referenciado fica (sinapi_remover_mes recusaria)
+        IF public.sinapi_referencias_mes(v_mes) > 0 THEN
+            RAISE NOTICE '% mantida: ainda referenciada', public.sinapi_particao_mes(v_mes);
+            CONTINUE;
+        END IF;
+        PERFORM public.sinapi_remover_mes(v_mes);
+        RETURN NEXT public.sinapi_particao_mes(v_mes);
+    END LOOP;
+END;
+$$;
+
+
+REVOKE ALL ON FUNCTION "public"."sinapi_preparar_carga"() FROM PUBLIC, "anon", "authenticated";
+REVOKE ALL ON FUNCTION "public"."sinapi_publicar_mes"("date") FROM PUBLIC, "anon", "authenticated";
+REVOKE ALL ON FUNCTION "public"."sinapi_listar_particoes"() FROM PUBLIC, "anon", "authenticated";
+REVOKE ALL ON FUNCTION "public"."sinapi_remover_mes"("date") FROM PUBLIC, "anon", "authenticated";
+REVOKE ALL ON FUNCTION "public"."sinapi_reter_meses"(integer) FROM PUBLIC, "anon", "authenticated";
+REVOKE ALL ON FUNCTION "public"."sinapi_referencias_mes"("date") FROM PUBLIC, "anon", "authenticated";
+GRANT EXECUTE ON FUNCTION "public"."sinapi_preparar_carga"() TO "service_role";
+GRANT EXECUTE ON FUNCTION "public"."sinapi_publicar_mes"("date") TO "service_role";
+GRANT EXECUTE ON FUNCTION "public"."sinapi_listar_particoes"() TO "service_role";
+GRANT EXECUTE ON FUNCTION "public"."sinapi_remover_mes"("date") TO "service_role";
+GRANT EXECUTE ON FUNCTION "public"."sinapi_reter_meses"(integer) TO "service_role";
+GRANT EXECUTE ON FUNCTION "public"."sinapi_referencias_mes"("date") TO "service_role";